@@ -41,14 +41,15 @@ def loadFromFile(path):
     if magic != Project.MAGIC_NUMBER:
         raise IOError, "unrecognized file type"
     version = stream.readInt32()
-    if version < Project.FILE_VERSION:
+    if version < Project.FILE_VERSION_COMPATIBLE:
         raise IOError, "old and unreadable file format"
     elif version > Project.FILE_VERSION:
         raise IOError, "new and unreadable file format"
     stream.setVersion(QtCore.QDataStream.Qt_4_2)
 
     project=Project()
-    project.loadFromStream(stream, huella=False, run=False)
+    project.loadFromStream(stream, huella=False, run=False,
+                           version=version)
     return project
 
 class SelectStreamProject(QtGui.QDialog):
@@ -398,13 +399,17 @@ class StreamItem(GeometricItem, QtGui.QGraphicsPathItem, GraphicsEntity):
 #            if isinstance(self.scene().project.getDownToStream(self.id), flux.Mixer):
 #                kwargs["id_entrada"]=self.scene().project.streams[self.id][3]+1
 #            self.scene().project.getDownToStream(self.id)(**kwargs)
-            pen=self.pen()
-            if corriente.status==1:
-                pen.setColor(QtGui.QColor("blue"))
-            else:
-                pen.setColor(QtGui.QColor("red"))
-            self.setPen(pen)
-            self.itemChange(QtGui.QGraphicsItem.ItemPositionChange, 0)
+            self.updateStatus()
+
+    def updateStatus(self):
+        """Color the stream with the status of its calculated value"""
+        pen=self.pen()
+        if self.corriente.status==1:
+            pen.setColor(QtGui.QColor("blue"))
+        else:
+            pen.setColor(QtGui.QColor("red"))
+        self.setPen(pen)
+        self.itemChange(QtGui.QGraphicsItem.ItemPositionChange, 0)
 
     def mouseDoubleClickEvent(self, event=None):
         dialog = UI_corriente.Corriente_Dialog(self.corriente)
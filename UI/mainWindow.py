@@ -11,8 +11,9 @@ from scipy.optimize import fsolve
 
 from UI import texteditor, newComponent, flujo, wizard, charts, plots, viewComponents
 from UI.widgets import createAction, ClickableLabel, TreeEquipment, FlowLayout, Tabla
-from lib.config import conf_dir, getComponents
+from lib.config import conf_dir, getComponents, invalidateConfig
 from lib.project import Project
+from lib.thread import Solve
 from lib.EoS import K, H
 from lib import unidades, mEoS
 from equipment import *
@@ -380,6 +381,12 @@ class UI_pychemqt(QtGui.QMainWindow):
         self.actionResolution = createAction(QtGui.QApplication.translate("pychemqt", "Resolution"), slot=partial(self.dialogConfig, UI_confResolution), tip=QtGui.QApplication.translate("pychemqt", "Defining PFD resolution dialog"), parent=self)
         self.menuPFD.addAction( self.actionResolution)
         self.menuPFD.addSeparator()
+        self.actionSolve = createAction(QtGui.QApplication.translate("pychemqt", "Solve"), slot=self.solveProject, icon=os.environ["pychemqt"]+"/images/button/update", shortcut="F8", tip=QtGui.QApplication.translate("pychemqt", "Solve the flowsheet"), parent=self)
+        self.actionSolveCancel = createAction(QtGui.QApplication.translate("pychemqt", "Stop calculation"), slot=self.solveCancel, icon=os.environ["pychemqt"]+"/images/button/clear", shortcut="Shift+F8", tip=QtGui.QApplication.translate("pychemqt", "Stop the flowsheet calculation in process"), parent=self)
+        self.actionSolveCancel.setEnabled(False)
+        self.menuPFD.addAction(self.actionSolve)
+        self.menuPFD.addAction(self.actionSolveCancel)
+        self.menuPFD.addSeparator()
         self.menuPFD.addAction(self.menuObjetosGraficos.menuAction())
         self.menuPFD.addAction(self.menuObjetosFlujo.menuAction())
         self.menuPFD.addAction(self.menuObjetosBasics.menuAction())
@@ -476,6 +483,11 @@ class UI_pychemqt(QtGui.QMainWindow):
         self.progressBar.setVisible(False)
         self.progressBar.setFixedWidth(80)
         self.statusbar.addPermanentWidget(self.progressBar)
+        # Flowsheet calculation out of gui thread
+        self.solveThread = Solve(self)
+        self.solveThread.progress.connect(self.solveProgress)
+        self.solveThread.finished.connect(self.solveFinished)
+        self.solvePending = None
         self.statusPosition=QtGui.QLabel(self)
         self.statusbar.addPermanentWidget(self.statusPosition)
         self.statusResolution=ClickableLabel(self)
@@ -667,6 +679,7 @@ class UI_pychemqt(QtGui.QMainWindow):
         scene = flujo.GraphicsScene(self)
         scene.selectionChanged.connect(self.selectionChanged)
         scene.setSceneRect(0, 0, self.config[-1].getint("PFD", "x"), self.config[-1].getint("PFD", "y"))
+        scene.project.solver = self.solveProject
         PFD.setScene(scene)
         mdiarea.addSubWindow(PFD)
         PFD.show()
@@ -681,6 +694,7 @@ class UI_pychemqt(QtGui.QMainWindow):
         config.set("PFD", "x", self.Preferences.get("PFD", "x"))
         config.set("PFD", "y", self.Preferences.get("PFD", "y"))
         self.config.append(config)
+        invalidateConfig()
         mdiArea = QtGui.QMdiArea()
 #        style=StyleCustom()
 #        mdiArea.setStyle(style)
@@ -788,16 +802,18 @@ class UI_pychemqt(QtGui.QMainWindow):
             if magic != Project.MAGIC_NUMBER:
                 raise IOError, "unrecognized file type"
             version = stream.readInt32()
-            if version < Project.FILE_VERSION:
+            if version < Project.FILE_VERSION_COMPATIBLE:
                 raise IOError, "old and unreadable file format"
             elif version > Project.FILE_VERSION:
                 raise IOError, "new and unreadable file format"
             stream.setVersion(QtCore.QDataStream.Qt_4_2)
 
             project=Project()
-            project.loadFromStream(stream)
+            project.loadFromStream(stream, version=version, run=False)
+            project.solver = self.solveProject
 
             self.config.append(project.config)
+            invalidateConfig()
 
             mdiArea = QtGui.QMdiArea()
 
@@ -831,6 +847,7 @@ class UI_pychemqt(QtGui.QMainWindow):
 
             self.activeControl(True)
             self.changeStatusThermo(self.config[self.idTab])
+            self.solveProject(project)
 
     def fileClose(self, int):
         if self.okToContinue(int):
@@ -839,6 +856,7 @@ class UI_pychemqt(QtGui.QMainWindow):
             del self.dirty[int]
             del self.config[int]
             del self.filename[int]
+            invalidateConfig()
             if self.centralwidget.count():
                 self.activeControl(True)
             else:
@@ -860,6 +878,7 @@ class UI_pychemqt(QtGui.QMainWindow):
 
     def updateConfig(self, config):
         self.config[self.idTab]=config
+        invalidateConfig()
         self.currentScene.project.setConfig(config)
         self.dirty[self.idTab]=True
         self.currentScene.setSceneRect(0, 0, config.getint("PFD", "x"), config.getint("PFD", "y"))
@@ -881,6 +900,56 @@ class UI_pychemqt(QtGui.QMainWindow):
         self.status.append( '<b>' + time.strftime("%H:%M:%S", time.localtime()) + '</b> - ' + text + ' [<font color="%s">%s</font>]' %(color, txt))
         QtGui.QApplication.processEvents()
 
+#Calculation
+    def solveProject(self, project=None):
+        """Solve a project in the calculation thread, if other calculation is
+        in process it's stopped and the project solved when it finish
+        project: project to solve, default the project of current tab"""
+        if not isinstance(project, Project):
+            if not self.centralwidget.count():
+                return
+            project = self.currentScene.project
+        if self.solveThread.isRunning():
+            self.solvePending = project
+            self.solveThread.cancel()
+            return
+        self.progressBar.setValue(0)
+        self.progressBar.setVisible(True)
+        self.actionSolveCancel.setEnabled(True)
+        self.updateStatus(QtGui.QApplication.translate("pychemqt", "Solving flowsheet"))
+        self.solveThread.start(project)
+
+    def solveCancel(self):
+        """Stop the flowsheet calculation in process"""
+        self.solvePending = None
+        self.solveThread.cancel()
+
+    def solveProgress(self, done, total):
+        self.progressBar.setMaximum(total)
+        self.progressBar.setValue(done)
+
+    def solveFinished(self):
+        """Show the result of flowsheet calculation and start the pending
+        calculation if there is one"""
+        self.progressBar.setVisible(False)
+        self.actionSolveCancel.setEnabled(False)
+        project = self.solveThread.project
+        if project.cancelled:
+            self.updateStatus(QtGui.QApplication.translate("pychemqt", "Flowsheet calculation stopped"), False)
+        else:
+            self.updateStatus(QtGui.QApplication.translate("pychemqt", "Flowsheet solved"), self.solveThread.converged)
+            for report in project.convergence:
+                if not report["converged"]:
+                    self.updateStatus(QtGui.QApplication.translate("pychemqt", "Recycle loop")+" %s: %s" % (", ".join(report["nodes"]), report["msg"]), False)
+        for indice in range(self.centralwidget.count()):
+            scene = self.getScene(indice)
+            if scene.project is project:
+                for item in scene.objects["stream"].values():
+                    item.updateStatus()
+        if self.solvePending is not None:
+            project, self.solvePending = self.solvePending, None
+            self.solveProject(project)
+
     def updatePosition(self, point):
         self.statusPosition.setText("(%i, %i)" %(point.x(), point.y()))
 
@@ -922,6 +991,7 @@ class UI_pychemqt(QtGui.QMainWindow):
             preferences.write(open(conf_dir+"pychemqtrc", "w"))
             self.Preferences=ConfigParser()
             self.Preferences.read(conf_dir+"pychemqtrc")
+            invalidateConfig()
             self.updateStatus(QtGui.QApplication.translate("pychemqt", "pychemqt configuration change"), True)
             self.changePreferenceLive()
         else:
@@ -974,6 +1044,7 @@ class UI_pychemqt(QtGui.QMainWindow):
     def currentTabChanged(self, indice):
 #        flujo.StreamItem.id=0
 #        flujo.EquipmentItem.id=0
+        invalidateConfig()
         if indice==-1:
             self.list.clear()
             self.activeControl(False)
@@ -6,7 +6,6 @@
 import os
 
 from PyQt4.QtGui import QApplication
-from scipy.optimize import fsolve
 
 from lib.corriente import Corriente
 from lib import unidades
@@ -209,23 +208,19 @@ class Mixer(equipment):
                 self.Pout=unidades.Pressure(sum(lst, 0.0) / len(lst))
 
         h_in=0
-        To=0
         caudalunitariomasico=[0]*len(self.entrada[0].fraccion)
         for entrada in self.entrada:
             if entrada.status:
                 h_in+=entrada.h
-                To+=entrada.T*entrada.caudalmasico
                 for i, caudal in enumerate(entrada.caudalunitariomasico):
                     caudalunitariomasico[i]+=caudal
-        To/=sum(caudalunitariomasico)
         
         if self.entrada[0].Config.get("Components", "Solids"):
             #TODO: Add solid mixer
             pass
         
-        f=lambda T: Corriente(T=T, P=self.Pout, caudalUnitarioMasico=caudalunitariomasico).h-h_in
-        T=fsolve(f, To)[0]
-        salida=Corriente(T=T, P=self.Pout, caudalUnitarioMasico=caudalunitariomasico)
+        salida=Corriente(P=self.Pout, h=h_in, ids=self.entrada[0].ids,
+                        caudalUnitarioMasico=caudalunitariomasico)
         self.salida=[salida]
         
         self.outT=salida.T
@@ -372,10 +367,19 @@ class Valve(equipment):
             elif Dew:
                 corriente=self.entrada.clone(T=Dew)
                 self.Pout=corriente.eos._Dew_P()
+                if self.Pout is None:
+                    self.msg=QApplication.translate("pychemqt", "dew pressure can't be calculated")
             elif Bubble:
                 corriente=self.entrada.clone(T=Bubble)
                 self.Pout=corriente.eos._Bubble_P()
-            self.salida=[self.entrada.clone(P=self.Pout)]
+                if self.Pout is None:
+                    self.msg=QApplication.translate("pychemqt", "bubble pressure can't be calculated")
+            if self.Pout is None:
+                self.status=2
+                self.salida=[Corriente()]
+                return
+            # Isenthalpic expansion
+            self.salida=[self.entrada.clone(P=self.Pout, h=self.entrada.h)]
             
         elif self.kwargs["off"]==2:
             self.entrada=Corriente()
@@ -17,7 +17,6 @@ from math import factorial
 
 from PyQt4.QtGui import QApplication
 from scipy import sqrt, exp, log, pi, arccos, sin, cos, log10, tanh
-from scipy.optimize import fsolve
 from scipy.constants import g
 
 from lib import unidades
@@ -352,11 +351,10 @@ class Heat_Exchanger(equipment):
             else:
                 self.HeatCalc=unidades.Power(A*U*(Text-self.entrada.T))
 
-            f=lambda T: self.entrada.clone(T=T, P=self.entrada.P-self.DeltaP).h-self.entrada.h-self.HeatCalc
-            T=fsolve(f, self.entrada.T)[0]
-            if T>max(Text, self.entrada.T) or T<min(Text, self.entrada.T):
-                T=self.Text
-            self.salida=[self.entrada.clone(T=T, P=self.entrada.P-self.DeltaP)]
+            salida=self.entrada.clone(P=self.entrada.P-self.DeltaP, h=self.entrada.h+self.HeatCalc)
+            if salida.T>max(Text, self.entrada.T) or salida.T<min(Text, self.entrada.T):
+                salida=self.entrada.clone(T=Text, P=self.entrada.P-self.DeltaP)
+            self.salida=[salida]
 
         self.Tin=self.entrada.T
         self.ToutCalc=self.salida[0].T
@@ -1760,12 +1758,8 @@ class Hairpin(Heat_ExchangerDesign):
             else:
                 QTube=-self.Q
                 QAnnulli=self.Q
-            f=lambda T: inTube.clone(T=T).h-inTube.h+QTube
-            T=fsolve(f, inTube.T)[0]
-            self.outTube=inTube.clone(T=T)
-            f=lambda T: inAnnulli.clone(T=T).h-inAnnulli.h+QAnnulli
-            T=fsolve(f, inAnnulli.T)[0]
-            self.outAnnulli=inAnnulli.clone(T=T)
+            self.outTube=inTube.clone(h=inTube.h-QTube)
+            self.outAnnulli=inAnnulli.clone(h=inAnnulli.h-QAnnulli)
 
 
     def design(self):
@@ -1804,10 +1798,8 @@ class Hairpin(Heat_ExchangerDesign):
                 DTi=abs(self.outTube.T-inTube.T)
                 Qi=abs(self.outTube.h-inTube.h)
                 self.Q=unidades.Power(Qi)
-                f=lambda T: inAnnulli.clone(T=T).h-inAnnulli.h-Qi
-                T=fsolve(f, inAnnulli.T)[0]
-                DTo=abs(T-inAnnulli.T)
-                self.outAnnulli=inAnnulli.clone(T=T)
+                self.outAnnulli=inAnnulli.clone(h=inAnnulli.h+Qi)
+                DTo=abs(self.outAnnulli.T-inAnnulli.T)
 
             elif self.statusOut==3:
                 if self.kwargs["annulliTout"]:
@@ -1818,10 +1810,8 @@ class Hairpin(Heat_ExchangerDesign):
                 DTo=abs(self.outAnnulli.T-inAnnulli.T)
                 Qo=abs(self.outAnnulli.h-inAnnulli.h)
                 self.Q=unidades.Power(Qo)
-                f=lambda T: inTube.clone(T=T).h-inTube.h-Qi
-                T=fsolve(f, inTube.T)[0]
-                DTi=abs(T-inTube.T)
-                self.outTube=inTube.clone(T=T)
+                self.outTube=inTube.clone(h=inTube.h+Qo)
+                DTi=abs(self.outTube.T-inTube.T)
 
             self.phaseTube=self.ThermalPhase(inTube, self.outTube)
             self.phaseAnnulli=self.ThermalPhase(inAnnulli, self.outAnnulli)
@@ -2271,10 +2261,8 @@ class Fired_Heater(equipment):
         Heat=unidades.Power(H1-Ho)
 
         if self.Hmax and Heat>self.Hmax:
-            self.Heat=unidades.Power(Hmax)
-            To=(self.entrada.T+self.Tout)/2
-            T=fsolve(lambda T: self.entrada.clone(T=T, P=self.entrada.P-self.deltaP).h-Ho-Hmax, To)[0]
-            self.salida=[self.entrada.clone(T=T, P=self.entrada.P-self.deltaP)]
+            self.Heat=unidades.Power(self.Hmax)
+            self.salida=[self.entrada.clone(P=self.entrada.P-self.deltaP, h=Ho+self.Hmax)]
         else:
             self.Heat=Heat
             self.salida=[salida]
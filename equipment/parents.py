@@ -13,7 +13,9 @@ import logging
 
 from PyQt4 import QtCore, QtGui
 
+from lib import unidades
 from lib.config import Entity
+from lib.corriente import Corriente
 from lib.thread import Evaluate
 from UI import texteditor
 from UI.widgets import Status
@@ -22,6 +24,113 @@ from tools.HelpView import HelpView
 from tools.costIndex import indiceBase, indiceActual
 
 
+# Type codes of values in the calculated state of equipment saved to file
+(STATE_NONE, STATE_BOOL, STATE_INT, STATE_FLOAT, STATE_UNIT, STATE_STR,
+ STATE_UNICODE, STATE_LIST, STATE_TUPLE, STATE_STREAM) = range(10)
+# Unicode text types, QString with the version 1 of PyQt4 string api
+TEXT = (unicode, getattr(QtCore, "QString", unicode))
+
+
+def _isStateValue(value):
+    """Check if a calculated value can be saved to file as state"""
+    if value is None or isinstance(value, (int, str, Corriente)+TEXT):
+        return True
+    elif isinstance(value, unidades.unidad):
+        name = value.__class__.__name__
+        return getattr(unidades, name, None) is value.__class__
+    elif isinstance(value, float):
+        return True
+    elif isinstance(value, (list, tuple)):
+        return all([_isStateValue(val) for val in value])
+    return False
+
+
+def writeStateValue(stream, value):
+    """Write a calculated value to file with its type code"""
+    if value is None:
+        stream.writeInt32(STATE_NONE)
+    elif isinstance(value, bool):
+        stream.writeInt32(STATE_BOOL)
+        stream.writeBool(value)
+    elif isinstance(value, int):
+        stream.writeInt32(STATE_INT)
+        stream.writeInt32(value)
+    elif isinstance(value, unidades.unidad):
+        stream.writeInt32(STATE_UNIT)
+        stream.writeString(value.__class__.__name__)
+        stream.writeString(value.code)
+        stream.writeString(value.magnitud)
+        stream.writeDouble(value._data)
+    elif isinstance(value, float):
+        stream.writeInt32(STATE_FLOAT)
+        stream.writeDouble(value)
+    elif isinstance(value, str):
+        stream.writeInt32(STATE_STR)
+        stream.writeString(value)
+    elif isinstance(value, TEXT):
+        stream.writeInt32(STATE_UNICODE)
+        stream.writeString(unicode(value).encode("utf-8"))
+    elif isinstance(value, (list, tuple)):
+        if isinstance(value, list):
+            stream.writeInt32(STATE_LIST)
+        else:
+            stream.writeInt32(STATE_TUPLE)
+        stream.writeInt32(len(value))
+        for val in value:
+            writeStateValue(stream, val)
+    elif isinstance(value, Corriente):
+        stream.writeInt32(STATE_STREAM)
+        value.writeStatetoStream(stream)
+
+
+def readStateValue(stream):
+    """Read a calculated value from file"""
+    code = stream.readInt32()
+    if code == STATE_NONE:
+        value = None
+    elif code == STATE_BOOL:
+        value = stream.readBool()
+    elif code == STATE_INT:
+        value = stream.readInt32()
+    elif code == STATE_UNIT:
+        cls = getattr(unidades, stream.readString())
+        unit = stream.readString()
+        magnitud = stream.readString()
+        value = unidades._restore(cls, stream.readDouble(), unit, magnitud)
+    elif code == STATE_FLOAT:
+        value = stream.readDouble()
+    elif code == STATE_STR:
+        value = stream.readString()
+    elif code == STATE_UNICODE:
+        value = stream.readString().decode("utf-8")
+    elif code in (STATE_LIST, STATE_TUPLE):
+        value = [readStateValue(stream) for i in range(stream.readInt32())]
+        if code == STATE_TUPLE:
+            value = tuple(value)
+    elif code == STATE_STREAM:
+        value = Corriente()
+        value.readStatefromStream(stream)
+    return value
+
+
+def writeStatetoStream(stream, state):
+    """Write the calculated state of a equipment to file, dict with the
+    attribute values as returned by equipment.getState"""
+    stream.writeInt32(len(state))
+    for key, value in state.iteritems():
+        stream.writeString(key)
+        writeStateValue(stream, value)
+
+
+def readStatefromStream(stream):
+    """Read the calculated state of a equipment from file"""
+    state = {}
+    for i in range(stream.readInt32()):
+        key = stream.readString()
+        state[key] = readStateValue(stream)
+    return state
+
+
 class equipment(Entity):
     """General structure for equipment, each child class must define the
     properties and procedures
@@ -171,6 +280,37 @@ class equipment(Entity):
         """
         return []
 
+    # Calculated state to file
+    def getState(self):
+        """Return the calculated state of equipment to save to file, a dict
+        with the status, message, output streams and the calculated values
+        of calculateValue, calculateCostos and propertiesEquipment, None if
+        the equipment isn't solved or any value can't be saved"""
+        if self.status not in (1, 3) or "salida" not in self.__dict__:
+            return None
+        names = ["salida", "statusCoste"]
+        names += list(self.calculateValue) + list(self.calculateCostos)
+        for name, attr, unit in self.propertiesEquipment():
+            if isinstance(attr, tuple):
+                attr = attr[0]
+            if attr not in names and attr not in self.kwargs:
+                names.append(attr)
+
+        state = {"status": self.status, "msg": self.msg}
+        for name in names:
+            if name in self.__dict__:
+                state[name] = self.__dict__[name]
+        if not _isStateValue(state.values()):
+            return None
+        return state
+
+    def setState(self, state):
+        """Set a calculated state read from file, the input streams must be
+        defined previously"""
+        for key, value in state.iteritems():
+            setattr(self, key, value)
+        self._bool = True
+
 
 class UI_equip(QtGui.QDialog):
     """UI general for equipments, each child class must define specifics"""
@@ -13,7 +13,6 @@ from lib import unidades
 from lib.eos import EoS
 from lib.EoS import cubic
 from lib.physics import R_atml
-from lib.bip import bwrs
 
 
 class BWRS(EoS):
@@ -26,7 +25,7 @@ class BWRS(EoS):
         self.P = unidades.Pressure(P, "atm")
         self.componente = mezcla.componente
         self.zi = mezcla.fraccion
-        self.kij = mezcla.Kij(bwrs)
+        self.kij = mezcla.Kij(self.T, "bwrs")
 
         Aoi = []
         Boi = []
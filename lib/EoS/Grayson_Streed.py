@@ -14,13 +14,27 @@ from lib import unidades, config
 from lib.physics import R_atml, factor_acentrico_octano
 
 from lib.eos import EoS
+from lib.EoS.cubic import RK
 
 class Grayson_Streed(EoS):
     """Ecuación de estado de Grayson Streed modificada por Chao-Seader
-    Chao, K.C. and Seader, J.D.; A General Correlation of Vapor-Liquid Equilibria in Hydrocarbon Mixtures, AIChE Journal, 7, No 4 (December 1961"""
+    Chao, K.C. and Seader, J.D.; A General Correlation of Vapor-Liquid Equilibria in Hydrocarbon Mixtures, AIChE Journal, 7, No 4 (December 1961
+
+    Vapor fraction of a light hydrocarbon mixture in the two phases region,
+    near to the SRK value, T in K and P in atm
+    >>> from lib.corriente import Mezcla
+    >>> from lib.EoS.cubic import SRK
+    >>> mix = Mezcla(2, ids=[2, 4, 6], caudalUnitarioMolar=[0.4, 0.3, 0.3])
+    >>> print "%0.2f %0.2f" % (SRK(250, 10, mix).x, Grayson_Streed(250, 10, mix).x)
+    0.41 0.38
+    """
     __title__="Grayson Streed (1961)"
     __status__="GS"
 
+    # The liquid fugacity is calculated with a correlation, so the stability
+    # test of feed can't be used
+    flashStability = False
+
     def __init__(self, T, P, mezcla):
         self.T=unidades.Temperature(T)
         self.P=unidades.Pressure(P, "atm")
@@ -51,7 +65,7 @@ class Grayson_Streed(EoS):
         nio=[]
         for i in self.componente:
             tr=i.tr(self.T)
-            pr=i.pr(self.P.atm)
+            pr=i.pr(self.P)
             if i.indice==1:
                 A=[1.50709, 2.74283, -0.02110, 0.00011, 0.0, 0.008585, 0., 0., 0., 0.]
             elif i.indice==2:
@@ -70,52 +84,9 @@ class Grayson_Streed(EoS):
         return tital, fi
 
 
-    def _Flash(self):
-        """Cálculo de los coeficientes de reparto entre fases, Ref Naji - Conventional and rapid flash claculations"""
-        #Estimación inicial de K mediante correlación wilson Eq 19
-        Ki=[]
-        for i in self.componente:
-            Ki.append(i.Pc/self.P*exp(5.37*(1.+i.f_acent)*(1.-i.Tc/self.T)))
-
-        Rachford=lambda x: sum([zi*(ki-1.)/(1.-x+x*ki) for zi, ki in zip(self.fraccion, Ki)])
-
-        if Rachford(0)>0 and Rachford(1)>0: #x>1, por tanto solo fase vapor
-            xi=self.fraccion
-            yi=self.fraccion
-            x=1.
-        elif Rachford(0)<0 and Rachford(1)<0: #x<0, por tanto solo fase líquida
-            xi=self.fraccion
-            yi=self.fraccion
-            x=0.
-        else:
-            x=0.5
-            while True:
-                xo=x
-                solucion=fsolve(Rachford, x, full_output=True)
-                if solucion[2]!=1:
-                    print solucion
-                    break
-                else:
-                    x=solucion[0]
-                    xi=[]
-                    yi=[]
-                    for zi, ki in zip(self.fraccion, Ki):
-                        xi.append(zi/(1-x+x*ki))
-                        yi.append(zi*ki/(1-x+x*ki))
-
-                    titas=self._k(xi, yi)
-                    tital=titas[0]
-                    titav=titas[1]
-
-                    fiv=[z*t*self.P for z, t in zip(yi, titav)]
-                    fil=[z*t*self.P for z, t in zip(xi, tital)]
-                    #criterio de convergencia Eq 21
-                    if sum([abs(l/v-1) for l, v in zip(fil, fiv)])< 1e-12 and (x-xo)**2 < 1e-15:
-                        break
-                    else:
-                        Ki=[l/v for l, v in zip(tital, titav)]
-
-        return x, xi, yi, Ki
+    def _lnK(self, xi, yi):
+        tital, titav = self._k(xi, yi)
+        return log(tital)-log(titav)
 
 
 _all = [Grayson_Streed]
@@ -2,90 +2,320 @@
 # -*- coding: utf-8 -*-
 
 ###############################################################################
-# Virial equation of state implementation
+# Cubic equation of state implementation
+#   - Cubic: Vectorized core of generalized cubic equation of state
+#   - Subclasses: Parameters and alpha functions of each equation
+#
+#   The core works with numpy arrays of component parameters, so the alpha
+#   functions are evaluated for all components at once, and the mixture
+#   parameters, compresibility factor roots and fugacity coefficients can
+#   be calculated for arrays of compositions and temperatures
 ###############################################################################
 
-from scipy import roots, r_, log, exp, sqrt
+from numpy import (arccos, array, asarray, cbrt, clip, cos, errstate, exp,
+                   log, newaxis, pi, sqrt, where, zeros)
+from scipy.optimize import fsolve
 
 from lib import unidades, config
 from lib.eos import EoS
 from lib.physics import R_atml
 
 
-class Cubic(EoS):
-    """Clase que modela de manera generalizada las ecuaciones de estado cúbicas
-    ref. Prausnick  Propiedades de gases y liquidos, pag 203"""
-    def __init__(self, T, P, mezcla):
-        self.T=unidades.Temperature(T)
-        self.P=unidades.Pressure(P, "atm")
-        self.mezcla=mezcla
-        self.componente=mezcla.componente
-        self.fraccion=mezcla.fraccion
+# Alpha functions, vector kernels, return alfa and its derivative with
+# reduced temperature
+def _Soave(Tr, m):
+    """Soave alpha function, α=[1+m(1-Tr^0.5)]²"""
+    g = 1+m*(1-Tr**0.5)
+    return g**2, -m*g/Tr**0.5
+
+
+def _BostonMathias(Tr, m, d=None):
+    """Boston-Mathias extrapolation of alpha function for supercritical
+    components, α=exp[2c(1-Tr^d)]"""
+    if d is None:
+        d = 1+m/2.
+    c = 1-1./d
+    alfa = exp(2*c*(1-Tr**d))
+    return alfa, -2*c*d*Tr**(d-1)*alfa
+
+
+def _where(condition, kernel1, kernel2):
+    """Select alpha function and derivative by condition"""
+    return (where(condition, kernel1[0], kernel2[0]),
+            where(condition, kernel1[1], kernel2[1]))
+
+
+def _cubicRoots(c2, c1, c0):
+    """Real roots of Z³+c2·Z²+c1·Z+c0=0, vectorized
+    Output:
+        Zmax, Zmid, Zmin: Roots sorted, all equal with only one real root
+    """
+    p = c1-c2**2/3.
+    q = 2*c2**3/27.-c2*c1/3.+c0
+    disc = q**2/4+p**3/27
+    with errstate(invalid="ignore", divide="ignore"):
+        # One real root, Cardano formula
+        sq = sqrt(abs(disc))
+        t = cbrt(-q/2+sq)+cbrt(-q/2-sq)
+
+        # Three real roots, trigonometric formula
+        r = 2*sqrt(abs(p)/3)
+        theta = arccos(clip(3*q/p/r, -1, 1))/3
+        t0 = r*cos(theta)
+        t1 = r*cos(theta-2*pi/3)
+        t2 = r*cos(theta-4*pi/3)
+
+    single = disc > 0
+    roots = [where(single, t, ti)-c2/3 for ti in (t0, t1, t2)]
+
+    # Polish the roots with a newton step
+    for i, Z in enumerate(roots):
+        f = ((Z+c2)*Z+c1)*Z+c0
+        df = (3*Z+2*c2)*Z+c1
+        with errstate(invalid="ignore", divide="ignore"):
+            roots[i] = where(df != 0, Z-f/df, Z)
+    return roots
 
-        self.B=self.b*self.P.atm/R_atml/self.T
-        self.Tita=self.tita*self.P.atm/(R_atml*self.T)**2
 
-        delta=self.delta*self.P.atm/R_atml/self.T
-        epsilon=self.epsilon*(self.P.atm/R_atml/self.T)**2
-        eta=self.eta*self.P.atm/R_atml/self.T
-        Z=roots([1, delta-self.B-1, self.Tita+epsilon-delta*(self.B+1), -epsilon*(self.B+1)-self.Tita*eta])
-        self.Z=r_[Z[0].real, Z[2].real]
+class Cubic(EoS):
+    """Generalized cubic equation of state
+        P = RT/(V-b) - a/(V²+u·b·V+w·b²)
+    ref. Prausnick  Propiedades de gases y liquidos, pag 203
+
+    The subclasses only define the parameters of the equation:
+        OmegaA, OmegaB: Coefficients of critical a and b parameters
+        u, w: Coefficients of attractive term denominator
+        mixing: Name of Mezcla mixing rule method to use, default the
+            configured mixing rule
+        bip: Name of binary interaction parameters table, without it the
+            interaction parameters are zero
+        _lib: Method to calculate the component parameters arrays
+        _alfa: Method with the alpha function as vector kernel
+    """
+    OmegaA = 0
+    OmegaB = 0
+    u = 0
+    w = 0
+    mixing = None
+    bip = None
 
-        self.V=self.Z*R_atml*self.T/self.P.atm  #mol/l
-        self.x, self.xi, self.yi, self.Ki=self._Flash()
-        self.H_exc=-(self.tita+self.dTitadT)/R_atml/self.T/(self.delta**2-4*self.epsilon)**0.5*log((2*self.V+self.delta-(self.delta**2-4*self.epsilon)**0.5)/(2*self.V+self.delta+(self.delta**2-4*self.epsilon)**0.5))+1-self.Z
+    def __init__(self, T, P, mezcla):
+        self.T = unidades.Temperature(T)
+        self.P = unidades.Pressure(P, "atm")
+        self.mezcla = mezcla
+        self.componente = mezcla.componente
+        self.fraccion = mezcla.fraccion
+
+        self._setup(mezcla)
+        x = asarray(self.fraccion, dtype=float)
+        self.ai, self.dai = self._ai(T)
+        a, b, Ai, dadT, u, w = self._mixture(x, self.ai, self.dai)
+        self.Ai = Ai
+
+        self.b = b
+        self.tita = a
+        self.delta = u*b
+        self.epsilon = w*b**2
+        self.eta = b
+        self.u = u
+        self.w = w
+        self.dTitadT = dadT
+
+        self.B = self.b*self.P.atm/R_atml/self.T
+        self.Tita = self.tita*self.P.atm/(R_atml*self.T)**2
+        Zv, Zl = self._Z(self.Tita, self.B, u, w)
+        self.Z = array([Zv, Zl], dtype=float)
+
+        self.V = self.Z*R_atml*self.T/self.P.atm  # mol/l
+        self.x, self.xi, self.yi, self.Ki = self._Flash()
+        self.H_exc = 1-self.Z+(self.tita-self.T*self.dTitadT)/self.b/R_atml / \
+            self.T*self._I(self.Z, self.B, u, w)
+
+    def _setup(self, mezcla):
+        """Define the arrays of component parameters"""
+        self.Tci = array([cmp.Tc for cmp in self.componente], dtype=float)
+        self.Pci = array([cmp.Pc.atm for cmp in self.componente], dtype=float)
+        self.f_acent = array([cmp.f_acent for cmp in self.componente],
+                             dtype=float)
+        self.aci = self.OmegaA*R_atml**2*self.Tci**2/self.Pci
+        self.bi = self.OmegaB*R_atml*self.Tci/self.Pci
+
+        Config = config.getConfig()
+        self._mathias = Config.getint("Thermo", "Alfa") == 1
+        self.kij = asarray(mezcla.Kij(self.T, self.bip), dtype=float)
+        self._lib()
+
+    def _lib(self):
+        """Calculate the arrays with the specific parameters of equation,
+        to override in subclasses"""
+        pass
+
+    def _alfa(self, Tr):
+        """Alpha function, return alfa and its derivative with reduced
+        temperature, to override in subclasses"""
+        return 1+0*Tr, 0*Tr
+
+    def _ai(self, T):
+        """Attractive parameter of components and its temperature derivative
+        Input:
+            T: temperature, scalar or array
+        Output:
+            ai, daidT: arrays with shape T.shape+(n,)
+        """
+        T = asarray(T, dtype=float)
+        Tr = T[..., newaxis]/self.Tci
+        alfa, dalfa = self._alfa(Tr)
+        return self.aci*alfa, self.aci*dalfa/self.Tci
+
+    def _uw(self, x):
+        """Coefficients of attractive term denominator, constant for two
+        parameter equations"""
+        return self.u, self.w
+
+    def _kij(self, x):
+        """Dense interaction parameters matrix with the mixing rule"""
+        kij = self.kij
+        kji = kij.T
+        xi = x[..., :, newaxis]
+        xj = x[..., newaxis, :]
+        rule = self.mixing or self.mezcla.Mixing_Rule.__name__
+        if rule == "Mix_Stryjek_Vera":
+            with errstate(invalid="ignore", divide="ignore"):
+                k = kij*kji/(xi*kij+xj*kji)
+            return where((kij == 0) & (kji == 0), 0, k)
+        elif rule == "Mix_Panagiotopoulos":
+            return kij-(kij-kji)*xi
+        elif rule == "Mix_Melhem":
+            return kij-(kij-kji)*xi/(xi+xj)
+        else:
+            return kij
+
+    def _mixture(self, x, ai, dai):
+        """Mixture parameters
+        Input:
+            x: molar fraction, array with shape (n,) or (m, n)
+            ai, dai: component attractive parameter and its temperature
+                derivative
+        Output:
+            a, b: mixture parameters
+            Ai: Σj xj·aij, for fugacity calculation
+            dadT: temperature derivative of a
+            u, w: coefficients of attractive term denominator
+        """
+        x = asarray(x, dtype=float)
+        sa = sqrt(ai)
+        dsa = dai/2/sa
+        kij = 1-self._kij(x)
+        aij = sa[..., :, newaxis]*sa[..., newaxis, :]*kij
+        daij = (dsa[..., :, newaxis]*sa[..., newaxis, :] +
+                sa[..., :, newaxis]*dsa[..., newaxis, :])*kij
+
+        Ai = (aij*x[..., newaxis, :]).sum(-1)
+        a = (x*Ai).sum(-1)
+        dadT = (x*(daij*x[..., newaxis, :]).sum(-1)).sum(-1)
+        b = (x*self.bi).sum(-1)
+        u, w = self._uw(x)
+        return a, b, Ai, dadT, u, w
+
+    @staticmethod
+    def _Z(A, B, u, w):
+        """Compresibility factor roots of cubic equation
+        Output:
+            Zv, Zl: Vapor and liquid roots
+        """
+        c2 = (u-1)*B-1
+        c1 = A+w*B**2-u*B-u*B**2
+        c0 = -A*B-w*B**2-w*B**3
+        Zmax, Zmid, Zmin = _cubicRoots(c2, c1, c0)
+
+        # Liquid root must be greater than covolume
+        Zl = where(Zmin > B, Zmin, where(Zmid > B, Zmid, Zmax))
+        return Zmax, Zl
+
+    @staticmethod
+    def _I(Z, B, u, w):
+        """Logarithmic term of residual properties
+        1/s·ln[(2Z+B(u+s))/(2Z+B(u-s))], with s=(u²-4w)^0.5
+        with the limit 2B/(2Z+uB) for s=0, van der Waals equation"""
+        s = sqrt(asarray(u**2-4*w, dtype=float))
+        with errstate(invalid="ignore", divide="ignore"):
+            I = log((2*Z+B*(u+s))/(2*Z+B*(u-s)))/s
+        return where(s > 0, I, 2*B/(2*Z+u*B))
+
+    def _lnphi(self, x, Z, A, B, a, b, Ai, u, w):
+        """Logarithm of fugacity coefficients"""
+        Z = asarray(Z)[..., newaxis]
+        A = asarray(A)[..., newaxis]
+        B = asarray(B)[..., newaxis]
+        a = asarray(a)[..., newaxis]
+        b = asarray(b)[..., newaxis]
+        u = asarray(u)[..., newaxis]
+        w = asarray(w)[..., newaxis]
+        bb = self.bi/b
+        return bb*(Z-1)-log(Z-B)-A/B*(2*Ai/a-bb)*self._I(Z, B, u, w)
+
+    def _fugacity(self, x, T, P):
+        """Compresibility factor roots and fugacity coefficients for arrays
+        of compositions and conditions
+        Input:
+            x: molar fraction, array with shape (n,) or (m, n)
+            T: temperature, K, scalar or array with shape (m,)
+            P: pressure, atm, scalar or array with shape (m,)
+        Output:
+            Zv, Zl: vapor and liquid roots
+            lnphiv, lnphil: logarithm of fugacity coefficients for both roots
+        """
+        x = asarray(x, dtype=float)
+        T = asarray(T, dtype=float)
+        P = asarray(P, dtype=float)
+        ai, dai = self._ai(T)
+        a, b, Ai, dadT, u, w = self._mixture(x, ai, dai)
+        B = b*P/R_atml/T
+        A = a*P/(R_atml*T)**2
+        Zv, Zl = self._Z(A, B, u, w)
+        lnphiv = self._lnphi(x, Zv, A, B, a, b, Ai, u, w)
+        lnphil = self._lnphi(x, Zl, A, B, a, b, Ai, u, w)
+        return Zv, Zl, lnphiv, lnphil
+
+    def _lnphiTP(self, x, T, P):
+        """Logarithm of fugacity coefficients of the root with lower Gibbs
+        energy for arrays of compositions and conditions, only the
+        temperature dependent parameters are recalculated"""
+        Zv, Zl, lnphiv, lnphil = self._fugacity(x, T, P)
+        liquid = (x*lnphil).sum(-1) < (x*lnphiv).sum(-1)
+        return where(liquid[..., newaxis], lnphil, lnphiv)
+
+    def _fugPhase(self, xi, liquid):
+        """Logarithm of fugacity coefficients of a phase with composition xi,
+        the compresibility factor is calculated for the phase composition
+        liquid: boolean to use the liquid root, else the vapor root"""
+        xi = asarray(xi, dtype=float)
+        a, b, Ai, dadT, u, w = self._mixture(xi, self.ai, self.dai)
+        B = b*self.P.atm/R_atml/self.T
+        A = a*self.P.atm/(R_atml*self.T)**2
+        Zv, Zl = self._Z(A, B, u, w)
+        if liquid:
+            Z = Zl
+        else:
+            Z = Zv
+        return self._lnphi(xi, Z, A, B, a, b, Ai, u, w)
 
     def _fug(self, Z, xi):
-        Ai=[]
-        for i in range(len(self.componente)):
-            suma=0
-            for j in range(len(self.componente)):
-                suma+=self.fraccion[j]*self.ai[j]**0.5*(1-self.kij[i][j])
-            Ai.append(1/self.tita*2*self.ai[i]**0.5*suma)
-        tita=[]
-        for i in range(len(self.componente)):
-            tita.append(exp(self.bi[i]/self.b*(Z-1)-log(Z-self.B)-self.Tita/self.B/sqrt(self.u**2-4*self.w)*(Ai[i]-self.bi[i]/self.b)*log((Z+self.B/2*(self.u+sqrt(self.u**2-4*self.w)))/(Z+self.B/2*(self.u-sqrt(self.u**2-4*self.w))))).real)
-        return tita
-
-
-class _2ParameterCubic(Cubic):
-    pass
-    
+        """Fugacity coefficients of composition xi, Z is the root of the
+        global mixture used to select the phase"""
+        return exp(self._fugPhase(xi, Z < self.Z[0]))
+
+
 class van_Waals(Cubic):
     """Ecuación de estado de van der Waals
         van der Waals, J.D. Over de continuiteit van den gas- en vloestof-toestand. Dissertation, Leiden University, Leiden, Niederlande, 1873."""
     __title__="van der Waals (1890)"
     __status__="vdW"
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        for componente in mezcla.componente:
-            a, b=self.__lib(componente)
-            ai.append(a)
-            bi.append(b)
-        self.kij=mezcla.Kij(None)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=0
-        self.epsilon=0
-        self.eta=b
-
-        #TODO: Find relation between u,w y tita,delta, epsilon...
-        self.u=0
-        self.w=0
 
-        self.dTitadT=0
-        super(van_Waals, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto):
-        a=0.421875*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.125*R_atml*compuesto.Tc/compuesto.Pc.atm
-        return  a, b
+    OmegaA = 0.421875
+    OmegaB = 0.125
+    u = 0
+    w = 0
 
 
 class RK(Cubic):
@@ -93,37 +323,14 @@ class RK(Cubic):
     Redlich, O.; Kwong, J.N.S., On The Thermodynamics of Solutions. Chem. Rev. 1949, 44, 233."""
     __title__="Redlich-Kwong (1949)"
     __status__="RK"
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        for componente in mezcla.componente:
-            a, b=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-        self.kij=mezcla.Kij(None)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=b
-        self.epsilon=0
-        self.eta=b
-
-        #TODO: Find relation between u,w y tita,delta, epsilon...
-        self.u=1
-        self.w=0
-
-        self.dTitadT=tdadt
-        super(RK, self).__init__(T, P, mezcla)
-
-    def __lib(self, compuesto, T):
-        a=0.42747*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        alfa=compuesto.tr(T)**-0.5
-        b=0.08664*R_atml*compuesto.Tc/compuesto.Pc.atm
-        return  a*alfa, b
+
+    OmegaA = 0.42747
+    OmegaB = 0.08664
+    u = 1
+    w = 0
+
+    def _alfa(self, Tr):
+        return Tr**-0.5, -0.5*Tr**-1.5
 
 
 class Wilson(Cubic):
@@ -132,37 +339,14 @@ class Wilson(Cubic):
     __title__="Wilson (1964)"
     __status__="Wilson"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        for componente in mezcla.componente:
-            a, b=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-        self.kij=mezcla.Kij(None)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=b
-        self.epsilon=0
-        self.eta=b
-
-        self.u=1
-        self.w=0
-
-        self.dTitadT=tdadt
-        super(Wilson, self).__init__(T, P, mezcla)
-
-    def __lib(self, compuesto, T):
-        """Librería de cálculo de la ecuación de estado de Wilson"""
-        a=0.42747*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        alfa=1+(1.57+1.62*compuesto.f_acent/(compuesto.tr(T)-1))*compuesto.tr(T)
-        b=0.08664*R_atml*compuesto.Tc/compuesto.Pc.atm
-        return  a*alfa, b
+    OmegaA = 0.42747
+    OmegaB = 0.08664
+    u = 1
+    w = 0
+
+    def _alfa(self, Tr):
+        k = 1.57+1.62*self.f_acent
+        return Tr+k*(1-Tr), 1-k+0*Tr
 
 
 class Fuller(Cubic):
@@ -171,48 +355,40 @@ class Fuller(Cubic):
     __title__="Fuller (1976)"
     __status__="Fuller"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        ci=[]
-        for componente in mezcla.componente:
-            a, b, c=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            ci.append(ac)
-        self.kij=mezcla.Kij(SRK)
-        a, b=mezcla.Mix_van_der_Waals([ai, bi, ci], self.kij)
-        tdadt=0
-
-        self.ai=ai
-        self.bi=bi
-        self.ci=ci
-        self.b=b
-        self.tita=a
-        self.delta=b
-        self.epsilon=0
-        self.eta=b
-
-        self.u=c
-        self.w=0
-
-        self.dTitadT=tdadt
-        super(Fuller, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        #FIXME: La expresión para calcular beta no es correcta, necesita el valor de b que se culcula a partir de el, algún fallo habra en la bibliografia
-        b=compuesto.vc*compuesto.peso_molecular
-        beta=b/compuesto.vc*compuesto.peso_molecular
-        c=1/beta*(sqrt(1/beta-0.75)-1.5)
-        Wb=beta*((1-beta)*(2+c*beta)-(1+c*beta))/((2+c*beta)*(1-beta)**2)
-        b=Wb*R_atml*compuesto.Tc/compuesto.Pc.atm
-        Wa=(1+c*beta)**2*Wb/beta/(1-beta)**2/(2+c*beta)
-        m=0.48+1.574*compuesto.f_acent-0.176*compuesto.f_acent**2
-        q=(beta/0.26)**0.25*m
-        alfa=(1+q*(1-compuesto.tr(T)**0.5))**2
-        a=Wa*R_atml**2*compuesto.Tc*alfa/compuesto.Pc.atm
-        return  a, b, c
+    u = 1
+    w = 0
+
+    def _lib(self):
+        # β=b/Vc is calculated from critical compresibility factor
+        Zc = []
+        for cmp in self.componente:
+            if cmp.Vc:
+                Zc.append(cmp.Pc.atm*cmp.Vc*cmp.M/R_atml/cmp.Tc)
+            else:
+                Zc.append(0)
+        Zc = array(Zc, dtype=float)
+
+        def f(beta):
+            c = 1/beta*(sqrt(1/beta-0.75)-1.5)
+            Wb = beta*((1-beta)*(2+c*beta)-(1+c*beta))/(
+                (2+c*beta)*(1-beta)**2)
+            return Wb/beta-where(Zc > 0, Zc, 1./3)
+
+        beta = fsolve(f, 0.26+0*Zc)
+        c = 1/beta*(sqrt(1/beta-0.75)-1.5)
+        Wb = beta*((1-beta)*(2+c*beta)-(1+c*beta))/((2+c*beta)*(1-beta)**2)
+        Wa = (1+c*beta)**2*Wb/beta/(1-beta)**2/(2+c*beta)
+        m = 0.48+1.574*self.f_acent-0.176*self.f_acent**2
+        self.ci = c
+        self.q = (beta/0.26)**0.25*m
+        self.aci = Wa*R_atml**2*self.Tci**2/self.Pci
+        self.bi = Wb*R_atml*self.Tci/self.Pci
+
+    def _alfa(self, Tr):
+        return _Soave(Tr, self.q)
+
+    def _uw(self, x):
+        return (x*self.ci).sum(-1), 0
 
 
 class SRK(Cubic):
@@ -221,770 +397,306 @@ class SRK(Cubic):
     __title__="SRK (1972)"
     __status__="SRK"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, m=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(m)
-        self.kij=mezcla.Kij(SRK)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=b
-        self.epsilon=0
-        self.eta=b
-
-        self.u=1
-        self.w=0
-
-        self.dTitadT=tdadt
-        super(SRK, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        """Librería de cálculo de la ecuación de estado de Soave-Redlich-Kwong,"""
-        Tr=T/compuesto.Tc
-        ac=0.42748*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.08664*R_atml*compuesto.Tc/compuesto.Pc.atm
-        m=0.48+1.574*compuesto.f_acent-0.176*compuesto.f_acent**2
-
-        Config=config.getMainWindowConfig()
-        Alpha_Mathias=Config.getint("Thermo","Alfa")
-        if Alpha_Mathias==1 and Tr>1:
-            d=1.+m/2.
-            c=1.-1./d
-            alfa=exp(c*(1-Tr**d))**2
-        else:
-            alfa=(1+m*(1-Tr**0.5))**2
-        return ac*alfa, b, ac, m
+    OmegaA = 0.42748
+    OmegaB = 0.08664
+    u = 1
+    w = 0
+    bip = "srk"
 
+    def _lib(self):
+        self.m = 0.48+1.574*self.f_acent-0.176*self.f_acent**2
 
-class SRK_API(Cubic):
+    def _alfa(self, Tr):
+        alfa = _Soave(Tr, self.m)
+        if self._mathias:
+            alfa = _where(Tr > 1, _BostonMathias(Tr, self.m), alfa)
+        return alfa
+
+
+class SRK_API(SRK):
     """Ecuación de estado de Soave-Redlich-Kwong modificada publicada en el API Technical Databook
     Soave, G.: Inst. Chem. Eng. Symp. Ser., 56(1.2): 1 (1979)."""
     __title__="SRK-API (1979)"
     __status__="SRK-API"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, m=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(m)
-        self.kij=mezcla.Kij(SRK)
-        a, b=mezcla.Mix_van_der_Waals([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=b
-        self.epsilon=0
-        self.eta=b
-
-        self.u=1
-        self.w=0
-
-        self.dTitadT=tdadt
-        super(SRK_API, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        """Librería de cálculo de la ecuación de estado de Soave-Redlich-Kwong,"""
-        Tr=T/compuesto.Tc
-        ac=0.42748*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.08664*R_atml*compuesto.Tc/compuesto.Pc.atm
-        m=0.48505+1.55171*compuesto.f_acent-0.15613*compuesto.f_acent**2
-
-        Config=config.getMainWindowConfig()
-        Alpha_Mathias=Config.getint("Thermo","Alfa")
-        if Alpha_Mathias==1 and Tr>1:
-            d=1.+m/2.
-            c=1.-1./d
-            alfa=exp(c*(1-Tr**d))**2
-        else:
-            alfa=(1+m*(1-Tr**0.5))**2
-        return ac*alfa, b, ac, m
+    mixing = "Mix_van_der_Waals"
+
+    def _lib(self):
+        self.m = 0.48505+1.55171*self.f_acent-0.15613*self.f_acent**2
 
 
-class MSRK(Cubic):
+class MSRK(SRK):
     """Ecuación de estado de Soave-Redlich-Kwong modificada de dos parámetros
     Soave, G.: Chem. Eng. Sci., 39: 357 (1984)."""
     __title__="M-SRK (1984)"
     __status__="MSRK"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, m=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(m)
-        self.kij=mezcla.Kij(SRK)
-        a, b=mezcla.Mix_van_der_Waals([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=b
-        self.epsilon=0
-        self.eta=b
-
-        self.u=1
-        self.w=0
-
-        self.dTitadT=tdadt
-        super(MSRK, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        ac=0.42748*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.08664*R_atml*compuesto.Tc/compuesto.Pc.atm
-        if compuesto.MSRK[0]==0 and compuesto.MSRK[1]==0:
-            m=0.48+1.574*compuesto.f_acent-0.176*compuesto.f_acent**2
-            alf=alfa=(1+m*(1-compuesto.tr(T)**0.5))**2
-        else:
-            m=0.48+1.574*compuesto.f_acent-0.176*compuesto.f_acent**2
-            alf=1.+(1-compuesto.tr(T))*(compuesto.MSRK[0]+compuesto.MSRK[1]/compuesto.tr(T))
-        return ac*alf, b, ac, m
+    mixing = "Mix_van_der_Waals"
+
+    def _lib(self):
+        SRK._lib(self)
+        MSRK = array([cmp.MSRK for cmp in self.componente], dtype=float)
+        self.p1, self.p2 = MSRK.T
 
+    def _alfa(self, Tr):
+        p1, p2 = self.p1, self.p2
+        msrk = (1+(1-Tr)*(p1+p2/Tr), -(p1+p2/Tr)-(1-Tr)*p2/Tr**2)
+        return _where((p1 == 0) & (p2 == 0), _Soave(Tr, self.m), msrk)
 
-class SRK_Graboski(Cubic):
+
+class SRK_Graboski(SRK):
     """Ecuación de estado de Soave-Redlich-Kwong Graboski Daubert API 8D4.1, par 820
        Graboski, M. S., Daubert, T. E., “A Modified Soave Equation of State for Phase Equilibrium Calculations-II. Systems Containing CO,, H,S, N2, and C0,”Ind. Eng. Chem. ProcessDes. Develop. 17 (1978)."""
     __title__="SRK-Graboski-Daubert (1978)"
     __status__="SRK-GD"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        for componente in mezcla.componente:
-            a, b=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-        self.kij=mezcla.Kij(SRK)
-        a, b=mezcla.Mix_van_der_Waals([ai, bi], self.kij)
-        tdadt=0
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=b
-        self.epsilon=0
-        self.eta=b
-
-        self.u=1
-        self.w=0
-
-        self.dTitadT=tdadt
-        super(SRK_Thorwart, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        Tr=T/compuesto.Tc
-        a=0.42748*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.08664*R_atml*compuesto.Tc/compuesto.Pc.atm
-        if not compuesto.SRKGraboski[1]:
-            m=0.48505+1.55171*compuesto.f_acent-0.15613*compuesto.f_acent**2
-
-            Config=config.getMainWindowConfig()
-            Alpha_Mathias=Config.getint("Thermo","Alfa")
-            if Alpha_Mathias==1 and Tr>1:
-                d=1.+m/2.
-                c=1.-1./d
-                alfa=exp(c*(1-Tr**d))**2
-            else:
-                alfa=(1+m*(1-Tr**0.5))**2
-        elif not compuesto.SRKGraboski[0]:
-            S1=0.48508+1.55171*compuesto.f_acent-0.15613*compuesto.f_acent**2
-            S2=compuesto.SRKGraboski[1]
-            alfa=(1+S1*(1-Tr**0.5)+S2*(1-Tr**0.5)/Tr**0.5)**2
-        return  a*alfa, b
+    mixing = "Mix_van_der_Waals"
+
+    def _lib(self):
+        self.m = 0.48505+1.55171*self.f_acent-0.15613*self.f_acent**2
+        self.S1 = 0.48508+1.55171*self.f_acent-0.15613*self.f_acent**2
+        self.S2 = array([cmp.SRKGraboski[1] for cmp in self.componente],
+                        dtype=float)
+
+    def _alfa(self, Tr):
+        s = Tr**0.5
+        g = 1+self.S1*(1-s)+self.S2*(1-s)/s
+        dg = -self.S1/2/s-self.S2/2/s**3
+        return _where(self.S2 == 0, SRK._alfa(self, Tr), (g**2, 2*g*dg))
 
 
-class SRK_Mathias(Cubic):
+class SRK_Mathias(SRK):
     """Ecuación de estado de Soave-Redlich-Kwong modificada por Mathias
     Mathias, P.M.: A versatile phase equilibrium equation of state. Industrial and Engineering Chemistry PRocess Design and Development 22, 385-391 (1983)"""
     __title__="SRK-Mathias (1983)"
     __status__="SRK-Math"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, m=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(m)
-        self.kij=mezcla.Kij(SRK)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=b
-        self.epsilon=0
-        self.eta=b
-
-        self.u=1
-        self.w=0
-
-        self.dTitadT=tdadt
-        super(SRK, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        """Librería de cálculo de la ecuación de estado de Soave-Redlich-Kwong,"""
-        Tr=T/compuesto.Tc
-        ac=0.42748*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.08664*R_atml*compuesto.Tc/compuesto.Pc.atm
-        m=0.48508+1.55191*compuesto.f_acent-0.15613*compuesto.f_acent**2
-
-        Config=config.getMainWindowConfig()
-        Alpha_Mathias=Config.getint("Thermo","Alfa")
-        if Alpha_Mathias==1 and Tr>1:
-            d=1.+m/2.+0.3*compuesto.Mathias
-            c=1.-1./d
-            alfa=exp(c*(1-Tr**d))**2
-        else:
-            alfa=(1+m*(1-Tr**0.5)*compuesto.Mathias*(1-Tr)*(0.7-Tr))**2
-        return ac*alfa, b, ac, m
+    def _lib(self):
+        self.m = 0.48508+1.55191*self.f_acent-0.15613*self.f_acent**2
+        self.p = array([cmp.Mathias for cmp in self.componente], dtype=float)
 
+    def _alfa(self, Tr):
+        g = 1+self.m*(1-Tr**0.5)-self.p*(1-Tr)*(0.7-Tr)
+        dg = -self.m/2/Tr**0.5-self.p*(2*Tr-1.7)
+        alfa = g**2, 2*g*dg
+        if self._mathias:
+            d = 1+self.m/2.+0.3*self.p
+            alfa = _where(Tr > 1, _BostonMathias(Tr, self.m, d), alfa)
+        return alfa
 
-class SRK_Adachi(Cubic):
+
+class SRK_Adachi(SRK):
     """Ecuación de estado de Soave-Redlich-Kwong modificada por Adachi-Lu
    Adachi, Y., Lu, B.C.Y.: Simplest equation of state for vapor-liquid equilibrium calculation: a modification of the van der Walls equation. Journal of the American Institute of Chemical Engineers 30, 991-993 (1984)"""
     __title__="SRK-Adachi-Lu (1984)"
     __status__="SRK-Adachi"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, m=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(m)
-        self.kij=mezcla.Kij(SRK)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=b
-        self.epsilon=0
-        self.eta=b
-
-        self.u=1
-        self.w=0
-
-        self.dTitadT=tdadt
-        super(SRK, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        """Librería de cálculo de la ecuación de estado de Soave-Redlich-Kwong,"""
-        Tr=T/compuesto.Tc
-        ac=0.42748*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.08664*R_atml*compuesto.Tc/compuesto.Pc.atm
-        m=0.48508+1.55191*compuesto.f_acent-0.15613*compuesto.f_acent**2
-        alfa=compuesto.Adachi[0]*10**(compuesto.Adachi[1]*(1-Tr))
-        return ac*alfa, b, ac, m
-
-
-class SRK_Androulakis(Cubic):
+    def _lib(self):
+        self.m = 0.48508+1.55191*self.f_acent-0.15613*self.f_acent**2
+        Adachi = array([cmp.Adachi for cmp in self.componente], dtype=float)
+        self.A0, self.A1 = Adachi.T
+
+    def _alfa(self, Tr):
+        alfa = self.A0*10**(self.A1*(1-Tr))
+        adachi = (alfa, -alfa*self.A1*log(10))
+        return _where(self.A0 == 0, _Soave(Tr, self.m), adachi)
+
+
+class SRK_Androulakis(SRK):
     """Ecuación de estado de Soave-Redlich-Kwong modificada por Androulakis
     Andoulakis I.P., Kalospiros, N.S., Tassios, D.P.: Thermophysical properties of pure polar and nonpolar compounds with a modified vdW-711 equation of state. Fluid Phase Equilibria 45, 135-163 (1989)"""
     __title__="SRK-Androulakis (1984)"
     __status__="SRK-And"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, m=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(m)
-        self.kij=mezcla.Kij(SRK)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=b
-        self.epsilon=0
-        self.eta=b
-
-        self.u=1
-        self.w=0
-
-        self.dTitadT=tdadt
-        super(SRK, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        """Librería de cálculo de la ecuación de estado de Soave-Redlich-Kwong,"""
-        Tr=T/compuesto.Tc
-        ac=0.42748*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.08664*R_atml*compuesto.Tc/compuesto.Pc.atm
-        m=0.48508+1.55191*compuesto.f_acent-0.15613*compuesto.f_acent**2
-
-        Config=config.getMainWindowConfig()
-        Alpha_Mathias=Config.getint("Thermo","Alfa")
-        if Alpha_Mathias==1 and Tr>1:
-            alfa=exp(compuesto.Androulakis[0]*(1-Tr**(2./3)))
-        else:
-            alfa=(1+compuesto.Androulakis[0]*(1-Tr**(2./3))+compuesto.Androulakis[1]*(1-Tr**(2./3))**2+compuesto.Androulakis[2]*(1-Tr**(2./3))**3)**2
-        return ac*alfa, b, ac, m
+    def _lib(self):
+        d = array([getattr(cmp, "Androulakis", [0, 0, 0])
+                   for cmp in self.componente], dtype=float)
+        self.d1, self.d2, self.d3 = d.T
+
+    def _alfa(self, Tr):
+        t = 1-Tr**(2./3)
+        dt = -2./3/Tr**(1./3)
+        g = 1+self.d1*t+self.d2*t**2+self.d3*t**3
+        dg = (self.d1+2*self.d2*t+3*self.d3*t**2)*dt
+        alfa = g**2, 2*g*dg
+        if self._mathias:
+            alfa2 = exp(self.d1*t)
+            alfa = _where(Tr > 1, (alfa2, alfa2*self.d1*dt), alfa)
+        return alfa
 
 
-class PR(Cubic):
+class PR(SRK):
     """Ecuación de estado de Peng Robinson
     Peng, D.-Y.; Robinson, D.B. A New Two-Constant Equation of State. I&EC Fundam. 1976, 15(1), 59."""
     __title__="Peng-Robinson (1976)"
     __status__="PR"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, m=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(m)
-        self.kij=mezcla.Kij(PR)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=2*b
-        self.epsilon=-b**2
-        self.eta=b
-
-        self.u=2
-        self.w=-1
-
-        self.dTitadT=tdadt
-        super(PR, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        Tr=T/compuesto.Tc
-        a=0.457235*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.077796*R_atml*compuesto.Tc/compuesto.Pc.atm
-        m=0.37464+1.54226*compuesto.f_acent-0.26992*compuesto.f_acent**2
-
-        Config=config.getMainWindowConfig()
-        Alpha_Mathias=Config.getint("Thermo","Alfa")
-        if Alpha_Mathias==1 and Tr>1:
-            d=1.+m/2.
-            c=1.-1./d
-            alfa=exp(c*(1-Tr**d))**2
-        else:
-            alfa=(1+m*(1-Tr**0.5))**2
-        return a*alfa, b, a, m
+    OmegaA = 0.457235
+    OmegaB = 0.077796
+    u = 2
+    w = -1
+    bip = "pr"
 
+    def _lib(self):
+        self.m = 0.37464+1.54226*self.f_acent-0.26992*self.f_acent**2
 
 
-class PRSV(Cubic):
+class PRSV(PR):
     """Ecuación de estado de Peng Robinson modificada por Stryjek y Vera, v1"""
     __title__="PR-SV (1986)"
     __status__="PR-SV"
     __doi__ = {"autor": "Stryjek, R.; Vera, J.H.",
-               "title": "PRSV: An improved peng—Robinson equation of state for pure compounds and mixtures", 
+               "title": "PRSV: An improved peng—Robinson equation of state for pure compounds and mixtures",
                "ref": "Can. J. Chem. Eng. 1986, 64: 323–333",
-               "doi":  "10.1002/cjce.5450640224"}, 
-
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, k=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(k)
-        self.kij=mezcla.Kij(PR)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=2*b
-        self.epsilon=-b**2
-        self.eta=b
-
-        self.u=2
-        self.w=-1
-
-        self.dTitadT=tdadt
-        super(PR_SV, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        Tr=T/compuesto.Tc
-        w = compuesto.f_acent
-        if w>=0.49:
-            ko=0.378893+1.4897153*w-0.17131848*w**2+0.0196554*w**3
-        else:
-            ko=0.37464+1.54226*w-0.26992*w**2
-        
-        if compuesto.PRSV_k1:
-            # TODO: Add data from journal to database
-            k1 = compuesto.PRSV_k1
-        elif Tr>=0.7:
-            k1=0
-        elif 1<compuesto.C<=18:
-            k1=[-0.00159, 0.02669, 0.03136, 0.03443, 0.03946, 0.05104, 0.04648,
-                0.04464, 0.04104, 0.04510, 0.02919, 0.05426, 0.04157, 0.02686,
-                0.01892, 0.02665, 0.04048, 0.08291][compuesto.C]
-        else:
-            k1=0
-        k=ko+k1*(1.+sqrt(Tr))*(0.7-Tr)
-        alfa=(1+k*(1-Tr**0.5))**2
-        a=0.457235*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.077796*R_atml*compuesto.Tc/compuesto.Pc.atm
-
-        return a*alfa, b, a, k
-
-
-class PRSV2(Cubic):
+               "doi":  "10.1002/cjce.5450640224"},
+
+    _v2 = False
+
+    # κ1 parameters for n-alkanes from C1 to C18
+    _k1 = [-0.00159, 0.02669, 0.03136, 0.03443, 0.03946, 0.05104, 0.04648,
+           0.04464, 0.04104, 0.04510, 0.02919, 0.05426, 0.04157, 0.02686,
+           0.01892, 0.02665, 0.04048, 0.08291]
+
+    def _lib(self):
+        w = self.f_acent
+        self.ko = where(
+            w >= 0.49, 0.378893+1.4897153*w-0.17131848*w**2+0.0196554*w**3,
+            0.37464+1.54226*w-0.26992*w**2)
+
+        k1 = []
+        k2 = []
+        k3 = []
+        fitted = []
+        for cmp in self.componente:
+            if self._v2 and getattr(cmp, "PRSV_k1", 0) and \
+                    getattr(cmp, "PRSV_k2", 0):
+                # TODO: Add data from journal to database
+                k1.append(cmp.PRSV_k1)
+                k2.append(cmp.PRSV_k2)
+                k3.append(getattr(cmp, "PRSV_k3", 0))
+                fitted.append(True)
+            elif getattr(cmp, "PRSV_k1", 0):
+                k1.append(cmp.PRSV_k1)
+                k2.append(0)
+                k3.append(0)
+                fitted.append(True)
+            else:
+                if 1 <= cmp.C <= 18:
+                    k1.append(self._k1[cmp.C-1])
+                else:
+                    k1.append(0)
+                k2.append(0)
+                k3.append(0)
+                fitted.append(False)
+        self.k1 = array(k1, dtype=float)
+        self.k2 = array(k2, dtype=float)
+        self.k3 = array(k3, dtype=float)
+        self.fitted = array(fitted)
+
+    def _alfa(self, Tr):
+        s = Tr**0.5
+        # Generalized κ1 values only for Tr<0.7
+        k1 = where(self.fitted | (Tr < 0.7), self.k1, 0)
+        h = k1+self.k2*(self.k3-Tr)*(1-s)
+        dh = self.k2*(-(1-s)-(self.k3-Tr)/2/s)
+        q = (1+s)*(0.7-Tr)
+        dq = (0.7-Tr)/2/s-(1+s)
+        k = self.ko+h*q
+        dk = dh*q+h*dq
+        g = 1+k*(1-s)
+        dg = dk*(1-s)-k/2/s
+        return g**2, 2*g*dg
+
+
+class PRSV2(PRSV):
     """Ecuación de estado de Peng Robinson modificada por Stryjek y Vera, v2"""
     __title__="PR-SV2 (1986)"
     __status__="PR-SV2"
     __doi__ = {"autor": "Stryjek, R.; Vera, J.H.",
-               "title": "PRSV2: A cubic equation of state for accurate vapor—liquid equilibria calculations", 
+               "title": "PRSV2: A cubic equation of state for accurate vapor—liquid equilibria calculations",
                "ref": "Can. J. Chem. Eng., 64: 820–826",
-               "doi":  "10.1002/cjce.5450640516"}, 
-
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, k=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(k)
-        self.kij=mezcla.Kij(PR)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=2*b
-        self.epsilon=-b**2
-        self.eta=b
-
-        self.u=2
-        self.w=-1
-
-        self.dTitadT=tdadt
-        super(PR_SV, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        Tr=T/compuesto.Tc
-        w = compuesto.f_acent
-        if w>=0.49:
-            ko=0.378893+1.4897153*w-0.17131848*w**2+0.0196554*w**3
-        else:
-            ko=0.37464+1.54226*w-0.26992*w**2
-        
-        if compuesto.PRSV_k1 and compuesto.PRSV_k2:
-            # TODO: Add data from journal to database
-            k1 = compuesto.PRSV_k1
-            k2 = compuesto.PRSV_k2
-            k3 = compuesto.PRSV_k3
-        else:
-            # Use PRSV V1
-            k2 = 0
-            K3 = 0
-            if Tr>=0.7:
-                k1=0
-            elif 1<compuesto.C<=18:
-                k1=[-0.00159, 0.02669, 0.03136, 0.03443, 0.03946, 0.05104,
-                    0.04648, 0.04464, 0.04104, 0.04510, 0.02919, 0.05426,
-                    0.04157, 0.02686, 0.01892, 0.02665, 0.04048, 0.08291][compuesto.C]
-            else:
-                k1=0
-        k = ko+(k1+k2*(k3-Tr)*(1-Tr**0.5))*(1+Tr**0.5)*(0.7-Tr)
-        alfa = (1+k*(1-Tr**0.5))**2
-        a = 0.457235*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b = 0.077796*R_atml*compuesto.Tc/compuesto.Pc.atm
+               "doi":  "10.1002/cjce.5450640516"},
 
-        return a*alfa, b, a, k
+    _v2 = True
 
 
-class PR_Gasem(Cubic):
+class PR_Gasem(PR):
     """Ecuación de estado de Peng Robinson modificada por Gasem (2001)
     Gasem, Gao, Pan & Robinson: Fluid Phase Equilibria, 181, 113-125 (2001)"""
     __title__="PR Gassem (2001)"
     __status__="PR-Gas"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, m=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(m)
-        self.kij=mezcla.Kij(PR)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=2*b
-        self.epsilon=-b**2
-        self.eta=b
-
-        self.u=2
-        self.w=-1
-
-        self.dTitadT=tdadt
-        super(PR_Gasem, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        Tr=T/compuesto.Tc
-        m=0.134+0.508*compuesto.f_acent-0.0467*compuesto.f_acent**2
-        alfa=exp((2.+0.836*Tr)*(1-Tr**m))
-        a=0.457235*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.077796*R_atml*compuesto.Tc/compuesto.Pc.atm
-        return a*alfa, b, a, m
-
-
-class PR_Melhem(Cubic):
+    def _lib(self):
+        self.m = 0.134+0.508*self.f_acent-0.0467*self.f_acent**2
+
+    def _alfa(self, Tr):
+        m = self.m
+        alfa = exp((2.+0.836*Tr)*(1-Tr**m))
+        df = 0.836*(1-Tr**m)-(2.+0.836*Tr)*m*Tr**(m-1)
+        return alfa, alfa*df
+
+
+class PR_Melhem(PR):
     """Ecuación de estado de Peng Robinson modificada por Melhem
     Melhem, G.A.; Saini, R.; Goodwin, B.M. A Modified Peng-Robinson Equation of State. Fluid Phase Eq. 1989, 47, 189."""
     __title__="PR Melhem (1989)"
     __status__="PR-Mel"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        for componente in mezcla.componente:
-            a, b, ac=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-        self.kij=mezcla.Kij(PR)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=2*b
-        self.epsilon=-b**2
-        self.eta=b
-
-        self.u=2
-        self.w=-1
-
-        self.dTitadT=tdadt
-        super(PR_Melhem, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        Tr=T/compuesto.Tc
-        alfa=exp(compuesto.Melhem[0]*(1-Tr)+compuesto.Melhem[1]*(1-Tr**0.5)**2)
-        a=0.457235*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.077796*R_atml*compuesto.Tc/compuesto.Pc.atm
-        return a*alfa, b, a
-
-
-class PR_Almeida(Cubic):
+    def _lib(self):
+        PR._lib(self)
+        M = array([cmp.Melhem for cmp in self.componente], dtype=float)
+        self.M0, self.M1 = M.T
+
+    def _alfa(self, Tr):
+        s = Tr**0.5
+        alfa = exp(self.M0*(1-Tr)+self.M1*(1-s)**2)
+        melhem = (alfa, alfa*(-self.M0-self.M1*(1-s)/s))
+        return _where((self.M0 == 0) & (self.M1 == 0), _Soave(Tr, self.m),
+                      melhem)
+
+
+class PR_Almeida(PR):
     """Ecuación de estado de Peng Robinson modificada por Almeida
     Almeida, G.S.; Aznar, M. and Silva Telles, A., Uma Nova Forma de Dependência com a Temperatura do Termo Atrativo de Equaçöes de Estado Cúbicas, RBE, Cad. Eng. Quim., 8, 95-123, (1991)"""
     __title__="PR Almeida (1991)"
     __status__="PR-Alm"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        for componente in mezcla.componente:
-            a, b, ac=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-        self.kij=mezcla.Kij(PR)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=2*b
-        self.epsilon=-b**2
-        self.eta=b
-
-        self.u=2
-        self.w=-1
-
-        self.dTitadT=tdadt
-        super(PR_Almeida, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        Tr=T/compuesto.Tc
-        alfa=exp(compuesto.Almeida[0]*(1-Tr)*abs(1-Tr)**(compuesto.Almeida[2]-1)+compuesto.Almeida[1]*(Tr**-1-1))
-        a=0.457235*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.077796*R_atml*compuesto.Tc/compuesto.Pc.atm
-        return a*alfa, b, a
-
-
-class PR_Mathias_Copeman(Cubic):
+    def _lib(self):
+        PR._lib(self)
+        A = zeros((len(self.componente), 3))
+        for i, cmp in enumerate(self.componente):
+            A[i, :len(cmp.Almeida)] = cmp.Almeida
+        self.A0, self.A1, self.A2 = A.T
+
+    def _alfa(self, Tr):
+        y = abs(1-Tr)**(self.A2-1)
+        alfa = exp(self.A0*(1-Tr)*y+self.A1*(1/Tr-1))
+        almeida = (alfa, alfa*(-self.A0*self.A2*y-self.A1/Tr**2))
+        return _where((self.A0 == 0) & (self.A1 == 0), _Soave(Tr, self.m),
+                      almeida)
+
+
+class PR_Mathias_Copeman(PR):
     """Ecuación de estado de Peng-Robinson modificada por Mathias-Copeman
     Mathias, P.M., Copeman, T.W.: Extension of the Peng-Robinson equation of the various forms of the local composition concept. Fluid Phase Equilibria 13, 91-108."""
     __title__="PR-Mathias-Copeman (1983)"
     __status__="PR-MC"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, m=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(m)
-        self.kij=mezcla.Kij(PR)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=2*b
-        self.epsilon=-b**2
-        self.eta=b
-
-        self.u=2
-        self.w=-1
-
-        self.dTitadT=tdadt
-        super(PR_Mathias_Copeman, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        Tr=T/compuesto.Tc
-        a=0.457235*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        b=0.077796*R_atml*compuesto.Tc/compuesto.Pc.atm
-
-        Config=config.getMainWindowConfig()
-        Alpha_Mathias=Config.getint("Thermo","Alfa")
-        if Alpha_Mathias==1 and Tr>1:
-            alfa=(1+compuesto.MathiasCopeman[0]*(1-Tr**0.5))**2
-        else:
-            alfa=(1+compuesto.MathiasCopeman[0]*(1-Tr**0.5)+compuesto.MathiasCopeman[1]*(1-Tr**0.5)**2+compuesto.MathiasCopeman[2]*(1-Tr**0.5)**3)**2
-        return a*alfa, b, a, m
+    def _lib(self):
+        c = array([cmp.MathiasCopeman for cmp in self.componente],
+                  dtype=float)
+        self.c1, self.c2, self.c3 = c.T
+
+    def _alfa(self, Tr):
+        t = 1-Tr**0.5
+        dt = -0.5/Tr**0.5
+        g = 1+self.c1*t+self.c2*t**2+self.c3*t**3
+        dg = (self.c1+2*self.c2*t+3*self.c3*t**2)*dt
+        alfa = g**2, 2*g*dg
+        if self._mathias:
+            g = 1+self.c1*t
+            alfa = _where(Tr > 1, (g**2, 2*g*self.c1*dt), alfa)
+        return alfa
 
 
 class PR_Yu_Lu(Cubic):
@@ -993,62 +705,36 @@ class PR_Yu_Lu(Cubic):
     __title__="PR-Yu Lu (1987)"
     __status__="PR-YL"
 
-    def __init__(self, T, P, mezcla):
-        ai=[]
-        bi=[]
-        aci=[]
-        mi=[]
-        for componente in mezcla.componente:
-            a, b, ac, m=self.__lib(componente, T)
-            ai.append(a)
-            bi.append(b)
-            aci.append(ac)
-            mi.append(m)
-        self.kij=mezcla.Kij(PR)
-        a, b=mezcla.Mixing_Rule([ai, bi], self.kij)
-        tdadt=0
-        for i in range(len(mezcla.componente)):
-            for j in range(len(mezcla.componente)):
-                tdadt-=mezcla.fraccion[i]*mezcla.fraccion[j]*mi[j]*(aci[i]*aci[j]*mezcla.componente[j].tr(T))**0.5*(1-self.kij[i][j])
-
-        self.ai=ai
-        self.bi=bi
-        self.b=b
-        self.tita=a
-        self.delta=2*b
-        self.epsilon=-b**2
-        self.eta=b
-
-        self.u=2
-        self.w=-1
-
-        self.dTitadT=tdadt
-        super(PR_Yu_Lu, self).__init__(T, P, mezcla)
-
-
-    def __lib(self, compuesto, T):
-        Tr=T/compuesto.Tc
-        ac=(0.46863-0.0378304*compuesto.f_acent-0.00751969*compuesto.f_acent**2)*R_atml**2*compuesto.Tc**2/compuesto.Pc.atm
-        if compuesto.Yu_Lu==[0, 0, 0]:
-            if compuesto.f_acent<=0.49:
-                m=0.406846+1.87907*compuesto.f_acent-0.792636*compuesto.f_acent**2+0.737519*compuesto.f_acent**3
-                A0=0.535843
-                A1=-0.39244
-                A2=0.26507
-            else:
-                m=0.581981+0.17141*compuesto.f_acent-1.84441*compuesto.f_acent**2+1.19047*compuesto.f_acent**3
-                A0=0.79355
-                A1=-0.53409
-                A2=0.37273
-        else:
-            A0, A1, A2=compuesto.Yu_Lu
-        if Tr<1:
-            alfa=10**(m*(A0+A1*Tr+A2*Tr**2)*(1-Tr))
-        else:
-            alfa=10**(m*(A0+A1+A2)*(1-Tr))
-        b=(0.0892828-0.0640903*compuesto.f_acent-0.00518289*compuesto.f_acent**2)*R_atml*compuesto.Tc/compuesto.Pc.atm
-        c=b*(-1.29917+0.648463*compuesto.f_acent+0.895926*compuesto.f_acent**2)
-        return ac*alfa, b, c
+    def _lib(self):
+        w = self.f_acent
+        self.aci = (0.46863-0.0378304*w-0.00751969*w**2) * \
+            R_atml**2*self.Tci**2/self.Pci
+        self.bi = (0.0892828-0.0640903*w-0.00518289*w**2) * \
+            R_atml*self.Tci/self.Pci
+        self.ci = self.bi*(-1.29917+0.648463*w+0.895926*w**2)
+
+        self.m = where(
+            w <= 0.49, 0.406846+1.87907*w-0.792636*w**2+0.737519*w**3,
+            0.581981+0.17141*w-1.84441*w**2+1.19047*w**3)
+        A = array([[0.535843, -0.39244, 0.26507] if x <= 0.49 else
+                   [0.79355, -0.53409, 0.37273] for x in w])
+        for i, cmp in enumerate(self.componente):
+            if cmp.Yu_Lu != [0, 0, 0]:
+                A[i] = cmp.Yu_Lu
+        self.A0, self.A1, self.A2 = A.T
+
+    def _alfa(self, Tr):
+        Tr1 = where(Tr < 1, Tr, 1)
+        dTr1 = where(Tr < 1, 1, 0)
+        p = self.A0+self.A1*Tr1+self.A2*Tr1**2
+        alfa = 10**(self.m*p*(1-Tr))
+        df = self.m*((self.A1+2*self.A2*Tr1)*dTr1*(1-Tr)-p)
+        return alfa, alfa*log(10)*df
+
+    def _uw(self, x):
+        # Attractive term denominator V(V+c)+b(3V+c)
+        r = (x*self.ci).sum(-1)/(x*self.bi).sum(-1)
+        return 3+r, r
 
 
 
@@ -1058,5 +744,5 @@ if __name__ == "__main__":
     from lib.corriente import Mezcla
     mezcla = Mezcla(1, ids=[98], caudalUnitarioMasico=[1.])
     for T in [125, 135, 145, 165, 185, 205]:
-        eq = Virial(T, 1, mezcla)
+        eq = SRK(T, 1, mezcla)
         print eq.H_exc
@@ -0,0 +1,334 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+# Calculation of projects without gui, for case studies and sensitivity
+# sweeps over project variables
+#   - loadProject: Load a project file without widgets
+#   - setVariable: Set an input variable of project, stream or equipment kwarg
+#   - getVariable: Get a calculated value of project, stream or equipment
+#   - readCases: Read the cases definition from a csv file
+#   - sweep: Parse a sweep definition of a variable
+#   - caseList: Cartesian product of cases and sweeps
+#   - runCases: Calculate the cases in a process pool
+#   - writeResults: Save the results as a csv or columnar npz file
+#   - main: Command line entry point
+#
+#   The variables are named by the entity and the attribute path separated
+#   by dots, the list elements by its index:
+#       s1.T: temperature of stream 1
+#       s1.caudalUnitarioMolar.2: molar flow of third component of stream 1
+#       e3.split.0: first split fraction of equipment 3
+#       e3.Heat: calculated heat duty of equipment 3
+#   The input variables must be kwargs of project input streams or of
+#   equipment, in SI units, the output variables any numeric attribute
+###############################################################################
+
+import csv
+from itertools import product
+from optparse import OptionParser
+import sys
+import traceback
+
+from numpy import array, linspace, nan, savez_compressed
+from PyQt4 import QtCore
+
+from lib import config
+from lib.project import Project
+from lib.thread import parallelMap
+
+
+def loadProject(path, run=True):
+    """Load a project file without gui, the project config is set as the
+    current config without write the pychemqtrc_temporal file
+        path: project file path
+        run: boolean to solve the project"""
+    fh = QtCore.QFile(path)
+    if not fh.open(QtCore.QIODevice.ReadOnly):
+        raise IOError(unicode(fh.errorString()))
+    stream = QtCore.QDataStream(fh)
+
+    magic = stream.readInt32()
+    if magic != Project.MAGIC_NUMBER:
+        raise IOError("unrecognized file type")
+    version = stream.readInt32()
+    if version < Project.FILE_VERSION_COMPATIBLE:
+        raise IOError("old and unreadable file format")
+    elif version > Project.FILE_VERSION:
+        raise IOError("new and unreadable file format")
+    stream.setVersion(QtCore.QDataStream.Qt_4_2)
+
+    project = Project()
+    project.loadFromStream(stream, run=False, version=version,
+                           temporal=False)
+    fh.close()
+    config.setProjectConfig(project.config)
+    if run:
+        project.solve()
+    return project
+
+
+def _getEntity(project, entity):
+    """Return the entity of project with name sid for streams or eid for
+    equipments"""
+    kind, id = entity[0], int(entity[1:])
+    if kind == "s":
+        if id not in project.streams:
+            raise KeyError("Stream %i isn't in project" % id)
+        return project.streams[id][4]
+    elif kind == "e":
+        if "e%i" % id not in project.items:
+            raise KeyError("Equipment %i isn't in project" % id)
+        return project.items["e%i" % id]
+    raise ValueError("Unknown entity %s" % entity)
+
+
+def _entity(project, name):
+    """Return the entity of variable and the attribute path"""
+    entity, path = name.split(".", 1)
+    return _getEntity(project, entity), path.split(".")
+
+
+def setVariable(project, variables):
+    """Set input variables of project, the project must be solved later
+        variables: list of (name, value), the values of the same entity are
+            set at once"""
+    entities = {}
+    for name, value in variables:
+        entity, path = name.split(".", 1)
+        entities.setdefault(entity, []).append((path.split("."), value))
+
+    for entity, values in sorted(entities.items()):
+        obj = _getEntity(project, entity)
+        kwargs = {}
+        for path, value in values:
+            key = path[0]
+            if key not in obj.kwargs or key in obj.kwargs_forbidden:
+                raise KeyError("%s isn't an input of %s" % (key, entity))
+            if len(path) > 1:
+                lista = list(kwargs.get(key, obj.kwargs[key]))
+                lista[int(path[1])] = value
+                value = lista
+            kwargs[key] = value
+
+        if entity[0] == "s":
+            id = int(entity[1:])
+            up, down, ind_up, ind_down, old = project.streams[id]
+            if up[0] != "i":
+                raise ValueError("Stream %i isn't a project input" % id)
+            obj = old.clone(**kwargs)
+            project.streams[id] = (up, down, ind_up, ind_down, obj)
+            project.items[up] = obj
+        else:
+            obj(**kwargs)
+
+
+def getVariable(project, name):
+    """Get the value of a calculated variable of project"""
+    obj, path = _entity(project, name)
+    for attr in path:
+        if attr.isdigit():
+            obj = obj[int(attr)]
+        else:
+            obj = getattr(obj, attr)
+    return float(obj)
+
+
+def defaultOutputs(project):
+    """Default output variables, temperature, pressure, mass flow and vapor
+    fraction of all streams"""
+    outputs = []
+    for id in sorted(project.streams):
+        for attr in ("T", "P", "caudalmasico", "x"):
+            outputs.append("s%i.%s" % (id, attr))
+    return outputs
+
+
+def readCases(path):
+    """Read the cases from a csv file, a row for each case with a column for
+    each input variable, a column named case can be used for the case name,
+    the empty cells are not set
+    Return a list of (name, variables), variables is a list of (name,
+    value)"""
+    cases = []
+    with open(path, "rb") as archivo:
+        reader = csv.DictReader(archivo)
+        for i, row in enumerate(reader):
+            name = row.pop("case", None) or str(i+1)
+            variables = []
+            for variable in reader.fieldnames:
+                if variable != "case" and row.get(variable, "").strip():
+                    variables.append((variable, float(row[variable])))
+            cases.append((name, variables))
+    return cases
+
+
+def sweep(definition):
+    """Parse a sweep definition, variable=start:stop:points for equally
+    spaced values or variable=value1,value2,... for a values list
+    Return the variable name and the list of values"""
+    name, values = definition.split("=", 1)
+    if ":" in values:
+        start, stop, points = values.split(":")
+        values = linspace(float(start), float(stop), int(points)).tolist()
+    else:
+        values = [float(value) for value in values.split(",")]
+    return name.strip(), values
+
+
+def caseList(base=None, sweeps=[]):
+    """Cartesian product of cases and sweeps
+        base: list of (name, variables) with the cases, default only the
+            project as saved
+        sweeps: list of (variable, values)"""
+    if not base:
+        base = [("base", [])]
+    lista = []
+    for name, variables in base:
+        for values in product(*[points for variable, points in sweeps]):
+            sweepVariables = zip([variable for variable, v in sweeps], values)
+            if sweepVariables:
+                caseName = "%s %s" % (name, " ".join(
+                    ["%s=%g" % (var, value) for var, value in sweepVariables]))
+            else:
+                caseName = name
+            lista.append((caseName, variables+sweepVariables))
+    return lista
+
+
+def _runCase(task):
+    """Calculate a case in a worker process, the project is loaded from file
+    for each case, so the saved results are restored and only the entities
+    affected by the case variables are calculated
+    Return the case index, the convergence, the output values and the error
+    message"""
+    index, path, variables, outputs = task
+    try:
+        project = loadProject(path, run=False)
+        setVariable(project, variables)
+        # The cases are already distributed in process
+        converged = project.solve(processes=1)
+    except Exception:
+        return index, False, [nan]*len(outputs), traceback.format_exc()
+
+    values = []
+    error = ""
+    for output in outputs:
+        try:
+            values.append(getVariable(project, output))
+        except Exception as e:
+            values.append(nan)
+            error = error or "%s: %s" % (output, e)
+    return index, converged, values, error
+
+
+def runCases(path, cases, outputs, processes=None, progress=None):
+    """Calculate the cases of a project
+        path: project file path
+        cases: list of (name, variables)
+        outputs: list of output variables
+        processes: number of worker process, default the number of cpu
+        progress: optional function called with the finished cases count and
+            the total cases count
+    Return a list of results (name, converged, output values, error) in the
+    cases order"""
+    tasks = [(i, path, variables, outputs)
+             for i, (name, variables) in enumerate(cases)]
+    results = [None]*len(cases)
+    for count, (i, converged, values, error) in enumerate(
+            parallelMap(_runCase, tasks, processes)):
+        results[i] = (cases[i][0], converged, values, error)
+        if progress:
+            progress(count+1, len(cases))
+    return results
+
+
+def writeResults(path, cases, outputs, results):
+    """Save the results, a row for each case with the case name, the input
+    variables, the convergence, the output variables and the error message.
+    The npz extension save a column array for each variable, other
+    extension save a csv file"""
+    inputs = []
+    for name, variables in cases:
+        for variable, value in variables:
+            if variable not in inputs:
+                inputs.append(variable)
+
+    columns = ["case"]+inputs+["converged"]+outputs+["error"]
+    rows = []
+    for (name, variables), result in zip(cases, results):
+        values = dict(variables)
+        rows.append([name]+[values.get(var, nan) for var in inputs] +
+                    [result[1]]+result[2]+[result[3]])
+
+    if path.endswith(".npz"):
+        data = {}
+        for i, column in enumerate(columns):
+            data[column] = array([row[i] for row in rows])
+        savez_compressed(path, **data)
+    else:
+        with open(path, "wb") as archivo:
+            writer = csv.writer(archivo)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+
+
+def main(argv=None):
+    """Command line entry point, return the exit status"""
+    parser = OptionParser(
+        usage="%prog project.pcq [options]",
+        description="Calculate case studies and sensitivity sweeps of a "
+        "pychemqt project without gui")
+    parser.add_option("-c", "--cases", dest="cases",
+                      help="csv file with a case by row, a column for each "
+                      "input variable")
+    parser.add_option("-s", "--sweep", dest="sweeps", action="append",
+                      default=[], metavar="VAR=START:STOP:POINTS",
+                      help="sweep of variable, can be repeated, the cases "
+                      "are the cartesian product of cases and sweeps, a "
+                      "values list VAR=V1,V2,... can be used too")
+    parser.add_option("-r", "--results", dest="outputs",
+                      help="comma separated list of output variables, "
+                      "default T, P, mass flow and vapor fraction of streams")
+    parser.add_option("-o", "--output", dest="output", default="results.csv",
+                      help="results file, csv or columnar npz by extension")
+    parser.add_option("-p", "--processes", dest="processes", type="int",
+                      help="number of worker process, default cpu count")
+    options, args = parser.parse_args(argv)
+    if len(args) != 1:
+        parser.error("a project file is needed")
+    path = args[0]
+
+    # Check the variables names with the project before distribute the cases
+    project = loadProject(path, run=False)
+    if options.outputs:
+        outputs = [var.strip() for var in options.outputs.split(",")]
+    else:
+        outputs = defaultOutputs(project)
+    try:
+        for output in outputs:
+            _entity(project, output)
+
+        base = []
+        if options.cases:
+            base = readCases(options.cases)
+        lista = caseList(base, [sweep(definition)
+                                for definition in options.sweeps])
+        for name, variables in lista:
+            for variable, value in variables:
+                _entity(project, variable)
+    except (KeyError, ValueError) as error:
+        parser.error(error.args[0])
+
+    def progress(count, total):
+        sys.stderr.write("\r%i/%i" % (count, total))
+    results = runCases(path, lista, outputs, options.processes, progress)
+    sys.stderr.write("\n")
+    writeResults(options.output, lista, outputs, results)
+
+    failed = [result for result in results if result[3] or not result[1]]
+    for name, converged, values, error in failed:
+        sys.stderr.write("%s: %s\n" % (
+            name, error.strip().split("\n")[-1] if error else "not converged"))
+    return int(bool(failed))
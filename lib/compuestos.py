@@ -22,7 +22,7 @@ class Componente(object):
         if not indice:
             return
         self.indice=indice
-        self.Config=config.getMainWindowConfig()
+        self.Config=config.getConfig()
         componente=sql.getElement(indice)
         self.formula=componente[1]
         self.nombre=componente[2]
@@ -1251,6 +1251,26 @@ class Componente(object):
         return P/z/R_atml/T
 
 
+def getComponente(indice):
+    """Return the component with id indice, reusing the parsed instance from
+    the databank cache, the configuration is updated in each call"""
+    indice=int(indice)
+    componente=sql.componentCache.get(indice)
+    if componente is None:
+        componente=Componente(indice)
+        sql.componentCache.put(indice, componente)
+    else:
+        componente.Config=config.getConfig()
+    return componente
+
+def getComponentes(indices):
+    """Return the list of components with ids in indices, reading the
+    elements not cached with a only query to databank"""
+    indices=[int(i) for i in indices]
+    sql.getElements([i for i in indices if i not in sql.componentCache])
+    return [getComponente(i) for i in indices]
+
+
 class newComponente(object):
     """Clase general que define la creaccion de nuevos componentes"""
     def export2Component(self):
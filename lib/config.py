@@ -5,6 +5,11 @@
 # Module with configuration tools
 #   - getComponents: Get component list from project
 #   - getMainWindowConfig: Return config of current project
+#   - setProjectConfig: Set the project config for use without gui
+#   - getConfig: Return read only snapshot of current project config
+#   - getPreferences: Return read only snapshot of pychemqt preferences
+#   - invalidateConfig: Discard the snapshots after a configuration change
+#   - ConfigSnapshot: Read only versioned copy of a configuration
 #   - Entity: General class for model object
 #   - Fluid: dict class wiih custom properties
 
@@ -69,8 +74,29 @@ where id == %s" % str(componente))
         return indices
 
 
+def setProjectConfig(config):
+    """Set the config of current project for use without gui, the config is
+    then used instead of search the main window or read the
+    pychemqtrc_temporal file, None to restore the normal behaviour"""
+    global _projectConfig
+    _projectConfig = config
+    invalidateConfig()
+
+
+_projectConfig = None
+
+
 def getMainWindowConfig():
     """Return config of current project"""
+    if _projectConfig is not None:
+        return _projectConfig
+
+    # Without gui there isn't main window to search
+    if QtGui.QApplication.instance() is None:
+        config = ConfigParser()
+        config.read(conf_dir+"pychemqtrc_temporal")
+        return config
+
     # FIXME: For now need pychemqtrc_temporal for save config of last project
     widget = QtGui.QApplication.activeWindow()
     config = None
@@ -92,6 +118,64 @@ def getMainWindowConfig():
         config.read(conf_dir+"pychemqtrc_temporal")
     return config
 
+
+class ConfigSnapshot(ConfigParser):
+    """Read only copy of a configuration, with the same query methods as
+    ConfigParser. The snapshots are shared by all the calculation objects so
+    any try to modify it raise a TypeError"""
+    def __init__(self, config=None, version=0):
+        ConfigParser.__init__(self)
+        self.version = version
+        if config is not None:
+            self._defaults = self._dict(config._defaults)
+            for section in config.sections():
+                self._sections[section] = self._dict(config._sections[section])
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Configuration snapshot is read only")
+
+    set = add_section = remove_option = remove_section = _readonly
+    read = readfp = _readonly
+
+
+_snapshots = {}
+_version = 0
+
+
+def getConfig():
+    """Return the configuration snapshot of current project, the config is
+    read only the first time after each call to invalidateConfig"""
+    snapshot = _snapshots.get("config")
+    if snapshot is None:
+        snapshot = ConfigSnapshot(getMainWindowConfig(), _version)
+        _snapshots["config"] = snapshot
+    return snapshot
+
+
+def getPreferences():
+    """Return the snapshot of pychemqt preferences file"""
+    snapshot = _snapshots.get("preferences")
+    if snapshot is None:
+        Preferences = ConfigParser()
+        Preferences.read(conf_dir+"pychemqtrc")
+        snapshot = ConfigSnapshot(Preferences, _version)
+        _snapshots["preferences"] = snapshot
+    return snapshot
+
+
+def invalidateConfig():
+    """Discard the configuration snapshots, it must be called after any
+    change in preferences or in the configuration of current project"""
+    global _version
+    _version += 1
+    _snapshots.clear()
+
+
+def configVersion():
+    """Return the current version of configuration, increased in each
+    invalidation, useful to cache values dependent of configuration"""
+    return _version
+
 # indices, nombres, M=getComponents()
 # solidos, nombreSolidos, MSolidos=getComponents(solidos=True)
 
@@ -3,6 +3,7 @@
 
 ###############################################################################
 # Module with stream definition
+#   -MixtureContext: Composition dependent properties shared between mixtures
 #   -Mezcla: Mixture related calculation
 #   -Solid: Solid entity
 #   -Corriente: Stream general class model
@@ -12,6 +13,7 @@
 import os
 import logging
 
+from numpy import array, newaxis
 from scipy.optimize import fsolve, leastsq
 from scipy.special import erf
 from scipy.linalg import det
@@ -19,12 +21,114 @@ from scipy import roots, log, sqrt, log10, exp, sin, r_, zeros
 from pylab import triu
 from PyQt4.QtGui import QApplication
 
-from compuestos import Componente
-from bip import srk
+from compuestos import Componente, getComponentes
 from physics import R_atml, R
 from lib import unidades, config
 from lib import EoS, mEoS, gerg, iapws, freeSteam, refProp, coolProp
+from lib import tabulated, bip
 from lib.psycrometry import PsychroState
+from lib.utilities import LRUCache
+
+
+# Mixture contexts by component set and molar fractions
+_contextCache = LRUCache(256)
+
+# Generalized interaction parameters by component set
+_kijGeneralizedCache = LRUCache(256)
+
+
+def mixtureContext(componente, fraccion, M):
+    """Return the mixture context of composition, calculated only if it isn't
+    in cache, the context is valid while the component instances are the
+    cached ones, so a database modification calculate it again"""
+    key = (tuple([cmp.indice for cmp in componente]),
+           tuple([float(x) for x in fraccion]))
+    context = _contextCache.get(key)
+    if context is None or [cmp for cmp, cached in zip(
+            componente, context.componente) if cmp is not cached]:
+        context = MixtureContext(componente, fraccion, M)
+        _contextCache.put(key, context)
+    return context
+
+
+class MixtureContext(object):
+    """Composition dependent properties of mixture, critical and pseudo
+    critical properties and component pair parameters for transport
+    properties, calculated once and shared by all Mezcla instances with the
+    same composition, like a stream cloned at other conditions, so it must
+    not be modified
+        componente: list of Componente instances
+        fraccion: molar fractions
+        M: molecular weight of mixture"""
+    properties = ("Tc", "tpc", "ppc", "Pc", "f_acent", "f_acent_mod", "Vc",
+                  "Tb", "SG")
+
+    def __init__(self, componente, fraccion, M):
+        self.componente = tuple(componente)
+        self.fraccion = tuple(fraccion)
+        self.M = M
+
+        # Calculate critic temperature, API procedure 4B1.1 pag 304
+        V = sum([xi*cmp.Vc for xi, cmp in zip(self.fraccion, self.componente)])
+        k = [xi*cmp.Vc/V for xi, cmp in zip(self.fraccion, self.componente)]
+        Tcm = sum([ki*cmp.Tc for ki, cmp in zip(k, self.componente)])
+        self.Tc = unidades.Temperature(Tcm)
+
+        # Calculate pseudocritic temperature
+        t = sum([xi*cmp.Tc for xi, cmp in zip(self.fraccion, self.componente)])
+        self.tpc = unidades.Temperature(t)
+
+        # Calculate pseudocritic pressure
+        p = sum([xi*cmp.Pc for xi, cmp in zip(self.fraccion, self.componente)])
+        self.ppc = unidades.Pressure(p)
+
+        # Calculate critic pressure, API procedure 4B2.1 pag 307
+        sumaw = 0
+        for xi, cmp in zip(self.fraccion, self.componente):
+            sumaw += xi*cmp.f_acent
+        pc = self.ppc+self.ppc*(5.808+4.93*sumaw)*(self.Tc-self.tpc)/self.tpc
+        self.Pc = unidades.Pressure(pc)
+
+        # Calculate acentric factor, API procedure 6B2.2-6 pag 523"""
+        self.f_acent = sum([xi*cmp.f_acent for xi, cmp in
+                            zip(self.fraccion, self.componente)])
+        self.f_acent_mod = sum([xi*cmp.f_acent_mod for xi, cmp in
+                                zip(self.fraccion, self.componente)])
+
+        # Calculate critic volume, API procedure 4B3.1 pag 314
+        sumaxvc23 = sum([xi*cmp.Vc**(2./3) for xi, cmp in
+                         zip(self.fraccion, self.componente)])
+        k = [xi*cmp.Vc**(2./3)/sumaxvc23 for xi, cmp in
+             zip(self.fraccion, self.componente)]
+
+        # TODO: Calculate C value from component type.
+        # For now it suppose all are hidrycarbon (C=0)
+        C = 0
+
+        V = [[-1.4684*abs((cmpi.Vc-cmpj.Vc)/(cmpi.Vc+cmpj.Vc))+C
+              for cmpj in self.componente] for cmpi in self.componente]
+        v = [[V[i][j]*(cmpi.Vc+cmpj.Vc)/2. for j, cmpj in enumerate(
+            self.componente)] for i, cmpi in enumerate(self.componente)]
+        suma1 = sum([ki*cmp.Vc for ki, cmp in zip(k, self.componente)])
+        suma2 = sum([ki*kj*v[i][j] for j, kj in enumerate(k)
+                     for i, ki in enumerate(k)])
+        self.Vc = unidades.SpecificVolume((suma1+suma2)*self.M)
+
+        tb = [xi*cmp.Tb for xi, cmp in zip(self.fraccion, self.componente)]
+        self.Tb = unidades.Temperature(sum(tb))
+        self.SG = sum([xi*cmp.SG for xi, cmp in
+                       zip(self.fraccion, self.componente)])
+
+        # Component pairs parameters of gas transport properties
+        Mi = array([cmp.M for cmp in self.componente], dtype=float)
+        self.Mi = Mi
+        self.Mji = Mi[newaxis, :]/Mi[:, newaxis]
+        S = [1.5*cmp.Tb for cmp in self.componente]
+        for i, cmp in enumerate(self.componente):
+            if cmp.indice == 1:
+                S[i] = 78.8888889
+        self.S = array(S, dtype=float)
+        self.Sij = (self.S[:, newaxis]*self.S[newaxis, :])**0.5
 
 
 class Mezcla(config.Entity):
@@ -63,13 +167,13 @@ class Mezcla(config.Entity):
         if "ids" in self.kwargs and self.kwargs["ids"] is not None:
             self.ids = self.kwargs.get("ids")
         else:
-            Config = config.getMainWindowConfig()
+            Config = config.getConfig()
             txt = Config.get("Components", "Components")
             if isinstance(txt, str):
                 self.ids = eval(txt)
             else:
                 self.ids = txt
-        self.componente = [Componente(int(i)) for i in self.ids]
+        self.componente = getComponentes(self.ids)
         fraccionMolar = self.kwargs.get("fraccionMolar", None)
         fraccionMasica = self.kwargs.get("fraccionMasica", None)
         caudalMasico = self.kwargs.get("caudalMasico", None)
@@ -156,7 +260,7 @@ class Mezcla(config.Entity):
 
         mixing = [self.Mix_van_der_Waals, self.Mix_Stryjek_Vera,
                   self.Mix_Panagiotopoulos, self.Mix_Melhem]
-        conf = config.getMainWindowConfig().getint("Thermo", "Mixing")
+        conf = config.getConfig().getint("Thermo", "Mixing")
         self.Mixing_Rule = mixing[conf]
 
         if tipo == 0:
@@ -167,60 +271,30 @@ class Mezcla(config.Entity):
             self._bool = True
             self.status = 1
 
-        # Calculate critic temperature, API procedure 4B1.1 pag 304
-        V = sum([xi*cmp.Vc for xi, cmp in zip(self.fraccion, self.componente)])
-        k = [xi*cmp.Vc/V for xi, cmp in zip(self.fraccion, self.componente)]
-        Tcm = sum([ki*cmp.Tc for ki, cmp in zip(k, self.componente)])
-        self.Tc = unidades.Temperature(Tcm)
-
-        # Calculate pseudocritic temperature
-        t = sum([xi*cmp.Tc for xi, cmp in zip(self.fraccion, self.componente)])
-        self.tpc = unidades.Temperature(t)
-
-        # Calculate pseudocritic pressure
-        p = sum([xi*cmp.Pc for xi, cmp in zip(self.fraccion, self.componente)])
-        self.ppc = unidades.Pressure(p)
-
-        # Calculate critic pressure, API procedure 4B2.1 pag 307
-        sumaw = 0
-        for xi, cmp in zip(self.fraccion, self.componente):
-            sumaw += xi*cmp.f_acent
-        pc = self.ppc+self.ppc*(5.808+4.93*sumaw)*(self.Tc-self.tpc)/self.tpc
-        self.Pc = unidades.Pressure(pc)
-
-        # Calculate acentric factor, API procedure 6B2.2-6 pag 523"""
-        self.f_acent = sum([xi*cmp.f_acent for xi, cmp in
-                            zip(self.fraccion, self.componente)])
-        self.f_acent_mod = sum([xi*cmp.f_acent_mod for xi, cmp in
-                                zip(self.fraccion, self.componente)])
-
-        # Calculate critic volume, API procedure 4B3.1 pag 314
-        sumaxvc23 = sum([xi*cmp.Vc**(2./3) for xi, cmp in
-                         zip(self.fraccion, self.componente)])
-        k = [xi*cmp.Vc**(2./3)/sumaxvc23 for xi, cmp in
-             zip(self.fraccion, self.componente)]
-
-        # TODO: Calculate C value from component type.
-        # For now it suppose all are hidrycarbon (C=0)
-        C = 0
-
-        V = [[-1.4684*abs((cmpi.Vc-cmpj.Vc)/(cmpi.Vc+cmpj.Vc))+C
-              for cmpj in self.componente] for cmpi in self.componente]
-        v = [[V[i][j]*(cmpi.Vc+cmpj.Vc)/2. for j, cmpj in enumerate(
-            self.componente)] for i, cmpi in enumerate(self.componente)]
-        suma1 = sum([ki*cmp.Vc for ki, cmp in zip(k, self.componente)])
-        suma2 = sum([ki*kj*v[i][j] for j, kj in enumerate(k)
-                     for i, ki in enumerate(k)])
-        self.Vc = unidades.SpecificVolume((suma1+suma2)*self.M)
-
-        tb = [xi*cmp.Tb for xi, cmp in zip(self.fraccion, self.componente)]
-        self.Tb = unidades.Temperature(sum(tb))
-        self.SG = sum([xi*cmp.SG for xi, cmp in
-                       zip(self.fraccion, self.componente)])
+        # Composition dependent properties, shared with other mixtures with
+        # the same composition
+        self.context = mixtureContext(self.componente, self.fraccion, self.M)
+        for attr in MixtureContext.properties:
+            setattr(self, attr, getattr(self.context, attr))
 
     def __call__(self):
         pass
-        
+
+    def __getstate__(self):
+        """Pickle support, the mixing rule is saved by name"""
+        state = self.__dict__.copy()
+        if "Mixing_Rule" in state:
+            state["Mixing_Rule"] = state["Mixing_Rule"].__name__
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "Mixing_Rule" in state:
+            self.Mixing_Rule = getattr(self, state["Mixing_Rule"])
+        if state.get("status") and "context" not in state:
+            self.context = mixtureContext(
+                self.componente, self.fraccion, self.M)
+
     def recallZeros(self, lista, val=0):
         """Method to return any list with null component added"""
         l = lista[:]
@@ -238,42 +312,59 @@ class Mezcla(config.Entity):
 
     def Kij(self, T=0, EOS=None):
         """Calculate binary interaction matrix for component of mixture,
-        use bip data from dat/bip directory
+        use bip data from dat/bip directory, the pairs without data use the
+        generalized method
         Parameter:
-            T: opcional temperatura for generalized method
+            T: opcional temperatura for temperature dependent parameters and
+                generalized method
             EOS: name of equation of state, bwrs, nrtl, pr, srk, uniq, wils
         API procedure 8D1.1 pag 819, equations pag 827"""
-        # TODO: import data here from file and remove lib/bip
-        if EOS:
-            kij = []
-            for i in self.ids:
-                kijk = []
-                for j in self.ids:
-                    if i == j:
-                        kijk.append(0)
-                    else:
-                        for indice in EOS:
-                            if i in indice[0:2] and j in indice[0:2]:
-                                kijk.append(indice[2])
-                                break
-                        else:
-                            if i == 1 or j == 1:
-                                kijk.append(1/(344.23*exp(-0.48586*T/databank.base_datos[1][3])+1))
-                            elif i == 2 or j == 2:
-                                kijk.append(0.014*(abs(self.componente[self.ids.index(i)].parametro_solubilidad-self.componente[self.ids.index(j)].parametro_solubilidad)))
-                            elif i == 46 or j == 46:
-                                kijk.append(0.0403*(abs(self.componente[self.ids.index(i)].parametro_solubilidad-self.componente[self.ids.index(j)].parametro_solubilidad)))
-                            elif i == 48 or j == 48:
-                                kijk.append(0)
-                            elif i == 49 or j == 49:
-                                kijk.append(0.1)
-                            elif i == 50 or j == 50:
-                                kijk.append(0.0316*(abs(self.componente[self.ids.index(i)].parametro_solubilidad-self.componente[self.ids.index(j)].parametro_solubilidad)))
-                            else:
-                                kijk.append(0)
-                kij.append(kijk)
+        if not EOS:
+            return zeros((len(self.ids), len(self.ids)))
+        kij, found = bip.kij(EOS, self.ids, T)
+        if not found.all():
+            missing = ~found
+            kij[missing] = self._KijGeneralized(T)[missing]
+        return kij
+
+    def _KijGeneralized(self, T):
+        """Generalized interaction parameters for pairs without data, the
+        hydrogen parameters depend of temperature, the rest are cached by
+        component set"""
+        ids = tuple(self.ids)
+        cached = _kijGeneralizedCache.get(ids)
+        if cached and not [cmp for cmp, old in zip(
+                self.componente, cached[0]) if cmp is not old]:
+            kij = cached[1]
         else:
-            kij = zeros((len(self.ids), len(self.ids)))
+            n = len(ids)
+            kij = zeros((n, n))
+            # Solubility parameter in (cal/cm³)^0.5 for API correlation
+            delta = [cmp.parametro_solubilidad.calcc
+                     for cmp in self.componente]
+            for a, i in enumerate(ids):
+                for b, j in enumerate(ids):
+                    if i == j:
+                        continue
+                    elif i == 2 or j == 2:
+                        kij[a, b] = 0.014*abs(delta[a]-delta[b])
+                    elif i == 46 or j == 46:
+                        kij[a, b] = 0.0403*abs(delta[a]-delta[b])
+                    elif i == 48 or j == 48:
+                        kij[a, b] = 0
+                    elif i == 49 or j == 49:
+                        kij[a, b] = 0.1
+                    elif i == 50 or j == 50:
+                        kij[a, b] = 0.0316*abs(delta[a]-delta[b])
+            kij.setflags(write=False)
+            _kijGeneralizedCache.put(ids, (tuple(self.componente), kij))
+
+        if 1 in ids:
+            h = ids.index(1)
+            kij = kij.copy()
+            kij[h, :] = kij[:, h] = 1/(344.23*exp(
+                -0.48586*T/self.componente[h].Tc)+1)
+            kij[h, h] = 0
         return kij
 
 #    def _Critical_API(self):
@@ -853,29 +944,19 @@ class Mezcla(config.Entity):
 
     def Mu_Gas_Wilke(self, T):
         """Calculate gases viscosity, API procedure 11B2.1, pag 1102"""
-        mui=[cmp.Mu_Gas(T, 1) for cmp in self.componente]
+        mui = array([cmp.Mu_Gas(T, 1) for cmp in self.componente],
+                    dtype=float)
+        x = array(self.fraccion, dtype=float)
+        Mji = self.context.Mji
 
-        kij = []
-        for i in range(len(self.componente)):
-            kiji = []
-            for j in range(len(self.componente)):
-                if i == j:
-                    kiji.append(0)
-                else:
-                    kiji.append((1+(mui[i]/mui[j])**0.5*(self.componente[j].M/self.componente[i].M)**0.25)**2/8**0.5/(1+self.componente[i].M/self.componente[j].M)**0.5)
-            kij.append(kiji)
+        kij = (1+(mui[:, newaxis]/mui[newaxis, :])**0.5*Mji**0.25)**2 / \
+            8**0.5/(1+1/Mji)**0.5
+        kij.flat[::len(x)+1] = 0
 
-        suma = []
-        for i in range(len(self.componente)):
-            sumai = 0
-            if self.fraccion[i]!=0:
-                for j in range(len(self.componente)):
-                    sumai += kij[i][j]*self.fraccion[j]/self.fraccion[i]
-            suma.append(sumai)
-        mu = 0
-        for i in range(len(self.componente)):
-            mu += mui[i]/(1.+suma[i])
-        return unidades.Viscosity(mu)
+        suma = kij.dot(x)
+        suma[x != 0] /= x[x != 0]
+        suma[x == 0] = 0
+        return unidades.Viscosity((mui/(1.+suma)).sum())
 
     def Mu_Gas_Stiel(self, T, P, rhoG=0, muo=0):
         """Calculate gas viscosity at high pressure, API procedure 11B4.1, pag 1107"""
@@ -942,42 +1023,18 @@ class Mezcla(config.Entity):
 
     def ThCond_Gas(self, T, P):
         """Calculate gas thermal conductivity, API procedure 12A2.1, pag 1145"""
-        ki = []
-        S = []
-        mu = []
-        for cmp in self.componente:
-            ki.append(cmp.ThCond_Gas(T, P))
-            if cmp.indice == 1:
-                S.append(78.8888889)
-            else:
-                S.append(1.5*cmp.Tb)
-            mu.append(cmp.Mu_Gas(T, P))
-
-        Sij = []
-        for i in range(len(self.componente)):
-            Siji = []
-            for j in range(len(self.componente)):
-                Siji.append(sqrt(S[i]*S[j]))
-            Sij.append(Siji)
-
-        Aij = []
-        for i in range(len(self.componente)):
-            Aiji = []
-            for j in range(len(self.componente)):
-                Aiji.append(0.25*(1+sqrt(mu[i]/mu[j]*(self.componente[j].M/self.componente[i].M)**0.75*(1+S[i]/T)/(1+S[j]/T)))**2*(1+Sij[i][j]/T)/(1+S[i]/T))
-            Aij.append(Aiji)
-
-        sumaj = []
-        for i in range(len(self.componente)):
-            suma = 0
-            for j in range(len(self.componente)):
-                suma += Aij[i][j]*self.fraccion[j]
-            sumaj.append(suma)
-
-        k = 0
-        for i in range(len(self.componente)):
-            k += ki[i]*self.fraccion[i]/sumaj[i]
-
+        ki = array([cmp.ThCond_Gas(T, P) for cmp in self.componente],
+                   dtype=float)
+        mu = array([cmp.Mu_Gas(T, P) for cmp in self.componente],
+                   dtype=float)
+        x = array(self.fraccion, dtype=float)
+        S = self.context.S
+
+        fi = 1+S/T
+        Aij = 0.25*(1+(mu[:, newaxis]/mu[newaxis, :]*self.context.Mji**0.75 *
+                       fi[:, newaxis]/fi[newaxis, :])**0.5)**2 * \
+            (1+self.context.Sij/T)/fi[:, newaxis]
+        k = (ki*x/Aij.dot(x)).sum()
         return unidades.ThermalConductivity(k)
 
     def Solubilidad_agua(self, T):
@@ -1108,13 +1165,13 @@ class Solid(config.Entity):
         return self._def
 
     def calculo(self):
-        self.Config = config.getMainWindowConfig()
+        self.Config = config.getConfig()
         txt = self.Config.get("Components", "Solids")
         if isinstance(txt, str):
             self.ids = eval(txt)
         else:
             self.ids = txt
-        self.componente = [Componente(int(i)) for i in self.ids]
+        self.componente = getComponentes(self.ids)
         
         caudal = self.kwargs.get("caudalSolido", [])
         diametro_medio = self.kwargs.get("diametroMedio", 0.0)
@@ -1252,6 +1309,8 @@ class Corriente(config.Entity):
         -T: temperature, Kelvin
         -P: Pressure, Pa
         -x: quality
+        -h: enthalpy flow, W, with P the temperature is calculated in a PH flash
+        -s: entropy flow, W/K, with P the temperature is calculated in a PS flash
 
         -caudalMasico: mass flow in kg/s (solid component excluded)
         -caudalMolar: molar flow in kmol/s (solid component excluded)
@@ -1269,10 +1328,23 @@ class Corriente(config.Entity):
         -distribucion_diametro: Array with particle diameter of solid particle distribution, in micrometer
 
         -notas: Description text for stream
+
+    With a pure component backend the PH and PS flash use the backend input,
+    so the state is defined too in the two phases region
+    >>> conf = config.getMainWindowConfig()
+    >>> conf.set("Thermo", "iapws", "True")
+    >>> config.setProjectConfig(conf)
+    >>> st = Corriente(P=1e5, h=1500e3, caudalMasico=1., ids=[62],
+    ...                fraccionMolar=[1.])
+    >>> print "%0.2f %0.4f %0.1f" % (st.T, st.x, st.h.kW)
+    372.76 0.4795 1500.0
+    >>> config.setProjectConfig(None)
         """
     kwargs = {"T": 0.0,
               "P": 0.0,
               "x": None,
+              "h": 0.0,
+              "s": 0.0,
               "ids": None, 
 
               "caudalMasico": 0.0,
@@ -1294,8 +1366,14 @@ class Corriente(config.Entity):
     kwargs_forbidden = ["entrada", "mezcla", "solido"]
     solido = None
 
+    # Last temperature solution of PH and PS flash for each component set,
+    # used as initial value of next flash
+    _lastT = {}
+    # Maximum error of PH and PS flash, J/kg and J/kgK
+    _flashTolerance = {"h": 1., "s": 1e-3}
+
     def __init__(self, **kwargs):
-        self.Config = config.getMainWindowConfig()
+        self.Config = config.getConfig()
         self.kwargs = Corriente.kwargs.copy()
         self.__call__(**kwargs)
 
@@ -1395,7 +1473,19 @@ class Corriente(config.Entity):
             self.kwargs["P"] = 0.0
         elif kwargs.get("P", 0.0) and self.kwargs["T"] and self.kwargs["x"]:
             self.kwargs["x"] = None
-            
+
+        # Enthalpy or entropy definition replace the temperature and quality
+        if kwargs.get("h", 0.0) or kwargs.get("s", 0.0):
+            self.kwargs["T"] = 0.0
+            self.kwargs["x"] = None
+            if kwargs.get("h", 0.0):
+                self.kwargs["s"] = 0.0
+            else:
+                self.kwargs["h"] = 0.0
+        elif kwargs.get("T", 0.0) or kwargs.get("x", None) is not None:
+            self.kwargs["h"] = 0.0
+            self.kwargs["s"] = 0.0
+
         self.kwargs.update(kwargs)
 
         for key, value in self.kwargs.iteritems():
@@ -1422,8 +1512,8 @@ class Corriente(config.Entity):
             QApplication.processEvents()
 
             self.status = 1
-            self.calculo()
             self.msg = ""
+            self.calculo()
             
         elif self.tipoFlujo:
             if self.kwargs["mezcla"]:
@@ -1449,6 +1539,10 @@ class Corriente(config.Entity):
             self.tipoTermodinamica = "Tx"
         elif self.kwargs["P"] and self.kwargs["x"]:
             self.tipoTermodinamica = "Px"
+        elif self.kwargs["P"] and self.kwargs["h"]:
+            self.tipoTermodinamica = "Ph"
+        elif self.kwargs["P"] and self.kwargs["s"]:
+            self.tipoTermodinamica = "Ps"
 
         # Mix definition
         self.tipoFlujo = 0
@@ -1509,68 +1603,36 @@ class Corriente(config.Entity):
         T = unidades.Temperature(self.kwargs.get("T", None))
         P = unidades.Pressure(self.kwargs.get("P", None))
         x = self.kwargs.get("x", None)
-
-        MEoS = self.Config.getboolean("Thermo", "MEoS")
-        COOLPROP = self.Config.getboolean("Thermo", "coolprop")
-        REFPROP = self.Config.getboolean("Thermo", "refprop")
-        IAPWS = self.Config.getboolean("Thermo", "iapws") and \
-            len(self.ids) == 1 and self.ids[0] == 62
-        FREESTEAM = self.Config.getboolean("Thermo", "freesteam") and \
-            len(self.ids) == 1 and self.ids[0] == 62
-        GERG = self.Config.getboolean("Thermo", "GERG")
-        setData = True
-
-        mEoS_available = self.ids[0] in mEoS.id_mEoS
-        GERG_available = True
-        REFPROP_available = True
-        COOLPROP_available = self.ids[0] in coolProp.__all__
-        for id in self.ids:
-            if id not in gerg.id_GERG:
-                GERG_available = False
-            if id not in refProp.__all__:
-                REFPROP_available = False
-
-        if IAPWS and FREESTEAM:
-            compuesto = freeSteam.Freesteam(**self.kwargs)
-            self._thermo = "freesteam"
-        elif IAPWS:
-            compuesto = iapws.IAPWS97(**self.kwargs)
-            self._thermo = "iapws"
-        elif MEoS and REFPROP and REFPROP_available:
-            fluido = [refProp.__all__[id] for id in self.ids]
-            compuesto = refProp.RefProp(fluido=fluido, **self.kwargs)
-            self._thermo = "refprop"
-        elif GERG and GERG_available:
-            ids = []
-            for id in self.ids:
-                ids.append(gerg.id_GERG.index(id))
-            kwargs = self.kwargs
-            kwargs["mezcla"] = self.mezcla
-            compuesto = gerg.GERG(componente=ids, fraccion=self.fraccion, **kwargs)
-            self._thermo = "gerg"
-        elif MEoS and len(self.ids) == 1 and COOLPROP and COOLPROP_available:
-            compuesto = coolProp.CoolProp(fluido=self.ids[0], **self.kwargs)
-            self._thermo = "coolprop"
-        elif MEoS and len(self.ids) == 1 and mEoS_available:
-            if self.tipoTermodinamica == "TP":
-                compuesto = mEoS.__all__[mEoS.id_mEoS.index(self.ids[0])](T=T, P=P)
-            elif self.tipoTermodinamica == "Tx":
-                compuesto = mEoS.__all__[mEoS.id_mEoS.index(self.ids[0])](T=T, x=x)
-            elif self.tipoTermodinamica == "Px":
-                compuesto = mEoS.__all__[mEoS.id_mEoS.index(self.ids[0])](P=P, x=x)
-            self._thermo = "meos"
-        else:
-            self._thermo = "eos"
-            setData = False
+        tipo = self.tipoTermodinamica
+
+        value = None
+        if tipo in ("Ph", "Ps") and \
+                self._thermoBackend() in self._nativeFlash:
+            # Specific property for the flash of backend
+            value = self.kwargs[tipo[1]]/self.caudalmasico
+        elif tipo in ("Ph", "Ps"):
+            T = self._flash(tipo[1], P)
+            if not T:
+                return
+            tipo = "TP"
+
+        compuesto = self._compuesto(T, P, x, tipo, value)
+        if value is not None and compuesto.status != 1:
+            self.status = 5
+            self.msg = QApplication.translate(
+                "pychemqt", "Thermodynamic state can't be calculated")
+            return
+        setData = compuesto is not None
+        if not setData:
             self.M = unidades.Dimensionless(self.mezcla.M)
             self.Tc = self.mezcla.Tc
             self.Pc = self.mezcla.Pc
             self.SG = unidades.Dimensionless(self.mezcla.SG)
 
-            if self.tipoTermodinamica == "TP":
+            if tipo == "TP":
                 self.T = unidades.Temperature(T)
                 self.P = unidades.Pressure(P)
-                eos = EoS.K[self.Config.getint("Thermo","K")](self.T, self.P.atm, self.mezcla)
+                eos, eosH = self._eos(self.T, self.P)
                 self.eos = eos
                 self.x = unidades.Dimensionless(eos.x)
             else:
@@ -1592,20 +1654,14 @@ class Corriente(config.Entity):
             self.Gas.Z = unidades.Dimensionless(float(eos.Z[0]))
             self.Liquido.Z = unidades.Dimensionless(float(eos.Z[1]))
 
-            if EoS.H[self.Config.getint("Thermo", "H")].__title__ == EoS.K[self.Config.getint("Thermo","K")].__title__:
-                eosH = eos
-            else:
-                eosH = EoS.H[self.Config.getint("Thermo", "H")](self.T, self.P.atm, self.mezcla)
             self.H_exc = eosH.H_exc
 
             self.Liquido.Q = unidades.VolFlow(0)
             self.Gas.Q = unidades.VolFlow(0)
-            self.Liquido.h = unidades.Power(0)
-            self.Gas.h = unidades.Power(0)
+            self.Liquido.h, self.Gas.h = self._eosEnthalpy(
+                eos, self.H_exc, self.T)
             if self.x < 1:
                 # There is liquid phase
-                Hl = (self.Liquido.Entalpia_ideal(self.T).Jg-self.Liquido.Hv_DIPPR(self.T).Jg)*self.Liquido.caudalmasico.gh
-                self.Liquido.h = unidades.Power(Hl-R*self.T/self.M*self.H_exc[1]*(1-self.x)*self.Liquido.caudalmasico.gh, "Jh")
                 self.Liquido.cp = self.Liquido.Cp_Liquido(T)
                 self.Liquido.rho = self.Liquido.RhoL_Tait_Costald(T, self.P.atm)
                 self.Liquido.mu = self.Liquido.Mu_Liquido(T, self.P.atm)
@@ -1615,8 +1671,6 @@ class Corriente(config.Entity):
                 self.Liquido.Pr = self.Liquido.cp*self.Liquido.mu/self.Liquido.k
             if self.x > 0:
                 # There is gas phase
-                Hg = self.Gas.Entalpia_ideal(self.T).Jg*self.Gas.caudalmasico.gh
-                self.Gas.h = unidades.Power(Hg-R*self.T/self.M*self.H_exc[0]*self.x*self.Gas.caudalmasico.gh, "Jh")
                 self.Gas.cp = self.Gas.Cp_Gas(T, self.P.atm)
                 self.Gas.rho = unidades.Density(self.P.atm/self.Gas.Z/R_atml/self.T*self.M, "gl")
                 self.Gas.rhoSd = unidades.Density(1./self.Gas.Z/R_atml/298.15*self.M, "gl")
@@ -1674,19 +1728,47 @@ class Corriente(config.Entity):
                 self.Gas.Q = unidades.VolFlow(self.Q*(1-self.x))
                 self.Gas.caudalmasico = unidades.MassFlow(self.caudalmasico*self.x)
                 self.Gas.caudalmolar = unidades.MolarFlow(self.caudalmolar*self.x)
-                self.Gas.fraccion = [unidades.Dimensionless(1)]
-                self.Gas.fraccion_masica = [unidades.Dimensionless(1)]
-                self.Gas.caudalunitariomasico = [self.Gas.caudalmasico]
-                self.Gas.caudalunitariomolar = [self.Gas.caudalmolar]
+                if self._thermo == "gerg":
+                    # Mixture flash, each phase has its own composition
+                    self.Gas.caudalmolar = unidades.MolarFlow(
+                        self.Gas.caudalmasico/self.Gas.M)
+                    self.Gas.fraccion_masica = [unidades.Dimensionless(
+                        x*cmp.M/self.Gas.M) for x, cmp in zip(
+                            self.Gas.fraccion, self.componente)]
+                    self.Gas.caudalunitariomasico = [
+                        unidades.MassFlow(self.Gas.caudalmasico*w)
+                        for w in self.Gas.fraccion_masica]
+                    self.Gas.caudalunitariomolar = [
+                        unidades.MolarFlow(self.Gas.caudalmolar*x)
+                        for x in self.Gas.fraccion]
+                else:
+                    self.Gas.fraccion = [unidades.Dimensionless(1)]
+                    self.Gas.fraccion_masica = [unidades.Dimensionless(1)]
+                    self.Gas.caudalunitariomasico = [self.Gas.caudalmasico]
+                    self.Gas.caudalunitariomolar = [self.Gas.caudalmolar]
 
             if self.x < 1:
                 self.Liquido.Q = unidades.VolFlow(self.Q*(1-self.x))
                 self.Liquido.caudalmasico = unidades.MassFlow(self.caudalmasico*(1-self.x))
                 self.Liquido.caudalmolar = unidades.MolarFlow(self.caudalmolar*(1-self.x))
-                self.Liquido.fraccion = [unidades.Dimensionless(1)]
-                self.Liquido.fraccion_masica = [unidades.Dimensionless(1)]
-                self.Liquido.caudalunitariomasico = [self.Liquido.caudalmasico]
-                self.Liquido.caudalunitariomolar = [self.Liquido.caudalmolar]
+                if self._thermo == "gerg":
+                    # Mixture flash, each phase has its own composition
+                    self.Liquido.caudalmolar = unidades.MolarFlow(
+                        self.Liquido.caudalmasico/self.Liquido.M)
+                    self.Liquido.fraccion_masica = [unidades.Dimensionless(
+                        x*cmp.M/self.Liquido.M) for x, cmp in zip(
+                            self.Liquido.fraccion, self.componente)]
+                    self.Liquido.caudalunitariomasico = [
+                        unidades.MassFlow(self.Liquido.caudalmasico*w)
+                        for w in self.Liquido.fraccion_masica]
+                    self.Liquido.caudalunitariomolar = [
+                        unidades.MolarFlow(self.Liquido.caudalmolar*x)
+                        for x in self.Liquido.fraccion]
+                else:
+                    self.Liquido.fraccion = [unidades.Dimensionless(1)]
+                    self.Liquido.fraccion_masica = [unidades.Dimensionless(1)]
+                    self.Liquido.caudalunitariomasico = [self.Liquido.caudalmasico]
+                    self.Liquido.caudalunitariomolar = [self.Liquido.caudalmolar]
 
         if self.Config.get("Components", "Solids"):
             if self.kwargs["solido"]:
@@ -1706,6 +1788,265 @@ class Corriente(config.Entity):
             self.kwargs["caudalVolumetrico"] = Q
             self.kwargs["caudalMolar"] = None
 
+    def _thermoBackend(self):
+        """Name of thermo backend selected by configuration for the stream:
+        freesteam, tabulated, iapws, refprop, gerg, coolprop, meos or eos"""
+        MEoS = self.Config.getboolean("Thermo", "MEoS")
+        COOLPROP = self.Config.getboolean("Thermo", "coolprop")
+        REFPROP = self.Config.getboolean("Thermo", "refprop")
+        IAPWS = self.Config.getboolean("Thermo", "iapws") and \
+            len(self.ids) == 1 and self.ids[0] == 62
+        FREESTEAM = self.Config.getboolean("Thermo", "freesteam") and \
+            len(self.ids) == 1 and self.ids[0] == 62
+        GERG = self.Config.getboolean("Thermo", "GERG")
+        TABULATED = self.Config.has_option("Thermo", "tabulated") and \
+            self.Config.getboolean("Thermo", "tabulated")
+
+        mEoS_available = self.ids[0] in mEoS.id_mEoS
+        GERG_available = True
+        REFPROP_available = True
+        COOLPROP_available = self.ids[0] in coolProp.__all__
+        for id in self.ids:
+            if id not in gerg.id_GERG:
+                GERG_available = False
+            if id not in refProp.__all__:
+                REFPROP_available = False
+
+        if IAPWS and FREESTEAM:
+            return "freesteam"
+        elif IAPWS and TABULATED:
+            return "tabulated"
+        elif IAPWS:
+            return "iapws"
+        elif MEoS and REFPROP and REFPROP_available:
+            return "refprop"
+        elif GERG and GERG_available:
+            return "gerg"
+        elif MEoS and len(self.ids) == 1 and TABULATED and mEoS_available:
+            return "tabulated"
+        elif MEoS and len(self.ids) == 1 and COOLPROP and COOLPROP_available:
+            return "coolprop"
+        elif MEoS and len(self.ids) == 1 and mEoS_available:
+            return "meos"
+        else:
+            return "eos"
+
+    # Single component backends with own PH and PS input, they define the
+    # state in the two phases region where the temperature doesn't define it
+    _nativeFlash = ("freesteam", "tabulated", "iapws", "coolprop", "meos")
+
+    def _compuesto(self, T, P, x, tipo, value=None):
+        """Thermo backend instance of stream, selected by configuration
+            T, P, x: Thermodynamic state variables
+            tipo: Thermodynamic definition, TP, Tx or Px, Ph and Ps only for
+                the backends in _nativeFlash
+            value: Specific enthalpy or entropy for Ph and Ps definitions,
+                in J/kg and J/kgK
+        Return None for mixture calculated with eos"""
+        kwargs = self.kwargs.copy()
+        del kwargs["h"]
+        del kwargs["s"]
+        kwargs["T"] = T
+        if tipo in ("Ph", "Ps"):
+            kwargs["T"] = 0.0
+            kwargs["x"] = None
+            kwargs[tipo[1]] = value
+
+        self._thermo = self._thermoBackend()
+        if self._thermo == "freesteam":
+            compuesto = freeSteam.Freesteam(**kwargs)
+        elif self._thermo == "tabulated" and self.ids[0] == 62 and \
+                self.Config.getboolean("Thermo", "iapws"):
+            compuesto = tabulated.Tabulated(
+                fluido=iapws.IAPWS97,
+                **self._tabulatedArgs(T, P, x, tipo, value))
+        elif self._thermo == "iapws":
+            compuesto = iapws.IAPWS97(**kwargs)
+        elif self._thermo == "refprop":
+            fluido = [refProp.__all__[id] for id in self.ids]
+            compuesto = refProp.RefProp(fluido=fluido, **kwargs)
+        elif self._thermo == "gerg":
+            ids = []
+            for id in self.ids:
+                ids.append(gerg.id_GERG.index(id))
+            kwargs["mezcla"] = self.mezcla
+            compuesto = gerg.GERG(componente=ids, fraccion=self.fraccion, **kwargs)
+        elif self._thermo == "tabulated":
+            fluido = mEoS.__all__[mEoS.id_mEoS.index(self.ids[0])]
+            compuesto = tabulated.Tabulated(
+                fluido=fluido, **self._tabulatedArgs(T, P, x, tipo, value))
+        elif self._thermo == "coolprop":
+            if tipo in ("Ph", "Ps"):
+                kwargs[tipo[1].upper()] = value
+            compuesto = coolProp.CoolProp(fluido=self.ids[0], **kwargs)
+        elif self._thermo == "meos":
+            fluido = mEoS.__all__[mEoS.id_mEoS.index(self.ids[0])]
+            compuesto = fluido(**self._tabulatedArgs(T, P, x, tipo, value))
+        else:
+            return None
+        return compuesto
+
+    def _eos(self, T, P):
+        """Equilibrium and enthalpy eos instances of mixture at T, P"""
+        K = EoS.K[self.Config.getint("Thermo", "K")]
+        H = EoS.H[self.Config.getint("Thermo", "H")]
+        eos = K(T, P.atm, self.mezcla)
+        if H.__title__ == K.__title__:
+            eosH = eos
+        else:
+            eosH = H(T, P.atm, self.mezcla)
+        return eos, eosH
+
+    def _eosEnthalpy(self, eos, H_exc, T):
+        """Enthalpy flow of liquid and gas phases calculated with eos,
+        ideal enthalpy with vaporization heat for liquid and departure from
+        eos, the phases are not instanced to use it in flash iteration
+            eos: Equilibrium eos instance with vapor fraction and phase
+                compositions
+            H_exc: Excess enthalpy of gas and liquid phase
+            T: Temperature
+        Return the liquid and gas enthalpy flows
+
+        The liquid phase has the greater departure from ideal gas
+        >>> conf = config.getMainWindowConfig()
+        >>> conf.set("Thermo", "K", "4")
+        >>> conf.set("Thermo", "H", "4")
+        >>> config.setProjectConfig(conf)
+        >>> st = Corriente(T=250., P=1013250., ids=[2, 4, 6],
+        ...                caudalUnitarioMolar=[0.4, 0.3, 0.3])
+        >>> print "%0.4f %0.6g %0.6g" % (st.x, st.Liquido.h, st.Gas.h)
+        0.4135 -9.00314e+06 -921479
+        >>> config.setProjectConfig(None)
+        """
+        x = eos.x
+        if 0 < x < 1:
+            phases = [(eos.xi, self.caudalmolar*(1-x)),
+                      (eos.yi, self.caudalmolar*x)]
+        elif x <= 0:
+            phases = [(self.fraccion, self.caudalmolar), None]
+        else:
+            phases = [None, (self.fraccion, self.caudalmolar)]
+
+        # The eos arrays are ordered as [gas, liquid]
+        h = []
+        for i, phase in enumerate(phases):
+            if phase is None:
+                h.append(unidades.Power(0))
+                continue
+            fraccion, caudalmolar = phase
+            suma = float(sum(fraccion))
+            fraccion = [xi/suma for xi in fraccion]
+            M = sum([xi*cmp.M for xi, cmp in zip(fraccion, self.componente)])
+            caudalmasico = unidades.MassFlow(caudalmolar*M)
+            Ho = 0
+            for xi, cmp in zip(fraccion, self.componente):
+                Ho += xi*cmp.M/M*cmp.Entalpia_ideal(T)
+            H = unidades.Enthalpy(Ho).Jg
+            if i == 0:
+                # Liquid phase
+                Hv = 0
+                for xi, cmp in zip(fraccion, self.componente):
+                    Tv = min(max(T, cmp.calor_vaporizacion[-2]),
+                             cmp.calor_vaporizacion[-1])
+                    Hv += xi*cmp.Hv_DIPPR(Tv)
+                H -= unidades.Enthalpy(Hv/M, "Jkg").Jg
+                factor = 1-x
+            else:
+                factor = x
+            h.append(unidades.Power(
+                H*caudalmasico.gh -
+                R*T/self.mezcla.M*H_exc[1-i]*factor*caudalmasico.gh, "Jh"))
+        return h
+
+    def _flashProperty(self, spec, T, P):
+        """Enthalpy or entropy flow of stream at T, P for flash, None if the
+        thermo backend can't calculate it"""
+        compuesto = self._compuesto(T, P, None, "TP")
+        if compuesto is not None:
+            return getattr(compuesto, spec)*self.caudalmasico
+        elif spec == "h":
+            eos, eosH = self._eos(T, P)
+            return sum(self._eosEnthalpy(eos, eosH.H_exc, T))
+
+    def _flash(self, spec, P):
+        """PH and PS flash, calculate the temperature with the enthalpy or
+        entropy flow defined, secant method bracketing the solution when
+        it's found, the initial value is the last solution of stream or of
+        the same component set
+            spec: h or s
+            P: Pressure
+        Return the temperature, None if the flash can't be done"""
+        value = self.kwargs[spec]
+        key = (tuple(self.ids), spec)
+        T1 = self.__dict__.get("T", None) or self._lastT.get(key, 298.15)
+        f1 = self._flashProperty(spec, T1, P)
+        if f1 is None:
+            self.status = 0
+            self.msg = QApplication.translate(
+                "pychemqt", "Entropy not available in eos thermo, PS flash "
+                "can't be done")
+            return
+        f1 -= value
+
+        lo, hi = 0, None
+        if f1 < 0:
+            lo = T1
+        else:
+            hi = T1
+        T2 = T1+1.
+        for i in range(50):
+            f2 = self._flashProperty(spec, T2, P)-value
+            if f2 < 0:
+                lo = max(lo, T2)
+            else:
+                hi = min(hi, T2) if hi else T2
+            if f2 == f1:
+                break
+            T = T2-f2*(T2-T1)/(f2-f1)
+            if hi and lo:
+                if not lo < T < hi:
+                    T = (lo+hi)/2
+            else:
+                # Limit the step before bracketing the solution
+                T = min(max(T, T2/2, T2-100), T2*2, T2+100)
+            T1, f1 = T2, f2
+            T2 = T
+            if abs(T2-T1) < 1e-6:
+                break
+        else:
+            self.status = 3
+            self.msg = QApplication.translate(
+                "pychemqt", "Flash not converged")
+
+        if abs(f2) > self._flashTolerance[spec]*self.caudalmasico:
+            # The property has a jump with temperature, a pure component in
+            # the two phases region calculated with eos, the state is
+            # calculated in the nearest temperature
+            self.status = 5
+            self.msg = QApplication.translate(
+                "pychemqt", "Flash specification not met")
+
+        self._lastT[key] = T2
+        return unidades.Temperature(T2)
+
+    def _tabulatedArgs(self, T, P, x, tipo, value=None):
+        """Input variables for meos and tabulated backends from
+        thermodynamic definition of stream, with the MEoS equation of
+        project"""
+        if self.Config.has_option("MEoS", "eq"):
+            kwargs = {"eq": self.Config.getint("MEoS", "eq")}
+        else:
+            kwargs = {}
+        if tipo == "TP":
+            kwargs.update({"T": T, "P": P})
+        elif tipo == "Tx":
+            kwargs.update({"T": T, "x": x})
+        elif tipo == "Px":
+            kwargs.update({"P": P, "x": x})
+        else:
+            kwargs.update({"P": P, tipo[1]: value})
+        return kwargs
+
     def setSolid(self, solid):
         self.solido = solid
         
@@ -1720,6 +2061,17 @@ class Corriente(config.Entity):
     def clone(self, **kwargs):
         """Create a new stream instance with change only kwags new values"""
         old_kwargs = self.kwargs.copy()
+        if (self.kwargs["h"] or self.kwargs["s"]) and self.status:
+            # The extensive flash definition is replaced by the temperature
+            # of solution, so the clone with new flows is consistent, or the
+            # quality for a pure component in two phases region
+            if len(self.ids) == 1 and 0 < self.x < 1:
+                old_kwargs["T"] = 0.0
+                old_kwargs["x"] = float(self.x)
+            else:
+                old_kwargs["T"] = float(self.T)
+            old_kwargs["h"] = 0.0
+            old_kwargs["s"] = 0.0
         if "split" in kwargs:
             split = kwargs["split"]
             del kwargs["split"]
@@ -1737,11 +2089,73 @@ class Corriente(config.Entity):
                 kwargs["caudalMolar"] = split*self.kwargs["caudalMolar"]
         if "x" in kwargs:
             del old_kwargs["T"]
+        if kwargs.get("h", 0.0) or kwargs.get("s", 0.0):
+            old_kwargs["T"] = 0.0
+            old_kwargs["x"] = None
+            old_kwargs["h"] = 0.0
+            old_kwargs["s"] = 0.0
+        elif kwargs.get("T", 0.0) or kwargs.get("x", None) is not None:
+            old_kwargs["h"] = 0.0
+            old_kwargs["s"] = 0.0
         if "mezcla" in kwargs:
             old_kwargs.update(kwargs["mezcla"].kwargs)
         old_kwargs.update(kwargs)
         return Corriente(**old_kwargs)
 
+    # Calculated state to file
+    def writeStatetoStream(self, stream):
+        """Save the calculated state of stream to file, temperature, pressure
+        and component molar flows, for a pure component in the two phases
+        region the vapor fraction define the state"""
+        solved = self.status == 1
+        stream.writeBool(solved)
+        if not solved:
+            return
+        stream.writeBool(len(self.ids) == 1 and 0 < self.x < 1)
+        stream.writeDouble(self.T)
+        stream.writeDouble(self.P)
+        stream.writeDouble(self.x)
+        stream.writeInt32(len(self.ids))
+        for id, caudal in zip(self.ids, self.mezcla.caudalunitariomolar):
+            stream.writeInt32(id)
+            stream.writeDouble(caudal)
+
+        if self.solido:
+            solido = self.solido.kwargs
+        else:
+            solido = Solid.kwargs
+        for key in ("caudalSolido", "distribucion_fraccion",
+                    "distribucion_diametro"):
+            stream.writeInt32(len(solido[key]))
+            for value in solido[key]:
+                stream.writeDouble(value)
+        stream.writeDouble(solido["diametroMedio"])
+
+    def readStatefromStream(self, stream):
+        """Read the calculated state of stream from file and calculate the
+        stream with it"""
+        if not stream.readBool():
+            return
+        pure = stream.readBool()
+        T = stream.readDouble()
+        P = stream.readDouble()
+        x = stream.readDouble()
+        kwargs = {"P": P, "ids": [], "caudalUnitarioMolar": []}
+        if pure:
+            kwargs["x"] = x
+        else:
+            kwargs["T"] = T
+        for i in range(stream.readInt32()):
+            kwargs["ids"].append(stream.readInt32())
+            kwargs["caudalUnitarioMolar"].append(stream.readDouble())
+
+        for key in ("caudalSolido", "distribucion_fraccion",
+                    "distribucion_diametro"):
+            kwargs[key] = [stream.readDouble()
+                           for i in range(stream.readInt32())]
+        kwargs["diametroMedio"] = stream.readDouble()
+        self(**kwargs)
+
     def __repr__(self):
         if self.status:
             return "Corriente at %0.2fK and %0.2fatm" % (self.T, self.P.atm)
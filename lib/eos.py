@@ -5,6 +5,11 @@
 # Library to add EoS common functionality
 ###############################################################################
 
+import logging
+
+from numpy import (array, asarray, column_stack, dot, eye, newaxis,
+                   ones_like, vstack, zeros)
+from numpy.linalg import LinAlgError, solve
 from scipy import exp, log, log10, tan, sinh, tanh, arctan, sqrt
 from scipy import roots, r_
 from scipy.constants import pi, Avogadro, R
@@ -27,7 +32,7 @@ def Alfa(Tr, m, f_acent, EOS="SRK", alfa=None):
         Boston, J.F.; Mathias, P.M. Phase Equilibria in a Third-Generation Process Simulator. Proc. 2nd. Int. Conf. On Phase Equilibria and Fluid Properties in the Chemical Process Industries, Berlin, Germany 17.-21.3.1980, p. 823.
         """
     if not alfa:
-        Config=config.getMainWindowConfig()
+        Config=config.getConfig()
         alfa=Config.getint("Thermo","Alfa")
 
     if alfa==2: #Función alfa de Twu et Alt.
@@ -83,6 +88,44 @@ def volume_Correction_Peneloux(compuesto):
     return 0.40768*(0.29441-compuesto.rackett)*R_atml*compuesto.Tc/compuesto.Pc.atm
 
 
+def rachfordRice(z, K):
+    """Solve the Rachford-Rice equation for the vapor molar fraction in
+    [0, 1], newton iteration with bisection safeguard in the
+    Leibovici-Neoschil window, where the liquid and vapor molar fractions
+    are both positive
+    Output:
+        beta: vapor molar fraction, 0 or 1 for a single phase
+        x, y: liquid and vapor molar fractions
+    """
+    f = lambda beta: (z*(K-1)/(1+beta*(K-1))).sum()
+    if f(0) <= 0:
+        beta = 0.
+    elif f(1) >= 0:
+        beta = 1.
+    else:
+        # Leibovici-Neoschil window
+        bmin = max([0.]+[(k*zi-1)/(k-1) for k, zi in zip(K, z) if k > 1])
+        bmax = min([1.]+[(1-zi)/(1-k) for k, zi in zip(K, z) if k < 1])
+        beta = (bmin+bmax)/2
+        for i in range(100):
+            fb = f(beta)
+            if fb > 0:
+                bmin = beta
+            else:
+                bmax = beta
+            dfb = -(z*(K-1)**2/(1+beta*(K-1))**2).sum()
+            new = beta-fb/dfb
+            if not bmin < new < bmax:
+                new = (bmin+bmax)/2
+            if abs(new-beta) < 1e-14:
+                beta = new
+                break
+            beta = new
+    x = z/(1+beta*(K-1))
+    y = K*x
+    return beta, x/x.sum(), y/y.sum()
+
+
 class EoS(object):
     def __init__(self, T, P, mezcla, **kwargs):
         self.T = unidades.Temperature(T)
@@ -92,95 +135,508 @@ class EoS(object):
         self.fraccion = mezcla.fraccion
         self.kwargs = kwargs
 
-    def _Flash(self):
-        """Cálculo de los coeficientes de reparto entre fases, Ref Naji - Conventional and rapid flash claculations"""
-        #Estimación inicial de K mediante correlación wilson Eq 19
-        Ki=[]
-        for i in self.componente:
-            Ki.append(i.Pc/self.P*exp(5.37*(1.+i.f_acent)*(1.-i.Tc/self.T)))
-
-        Rachford=lambda x: sum([zi*(ki-1.)/(1.-x+x*ki) for zi, ki in zip(self.fraccion, Ki)])
-
-        if Rachford(0)>0 and Rachford(1)>0: #x>1, por tanto solo fase vapor
-            xi=self.fraccion
-            yi=self.fraccion
-            x=1.
-        elif Rachford(0)<0 and Rachford(1)<0: #x<0, por tanto solo fase líquida
-            xi=self.fraccion
-            yi=self.fraccion
-            x=0.
+    # Iteration budget of flash calculation, stability test and successive
+    # substitution use each one flashMaxIter iterations as maximum
+    flashMaxIter = 100
+    flashTol = 1e-10
+    # Use the Michelsen stability test to decide the number of phases, else
+    # use the sign of Rachford-Rice equation with the Wilson K values
+    flashStability = True
+
+    def _Wilson(self, T=None, P=None):
+        """Estimación inicial de K mediante correlación wilson
+        T, P: temperature and pressure in atm, default the state values"""
+        if T is None:
+            T = self.T
+        if P is None:
+            P = self.P.atm
+        Pc = array([cmp.Pc.atm for cmp in self.componente], dtype=float)
+        Tc = array([cmp.Tc for cmp in self.componente], dtype=float)
+        w = array([cmp.f_acent for cmp in self.componente], dtype=float)
+        return Pc/P*exp(5.373*(1+w)*(1-Tc/T))
+
+    def _fugPhase(self, xi, liquid):
+        """Logarithm of fugacity coefficients of a phase with composition xi
+        liquid: boolean to use the liquid root, else the vapor root"""
+        if liquid:
+            Z = self.Z[1]
         else:
-            x=0.5
-            while True:
-                xo=x
-                solucion=fsolve(Rachford, x, full_output=True)
-                if solucion[2]!=1:
-                    print solucion
+            Z = self.Z[0]
+        return log(asarray(self._fug(Z, xi), dtype=float))
+
+    def _lnK(self, xi, yi):
+        """Logarithm of K values for the liquid and vapor compositions"""
+        return self._fugPhase(xi, True)-self._fugPhase(yi, False)
+
+    def _stability(self, z, lnphiz, K):
+        """Michelsen tangent plane stability test, with a vapor like and a
+        liquid like trial phases, solved by successive substitution
+        accelerated with the dominant eigenvalue method
+        Input:
+            z: molar fraction of feed
+            lnphiz: fugacity coefficients of feed
+            K: initial K values
+        Output:
+            tm: minimum tangent plane distance, negative for unstable feed
+            K: K values estimation from the trial phase
+            iterations: total number of iterations
+        """
+        d = log(z)+lnphiz
+        tmmin = 0
+        Kmin = K
+        iterations = 0
+        for liquid, W0 in ((False, z*K), (True, z/K)):
+            lnW = log(W0)
+            delta0 = None
+            for i in range(self.flashMaxIter):
+                iterations += 1
+                W = exp(lnW)
+                lnphiW = self._fugPhase(W/W.sum(), liquid)
+                step = d-lnphiW-lnW
+                lnW += step
+                if abs(step).max() < self.flashTol:
                     break
-                else:
-                    x=solucion[0][0]
-
-                    xi=[]
-                    yi=[]
-                    for zi, ki in zip(self.fraccion, Ki):
-                        xi.append(float(zi/(1-x+x*ki)))
-                        yi.append(float(zi*ki/(1-x+x*ki)))
-
-                    tital=self._fug(self.Z[1], xi)
-                    titav=self._fug(self.Z[0], yi)
-                    fiv=[z*t*self.P for z, t in zip(yi, titav)]
-                    fil=[z*t*self.P for z, t in zip(xi, tital)]
-                    #criterio de convergencia Eq 21
-                    if sum([abs(l/v-1) for l, v in zip(fil, fiv)])< 1e-14 and abs(x-xo) < 1e-10:
-                        break
-                    else:
-                        Ki=[l/v for l, v in zip(tital, titav)]
-
-        if x < 0:
-            x = 0
-        elif x > 1:
-            x = 1
-            
-        return x, xi, yi, Ki
-
-
-    def _Bubble_T(self):
-        def f(T):
-            eq=self.__class__(T, self.P.atm, self.mezcla)
-            return sum([k*x for k, x in zip(eq.Ki, self.fraccion)])-1.
 
-        T=fsolve(f, self.T)
-        return unidades.Temperature(T)
-
-    def _Bubble_P(self):
-        def f(P):
-            eq=self.__class__(self.T, P, self.mezcla)
-            return sum([k*x for k, x in zip(eq.Ki, self.fraccion)])-1.
-
-        P=fsolve(f, self.P.atm)
-        return unidades.Pressure(P, "atm")
+                # Trivial solution
+                if ((lnW-log(z))**2).sum() < 1e-6:
+                    break
 
-    def _Dew_T(self):
-        def f(T):
-            eq=self.__class__(T, self.P.atm, self.mezcla)
-            return 1./sum([x/k for k, x in zip(eq.Ki, self.fraccion)])-1.
+                # Dominant eigenvalue acceleration every five iterations
+                if delta0 is not None and i % 5 == 4:
+                    lamb = dot(step, step)/dot(delta0, step)
+                    if 0 < lamb < 1:
+                        lnW += step*lamb/(1-lamb)
+                delta0 = step
+
+            W = exp(lnW)
+            tm = 1+(W*(lnW+lnphiW-d-1)).sum()
+            if ((lnW-log(z))**2).sum() > 1e-6 and tm < tmmin:
+                tmmin = tm
+                w = W/W.sum()
+                if liquid:
+                    Kmin = z/w
+                else:
+                    Kmin = w/z
+        return tmmin, Kmin, iterations
 
-        T=fsolve(f, self.T)
-        return unidades.Temperature(T)
+    def _Flash(self):
+        """Isothermal flash calculation
+        The number of phases is decided with the Michelsen stability test,
+        the two phase solution use successive substitution accelerated with
+        the dominant eigenvalue method, with the Rachford-Rice equation
+        solved in the Leibovici-Neoschil window
+        Output:
+            x: vapor molar fraction
+            xi, yi: liquid and vapor molar fractions
+            Ki: equilibrium constants
+        The convergence diagnostic is saved in flashInfo dict:
+            stable: boolean if the feed is a single phase
+            tm: tangent plane distance of stability test
+            iterations: number of iterations used
+            error: maximum error in logarithm of K at exit
+            converged: boolean if the iteration converged
+        """
+        z = array(self.fraccion, dtype=float)
+        # Avoid log of zero for absent components
+        z[z <= 0] = 1e-300
+        K = self._Wilson()
+        self.flashInfo = info = {"stable": True, "tm": None, "iterations": 0,
+                                 "error": 0., "converged": True}
+
+        # Phase of feed if it's stable, the root with lower Gibbs energy
+        beta = rachfordRice(z, K)[0]
+        liquid = beta < 0.5
+        if self.flashStability:
+            lnphiV = self._fugPhase(z, False)
+            lnphiL = self._fugPhase(z, True)
+            if abs(lnphiV-lnphiL).max() > 1e-10:
+                liquid = dot(z, lnphiL) < dot(z, lnphiV)
+            if liquid:
+                lnphiz = lnphiL
+            else:
+                lnphiz = lnphiV
 
-    def _Dew_P(self):
-        def f(P):
-            eq=self.__class__(self.T, P, self.mezcla)
-            return sum([x/k for k, x in zip(eq.Ki, self.fraccion)])-1.
+            if len(z) > 1:
+                tm, K, iterations = self._stability(z, lnphiz, K)
+                info["tm"] = tm
+                info["iterations"] = iterations
+                info["stable"] = tm > -self.flashTol
+        else:
+            info["stable"] = beta <= 0 or beta >= 1
+
+        if not info["stable"]:
+            # Successive substitution
+            lnK = log(K)
+            delta0 = None
+            for i in range(self.flashMaxIter):
+                info["iterations"] += 1
+                beta, xi, yi = rachfordRice(z, exp(lnK))
+                step = self._lnK(xi, yi)-lnK
+                lnK += step
+                info["error"] = abs(step).max()
+                if info["error"] < self.flashTol:
+                    break
 
-        P=fsolve(f, self.P.atm)
-        return unidades.Pressure(P, "atm")
+                # Trivial solution
+                if (lnK**2).sum() < 1e-8:
+                    break
 
+                if delta0 is not None and i % 5 == 4:
+                    lamb = dot(step, step)/dot(delta0, step)
+                    if 0 < lamb < 1:
+                        lnK += step*lamb/(1-lamb)
+                delta0 = step
+            else:
+                info["converged"] = False
+                logging.warning("Flash not converged, error %g" % info["error"])
+
+            K = exp(lnK)
+            beta, xi, yi = rachfordRice(z, K)
+            if (lnK**2).sum() < 1e-8 or not 0 < beta < 1:
+                info["stable"] = True
+                liquid = beta <= 0
+
+        if info["stable"]:
+            xi = yi = array(self.fraccion, dtype=float)
+            if liquid:
+                beta = 0.
+            else:
+                beta = 1.
+
+        return float(beta), xi.tolist(), yi.tolist(), K.tolist()
+
+    def _lnphiTP(self, x, T, P):
+        """Logarithm of fugacity coefficients of the root with lower Gibbs
+        energy for arrays of compositions and conditions, used in the
+        saturation and phase envelope calculation
+        Input:
+            x: molar fraction, array with shape (m, n)
+            T: temperature, K, array with shape (m,)
+            P: pressure, atm, array with shape (m,)
+        The generic version create a new instance for each condition, the
+        equations with a vectorized core must overwrite it"""
+        lnphi = []
+        for xi, Ti, Pi in zip(x, T, P):
+            eq = self.__class__(Ti, Pi, self.mezcla)
+            lnphiV = eq._fugPhase(xi, False)
+            lnphiL = eq._fugPhase(xi, True)
+            if dot(xi, lnphiL) < dot(xi, lnphiV):
+                lnphi.append(lnphiL)
+            else:
+                lnphi.append(lnphiV)
+        return array(lnphi)
+
+    def _satEquations(self, z, beta, X, jacobian=False):
+        """Equations of a saturation point with the incipient phase in
+        equilibrium with the feed, Michelsen formulation
+        Input:
+            z: molar fraction of feed
+            beta: 0 for bubble point, 1 for dew point
+            X: variables, [lnK1...lnKn, lnT, lnP]
+            jacobian: boolean to calculate the jacobian by finite
+                differences, all the perturbed points are evaluated in a
+                single call
+        Output:
+            g: residual of the n+1 equations
+            J: jacobian, shape (n+1, n+2)
+        """
+        n = len(z)
+        h = 1e-7
+        if jacobian:
+            Xs = X+vstack([zeros(n+2), eye(n+2)*h])
+        else:
+            Xs = X[newaxis]
+        K = exp(Xs[:, :n])
+        T = exp(Xs[:, n])
+        P = exp(Xs[:, n+1])
+        if beta:
+            y = z*ones_like(K)
+            x = z/K
+        else:
+            x = z*ones_like(K)
+            y = z*K
+        F = (y-x).sum(-1)
+        x = x/x.sum(-1)[:, newaxis]
+        y = y/y.sum(-1)[:, newaxis]
+        g = Xs[:, :n]+self._lnphiTP(y, T, P)-self._lnphiTP(x, T, P)
+        G = column_stack([g, F])
+        if jacobian:
+            return G[0], ((G[1:]-G[0])/h).T
+        return G[0]
+
+    def _satNewton(self, z, beta, X, spec, S):
+        """Newton solution of saturation equations with a specified variable
+        Input:
+            z, beta: feed and kind of saturation point, see _satEquations
+            X: initial values of variables
+            spec: index of specified variable
+            S: value of specified variable
+        Output:
+            X: variables at solution
+            J: complete jacobian with the specification row
+            iterations: number of iterations, None if not converged or the
+                jacobian is singular
+        """
+        X = X.copy()
+        X[spec] = S
+        e = zeros(len(X))
+        e[spec] = 1
+        for i in range(self.flashMaxIter):
+            g, J = self._satEquations(z, beta, X, jacobian=True)
+            J = vstack([J, e])
+            try:
+                dX = solve(J, -r_[g, 0])
+            except LinAlgError:
+                return X, J, None
+
+            # Limit the step to keep the newton method inside convergence
+            # region
+            factor = abs(dX).max()/0.5
+            if factor > 1:
+                dX /= factor
+            X += dX
+            if abs(dX).max() < 1e-9:
+                return X, J, i+1
+        return X, J, None
+
+    def _satInitial(self, z, beta, T=None, P=None):
+        """Initial values of saturation point from Wilson correlation, one
+        of T or P must be specified, the other is calculated"""
+        Tc = array([cmp.Tc for cmp in self.componente], dtype=float)
+        w = array([cmp.f_acent for cmp in self.componente], dtype=float)
+        if beta:
+            sign = -1
+        else:
+            sign = 1
 
+        if P is None:
+            K = self._Wilson(T, 1.)
+            if beta:
+                P = 1/(z/K).sum()
+            else:
+                P = (z*K).sum()
+        else:
+            # Newton iteration in 1/T of ln Σz·K^±1 = 0
+            T = (z*Tc).sum()
+            for i in range(50):
+                K = self._Wilson(T, P)**sign
+                f = log((z*K).sum())
+                df = -sign*(z*K*5.373*(1+w)*Tc).sum()/(z*K).sum()
+                invT = 1./T-f/df
+                T = 1/invT
+                if abs(f) < 1e-10:
+                    break
+        return r_[log(self._Wilson(T, P)), log(T), log(P)]
+
+    def _saturation(self, beta, T=None, P=None):
+        """Calculate a saturation point, bubble with beta=0, dew with
+        beta=1, at fixed T or fixed P
+        Output:
+            T, P: temperature and pressure in atm of saturation point, None
+                if the newton method don't converge or converge to the
+                trivial solution, K=1
+        """
+        z = array(self.fraccion, dtype=float)
+        z[z <= 0] = 1e-300
+        n = len(z)
+        X0 = self._satInitial(z, beta, T, P)
+        if T is None:
+            spec = n+1
+            S = log(P)
+        else:
+            spec = n
+            S = log(T)
+        X, J, iterations = self._satNewton(z, beta, X0, spec, S)
+        if iterations is None:
+            logging.warning("Saturation point not converged")
+            return None
+        if abs(X[:n]).max() < 1e-4:
+            logging.warning("Saturation point converged to trivial solution")
+            return None
+        return exp(X[n]), exp(X[n+1])
 
+    def _Bubble_T(self):
+        """Bubble temperature at the pressure of eos, None if it can't be
+        calculated"""
+        sat = self._saturation(0, P=self.P.atm)
+        if sat is not None:
+            return unidades.Temperature(sat[0])
 
+    def _Bubble_P(self):
+        """Bubble pressure at the temperature of eos, None if it can't be
+        calculated"""
+        sat = self._saturation(0, T=self.T)
+        if sat is not None:
+            return unidades.Pressure(sat[1], "atm")
 
+    def _Dew_T(self):
+        """Dew temperature at the pressure of eos, None if it can't be
+        calculated"""
+        sat = self._saturation(1, P=self.P.atm)
+        if sat is not None:
+            return unidades.Temperature(sat[0])
 
+    def _Dew_P(self):
+        """Dew pressure at the temperature of eos, None if it can't be
+        calculated"""
+        sat = self._saturation(1, T=self.T)
+        if sat is not None:
+            return unidades.Pressure(sat[1], "atm")
+
+    def _Envelope(self, Pmin=0.5, Pmax=1000., maxPoints=200):
+        """Phase envelope of mixture, traced with the Michelsen continuation
+        method from the dew point at low pressure, through the critical
+        point, to the bubble point at low pressure
+        Input:
+            Pmin: pressure of first and last point, atm
+            Pmax: maximum pressure, stop the bubble branch of mixtures
+                with light components whose pressure rise at low temperature
+            maxPoints: maximum number of points calculated
+        Output:
+            PhaseEnvelope instance
+        """
+        z = array(self.fraccion, dtype=float)
+        z[z <= 0] = 1e-300
+        n = len(z)
+
+        X0 = self._satInitial(z, 1, P=Pmin)
+        X, J, iterations = self._satNewton(z, 1, X0, n+1, log(Pmin))
+        if iterations is None:
+            logging.warning("Phase envelope initial point not converged")
+            return PhaseEnvelope([], [], [], None)
+
+        points = [X]
+        critical = None
+        dS = 0.1
+        # Start with increasing pressure
+        dXold = zeros(n+2)
+        dXold[n+1] = 1
+        while len(points) < maxPoints:
+            # Sensitivity of variables following the previous direction,
+            # and specified variable as the one with greater change
+            dXdS = solve(J, r_[zeros(n+1), 1])
+            if dot(dXdS, dXold) < 0:
+                dXdS = -dXdS
+            spec = abs(dXdS).argmax()
+            dXdS /= abs(dXdS[spec])
+            dX = dXdS*dS
+
+            # Cross the critical point with a symmetric step in lnK
+            if spec < n and X[spec]*(X[spec]+dX[spec]) < 0:
+                dX = dXdS*abs(2*X[spec])
+
+            # Reject the solutions far from the predicted point too, near
+            # the critical point the newton method can go to spurious
+            # solutions
+            Xnew, Jnew, iterations = self._satNewton(
+                z, 1, X+dX, spec, X[spec]+dX[spec])
+            if iterations is None or abs(Xnew[:n]).max() < 1e-4 or \
+                    abs(Xnew-X-dX).max() > abs(dX).max():
+                dS /= 2
+                if dS < 1e-4:
+                    logging.warning("Phase envelope tracing stopped")
+                    break
+                continue
+
+            if (Xnew[:n]*X[:n]).sum() < 0:
+                # Critical point by linear interpolation in lnK
+                k = abs(X[:n]-Xnew[:n]).argmax()
+                t = X[k]/(X[k]-Xnew[k])
+                Xc = X+t*(Xnew-X)
+                critical = (exp(Xc[n]), exp(Xc[n+1]))
+                points.append(Xc)
+
+            dXold = Xnew-X
+            X, J = Xnew, Jnew
+            points.append(X)
+
+            # Step size control by newton iterations
+            if iterations < 4:
+                dS = min(dS*1.5, 0.3)
+            elif iterations > 6:
+                dS /= 2
+            if X[n+1] < log(Pmin) or X[n+1] > log(Pmax):
+                break
+
+        points = array(points)
+        T = exp(points[:, n])
+        P = exp(points[:, n+1])
+        lnK = points[:, :n]
+        return PhaseEnvelope(T, P, lnK, critical)
+
+
+class PhaseEnvelope(object):
+    """Phase envelope of a mixture
+        T: array of temperatures, K
+        P: array of pressures, atm
+        lnK: array of logarithm of K values, y/x of incipient phase
+        critical: tuple with temperature and pressure of critical point, None
+            if it isn't found
+    The points before critical point are dew points and the points after
+    are bubble points"""
+    def __init__(self, T, P, lnK, critical):
+        self.T = array(T, dtype=float)
+        self.P = array(P, dtype=float)
+        self.lnK = array(lnK, dtype=float)
+        self.critical = critical
+
+        if critical is None:
+            self.ncritical = len(self.T)
+        else:
+            self.ncritical = list(self.T).index(critical[0])
+
+    @property
+    def dew(self):
+        """Temperatures and pressures of dew point branch"""
+        return self.T[:self.ncritical+1], self.P[:self.ncritical+1]
+
+    @property
+    def bubble(self):
+        """Temperatures and pressures of bubble point branch"""
+        return self.T[self.ncritical:], self.P[self.ncritical:]
+
+    @property
+    def cricondenbar(self):
+        """Maximum pressure of two phase region"""
+        i = self.P.argmax()
+        return self.T[i], self.P[i]
+
+    @property
+    def cricondentherm(self):
+        """Maximum temperature of two phase region"""
+        i = self.T.argmax()
+        return self.T[i], self.P[i]
+
+    def _interpolate(self, x, y, value):
+        """Values of y where the envelope cross x=value, linear interpolation
+        in logarithm of pressure"""
+        values = []
+        for i in range(len(x)-1):
+            if (x[i]-value)*(x[i+1]-value) <= 0 and x[i] != x[i+1]:
+                t = (value-x[i])/(x[i+1]-x[i])
+                values.append(y[i]+t*(y[i+1]-y[i]))
+        return values
+
+    def P_T(self, T):
+        """Saturation pressures at temperature T, atm, a list because in
+        retrograde region there are two values"""
+        lnP = self._interpolate(self.T, log(self.P), T)
+        return [float(exp(p)) for p in lnP]
+
+    def T_P(self, P):
+        """Saturation temperatures at pressure P, atm"""
+        return [float(t) for t in self._interpolate(log(self.P), self.T,
+                                                    log(P))]
+
+    def plot(self, ax, **kwargs):
+        """Plot the phase envelope in a matplotlib axes, with the critical
+        point marked"""
+        T, P = self.dew
+        ax.plot(T, P, label="Dew", **kwargs)
+        T, P = self.bubble
+        ax.plot(T, P, label="Bubble", **kwargs)
+        if self.critical:
+            ax.plot([self.critical[0]], [self.critical[1]], "ko")
 
 
 def PT_lib(compuesto, T):
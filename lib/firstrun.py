@@ -255,6 +255,7 @@ def config():
     config.set("Thermo", "freesteam", "False")
     config.set("Thermo", "coolProp", "False")
     config.set("Thermo", "refprop", "False")
+    config.set("Thermo", "tabulated", "False")
 
     # Transport
     config.add_section("Transport")
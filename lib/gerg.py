@@ -13,26 +13,800 @@
 # TODO: Not implemented gas-liquid equilibrium yet
 
 import cPickle
+import logging
 import os
 
-from scipy import exp, log, zeros, r_
-from scipy.constants import R
+from scipy import exp, log, zeros
 from scipy.optimize import fsolve
+from numpy import (array, asarray, bincount, cosh, diag, dot, errstate, eye,
+                   newaxis, outer, r_, sinh, tanh, where)
+from numpy.linalg import LinAlgError, solve
+from numpy import abs as abs_a
+from numpy import log as log_a
 
 import unidades
+from eos import EoS, rachfordRice
 from physics import R_atml
 from lib import mEoS
 from lib.config import Fluid
+from lib.meos import HelmholtzResidual
 
 Tref = 298.15
 Pref = 101325.
+R = 8.314472  # J/molK, value used in GERG-2008
 # so=0
 # ho=0
 
 
+class GERGMixture(object):
+    """Compiled GERG-2008 model for a set of components
+
+    The coefficients of the 21 pure component equations, the reducing
+    functions parameters and the binary departure functions are packed in
+    contiguous arrays only once, and each components set take a slice of
+    them, so the evaluation of the mixture Helmholtz free energy and its
+    composition derivatives don't need python loops
+
+    componente: list with index of components in GERG.componentes
+
+    >>> mix = GERGMixture.compile([0, 1])
+    >>> Tr, rhor, dTr, drhor = mix.reducing([0.9, 0.1])
+    >>> print "%0.4f %0.4f" % (Tr, rhor)
+    182.9950 10.2099
+    """
+    _data = None
+    _cache = {}
+
+    @classmethod
+    def compile(cls, componente):
+        """Return the compiled model for the components, reusing it if the
+        components set has been already used"""
+        key = tuple(componente)
+        mixture = cls._cache.get(key)
+        if mixture is None:
+            mixture = cls(key)
+            cls._cache[key] = mixture
+        return mixture
+
+    @classmethod
+    def _load(cls):
+        """Pack the coefficients of all GERG components and binary
+        departure functions, done only once"""
+        if cls._data is not None:
+            return cls._data
+
+        n = len(GERG.componentes)
+        data = {"Tc": [], "rhoc": [], "M": [], "Pc": [], "w": []}
+
+        # Ideal gas part, hyperbolic terms as sinh, cosh, sinh, cosh
+        for key in ("log", "factor"):
+            data[key] = []
+        data["n1"] = zeros(n)
+        data["n2"] = zeros(n)
+        data["ahyp"] = zeros((n, 4))
+        data["hyp"] = zeros((n, 4))+1
+
+        # Pure component residual terms, polinomial terms are saved as
+        # exponential terms with gamma=0
+        terms = {"owner": [], "n": [], "d": [], "t": [], "c": [], "g": []}
+        for i, componente in enumerate(GERG.componentes):
+            # Reducing constants of GERG-2008, Table A3.5, not the values
+            # of reference equation of component
+            constants = componente.GERG
+            data["M"].append(constants["M"])
+            data["Tc"].append(constants["Tc"])
+            data["rhoc"].append(constants["rhoc"])
+            data["Pc"].append(componente.Pc.kPa)
+            data["w"].append(componente.f_acent)
+
+            cp = constants["cp"]
+            data["log"].append(cp["ao_log"][1])
+            for t, a in zip(cp["pow"], cp["ao_pow"]):
+                data["n%i" % (t+1)][i] = a
+            data["factor"].append(cp.get("R", constants["R"])/constants["R"])
+            for j, (a, hyp) in enumerate(zip(cp["ao_hyp"], cp["hyp"])):
+                if a:
+                    data["ahyp"][i, j] = a
+                    data["hyp"][i, j] = hyp
+
+            nr1, d1, t1 = HelmholtzResidual._pack(constants, "nr1", "d1", "t1")
+            nr2, d2, t2, c2, g2 = HelmholtzResidual._pack(
+                constants, "nr2", "d2", "t2", "c2", "gamma2")
+            terms["owner"] += [i]*(len(nr1)+len(nr2))
+            terms["n"] += list(nr1)+list(nr2)
+            terms["d"] += list(d1)+list(d2)
+            terms["t"] += list(t1)+list(t2)
+            terms["c"] += [0]*len(nr1)+list(c2)
+            terms["g"] += [0]*len(nr1)+list(g2)
+        data["pure"] = dict([(k, array(v)) for k, v in terms.iteritems()])
+
+        # Binary departure functions, polinomial terms are saved as
+        # exponential terms with eta=beta=0
+        terms = {"i": [], "j": [], "n": [], "d": [], "t": [], "eta": [],
+                 "epsilon": [], "beta": [], "gamma": []}
+        for txt, constants in GERG.fir_ij.iteritems():
+            i, j = [int(x) for x in txt.split("-")]
+            nr1, d1, t1 = HelmholtzResidual._pack(constants, "nr1", "d1", "t1")
+            nr2 = constants["nr2"]
+            if nr2:
+                nr2, d2, t2, n2, e2, b2, g2 = HelmholtzResidual._pack(
+                    constants, "nr2", "d2", "t2", "n2", "e2", "b2", "g2")
+            else:
+                d2 = t2 = n2 = e2 = b2 = g2 = []
+            terms["i"] += [i]*(len(nr1)+len(nr2))
+            terms["j"] += [j]*(len(nr1)+len(nr2))
+            terms["n"] += list(nr1)+list(nr2)
+            terms["d"] += list(d1)+list(d2)
+            terms["t"] += list(t1)+list(t2)
+            terms["eta"] += [0]*len(nr1)+list(n2)
+            terms["epsilon"] += [0]*len(nr1)+list(e2)
+            terms["beta"] += [0]*len(nr1)+list(b2)
+            terms["gamma"] += [0]*len(nr1)+list(g2)
+        data["binary"] = dict([(k, array(v)) for k, v in terms.iteritems()])
+
+        for key in ("Tc", "rhoc", "M", "Pc", "w", "log", "factor"):
+            data[key] = array(data[key], dtype=float)
+        data["Fij"] = array(GERG.Fij, dtype=float)
+        for key in ("beta_t", "gamma_t", "beta_v", "gamma_v"):
+            value = zeros((n, n))
+            for i, row in enumerate(GERG.Prop_c[key]):
+                value[i, :len(row)] = row
+            data[key] = value
+        cls._data = data
+        return data
+
+    def __init__(self, componente):
+        data = self._load()
+        self.componente = componente
+        ids = array(componente, dtype=int)
+        n = len(ids)
+        self.Tc = data["Tc"][ids]
+        self.rhoc = data["rhoc"][ids]
+        self.M = data["M"][ids]
+        self.Pc = data["Pc"][ids]
+        self.w = data["w"][ids]
+
+        self.log = data["log"][ids]
+        self.n1 = data["n1"][ids]
+        self.n2 = data["n2"][ids]
+        self.factor = data["factor"][ids]
+        self.ahyp = data["ahyp"][ids]
+        self.hyp = data["hyp"][ids]
+
+        # Pure component terms, with the matrix to sum the terms of each
+        # component
+        position = dict([(id, i) for i, id in enumerate(componente)])
+        pure = data["pure"]
+        index = [k for k, owner in enumerate(pure["owner"])
+                 if owner in position]
+        for key in ("n", "d", "t", "c", "g"):
+            setattr(self, key+"_o", pure[key][index])
+        self.W_o = zeros((len(index), n))
+        for k, owner in enumerate(pure["owner"][index]):
+            self.W_o[k, position[owner]] = 1
+        self.dd_o = self.d_o*(self.d_o-1)
+        self.tt_o = self.t_o*(self.t_o-1)
+        self.gc_o = self.g_o*self.c_o
+
+        # Reducing functions parameters for all pairs, the tables are
+        # defined for i<j in GERG order
+        pairs = [(a, b) for a in range(n) for b in range(n)
+                 if ids[a] < ids[b]]
+        self.pa = array([a for a, b in pairs], dtype=int)
+        self.pb = array([b for a, b in pairs], dtype=int)
+        ia = ids[self.pa]
+        ib = ids[self.pb]
+        self.bt2 = data["beta_t"][ia, ib]**2
+        self.bv2 = data["beta_v"][ia, ib]**2
+        self.cT = 2*data["beta_t"][ia, ib]*data["gamma_t"][ia, ib] * \
+            (self.Tc[self.pa]*self.Tc[self.pb])**0.5
+        self.cv = 2*data["beta_v"][ia, ib]*data["gamma_v"][ia, ib]/8 * \
+            (self.rhoc[self.pa]**(-1./3)+self.rhoc[self.pb]**(-1./3))**3
+        self.F = data["Fij"][ia, ib]
+
+        # Departure functions terms of pairs with F!=0
+        binary = data["binary"]
+        pair = dict([((ia[k], ib[k]), k) for k in range(len(pairs))
+                     if self.F[k]])
+        index = [k for k, (i, j) in enumerate(zip(binary["i"], binary["j"]))
+                 if (i, j) in pair]
+        for key in ("n", "d", "t", "eta", "epsilon", "beta", "gamma"):
+            setattr(self, key+"_ij", binary[key][index])
+        self.W_ij = zeros((len(index), len(pairs)))
+        for k, (i, j) in enumerate(zip(binary["i"][index],
+                                       binary["j"][index])):
+            self.W_ij[k, pair[(i, j)]] = 1
+        self.tt_ij = self.t_ij*(self.t_ij-1)
+
+    def reducing(self, x, hessian=False):
+        """Reducing functions of mixture, eq. 7.9, 7.10 pag.125
+        Input:
+            x: molar fraction
+            hessian: boolean to return too the second composition
+                derivatives
+        Output:
+            Tr: reducing temperature, K
+            rhor: reducing molar density, mol/dm³
+            dTr: composition derivatives of Tr, ∂Tr/∂xi
+            drhor: composition derivatives of rhor, ∂rhor/∂xi
+            d2Tr, d2rhor: ∂²Y/∂xi∂xj matrix, only with hessian
+        """
+        x = asarray(x, dtype=float)
+        n = len(x)
+        xa = x[self.pa]
+        xb = x[self.pb]
+        xab = xa+xb
+
+        Tr = dot(x**2, self.Tc)
+        vr = dot(x**2, 1/self.rhoc)
+        dTr = 2*x*self.Tc
+        dvr = 2*x/self.rhoc
+        d2Tr = diag(2*self.Tc)
+        d2vr = diag(2/self.rhoc)
+        for b2, c, Y, dY, d2Y in ((self.bt2, self.cT, "T", dTr, d2Tr),
+                                  (self.bv2, self.cv, "v", dvr, d2vr)):
+            D = b2*xa+xb
+            null = D == 0
+            D = where(null, 1, D)
+            u = xa*xb*xab
+            ua = 2*xa*xb+xb**2
+            ub = xa**2+2*xa*xb
+            f = where(null, 0, u/D)
+            dfa = where(null, 0, ua/D-u*b2/D**2)
+            dfb = where(null, 0, ub/D-u/D**2)
+            if Y == "T":
+                Tr += dot(c, f)
+            else:
+                vr += dot(c, f)
+            dY += bincount(self.pa, c*dfa, n)+bincount(self.pb, c*dfb, n)
+
+            if hessian:
+                dfaa = where(null, 0, 2*xb/D-2*ua*b2/D**2+2*u*b2**2/D**3)
+                dfbb = where(null, 0, 2*xa/D-2*ub/D**2+2*u/D**3)
+                dfab = where(null, 0, 2*xab/D-ua/D**2-ub*b2/D**2 +
+                             2*u*b2/D**3)
+                d2Y += diag(bincount(self.pa, c*dfaa, n) +
+                            bincount(self.pb, c*dfbb, n))
+                d2Y[self.pa, self.pb] += c*dfab
+                d2Y[self.pb, self.pa] += c*dfab
+
+        rhor = 1/vr
+        drhor = -rhor**2*dvr
+        if not hessian:
+            return Tr, rhor, dTr, drhor
+        d2rhor = 2*rhor**3*outer(dvr, dvr)-rhor**2*d2vr
+        return Tr, rhor, dTr, drhor, d2Tr, d2rhor
+
+    def phi0(self, x, tau, delta, Tr, rhor):
+        """Ideal gas Helmholtz free energy and its derivatives, eq. 7.5
+        Input:
+            x: molar fraction
+            tau, delta: mixture reduced variables, Tr/T and rho/rhor
+            Tr, rhor: reducing temperature and molar density
+        Output:
+            fio, fiot, fiott, fiod, fiodd, fiodt, fioi
+                fioi: ideal free energy of each component in mixture
+        """
+        x = asarray(x, dtype=float)
+        taui = self.Tc*tau/Tr
+        deltai = delta*rhor/self.rhoc
+
+        # tau·dfi/dtau and tau²·d²fi/dtau² are invariant with the reducing
+        # temperature, so the mixture derivatives sum directly
+        a = self.ahyp
+        th = self.hyp*taui[:, newaxis]
+        fio = self.n1+self.n2*taui+self.log*log_a(taui)
+        fio += a[:, 0]*log_a(abs_a(sinh(th[:, 0])))
+        fio -= a[:, 1]*log_a(cosh(th[:, 1]))
+        fio += a[:, 2]*log_a(abs_a(sinh(th[:, 2])))
+        fio -= a[:, 3]*log_a(cosh(th[:, 3]))
+        tfiot = self.n2*taui+self.log
+        tfiot += a[:, 0]*th[:, 0]/tanh(th[:, 0])
+        tfiot -= a[:, 1]*th[:, 1]*tanh(th[:, 1])
+        tfiot += a[:, 2]*th[:, 2]/tanh(th[:, 2])
+        tfiot -= a[:, 3]*th[:, 3]*tanh(th[:, 3])
+        t2fiott = -self.log
+        t2fiott -= a[:, 0]*th[:, 0]**2/sinh(th[:, 0])**2
+        t2fiott -= a[:, 1]*th[:, 1]**2/cosh(th[:, 1])**2
+        t2fiott -= a[:, 2]*th[:, 2]**2/sinh(th[:, 2])**2
+        t2fiott -= a[:, 3]*th[:, 3]**2/cosh(th[:, 3])**2
+
+        fioi = log_a(deltai)+self.factor*fio
+        with errstate(all="ignore"):
+            xlogx = where(x > 0, x*log_a(x), 0)
+        fio = dot(x, fioi)+xlogx.sum()
+        fiot = dot(x, self.factor*tfiot)/tau
+        fiott = dot(x, self.factor*t2fiott)/tau**2
+        return fio, fiot, fiott, 1/delta, -1/delta**2, 0, fioi
+
+    def _terms(self, tau, delta):
+        """Residual Helmholtz free energy of each pure component and binary
+        departure function
+        Output:
+            pure, binary: tuples with the arrays with values for each
+                component or pair, (f, ft, ftt, fd, fdd, fdt, fdtt)
+        """
+        dc = delta**self.c_o
+        term = self.n_o*delta**self.d_o*tau**self.t_o*exp(-self.g_o*dc)
+        fd = self.d_o-self.gc_o*dc
+        termd = term*fd
+        tt, tt1 = self.t_o, self.tt_o
+        pure = (dot(term, self.W_o),
+                dot(term*tt, self.W_o)/tau,
+                dot(term*tt1, self.W_o)/tau**2,
+                dot(termd, self.W_o)/delta,
+                dot(term*(fd**2-self.d_o-self.gc_o*(self.c_o-1)*dc),
+                    self.W_o)/delta**2,
+                dot(termd*tt, self.W_o)/delta/tau,
+                dot(termd*tt1, self.W_o)/delta/tau**2)
+
+        # Departure functions, eq 7.8
+        eta, beta = self.eta_ij, self.beta_ij
+        term = self.n_ij*delta**self.d_ij*tau**self.t_ij*exp(
+            -eta*(delta-self.epsilon_ij)**2-beta*(delta-self.gamma_ij))
+        fd = self.d_ij-2*eta*delta*(delta-self.epsilon_ij)-beta*delta
+        termd = term*fd
+        tt, tt1 = self.t_ij, self.tt_ij
+        binary = (dot(term, self.W_ij),
+                  dot(term*tt, self.W_ij)/tau,
+                  dot(term*tt1, self.W_ij)/tau**2,
+                  dot(termd, self.W_ij)/delta,
+                  dot(term*(fd**2-self.d_ij-2*eta*delta**2),
+                      self.W_ij)/delta**2,
+                  dot(termd*tt, self.W_ij)/delta/tau,
+                  dot(termd*tt1, self.W_ij)/delta/tau**2)
+        return pure, binary
+
+    def phir(self, x, tau, delta):
+        """Residual Helmholtz free energy and its derivatives, eq. 7.7
+        Input:
+            x: molar fraction
+            tau, delta: mixture reduced variables, Tr/T and rho/rhor
+        Output:
+            fir, firt, firtt, fird, firdd, firdt, firdtt, firxi
+                firxi: composition derivatives, ∂fir/∂xi
+        """
+        x = asarray(x, dtype=float)
+        n = len(x)
+        pure, binary = self._terms(tau, delta)
+        xa = x[self.pa]
+        xb = x[self.pb]
+        weight = xa*xb*self.F
+        fir = [dot(x, a)+dot(weight, b) for a, b in zip(pure, binary)]
+        fij = self.F*binary[0]
+        firxi = pure[0]+bincount(self.pa, xb*fij, n) + \
+            bincount(self.pb, xa*fij, n)
+        return tuple(fir)+(firxi, )
+
+    def phirx(self, x, tau, delta):
+        """Composition derivatives of the residual Helmholtz free energy
+        Output:
+            firxi, firdxi, firtxi: ∂fir/∂xi, ∂²fir/∂xi∂delta, ∂²fir/∂xi∂tau
+            firxixj: ∂²fir/∂xi∂xj matrix
+        """
+        x = asarray(x, dtype=float)
+        n = len(x)
+        pure, binary = self._terms(tau, delta)
+        xa = x[self.pa]
+        xb = x[self.pb]
+        derivatives = []
+        for k in (0, 3, 1):
+            fij = self.F*binary[k]
+            derivatives.append(pure[k]+bincount(self.pa, xb*fij, n) +
+                               bincount(self.pb, xa*fij, n))
+        firxixj = zeros((n, n))
+        firxixj[self.pa, self.pb] = self.F*binary[0]
+        firxixj[self.pb, self.pa] = self.F*binary[0]
+        return tuple(derivatives)+(firxixj, )
+
+    def nfirni(self, x, tau, delta, fir, firt, fird, firxi, dTr, drhor,
+               Tr, rhor):
+        """Composition derivatives of the residual Helmholtz free energy
+        at constant T, V, eq. 7.29
+        Output:
+            ∂(n·fir)/∂ni for each component
+        """
+        x = asarray(x, dtype=float)
+        n_rhorni = drhor-dot(x, drhor)
+        n_Trni = dTr-dot(x, dTr)
+        n_firni = delta*fird*(1-n_rhorni/rhor)+tau*firt*n_Trni/Tr + \
+            firxi-dot(x, firxi)
+        return fir+n_firni
+
+    def density(self, x, T, P, liquid=False, rho0=None):
+        """Molar density for input T and P, newton iteration in log(rho)
+        with the analytic pressure derivative, the vapor root is searched
+        from ideal gas density and the liquid root from a dense state
+        Input:
+            x: molar fraction
+            T: temperature, K
+            P: pressure, kPa
+            liquid: boolean to search the liquid root
+            rho0: initial value of density, optional
+        Output:
+            rho: molar density, mol/dm³
+        """
+        Tr, rhor = self.reducing(x)[:2]
+        tau = Tr/T
+        RT = R*T
+        if rho0 is None:
+            if liquid:
+                rho0 = 3*rhor
+            else:
+                rho0 = P/RT
+        lnrho = log(rho0)
+        maxstep = 0.2
+        step = 0
+        for i in range(100):
+            rho = exp(lnrho)
+            delta = rho/rhor
+            fir = self.phir(x, tau, delta)
+            P2 = rho*RT*(1+delta*fir[3])
+            dpdrho = RT*(1+2*delta*fir[3]+delta**2*fir[4])
+            if liquid:
+                if dpdrho <= 0:
+                    # Inside the spinodal, go to the liquid side
+                    step = 0.1
+                else:
+                    step = min(max((P-P2)/dpdrho/rho, -1), 1)
+            elif dpdrho <= 0:
+                # The vapor iteration can't cross the spinodal, the
+                # equation can have spurious roots inside it, so go back
+                # and reduce the step length
+                if maxstep < 1e-8:
+                    # Vapor branch ended without root, only liquid
+                    return self.density(x, T, P, liquid=True)
+                lnrho -= step
+                maxstep = step/2
+                step = 0
+                continue
+            else:
+                step = min(max((P-P2)/dpdrho/rho, -1), maxstep)
+            lnrho += step
+            if abs(step) < 1e-12:
+                break
+        return exp(lnrho)
+
+    def lnphi(self, x, T, rho, derivatives=False):
+        """Fugacity coefficients of a phase
+        Input:
+            x: molar fraction
+            T: temperature, K
+            rho: molar density, mol/dm³
+            derivatives: boolean to calculate too the composition
+                derivatives
+        Output:
+            lnphi: logarithm of fugacity coefficients
+            Z: compressibility factor
+            dlnphi: n·∂lnφi/∂nj matrix at constant T, P, only with
+                derivatives
+            dlnphidT, dlnphidP: ∂lnφi/∂lnT at constant P and ∂lnφi/∂lnP at
+                constant T, only with derivatives
+        """
+        x = asarray(x, dtype=float)
+        Tr, rhor, dTr, drhor, d2Tr, d2rhor = self.reducing(x, hessian=True)
+        tau = Tr/T
+        delta = rho/rhor
+        fir, firt, firtt, fird, firdd, firdt, firdtt, firxi = self.phir(
+            x, tau, delta)
+        Z = 1+delta*fird
+        lnphi = self.nfirni(x, tau, delta, fir, firt, fird, firxi, dTr,
+                            drhor, Tr, rhor)-log(Z)
+        if not derivatives:
+            return lnphi, Z
+
+        # Derivatives of mixture reduced variables with composition,
+        # n·∂delta/∂ni = delta·r, n·∂tau/∂ni = tau·t
+        firxi, firdxi, firtxi, firxixj = self.phirx(x, tau, delta)
+        Rho = drhor-dot(x, drhor)
+        Ti = dTr-dot(x, dTr)
+        r = 1-Rho/rhor
+        t = Ti/Tr
+        dRho = d2rhor-drhor-dot(x, d2rhor)
+        dr = -dRho/rhor+outer(Rho, drhor)/rhor**2
+        dTi = d2Tr-dTr-dot(x, d2Tr)
+        dt = dTi/Tr-outer(Ti, dTr)/Tr**2
+
+        # B = n·∂fir/∂ni and its derivatives
+        B = delta*r*fird+tau*t*firt+firxi-dot(x, firxi)
+        dBd = r*(fird+delta*firdd)+tau*t*firdt+firdxi-dot(x, firdxi)
+        dBt = delta*r*firdt+t*(firt+tau*firtt)+firtxi-dot(x, firtxi)
+        dBx = delta*fird*dr+delta*outer(r, firdxi)+tau*firt*dt + \
+            tau*outer(t, firtxi)+firxixj-firxi-dot(x, firxixj)
+        dBx -= dot(dBx, x)[:, newaxis]
+        nFij = B+outer(dBd, delta*r)+outer(dBt, tau*t)+dBx
+
+        # Correction to constant pressure, with n·∂P/∂ni/(rho·R·T)
+        Pi = Z+delta*r*(fird+delta*firdd)+delta*tau*t*firdt + \
+            delta*(firdxi-dot(x, firdxi))
+        D = 1+2*delta*fird+delta**2*firdd
+        dlnphi = nFij+1-outer(Pi, Pi)/D
+
+        # Temperature and pressure derivatives from the derivatives at
+        # constant density, ∂lnφi/∂lnT and ∂lnφi/∂lnrho
+        dlnphit = -tau*(firt+dBt-delta*firdt/Z)
+        dlnphid = Pi-D/Z
+        dlnphidT = dlnphit-dlnphid*(Z-delta*tau*firdt)/D
+        dlnphidP = dlnphid*Z/D
+        return lnphi, Z, dlnphi, dlnphidT, dlnphidP
+
+    def wilson(self, T, P):
+        """Wilson correlation for initial K values
+        Input:
+            T: temperature, K
+            P: pressure, kPa
+        """
+        return self.Pc/P*exp(5.373*(1+self.w)*(1-self.Tc/T))
+
+    def phase(self, x, T, P):
+        """Stable density root for a composition
+        Output:
+            rho, lnphi, Z, liquid: boolean if the root is the liquid one
+        """
+        rhoV = self.density(x, T, P)
+        rhoL = self.density(x, T, P, liquid=True)
+        lnphiV, ZV = self.lnphi(x, T, rhoV)
+        if abs(rhoL-rhoV) < 1e-8*rhoV:
+            return rhoV, lnphiV, ZV, rhoV > self.reducing(x)[1]
+        lnphiL, ZL = self.lnphi(x, T, rhoL)
+        if dot(x, lnphiL) < dot(x, lnphiV):
+            return rhoL, lnphiL, ZL, True
+        return rhoV, lnphiV, ZV, False
+
+    def stability(self, z, T, P, lnphiz, K=None):
+        """Michelsen tangent plane stability test, with a vapor like and a
+        liquid like trial phases, solved by successive substitution
+        accelerated with the dominant eigenvalue method
+        Input:
+            z: molar fraction of feed
+            T: temperature, K
+            P: pressure, kPa
+            lnphiz: fugacity coefficients of feed
+            K: initial K values, default from wilson correlation
+        Output:
+            tm: minimum tangent plane distance, negative for unstable feed
+            K: K values estimation from the trial phase
+        """
+        z = asarray(z, dtype=float)
+        if K is None:
+            K = self.wilson(T, P)
+        d = log(z)+lnphiz
+
+        tmmin = 0
+        Kmin = K
+        for liquid, W0 in ((False, z*K), (True, z/K)):
+            lnW = log(W0)
+            delta0 = None
+            for i in range(200):
+                W = exp(lnW)
+                w = W/W.sum()
+                rho = self.density(w, T, P, liquid=liquid)
+                lnphiW = self.lnphi(w, T, rho)[0]
+                step = d-lnphiW-lnW
+                lnW += step
+                error = abs(step).max()
+                if error < 1e-10:
+                    break
+
+                # Trivial solution
+                if ((lnW-log(z))**2).sum() < 1e-6:
+                    break
+
+                # Dominant eigenvalue acceleration every five iterations
+                if delta0 is not None and i % 5 == 4:
+                    lamb = dot(step, step)/dot(delta0, step)
+                    if 0 < lamb < 1:
+                        lnW += step*lamb/(1-lamb)
+                delta0 = step
+
+            W = exp(lnW)
+            tm = 1+(W*(lnW+lnphiW-d-1)).sum()
+            if ((lnW-log(z))**2).sum() > 1e-6 and tm < tmmin:
+                tmmin = tm
+                w = W/W.sum()
+                if liquid:
+                    Kmin = z/w
+                else:
+                    Kmin = w/z
+        return tmmin, Kmin
+
+    def flash(self, z, T, P):
+        """Isothermal flash with stability test
+        The two phase solution use successive substitution accelerated with
+        the dominant eigenvalue method and it switch to a second order
+        minimization of Gibbs energy with the analytic fugacity derivatives
+        when the convergence is slow, as in the critical region
+        Input:
+            z: molar fraction of feed
+            T: temperature, K
+            P: pressure, kPa
+        Output:
+            beta: vapor molar fraction, None for single phase
+            phases: list of tuple with composition, molar density and
+                liquid boolean for each phase, first the liquid phase
+            info: dict with the convergence diagnostic, as EoS.flashInfo
+                stable: boolean if the feed is a single phase
+                tm: tangent plane distance of stability test
+                iterations: number of iterations used
+                error: maximum error in logarithm of K at exit
+                converged: boolean if the iteration converged
+        """
+        z = asarray(z, dtype=float)
+        info = {"stable": True, "tm": None, "iterations": 0, "error": 0.,
+                "converged": True}
+        if len(z) == 1:
+            rho, lnphiz, Z, liquid = self.phase(z, T, P)
+            return None, [(z, rho, liquid)], info
+
+        rho, lnphiz, Z, liquid = self.phase(z, T, P)
+        tm, K = self.stability(z, T, P, lnphiz)
+        info["tm"] = tm
+        if tm > -1e-10:
+            return None, [(z, rho, liquid)], info
+        info["stable"] = False
+
+        # Successive substitution
+        lnK = log(K)
+        delta0 = None
+        newton = False
+        converged = False
+        for i in range(100):
+            info["iterations"] += 1
+            beta, x, y = rachfordRice(z, exp(lnK))
+            rhoL = self.density(x, T, P, liquid=True)
+            rhoV = self.density(y, T, P)
+            lnphiL = self.lnphi(x, T, rhoL)[0]
+            lnphiV = self.lnphi(y, T, rhoV)[0]
+            step = lnphiL-lnphiV-lnK
+            lnK += step
+            error = info["error"] = abs(step).max()
+            if error < 1e-10:
+                converged = True
+                break
+            if (lnK**2).sum() < 1e-4 or (i > 15 and error > 1e-4):
+                newton = True
+                break
+            if delta0 is not None and i % 5 == 4:
+                lamb = dot(step, step)/dot(delta0, step)
+                if 0 < lamb < 1:
+                    lnK += step*lamb/(1-lamb)
+            delta0 = step
+
+        # Second order minimization of Gibbs energy in the vapor moles
+        if newton:
+            beta, x, y = rachfordRice(z, exp(lnK))
+            v = beta*y
+            for i in range(50):
+                info["iterations"] += 1
+                l = z-v
+                V = v.sum()
+                L = 1-V
+                x = l/L
+                y = v/V
+                rhoL = self.density(x, T, P, liquid=True, rho0=rhoL)
+                rhoV = self.density(y, T, P, rho0=rhoV)
+                lnphiL, ZL, dL = self.lnphi(x, T, rhoL, derivatives=True)[:3]
+                lnphiV, ZV, dV = self.lnphi(y, T, rhoV, derivatives=True)[:3]
+                g = log(y)+lnphiV-log(x)-lnphiL
+                info["error"] = abs(g).max()
+                if info["error"] < 1e-10:
+                    converged = True
+                    break
+                H = (diag(1/y)-1+dV)/V+(diag(1/x)-1+dL)/L
+                try:
+                    dv = solve(H, -g)
+                except LinAlgError:
+                    break
+
+                # Keep the moles inside bounds, the iteration stop if the
+                # step can't be reduced to a valid point
+                factor = 1.
+                for k in range(30):
+                    vnew = v+factor*dv
+                    if (vnew > 0).all() and (vnew < z).all():
+                        break
+                    factor /= 2
+                else:
+                    break
+                v = vnew
+            beta = V
+            lnK = log(y/x)
+
+        if not converged:
+            info["converged"] = False
+            logging.warning("GERG flash not converged, error %g" %
+                            info["error"])
+
+        if (lnK**2).sum() < 1e-8 or not 0 < beta < 1:
+            info["stable"] = True
+            return None, [(z, rho, liquid)], info
+
+        # The liquid phase is the denser one
+        if rhoL < rhoV:
+            return 1-beta, [(y, rhoV, True), (x, rhoL, False)], info
+        return beta, [(x, rhoL, True), (y, rhoV, False)], info
+
+
+class GERGSaturation(EoS):
+    """Saturation points and phase envelope of a GERG mixture, it use the
+    generic routines of EoS with the fugacity coefficients of GERG, so T in
+    K and P in atm
+        componente: list with index of components in GERG.componentes
+        fraccion: molar fraction
+    """
+    def __init__(self, T, P, componente, fraccion):
+        self.T = unidades.Temperature(T)
+        self.P = unidades.Pressure(P, "atm")
+        self.componente = [GERG.componentes[i] for i in componente]
+        self.fraccion = fraccion
+        self._mixture = GERGMixture.compile(componente)
+        self._roots = {}
+
+    def _lnphiPhase(self, phase, x, T, P):
+        """Fugacity coefficients of a phase of saturation equations with its
+        derivatives, see GERGMixture.lnphi, P in atm
+        The first evaluation use the root with lower Gibbs energy, then the
+        density root is followed from the previous evaluation of the phase,
+        so an instance is used only for a calculation"""
+        P = P*101.325
+        if phase in self._roots:
+            rho, liquid = self._roots[phase]
+            rho = self._mixture.density(x, T, P, liquid, rho)
+        else:
+            rho, lnphi, Z, liquid = self._mixture.phase(x, T, P)
+        self._roots[phase] = (rho, liquid)
+        return self._mixture.lnphi(x, T, rho, derivatives=True)
+
+    def _satEquations(self, z, beta, X, jacobian=False):
+        """Equations of a saturation point, see EoS._satEquations, with the
+        analytic jacobian from the composition, temperature and pressure
+        derivatives of fugacity coefficients"""
+        n = len(z)
+        K = exp(X[:n])
+        T = exp(X[n])
+        P = exp(X[n+1])
+        if beta:
+            x = z/K
+            y = z
+            dF = x
+        else:
+            x = z
+            y = z*K
+            dF = y
+        F = (y-x).sum()
+        x = x/x.sum()
+        y = y/y.sum()
+        lnphiy, Zy, dy, dTy, dPy = self._lnphiPhase("y", y, T, P)
+        lnphix, Zx, dx, dTx, dPx = self._lnphiPhase("x", x, T, P)
+        G = r_[X[:n]+lnphiy-lnphix, F]
+        if not jacobian:
+            return G
+
+        # The incipient phase composition change with K, ∂ni/∂lnKi=±ni
+        J = zeros((n+1, n+2))
+        if beta:
+            J[:n, :n] = eye(n)+dx*x
+        else:
+            J[:n, :n] = eye(n)+dy*y
+        J[:n, n] = dTy-dTx
+        J[:n, n+1] = dPy-dPx
+        J[n, :n] = dF
+        return G, J
+
+
 class GERG(object):
     """Multiparameter equation of state GERG 2008
-    ref http://dx.doi.org/10.1021/je300655b"""
+    ref http://dx.doi.org/10.1021/je300655b
+
+    Reference point of AGA8 Part 2 for the 21 components natural gas
+
+    >>> x = [0.77824, 0.02, 0.06, 0.08, 0.03, 0.003, 0.0015, 0.00165,
+    ...      0.0005, 0.00215, 0.00088, 0.00024, 0.004, 0.005, 0.002, 0.0001,
+    ...      0.007, 0.001, 0.0025, 0.00015, 0.00009]
+    >>> st = GERG(componente=range(21), fraccion=x, T=400, P=50e6)
+    >>> print "%0.4f %0.5f" % (st.Z, st.M)
+    1.1747 20.54274
+    """
     kwargs = {"componente": [],
               "fraccion": [],
               "T": 0.0,
@@ -275,88 +1049,34 @@ class GERG(object):
         u = self.kwargs["u"]
         x = self.kwargs["x"]
 
-        self.comp = []
-        for i in self.kwargs["componente"]:
-            c = self.componentes[i](eq="GERG", **self.kwargs)
-            self.comp.append(c)
+        # The components are used only by its constants, so the classes are
+        # used without instance it
+        self.comp = [self.componentes[i] for i in self.kwargs["componente"]]
         self.id = self.kwargs["componente"]
         self.xi = self.kwargs["fraccion"]
+        self._mixture = GERGMixture.compile(self.id)
 
         # Critic properties for mixture,
         # eq. 7.9, 7.10 pag.125, Tabla 7.10 pag 136
-        bt = self.Prop_c["beta_t"]
-        bv = self.Prop_c["beta_v"]
-        gt = self.Prop_c["gamma_t"]
-        gv = self.Prop_c["gamma_v"]
-        c_T = zeros((len(self.comp), len(self.comp)))
-        c_rho = zeros((len(self.comp), len(self.comp)))
-        for i, cmpi in enumerate(self.comp):
-            for j, cmpj in enumerate(self.comp):
-                c_T[i, j] = 2*bt[i][j]*gt[i][j]*(cmpi.Tc*cmpj.Tc)**0.5
-                c_rho[i, j] = 2*bv[i][j]*gv[i][j]/8. * \
-                    (1./cmpi.rhoc**(1./3)+1./cmpj.rhoc**(1./3))**3
-
-        f_T = zeros((len(self.comp), len(self.comp)))
-        f_rho = zeros((len(self.comp), len(self.comp)))
-        dFT_ik = zeros((len(self.comp), len(self.comp)))
-        dFT_ki = zeros((len(self.comp), len(self.comp)))
-        dFrho_ik = zeros((len(self.comp), len(self.comp)))
-        dFrho_ki = zeros((len(self.comp), len(self.comp)))
-        for i, x_i in enumerate(self.xi):
-            for j, x_j in enumerate(self.xi):
-                f_T[i, j] = x_i*x_j*(x_i+x_j)/(bt[i][j]**2*x_i+x_j)
-                f_rho[i, j] = x_i*x_j*(x_i+x_j)/(bv[i][j]**2*x_i+x_j)
-                dFT_ik[i, j] = x_j*(x_j+x_i)/(bt[i][j]**2*x_i+x_j) + \
-                    x_j*x_i/(bt[i][j]**2*x_i+x_j) * \
-                    (1-bt[i][j]**2*(x_j+x_i)/(bt[i][j]**2*x_i+x_j))
-                dFrho_ik[i, j] = x_j*(x_j+x_i)/(bv[i][j]**2*x_i+x_j) + \
-                    x_j*x_i/(bv[i][j]**2*x_i+x_j) * \
-                    (1-bv[i][j]**2*(x_j+x_i)/(bv[i][j]**2*x_i+x_j))
-                dFT_ki[j, i] = x_j*(x_j+x_i)/(bt[i][j]**2*x_j+x_i)+x_j*x_i / \
-                    (bt[i][j]**2*x_j+x_i)*(1-(x_j+x_i)/(bt[i][j]**2*x_j+x_i))
-                dFrho_ki[j, i] = x_j*(x_j+x_i)/(bv[i][j]**2*x_j+x_i)+x_j*x_i /\
-                    (bv[i][j]**2*x_j+x_i)*(1-(x_j+x_i)/(bv[i][j]**2*x_j+x_i))
-
-        sumai_v = sumaij_v = sumai_T = sumaij_T = m = 0
-        for i, componentei in enumerate(self.comp):
-            sumai_v += self.xi[i]**2/componentei.rhoc
-            sumai_T += self.xi[i]**2*componentei.Tc
-            m += self.xi[i]*componentei.M
-            for j, componentej in enumerate(self.comp):
-                if j > i:
-                    sumaij_v += c_rho[i, j]*f_rho[i, j]
-                    sumaij_T += c_T[i, j]*f_T[i, j]
-
-        self.rhoc = unidades.Density(1./(sumai_v+sumaij_v))
-        self.Tc = unidades.Temperature(sumai_T+sumaij_T)
-        self.M = m  # g/mol
+        Tr, rhor, self._dTr, self._drhor = self._mixture.reducing(self.xi)
+        self.M = float(dot(self.xi, self._mixture.M))  # g/mol
+        self.rhoc = unidades.Density(rhor*self.M)
+        self.Tc = unidades.Temperature(Tr)
         self.R = unidades.SpecificHeat(R/self.M, "kJkgK")
 
-        Tcxi = rhocxi = []
-        for i, componentei in enumerate(self.comp):
-            sumav1 = sumat1 = 0
-            for k in range(i):
-                sumav1 += c_rho[k, i]*dFrho_ki[k, i]
-                sumat1 += c_T[k, i]*dFT_ki[k, i]
-            sumav2 = sumat2 = 0
-            for k in range(i+1, len(self.xi)):
-                sumav2 += c_rho[i, k]*dFrho_ik[i, k]
-                sumat2 += c_T[i, k]*dFT_ik[i, k]
-
-            Tcxi.append(2*self.xi[i]*componentei.Tc+sumat1+sumat2)
-            rhocxi.append(2*self.xi[i]/componentei.rhoc+sumav1+sumav2)
-        self.Tcxi = Tcxi
-        self.rhocxi = rhocxi
-
         if v and not rho:
             rho = 1./v
 
+        # Convergence diagnostic of isothermal flash, see GERGMixture.flash
+        self.flashInfo = None
+
         if T and x is not None:
             pass
         else:
             if T and P:
-                rhoo = 2.
-                rho = fsolve(lambda rho: self._solve(rho, T)["P"]-P*1e6, rhoo)
+                # Isothermal flash
+                beta, fases, self.flashInfo = self._mixture.flash(
+                    self.xi, T, P/1000.)
             elif T and rho:
                 pass
             elif T and h is not None:
@@ -366,18 +1086,18 @@ class GERG(object):
             elif T and u is not None:
                 rho = fsolve(lambda rho: self._solve(rho, T)["u"]-u, 200)
             elif P and rho:
-                T = fsolve(lambda T: self._solve(rho, T)["P"]-P*1e6, 600)
+                T = fsolve(lambda T: self._solve(rho, T)["P"]-P, 600)
             elif P and h is not None:
                 rho, T = fsolve(lambda par: (
-                    self._solve(par[0], par[1])["P"]-P*1e6, self._solve(
+                    self._solve(par[0], par[1])["P"]-P, self._solve(
                         par[0], par[1])["h"]-h), [200, 600])
             elif P and s is not None:
                 rho, T = fsolve(lambda par: (
-                    self._solve(par[0], par[1])["P"]-P*1e6, self._solve(
+                    self._solve(par[0], par[1])["P"]-P, self._solve(
                         par[0], par[1])["s"]-s), [200, 600])
             elif P and u is not None:
                 rho, T = fsolve(lambda par: (
-                    self._solve(par[0], par[1])["P"]-P*1e6, self._solve(
+                    self._solve(par[0], par[1])["P"]-P, self._solve(
                         par[0], par[1])["u"]-u), [200, 600])
             elif rho and h is not None:
                 T = fsolve(lambda T: self._solve(rho, T)["h"]-h, 600)
@@ -400,42 +1120,129 @@ class GERG(object):
             else:
                 raise IOError
 
-        fio, fiot, fiott, fiod, fiodd, fiodt, fir, firt, firtt, fird, firdd,\
-            firdt, firdtt, nfioni, nfirni = self._eq(rho, T)
-
-        # Tabla 7.1 pag 127
-        tau = self.Tc/T
-        delta = rho/self.rhoc
+        if not (T and P):
+            # The other input options are solved as single phase
+            beta = None
+            rho = float(rho)
+            T = float(T)
+            fases = [(self.xi, rho/self.M, rho > self.rhoc)]
+        estados = [self._properties(xi, rhoi, T) for xi, rhoi, l in fases]
 
         self.T = unidades.Temperature(T)
-        self.rho = unidades.Density(rho)
-        self.v = unidades.SpecificVolume(1./rho)
-        self.P = unidades.Pressure((1+delta*fird)*self.R.JkgK*T*rho)
-        self.Z = 1+delta*fird
-        self.s = unidades.SpecificHeat(self.R.kJkgK*(tau*(fiot+firt)-fio-fir))
-        self.u = unidades.Enthalpy(self.R*T*tau*(fiot+firt))
-        self.h = unidades.Enthalpy(self.R*T*(1+tau*(fiot+firt)+delta*fird))
-        self.cp = unidades.SpecificHeat(self.R*(
-            -tau**2*(fiott+firtt)+(1+delta*fird-delta*tau*firdt)**2 /
-            (1+2*delta*fird+delta**2*firdd)))
-        self.cv = unidades.SpecificHeat(-self.R*tau**2*(fiott+firtt))
-        self.g = unidades.Enthalpy(self.R*T*(1+fio+fir+delta*fird))
-        self.w = unidades.Speed((self.R*T*(
-            1+2*delta*fird+delta**2*firdd-(1+delta*fird-delta*tau*firdt)**2 /
-            tau**2/(fiott+firtt)))**0.5)
+        self.Liquido = Fluid()
+        self.Gas = Fluid()
+        if beta is None:
+            estado = estados[0]
+            if fases[0][2]:
+                x = 0
+                self.fill(self.Liquido, estado)
+            else:
+                x = 1
+                self.fill(self.Gas, estado)
+            self.fill(self, estado)
+            self.P = unidades.Pressure(estado["P"])
+            self.xl = self.xv = estado["fraccion"]
+        else:
+            liquido, vapor = estados
+            self.fill(self.Liquido, liquido)
+            self.fill(self.Gas, vapor)
+            self.P = unidades.Pressure(P)
+            self.xl = liquido["fraccion"]
+            self.xv = vapor["fraccion"]
+
+            # Quality in mass basis
+            x = beta*vapor["M"]/(beta*vapor["M"]+(1-beta)*liquido["M"])
+            self.v = unidades.SpecificVolume(
+                x*self.Gas.v+(1-x)*self.Liquido.v)
+            self.rho = unidades.Density(1./self.v)
+            self.h = unidades.Enthalpy(x*self.Gas.h+(1-x)*self.Liquido.h)
+            self.s = unidades.SpecificHeat(x*self.Gas.s+(1-x)*self.Liquido.s)
+            self.u = unidades.Enthalpy(x*self.Gas.u+(1-x)*self.Liquido.u)
+            self.g = unidades.Enthalpy(x*self.Gas.g+(1-x)*self.Liquido.g)
+            self.Z = unidades.Dimensionless(
+                beta*self.Gas.Z+(1-beta)*self.Liquido.Z)
+        self.x = unidades.Dimensionless(x)
 
-        f, FI = self.fug(rho, T, nfirni)
-        Ki, xi, yi, Q = self.flash()
-        self.x = unidades.Dimensionless(Q)
-        self.xl = xi
-        self.xv = yi
         if self.kwargs["mezcla"]:
             self.Pc = self.kwargs["mezcla"].Pc
-        self.Liquido = Fluid()
-        self.Gas = Fluid()
+
+    def _Envelope(self, Pmin=0.5, Pmax=1000., maxPoints=200):
+        """Phase envelope of mixture, see EoS._Envelope, pressures in atm"""
+        eq = GERGSaturation(self.T, self.P.atm, self.id, self.xi)
+        return eq._Envelope(Pmin, Pmax, maxPoints)
+
+    def _properties(self, x, rho, T):
+        """Thermodynamic properties of a phase, Tabla 7.1 pag 127
+        Input:
+            x: molar fraction
+            rho: molar density, mol/dm³
+            T: temperature, K
+        Output:
+            dict with properties in SI units
+        """
+        mixture = self._mixture
+        Tr, rhor, dTr, drhor = mixture.reducing(x)
+        M = dot(x, mixture.M)
+        Rg = R/M*1000
+        tau = Tr/T
+        delta = rho/rhor
+        fio, fiot, fiott, fiod, fiodd, fiodt, fioi = mixture.phi0(
+            x, tau, delta, Tr, rhor)
+        fir, firt, firtt, fird, firdd, firdt, firdtt, firxi = mixture.phir(
+            x, tau, delta)
+        nfirni = mixture.nfirni(x, tau, delta, fir, firt, fird, firxi, dTr,
+                                drhor, Tr, rhor)
+
+        propiedades = {}
+        propiedades["fraccion"] = list(x)
+        propiedades["M"] = M
+        propiedades["rho"] = rho*M
+        propiedades["Z"] = 1+delta*fird
+        propiedades["P"] = propiedades["Z"]*Rg*T*rho*M
+        propiedades["s"] = Rg*(tau*(fiot+firt)-fio-fir)
+        propiedades["u"] = Rg*T*tau*(fiot+firt)
+        propiedades["h"] = Rg*T*(1+tau*(fiot+firt)+delta*fird)
+        propiedades["g"] = Rg*T*(1+fio+fir+delta*fird)
+        propiedades["cp"] = Rg*(
+            -tau**2*(fiott+firtt)+(1+delta*fird-delta*tau*firdt)**2 /
+            (1+2*delta*fird+delta**2*firdd))
+        propiedades["cv"] = -Rg*tau**2*(fiott+firtt)
+        propiedades["w"] = (Rg*T*(
+            1+2*delta*fird+delta**2*firdd-(1+delta*fird-delta*tau*firdt)**2 /
+            tau**2/(fiott+firtt)))**0.5
+        propiedades["lnphi"] = nfirni-log(propiedades["Z"])
+        return propiedades
+
+    def fill(self, fase, estado):
+        """Fill phase properties"""
+        fase.fraccion = [unidades.Dimensionless(x)
+                         for x in estado["fraccion"]]
+        fase.M = unidades.Dimensionless(estado["M"])
+        fase.rho = unidades.Density(estado["rho"])
+        fase.v = unidades.SpecificVolume(1./fase.rho)
+        fase.Z = unidades.Dimensionless(estado["Z"])
+        fase.h = unidades.Enthalpy(estado["h"])
+        fase.s = unidades.SpecificHeat(estado["s"])
+        fase.u = unidades.Enthalpy(estado["u"])
+        fase.g = unidades.Enthalpy(estado["g"])
+        fase.cp = unidades.SpecificHeat(estado["cp"])
+        fase.cv = unidades.SpecificHeat(estado["cv"])
+        fase.cp_cv = unidades.Dimensionless(fase.cp/fase.cv)
+        fase.w = unidades.Speed(estado["w"])
+        fase.fi = [unidades.Dimensionless(exp(l)) for l in estado["lnphi"]]
+        fase.f = [unidades.Pressure(x*fi*estado["P"])
+                  for x, fi in zip(estado["fraccion"], fase.fi)]
+
+        fase.rhoM = unidades.MolarDensity(fase.rho/fase.M)
+        fase.hM = unidades.MolarEnthalpy(fase.h*fase.M)
+        fase.sM = unidades.MolarSpecificHeat(fase.s*fase.M)
+        fase.uM = unidades.MolarEnthalpy(fase.u*fase.M)
+        fase.gM = unidades.MolarEnthalpy(fase.g*fase.M)
+        fase.cpM = unidades.MolarSpecificHeat(fase.cp*fase.M)
+        fase.cvM = unidades.MolarSpecificHeat(fase.cv*fase.M)
 
     def fug(self, rho, T, nfirni=None):
-        if not nfirni:
+        if nfirni is None:
             tau = self.Tc/T
             delta = rho/self.rhoc
             fir, firt, firtt, fird, firdd, firdt, firdtt, nfirni = self._phir(tau, delta)
@@ -488,200 +1295,27 @@ class GERG(object):
         fir, firt, firtt, fird, firdd, firdt, firdtt, nfirni = self._phir(tau, delta)
         propiedades = {}
         propiedades["P"] = (1+delta*fird)*self.R.JkgK*T*rho
-        propiedades["s"] = self.R.kJkgK*(tau*(fiot+firt)-fio-fir)
-        propiedades["u"] = self.R.kJkgK*T*tau*(fiot+firt)
-        propiedades["h"] = self.R.kJkgK*T*(1+tau*(fiot+firt)+delta*fird)
+        propiedades["s"] = self.R.JkgK*(tau*(fiot+firt)-fio-fir)
+        propiedades["u"] = self.R.JkgK*T*tau*(fiot+firt)
+        propiedades["h"] = self.R.JkgK*T*(1+tau*(fiot+firt)+delta*fird)
         return propiedades
 
     def _phi0(self, tau, delta):
         """Contribución ideal de la energía libre de Helmholtz eq. 7.5"""
-        fio = fiot = fiott = fiod = fiodd = fiodt = 0
-        nfioni = []   # ðnao/ðni
-        for i, componente in enumerate(self.comp):
-            deltai = delta*self.rhoc/componente.rhoc
-            taui = componente.Tc*tau/self.Tc
-            fio_, fiot_, fiott_, fiod_, fiodd_, fiodt_ = componente._phi0(
-                componente.GERG["cp"], taui, deltai)
-            fio += self.xi[i]*(fio_+log(self.xi[i]))
-            fiot += self.xi[i]*fiot_
-            fiott += self.xi[i]*fiott_
-            fiod += self.xi[i]*fiod_
-            fiodd += self.xi[i]*fiodd_
-            fiodt += self.xi[i]*fiodt_
-            nfioni.append(fio_+1+log(self.xi[i]))
+        fio, fiot, fiott, fiod, fiodd, fiodt, fioi = self._mixture.phi0(
+            self.xi, tau, delta, self.Tc, self.rhoc/self.M)
+        nfioni = fioi+1+log(self.xi)   # ðnao/ðni
         return fio, fiot, fiott, fiod, fiodd, fiodt, nfioni
 
     def _phir(self, tau, delta):
         """Contribución residual de la energía libre de Helmholtz eq. 7.7"""
-        fir = firt = firtt = fird = firdd = firdt = firdtt = 0
-        firxi = []
-        firxixj = zeros((len(self.comp), len(self.comp)))
-        firdxi = []
-        firtxi = []
-
-        for i, componente in enumerate(self.comp):
-            deltai = delta*self.rhoc/componente.rhoc
-            taui = componente.Tc*tau/self.Tc
-            fir_, firt_, firtt_, fird_, firdd_, firdt_, firdtt_, B_, C_ = \
-                componente._phir(taui, deltai)
-            fir += self.xi[i]*fir_
-            firt += self.xi[i]*firt_
-            firtt += self.xi[i]*firtt_
-            fird += self.xi[i]*fird_
-            firdd += self.xi[i]*firdd_
-            firdt += self.xi[i]*firdt_
-
-            firxi.append(fir_)
-            firdxi.append(fird_)
-            firtxi.append(firt_)
-
-        # Contribución residual cruzada eq 7.8
-        for i, x_i in enumerate(self.xi):
-            for j, x_j in enumerate(self.xi):
-                if j > i:
-                    (fir_, firt_, firtt_, fird_, firdd_, firdt_, firdtt_, B_,
-                        C_) = self._phijr(i, j, tau, delta)
-                    fir += x_i*x_j*self.Fij[self.id[i]][self.id[j]]*fir_
-                    firt += x_i*x_j*self.Fij[self.id[i]][self.id[j]]*firt_
-                    firtt += x_i*x_j*self.Fij[self.id[i]][self.id[j]]*firtt_
-                    fird += x_i*x_j*self.Fij[self.id[i]][self.id[j]]*fird_
-                    firdd += x_i*x_j*self.Fij[self.id[i]][self.id[j]]*firdd_
-                    firdt += x_i*x_j*self.Fij[self.id[i]][self.id[j]]*firdt_
-
-                    firxi[i] += x_j*self.Fij[self.id[i]][self.id[j]]*fir_
-                    firxixj[i, j] = self.Fij[self.id[i]][self.id[j]]*fir_
-                    firdxi[i] += x_j*self.Fij[self.id[i]][self.id[j]]*fird_
-                    firtxi[i] += x_j*self.Fij[self.id[i]][self.id[j]]*firt_
-
-        suma = suma_rho = suma_T = 0
-        for i, x_i in enumerate(self.xi):
-            suma += x_i*firxi[i]
-            suma_rho += x_i*self.rhocxi[i]
-            suma_T += x_i*self.Tcxi[i]
-
-        n_rhocni = []
-        n_Tcni = []
-        for i, x_i in enumerate(self.xi):
-            n_rhocni.append(self.rhocxi[i]-suma_rho)
-            n_Tcni.append(self.Tcxi[i]-suma_T)
-
-        n_firni = []  # ðar/ðni
-        nfirni = []   # ðnar/ðni
-        for i, componente in enumerate(self.comp):
-            n_firni.append(delta*fird*(1-1./self.rhoc*n_rhocni[i]) +
-                           tau*firt/self.Tc*n_Tcni[i]+firxi[i]-suma)
-            nfirni.append(fir_+n_firni[i])
+        fir, firt, firtt, fird, firdd, firdt, firdtt, firxi = \
+            self._mixture.phir(self.xi, tau, delta)
+        nfirni = self._mixture.nfirni(
+            self.xi, tau, delta, fir, firt, fird, firxi, self._dTr,
+            self._drhor, self.Tc, self.rhoc/self.M)   # ðnar/ðni
         return fir, firt, firtt, fird, firdd, firdt, firdtt, nfirni
 
-    def _phijr(self, i, j, tau, delta):
-        txt = str(i)+"-"+str(j)
-        constants = self.fir_ij.get(txt, 0)
-        fir = fird = firdd = firt = firtt = firdt = firdtt = B = C = 0
-        if constants:
-            delta_0 = 1e-50
-            nr1 = constants["nr1"]
-            d1 = constants["d1"]
-            t1 = constants["t1"]
-            for i in range(len(constants.get("nr1", []))):
-                # Polinomial terms
-                fir += nr1[i]*delta**d1[i]*tau**t1[i]
-                fird += nr1[i]*d1[i]*delta**(d1[i]-1)*tau**t1[i]
-                firdd += nr1[i]*d1[i]*(d1[i]-1)*delta**(d1[i]-2)*tau**t1[i]
-                firt += nr1[i]*t1[i]*delta**d1[i]*tau**(t1[i]-1)
-                firtt += nr1[i]*t1[i]*(t1[i]-1)*delta**d1[i]*tau**(t1[i]-2)
-                firdt += nr1[i]*t1[i]*d1[i]*delta**(d1[i]-1)*tau**(t1[i]-1)
-                firdtt += nr1[i]*t1[i]*d1[i]*(t1[i]-1)*delta**(d1[i]-1)*tau**(t1[i]-2)
-                B += nr1[i]*d1[i]*delta_0**(d1[i]-1)*tau**t1[i]
-                C += nr1[i]*d1[i]*(d1[i]-1)*delta_0**(d1[i]-2)*tau**t1[i]
-
-            nr2 = constants["nr2"]
-            if nr2:
-                d2 = constants["d2"]
-                t2 = constants["t2"]
-                n2 = constants["n2"]
-                e2 = constants["e2"]
-                b2 = constants["b2"]
-                g2 = constants["g2"]
-                for i in range(len(constants.get("nr2", []))):
-                    # Gaussian terms
-                    fir += nr2[i]*delta**d2[i]*tau**t2[i] * \
-                        exp(-n2[i]*(delta-e2[i])**2-b2[i]*(tau-g2[i])**(2))
-                    fird += nr2[i]*delta**d2[i]*tau**t2[i] * \
-                        exp(-n2[i]*(delta-e2[i])**2-b2[i]*(tau-g2[i])**(2)) * \
-                        (d2[i]/delta-2*n2[i]*(delta-e2[i]))
-                    firdd += nr2[i]*tau**t2[i] * \
-                        exp(-n2[i]*(delta-e2[i])**2-b2[i]*(tau-g2[i])**(2)) * \
-                        (-2*n2[i]*delta**d2[i]+4*n2[i]**2*delta**d2[i] *
-                         (delta-e2[i])**2-4*d2[i]*n2[i]*delta**2*(delta-e2[i])+d2[i]*2*delta)
-                    firt += nr2[i]*delta**d2[i]*tau**t2[i] * \
-                        exp(-n2[i]*(delta-e2[i])**2-b2[i]*(tau-g2[i])**(2)) * \
-                        (t2[i]/tau-2*b2[i]*(tau-g2[i]))
-                    firtt += nr2[i]*delta**d2[i]*tau**t2[i] * \
-                        exp(-n2[i]*(delta-e2[i])**2-b2[i]*(tau-g2[i])**(2)) * \
-                        ((t2[i]/tau-2*b2[i]*(tau-g2[i]))**(2)-t2[i]/tau**2-2*b2[i])
-                    firdt += nr2[i]*delta**d2[i]*tau**t2[i] * \
-                        exp(-n2[i]*(delta-e2[i])**2-b2[i]*(tau-g2[i])**(2)) * \
-                        (t2[i]/tau-2*b2[i]*(tau-g2[i])) * \
-                        (d2[i]/delta-2*n2[i]*(delta-e2[i]))
-                    firdtt += nr2[i]*delta**d2[i]*tau**t2[i] * \
-                        exp(-n2[i]*(delta-e2[i])**2-b2[i]*(tau-g2[i])**(2)) * \
-                        ((t2[i]/tau-2*b2[i]*(tau-g2[i]))**(2)-t2[i]/tau**2-2*b2[i]) * \
-                        (d2[i]/delta-2*n2[i]*(delta-e2[i]))
-                    B += nr2[i]*delta_0**d2[i]*tau**t2[i] * \
-                        exp(-n2[i]*(delta_0-e2[i])**2-b2[i]*(tau-g2[i])**(2)) * \
-                        (d2[i]/delta_0-2*n2[i]*(delta_0-e2[i]))
-                    C += nr2[i]*tau**t2[i] * \
-                        exp(-n2[i]*(delta_0-e2[i])**2-b2[i]*(tau-g2[i])**(2)) * \
-                        (-2*n2[i]*delta_0**d2[i]+4*n2[i]**2*delta_0**d2[i]*(delta_0-e2[i])**2 -
-                         4*d2[i]*n2[i]*delta_0**2*(delta_0-e2[i])+d2[i]*2*delta_0)
-
-        return fir, firt, firtt, fird, firdd, firdt, firdtt, B, C
-
-    def flash(self):
-        """Cálculo de los coeficientes de reparto entre fases"""
-        #Estimación inicial de K mediante correlación wilson Eq 5.61 Pag 82
-        Ki = []
-        for componente in self.comp:
-            Ki.append(componente.Pc/self.P*exp(5.373*(1.+componente.f_acent)*(1.-componente.Tc/self.T)))
-
-        def f(Q):
-            sum = 0
-            for i, x in enumerate(self.xi):
-                sum += x*(Ki[i]-1.)/(1.+Q+Q*Ki[i])
-            return sum
-
-        if f(0) > 0 and f(1) > 0:
-            # x>1, vapor only
-            xi = self.xi
-            yi = self.xi
-            Q = 1
-        elif f(0) < 0 and f(1) < 0:
-            # x<0, liquid only
-            xi = self.xi
-            yi = self.xi
-            Q = 0
-        else:
-            # two phases
-            Qo = 0.5
-            while True:
-                Q = Qo
-                Qo = fsolve(Vr, Q)
-                xi = []
-                yi = []
-                for i, fraccion in enumerate(self.xi):
-                    xi.append(fraccion/(1+Qo*(Ki[i]-1)))
-                    yi.append(fraccion*Ki[i]/(1+Qo*(Ki[i]-1)))
-
-                fi, Fi = self.fug(self.rho, self.T)
-                fiv = r_[yi]*r_[self.titaiv]*self.P
-                fil = r_[xi]*r_[self.titail]*self.P
-                # criterio de convergencia Eq 21
-                if sum((fil/fiv-1)**2) < 1e-15 and (Q-Qo)**2 < 1e-15:
-                    break
-                else:
-                    Ki = r_[self.titail]/r_[self.titaiv]
-        return Ki, xi, yi, Q
-
 
 id_GERG = [i.id for i in GERG.componentes]
 
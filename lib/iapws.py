@@ -6,9 +6,12 @@
 ###############################################################################
 
 from __future__ import division
-from math import sqrt, log, exp, tan, atan, acos, sin, pi
+from math import log, exp, tan, atan, acos, sin, pi
 from cmath import log as log_c
 
+from numpy import (amax, asarray, broadcast_arrays, clip, errstate, maximum,
+                   nan, ndarray, where, zeros)
+from numpy import log as log_a
 from scipy.optimize import fsolve
 from PyQt4.QtGui import QApplication
 
@@ -98,6 +101,13 @@ Pmin = 0.000611212677444
 Ps_623 = 16.5291642526
 
 
+def _clip(x, xmin, xmax):
+    """Limit the variable to the interval, valid for scalars and arrays"""
+    if isinstance(x, ndarray):
+        return clip(x, xmin, xmax)
+    return min(max(x, xmin), xmax)
+
+
 # Boundary Region1-Region2
 def _h13_s(s):
     """Define the boundary between Region 1 and 3, h=f(s)
@@ -177,10 +187,7 @@ def _PSat_T(T):
     >>> "%.8f" % _PSat_T(500)
     '2.63889776'
     """
-    if T < 273.15:
-        T = 273.15
-    elif T > Tc:
-        T = Tc
+    T = _clip(T, 273.15, Tc)
     n = [0, 0.11670521452767E+04, -0.72421316703206E+06, -0.17073846940092E+02,
          0.12020824702470E+05, -0.32325550322333E+07, 0.14915108613530E+02,
          -0.48232657361591E+04, 0.40511340542057E+06, -0.23855557567849E+00,
@@ -198,10 +205,7 @@ def _TSat_P(P):
     >>> "%.6f" % _TSat_P(10)
     '584.149488'
     """
-    if P < 611.212677/1e6:
-        P = 611.212677/1e6
-    elif P > 22.064:
-        P = 22.064
+    P = _clip(P, 611.212677/1e6, 22.064)
     n = [0, 0.11670521452767E+04, -0.72421316703206E+06, -0.17073846940092E+02,
          0.12020824702470E+05, -0.32325550322333E+07, 0.14915108613530E+02,
          -0.48232657361591E+04, 0.40511340542057E+06, -0.23855557567849E+00,
@@ -224,10 +228,7 @@ def _PSat_h(h):
     """
     hmin_Ps3 = _Region1(623.15, _PSat_T(623.15))["h"]
     hmax_Ps3 = _Region2(623.15, _PSat_T(623.15))["h"]
-    if h < hmin_Ps3:
-        h = hmin_Ps3
-    if h > hmax_Ps3:
-        h = hmax_Ps3
+    h = _clip(h, hmin_Ps3, hmax_Ps3)
     nu = h/2600
     I = [0, 1, 1, 1, 1, 5, 7, 8, 14, 20, 22, 24, 28, 36]
     J = [0, 1, 3, 4, 36, 3, 0, 24, 16, 16, 3, 18, 8, 24]
@@ -432,7 +433,7 @@ def _Region1(T, P):
     propiedades["s"] = R*(Tr*gt-g)
     propiedades["cp"] = -R*Tr**2*gtt
     propiedades["cv"] = R*(-Tr**2*gtt+(gp-Tr*gpt)**2/gpp)
-    propiedades["w"] = sqrt(R*T*1000*gp**2/((gp-Tr*gpt)**2/(Tr**2*gtt)-gpp))
+    propiedades["w"] = (R*T*1000*gp**2/((gp-Tr*gpt)**2/(Tr**2*gtt)-gpp))**0.5
     propiedades["alfav"] = (1-Tr*gpt/gp)/T
     propiedades["kt"] = -Pr*gpp/gp/P
     propiedades["region"] = 1
@@ -601,7 +602,7 @@ def Region2_cp0(Tr, Pr):
     no = [-0.96927686500217E+01, 0.10086655968018E+02, -0.56087911283020E-02,
           0.71452738081455E-01, -0.40710498223928E+00, 0.14240819171444E+01,
           -0.43839511319450E+01, -0.28408632460772E+00, 0.21268463753307E-01]
-    go = log(Pr)
+    go = log_a(Pr)
     gop = Pr**-1
     gopp = -Pr**-2
     got = gott = gopt = 0
@@ -1043,7 +1044,7 @@ def _Region3(rho, T):
 
     d = rho/rhoc
     Tr = Tc/T
-    g = n[0]*log(d)
+    g = n[0]*log_a(d)
     gd = n[0]*d**-1
     gdd = -n[0]*d**-2
     gt = gtt = gdt = 0
@@ -1063,7 +1064,7 @@ def _Region3(rho, T):
     propiedades["s"] = R*(Tr*gt-g)
     propiedades["cp"] = R*(-Tr**2*gtt+(d*gd-d*Tr*gdt)**2/(2*d*gd+d**2*gdd))
     propiedades["cv"] = -R*Tr**2*gtt
-    propiedades["w"] = sqrt(R*T*1000*(2*d*gd+d**2*gdd-(d*gd-d*Tr*gdt)**2/Tr**2/gtt))
+    propiedades["w"] = (R*T*1000*(2*d*gd+d**2*gdd-(d*gd-d*Tr*gdt)**2/Tr**2/gtt))**0.5
     propiedades["alfav"] = (gd-Tr*gdt)/(2*gd+d*gdd)/T
     propiedades["kt"] = 1/(2*d*gd+d**2*gdd)/rho/R/T*1000
     propiedades["alfap"] = (1-Tr*gdt/gd)/T
@@ -2409,7 +2410,7 @@ def Region5_cp0(Tr, Pr):
     Jo = [0, 1, -3, -2, -1, 2]
     no = [-0.13179983674201e2, 0.68540841634434e1, -0.24805148933466e-1,
           0.36901534980333, -0.31161318213925e1, -0.32961626538917]
-    go = log(Pr)
+    go = log_a(Pr)
     gop = Pr**-1
     gopp = -Pr**-2
     got = gott = gopt = 0
@@ -2979,6 +2980,332 @@ def _Bound_hs(h, s):
     return region
 
 
+# Newton refinement of backward equations, the functions are valid for
+# scalars and arrays, iterations is the maximum number of iterations
+def _converged(*steps):
+    """Check the relative steps of newton iterations"""
+    return max([amax(abs(step)) for step in steps]) <= 1e-12
+
+
+def _stepsOK(*steps):
+    """Check the last relative steps of newton iterations are small enough to
+    accept the refined state, elementwise for arrays"""
+    ok = True
+    for step in steps:
+        ok = ok & (abs(step) <= 1e-6)
+    return ok
+
+
+def _checkNewton(estado):
+    """Check the refined state of a newton iteration, it must be converged and
+    inside the pressure and temperature bounds of its region, return a bool
+    or a bool array"""
+    T = estado["T"]
+    P = estado["P"]
+    eps = 1e-6
+    ok = estado.get("converged", True) & (estado["v"] > 0) & \
+        (T >= 273.15*(1-eps)) & (P >= Pmin*(1-eps)) & (P <= 100*(1+eps))
+    region = estado["region"]
+    if region == 1:
+        ok = ok & (T <= 623.15*(1+eps))
+    elif region == 2:
+        ok = ok & (T <= 1073.15*(1+eps))
+    elif region == 3:
+        ok = ok & (T >= 623.15*(1-eps)) & (T <= _t_P(100)*(1+eps)) & \
+            (P >= Ps_623*(1-eps))
+    elif region == 5:
+        ok = ok & (T >= 1073.15*(1-eps)) & (T <= 2273.15*(1+eps)) & \
+            (P <= 50*(1+eps))
+    return ok
+
+
+def _NewtonT(function, T, P, key, value, iterations=20):
+    """Refine the temperature for input P and h or s in a region with T, P
+    as independent variables, with cp as analytic derivative"""
+    steps = ()
+    for i in range(iterations):
+        estado = function(T, P)
+        f = estado[key]-value
+        if key == "h":
+            step = f/estado["cp"]
+        else:
+            step = f/estado["cp"]*T
+        T = T-step
+        steps = (step/T, )
+        if _converged(*steps):
+            break
+    estado = function(T, P)
+    estado["converged"] = _stepsOK(*steps)
+    return estado
+
+
+def _NewtonTP(function, T, P, h, s, iterations=20):
+    """Refine the temperature and pressure for input h and s in a region with
+    T, P as independent variables"""
+    steps = ()
+    for i in range(iterations):
+        estado = function(T, P)
+        v = estado["v"]
+        dhdT = estado["cp"]
+        dhdP = 1000*v*(1-T*estado["alfav"])
+        dsdT = estado["cp"]/T
+        dsdP = -1000*v*estado["alfav"]
+        fh = estado["h"]-h
+        fs = estado["s"]-s
+        det = dhdT*dsdP-dhdP*dsdT
+        dT = (fh*dsdP-fs*dhdP)/det
+        dP = (fs*dhdT-fh*dsdT)/det
+        T = T-dT
+        P = P-dP
+        steps = (dT/T, dP/P)
+        if _converged(*steps):
+            break
+    estado = function(T, P)
+    estado["converged"] = _stepsOK(*steps)
+    return estado
+
+
+def _Region3_derivatives(estado):
+    """Derivatives of P, h and s with density and temperature in region 3,
+    return a dict with tuples (d/drho, d/dT)"""
+    rho = 1/estado["v"]
+    T = estado["T"]
+    dPdT = estado["alfap"]*estado["P"]
+    dPdrho = 1/rho/estado["kt"]
+    return {"P": (dPdrho, dPdT),
+            "h": (1000*(dPdrho-T*dPdT/rho)/rho, estado["cv"]+1000*dPdT/rho),
+            "s": (-1000*dPdT/rho**2, estado["cv"]/T)}
+
+
+def _Newton3(rho, T, x, y, iterations=20):
+    """Refine the density and temperature in region 3 for two input
+    variables x and y, tuples with name (P, h or s) and value"""
+    steps = ()
+    for i in range(iterations):
+        estado = _Region3(rho, T)
+        derivatives = _Region3_derivatives(estado)
+        ax, bx = derivatives[x[0]]
+        ay, by = derivatives[y[0]]
+        fx = estado[x[0]]-x[1]
+        fy = estado[y[0]]-y[1]
+        det = ax*by-bx*ay
+        drho = (fx*by-fy*bx)/det
+        dT = (fy*ax-fx*ay)/det
+        rho = rho-drho
+        T = T-dT
+        steps = (drho/rho, dT/T)
+        if _converged(*steps):
+            break
+    estado = _Region3(rho, T)
+    estado["converged"] = _stepsOK(*steps)
+    return estado
+
+
+def _Newton3_rho(T, P, rho, iterations=20):
+    """Refine the density in region 3 for input T and P"""
+    steps = ()
+    for i in range(iterations):
+        estado = _Region3(rho, T)
+        step = (estado["P"]-P)*estado["kt"]
+        rho = rho*(1-step)
+        steps = (step, )
+        if _converged(*steps):
+            break
+    estado = _Region3(rho, T)
+    estado["converged"] = _stepsOK(*steps)
+    return estado
+
+
+# Vectorized calculation, the basic equations, the saturation line and the
+# backward equations without subregions accept numpy arrays as input, here
+# the functions with branches for subregions and the regions boundaries
+def _batchApply(function, mask, *args):
+    """Evaluate function for the points selected by mask, return an array
+    with nan in the other points"""
+    result = zeros(mask.shape)*nan
+    if mask.any():
+        result[mask] = function(*[arg[mask] for arg in args])
+    return result
+
+
+def _batchBackward2_T_Ph(P, h):
+    """Backward equation for region 2, T=f(P,h) for arrays"""
+    a = P <= 4
+    b = ~a & ((P <= 6.546699678) | (h >= _hbc_P(P)))
+    c = ~a & ~b
+    T = _batchApply(_Backward2a_T_Ph, a, P, h)
+    T[b] = _batchApply(_Backward2b_T_Ph, b, P, h)[b]
+    T[c] = _batchApply(_Backward2c_T_Ph, c, P, h)[c]
+    return maximum(_TSat_P(P), T)
+
+
+def _batchBackward2_T_Ps(P, s):
+    """Backward equation for region 2, T=f(P,s) for arrays"""
+    a = P <= 4
+    b = ~a & (s >= 5.85)
+    c = ~a & ~b
+    T = _batchApply(_Backward2a_T_Ps, a, P, s)
+    T[b] = _batchApply(_Backward2b_T_Ps, b, P, s)[b]
+    T[c] = _batchApply(_Backward2c_T_Ps, c, P, s)[c]
+    return maximum(_TSat_P(P), T)
+
+
+def _batchBackward3(functions, a, P, y):
+    """Evaluate the backward equation of subregions 3a and 3b for arrays"""
+    result = _batchApply(functions[0], a, P, y)
+    result[~a] = _batchApply(functions[1], ~a, P, y)[~a]
+    return result
+
+
+def _batchBound_TP(T, P):
+    """Region definition for input T and P as arrays, 0 for points out of
+    bounds"""
+    region = zeros(T.shape, dtype=int)
+    r5 = (1073.15 < T) & (T <= 2273.15) & (Pmin <= P) & (P <= 50)
+    low = ~r5 & (Pmin <= P) & (P <= Ps_623)
+    high = ~r5 & (Ps_623 < P) & (P <= 100)
+
+    Tsat = _TSat_P(P)
+    region[low & (273.15 <= T) & (T <= Tsat)] = 1
+    region[low & (Tsat < T) & (T <= 1073.15)] = 2
+
+    T_b23 = _t_P(P)
+    region[high & (273.15 <= T) & (T <= 623.15)] = 1
+    region[high & (T_b23 <= T) & (T <= 1073.15)] = 2
+    region[high & (623.15 < T) & (T < T_b23)] = 3
+    region[r5] = 5
+    return region
+
+
+def _batchBound_PX(P, value, key):
+    """Region definition for input P and h or s as arrays, 0 for points
+    out of bounds"""
+    region = zeros(P.shape, dtype=int)
+    low = (Pmin <= P) & (P <= Ps_623)
+    medium = (Ps_623 < P) & (P < Pc)
+    high = (Pc <= P) & (P <= 100)
+    inside = low | medium | high
+
+    Tsat = _TSat_P(P)
+    vmin = _Region1(273.15, P)[key]
+    v25 = _Region2(1073.15, P)[key]
+    vmax = _Region5(2273.15, P)[key]
+    # Upper limit of region 1 and lower limit of region 2
+    v1 = where(low, _Region1(Tsat, P)[key], _Region1(623.15, P)[key])
+    v2 = where(low, _Region2(Tsat, P)[key], _Region2(_t_P(P), P)[key])
+
+    region[inside & (vmin <= value) & (value <= v1)] = 1
+    between = inside & (v1 < value) & (value < v2)
+    region[between & low] = 4
+    region[between & high] = 3
+    if key == "h":
+        P34 = _PSat_h(value)
+    else:
+        P34 = _PSat_s(value)
+    region[between & medium & (P < P34)] = 4
+    region[between & medium & (P >= P34)] = 3
+    region[inside & (v2 <= value) & (value <= v25)] = 2
+    region[inside & (P <= 50) & (v25 < value) & (value <= vmax)] = 5
+    return region
+
+
+def _batchFill(prop, mask, estado):
+    """Copy the region properties to the points selected by mask"""
+    for key in prop:
+        value = estado.get(key, None)
+        if value is not None:
+            prop[key][mask] = value
+
+
+def _batchNewton(prop, region, mask, estado):
+    """Copy the refined states to the points selected by mask, the points not
+    converged or out of its region bounds are set as out of bounds"""
+    _batchFill(prop, mask, estado)
+    bad = mask.copy()
+    bad[mask] = ~_checkNewton(estado)
+    for key in prop:
+        if key != "region":
+            prop[key][bad] = nan
+    region[bad] = 0
+
+
+def _batch(mode, a, b):
+    """Calculate the properties of arrays of states, input mode TP, Ph or
+    Ps with variables in the units of basic equations, return a dict with
+    the properties arrays, nan for points out of bounds or undefined"""
+    prop = {}
+    for key in ("T", "P", "v", "h", "s", "cp", "cv", "w", "alfav", "kt",
+                "x", "region"):
+        prop[key] = zeros(a.shape)*nan
+    prop["region"] = zeros(a.shape, dtype=int)
+
+    if mode == "TP":
+        T, P = a, b
+        region = _batchBound_TP(T, P)
+        for r, function in ((1, _Region1), (2, _Region2), (5, _Region5)):
+            mask = region == r
+            if mask.any():
+                _batchFill(prop, mask, function(T[mask], P[mask]))
+        mask = region == 3
+        if mask.any():
+            t, p = T[mask], P[mask]
+            rho = asarray([1/_Backward3_v_PT(*args) for args in zip(p, t)])
+            _batchNewton(prop, region, mask, _Newton3_rho(t, p, rho))
+
+    else:
+        key = mode[1]
+        P, value = a, b
+        region = _batchBound_PX(P, value, key)
+        if key == "h":
+            backward = (_Backward1_T_Ph, _batchBackward2_T_Ph)
+            backward3 = ((_Backward3a_v_Ph, _Backward3b_v_Ph),
+                         (_Backward3a_T_Ph, _Backward3b_T_Ph))
+        else:
+            backward = (_Backward1_T_Ps, _batchBackward2_T_Ps)
+            backward3 = ((_Backward3a_v_Ps, _Backward3b_v_Ps),
+                         (_Backward3a_T_Ps, _Backward3b_T_Ps))
+
+        for r, function, To in ((1, _Region1, backward[0]),
+                                (2, _Region2, backward[1]),
+                                (5, _Region5, None)):
+            mask = region == r
+            if mask.any():
+                p, x = P[mask], value[mask]
+                if To is None:
+                    T = p*0+1500.
+                else:
+                    T = To(p, x)
+                _batchNewton(prop, region, mask,
+                             _NewtonT(function, T, p, key, x))
+
+        # Two phases region, by saturated states in the pressure range of
+        # regions 1 and 2
+        Tsat = _TSat_P(P)
+        mask = (region == 4) & (Tsat <= 623.15)
+        if mask.any():
+            p = P[mask]
+            x = (value[mask]-_Region1(Tsat[mask], p)[key]) / \
+                (_Region2(Tsat[mask], p)[key]-_Region1(Tsat[mask], p)[key])
+            _batchFill(prop, mask, _Region4(p, x))
+
+        # Region 3, and its two phases points as in scalar calculation
+        mask = (region == 3) | ((region == 4) & (Tsat > 623.15))
+        if mask.any():
+            p, x = P[mask], value[mask]
+            if key == "h":
+                a = x <= _h_3ab(p)
+            else:
+                a = x <= sc
+            rho = 1/_batchBackward3(backward3[0], a, p, x)
+            T = _batchBackward3(backward3[1], a, p, x)
+            region[mask] = 3
+            estado = _Newton3(rho, T, ("P", p), (key, x))
+            _batchNewton(prop, region, mask, estado)
+
+    prop["region"] = region
+    return prop
+
+
 def prop0(T, P):
     """Ideal gas properties"""
     if T <= 1073.15:
@@ -3018,6 +3345,8 @@ class IAPWS97(object):
 
     Optional:
     l   -   Wavelength of light, for refractive index
+    iterations  -   Maximum newton refinements of backward equations, 0 to
+                    use backward values directly, default to convergence
 
     Definitions options:
     T, P    Not valid for two-phases region
@@ -3084,6 +3413,14 @@ class IAPWS97(object):
     >>> water=IAPWS97(T=50+273.15,P=611.2127)
     >>> "%0.4f %0.4f %0.2f %0.3f %0.2f" %(water.cp0, water.cv0, water.h0, water.s0, water.w0)
     '1.8714 1.4098 2594.66 9.471 444.93'
+
+    The newton refinement diverging out of the region bounds is reported
+    >>> water=IAPWS97(h=3654832.58711, s=4777.73357715)
+    >>> water.status, water.msg
+    (0, "Newton refinement don't converge in region bounds")
+    >>> water=IAPWS97(h=3.655e6, s=4778)
+    >>> water.status
+    0
     """
     kwargs = {"T": 0.0,
               "P": 0.0,
@@ -3091,7 +3428,8 @@ class IAPWS97(object):
               "h": None,
               "s": None,
               "v": 0.0,
-              "l": 0.5893}
+              "l": 0.5893,
+              "iterations": None}
     status = 0
     msg = "Unknown variables"
 
@@ -3104,8 +3442,8 @@ class IAPWS97(object):
 
         if self.calculable:
             self.status = 1
-            self.calculo()
             self.msg = "Solved"
+            self.calculo()
 
     @property
     def calculable(self):
@@ -3144,6 +3482,14 @@ class IAPWS97(object):
     def calculo(self):
         propiedades = None
         args = self.args()
+
+        # Newton refinement of backward equations, with iterations=0 the
+        # backward values are used directly, within IF97 consistency
+        if self.kwargs["iterations"] is None:
+            iterations = 20
+        else:
+            iterations = self.kwargs["iterations"]
+
         if self._thermo == "TP":
             T, P = args
             region = _Bound_TP(T, P)
@@ -3153,96 +3499,52 @@ class IAPWS97(object):
                 propiedades = _Region2(T, P)
             elif region == 3:
                 vo = _Backward3_v_PT(P, T)
-                funcion = lambda rho: _Region3(rho, self.kwargs["T"])["P"]-P
-                rho = fsolve(funcion, 1/vo)
-                propiedades = _Region3(rho, T)
+                propiedades = _Newton3_rho(T, P, 1/vo, iterations)
             elif region == 5:
                 propiedades = _Region5(T, P)
             else:
                 raise NotImplementedError("Incoming out of bound")
 
-        elif self._thermo == "Ph":
-            P, h = args
-            region = _Bound_Ph(P, h)
-            if region == 1:
-                To = _Backward1_T_Ph(P, h)
-                funcion = lambda T: _Region1(T, P)["h"]-h
-                T = fsolve(funcion, To)
-                propiedades = _Region1(T, P)
-            elif region == 2:
-                To = _Backward2_T_Ph(P, h)
-                funcion = lambda T: _Region2(T, P)["h"]-h
-                T = fsolve(funcion, To)
-                propiedades = _Region2(T, P)
-            elif region == 3:
-                vo = _Backward3_v_Ph(P, h)
-                To = _Backward3_T_Ph(P, h)
-                funcion = lambda par: (_Region3(par[0], par[1])["h"]-h,
-                                       _Region3(par[0], par[1])["P"]-P)
-#                print 1/vo, To, type(vo), type(To)
-                rho, T = fsolve(funcion, [1/vo, To])
-                propiedades = _Region3(rho, T)
-            elif region == 4:
+        elif self._thermo in ("Ph", "Ps"):
+            P, value = args
+            key = self._thermo[1]
+            if key == "h":
+                region = _Bound_Ph(P, value)
+                backward = (_Backward1_T_Ph, _Backward2_T_Ph,
+                            _Backward3_v_Ph, _Backward3_T_Ph)
+            else:
+                region = _Bound_Ps(P, value)
+                backward = (_Backward1_T_Ps, _Backward2_T_Ps,
+                            _Backward3_v_Ps, _Backward3_T_Ps)
+
+            if region == 4:
                 # FIXME: Bad region interpretation
                 T = _TSat_P(P)
                 if T <= 623.15:
-                    h1 = _Region1(T, P)["h"]
-                    h2 = _Region2(T, P)["h"]
-                    x = (h-h1)/(h2-h1)
+                    x1 = _Region1(T, P)[key]
+                    x2 = _Region2(T, P)[key]
+                    x = (value-x1)/(x2-x1)
                     propiedades = _Region4(P, x)
                 else:
-                    vo = _Backward3_v_Ph(P, h)
-                    To = _Backward3_T_Ph(P, h)
-                    funcion = lambda par: (_Region3(par[0], par[1])["h"]-h,
-                                           _Region3(par[0], par[1])["P"]-P)
-                    rho, T = fsolve(funcion, [1/vo, To])
-                    propiedades = _Region3(rho, T)
-            elif region == 5:
-                funcion = lambda T: _Region5(T, P)["h"]-h
-                T = fsolve(funcion, 1500)
-                propiedades = _Region5(T, P)
-            else:
-                raise NotImplementedError("Incoming out of bound")
+                    region = 3
 
-        elif self._thermo == "Ps":
-            P, s = args
-            region = _Bound_Ps(P, s)
             if region == 1:
-                To = _Backward1_T_Ps(P, s)
-                funcion = lambda T: _Region1(T, P)["s"]-s
-                T = fsolve(funcion, To)
-                propiedades = _Region1(T, P)
+                To = backward[0](P, value)
+                propiedades = _NewtonT(_Region1, To, P, key, value,
+                                       iterations)
             elif region == 2:
-                To = _Backward2_T_Ps(P, s)
-                funcion = lambda T: _Region2(T, P)["s"]-s
-                T = fsolve(funcion, To)
-                propiedades = _Region2(T, P)
+                To = backward[1](P, value)
+                propiedades = _NewtonT(_Region2, To, P, key, value,
+                                       iterations)
             elif region == 3:
-                vo = _Backward3_v_Ps(P, s)
-                To = _Backward3_T_Ps(P, s)
-                funcion = lambda par: (_Region3(par[0], par[1])["s"]-s,
-                                       _Region3(par[0], par[1])["P"]-P)
-                rho, T = fsolve(funcion, [1/vo, To])
-                propiedades = _Region3(rho, T)
-            elif region == 4:
-                T = _TSat_P(P)
-                if T <= 623.15:
-                    s1 = _Region1(T, P)["s"]
-                    s2 = _Region2(T, P)["s"]
-                    x = (s-s1)/(s2-s1)
-                    propiedades = _Region4(P, x)
-                else:
-                    vo = _Backward3_v_Ps(P, s)
-                    To = _Backward3_T_Ps(P, s)
-                    funcion = lambda par: (_Region3(par[0], par[1])["s"]-s,
-                                           _Region3(par[0], par[1])["P"]-P)
-                    rho, T = fsolve(funcion, [1/vo, To])
-                    propiedades = _Region3(rho, T)
+                vo = backward[2](P, value)
+                To = backward[3](P, value)
+                propiedades = _Newton3(1/vo, To, ("P", P), (key, value),
+                                       iterations)
             elif region == 5:
-                funcion = lambda T: _Region5(T, P)["s"]-s
-                T = fsolve(funcion, 1500)
-                propiedades = _Region5(T, P)
-            else:
+                # Without backward equations, always iterate
+                propiedades = _NewtonT(_Region5, 1500, P, key, value)
+            elif region != 4:
                 raise NotImplementedError("Incoming out of bound")
 
         elif self._thermo == "hs":
@@ -3251,25 +3553,17 @@ class IAPWS97(object):
             if region == 1:
                 Po = _Backward1_P_hs(h, s)
                 To = _Backward1_T_Ph(Po, h)
-                funcion = lambda par: (_Region1(par[0], par[1])["h"]-h,
-                                       _Region1(par[0], par[1])["s"]-s)
-                T, P = fsolve(funcion, [To, Po])
-                propiedades = _Region1(T, P)
+                propiedades = _NewtonTP(_Region1, To, Po, h, s, iterations)
             elif region == 2:
                 Po = _Backward2_P_hs(h, s)
                 To = _Backward2_T_Ph(Po, h)
-                funcion = lambda par: (_Region2(par[0], par[1])["h"]-h,
-                                       _Region2(par[0], par[1])["s"]-s)
-                T, P = fsolve(funcion, [To, Po])
-                propiedades = _Region2(T, P)
+                propiedades = _NewtonTP(_Region2, To, Po, h, s, iterations)
             elif region == 3:
                 P = _Backward3_P_hs(h, s)
                 vo = _Backward3_v_Ps(P, s)
                 To = _Backward3_T_Ps(P, s)
-                funcion = lambda par: (_Region3(par[0], par[1])["h"]-h,
-                                       _Region3(par[0], par[1])["s"]-s)
-                rho, T = fsolve(funcion, [1/vo, T])
-                propiedades = _Region3(rho, T)
+                propiedades = _Newton3(1/vo, To, ("h", h), ("s", s),
+                                       iterations)
             elif region == 4:
                 T = _Backward4_T_hs(h, s)
                 P = _PSat_T(T)
@@ -3322,6 +3616,14 @@ class IAPWS97(object):
         else:
             raise NotImplementedError("Bad incoming variables")
 
+        # The newton refinement of backward equations can diverge near the
+        # regions boundaries
+        if "converged" in propiedades and not _checkNewton(propiedades):
+            self.status = 0
+            self.msg = QApplication.translate(
+                "pychemqt", "Newton refinement don't converge in region bounds")
+            return
+
         self.M = unidades.Dimensionless(M)
         self.Pc = unidades.Pressure(Pc, "MPa")
         self.Tc = unidades.Temperature(Tc)
@@ -3476,6 +3778,81 @@ class IAPWS97(object):
               "a": self.P*fase.v*fase.xkappa}
         return (dP[z]*dT[y]-dT[z]*dP[y])/(dP[x]*dT[y]-dT[x]*dP[y])
 
+    @classmethod
+    def batch(cls, transport=True, **kwargs):
+        """Calculate a set of states in a single call, classifying the points
+        by region and evaluating the equations of each region with numpy
+        arrays, without the creation of the unidades and phase objects
+        Input:
+            Pair of state variables as arrays (or scalars), broadcastables,
+            in the same units as constructor:
+                T-P, P-h, P-s
+            transport: calculate too the transport properties, evaluated
+                point by point with the scalar correlations
+
+        Return a dict with float64 arrays of properties in SI units:
+            T, P, rho, v, x, h, s, u, cp, cv, cp_cv, w, alfav, xkappa,
+            region, mu, k
+        The points out of bounds have region 0, the properties undefined
+        are returned as nan
+
+        >>> st = IAPWS97.batch(T=[300, 500], P=[3e6, 1e5], transport=False)
+        >>> print "%0.2f %0.2f" % tuple(st["h"]/1000), tuple(st["region"])
+        115.33 2928.59 (1, 2)
+        """
+        variables = [key for key in ("T", "P", "h", "s")
+                     if kwargs.get(key, None) is not None]
+        mode = "".join(variables)
+        if mode not in ("TP", "Ph", "Ps"):
+            raise NotImplementedError(
+                "Batch calculation not supported for %s input" % mode)
+
+        a, b = broadcast_arrays(asarray(kwargs[variables[0]], dtype=float),
+                                asarray(kwargs[variables[1]], dtype=float))
+        shape = a.shape
+        a = a.flatten()
+        b = b.flatten()
+
+        # Conversion to units of basic equations, P in MPa, h, s in kJ/kg
+        if mode == "TP":
+            b = b/1e6
+        else:
+            a = a/1e6
+            b = b/1000
+
+        with errstate(all="ignore"):
+            estado = _batch(mode, a, b)
+
+        prop = {}
+        prop["T"] = estado["T"]
+        prop["P"] = estado["P"]*1e6
+        prop["v"] = estado["v"]
+        prop["rho"] = 1/estado["v"]
+        prop["x"] = estado["x"]
+        prop["h"] = estado["h"]*1000
+        prop["s"] = estado["s"]*1000
+        prop["u"] = prop["h"]-prop["P"]*prop["v"]
+        prop["cp"] = estado["cp"]*1000
+        prop["cv"] = estado["cv"]*1000
+        prop["cp_cv"] = estado["cp"]/estado["cv"]
+        prop["w"] = estado["w"]
+        prop["alfav"] = estado["alfav"]
+        prop["xkappa"] = estado["kt"]/1e6
+        prop["region"] = estado["region"]
+
+        prop["mu"] = a*nan
+        prop["k"] = a*nan
+        if transport:
+            for i, region in enumerate(prop["region"]):
+                if region:
+                    T, rho = prop["T"][i], prop["rho"][i]
+                    prop["mu"][i] = _Viscosity(rho, T)
+                    prop["k"][i] = _ThCond(rho, T)
+
+        for key in prop:
+            prop[key] = prop[key].reshape(shape)
+        return prop
+
 
 class IAPWS97_PT(IAPWS97):
     """Derivated class for direct P and T input"""
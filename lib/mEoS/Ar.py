@@ -228,6 +228,7 @@ class Ar(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032–3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 150.687, "rhoc": 13.407429659, "M": 39.948,
         "cp": Fi2,
         "ref": "OTO", 
 
@@ -246,6 +246,7 @@ class C2(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032–3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 305.322, "rhoc": 6.870854540, "M": 30.06904,
         "cp": Fi2,
         "ref": "OTO", 
         
@@ -262,6 +262,7 @@ class C3(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032–3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 369.825, "rhoc": 5.000043088, "M": 44.09562,
         "cp": Fi2,
         "ref": "OTO", 
 
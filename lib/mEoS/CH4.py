@@ -334,6 +334,7 @@ class CH4(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032–3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 190.564, "rhoc": 10.139342719, "M": 16.04246,
         "cp": Fi2,
         "ref": "OTO", 
 
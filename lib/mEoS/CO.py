@@ -105,6 +105,7 @@ class CO(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032–3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 132.86, "rhoc": 10.85, "M": 28.0101,
         "cp": Fi2,
         "ref": "OTO", 
 
@@ -114,7 +115,7 @@ class CO(MEoS):
         "nr1":  [0.92310041400851, -0.248858452058e1, 0.58095213783396,
                  0.28859164394654e-1, 0.70256257276544e-1, 0.21687043269488e-3],
         "d1": [1, 1, 1, 2, 3, 7],
-        "t1": [0.25, 0.125, 1.5, 1.375, 0.25, 0.875],
+        "t1": [0.25, 1.125, 1.5, 1.375, 0.25, 0.875],
 
         "nr2": [0.13758331015182, -0.51501116343466e-1, -0.14865357483379,
                 -0.38857100886810e-1, -0.29100433948943e-1, 0.14155684466279e-1],
@@ -260,6 +260,7 @@ class CO2(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032–3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 304.1282, "rhoc": 10.624978698, "M": 44.0095,
         "cp": Fi2,
         "ref": "OTO", 
 
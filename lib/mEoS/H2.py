@@ -124,6 +124,7 @@ class H2(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 33.19, "rhoc": 14.94, "M": 2.01588,
         "cp": Fi2,
         "ref": "OTO", 
 
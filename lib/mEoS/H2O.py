@@ -302,6 +302,7 @@ class H2O(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 647.096, "rhoc": 17.873716090, "M": 18.01528,
         "cp": Fi2,
         "ref": "OTO", 
 
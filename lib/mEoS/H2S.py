@@ -175,6 +175,7 @@ class H2S(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 373.1, "rhoc": 10.19, "M": 34.08088,
         "cp": Fi2,
         "ref": "OTO", 
 
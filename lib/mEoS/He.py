@@ -189,6 +189,7 @@ class He(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 5.1953, "rhoc": 17.399, "M": 4.002602,
         "cp": Fi2,
         "ref": "OTO", 
 
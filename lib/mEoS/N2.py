@@ -244,6 +244,7 @@ class N2(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032–3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 126.192, "rhoc": 11.1839, "M": 28.0134,
         "cp": Fi2,
         "ref": "OTO", 
 
@@ -243,6 +243,7 @@ class iC4(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi": "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 407.817, "rhoc": 3.860142940, "M": 58.1222,
         "cp": Fi2,
         "ref": "OTO", 
 
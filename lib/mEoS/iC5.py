@@ -85,6 +85,7 @@ class iC5(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi": "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 460.35, "rhoc": 3.271, "M": 72.14878,
         "cp": Fi2,
         "ref": "OTO", 
 
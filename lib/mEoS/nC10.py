@@ -72,6 +72,7 @@ class nC10(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi": "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 617.7, "rhoc": 1.64, "M": 142.28168,
         "cp": Fi2,
         "ref": "OTO", 
 
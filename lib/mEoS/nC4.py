@@ -245,6 +245,7 @@ class nC4(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi": "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 425.125, "rhoc": 3.920016792, "M": 58.1222,
         "cp": Fi2,
         "ref": "OTO", 
 
@@ -86,6 +86,7 @@ class nC5(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 469.70, "rhoc": 3.215577588, "M": 72.14878,
         "cp": Fi1,
         "ref": "OTO", 
 
@@ -91,6 +91,7 @@ class nC6(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi": "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 507.82, "rhoc": 2.705877875, "M": 86.17536,
         "cp": Fi2,
         "ref": "OTO", 
 
@@ -91,6 +91,7 @@ class nC7(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi": "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 540.13, "rhoc": 2.315324434, "M": 100.20194,
         "cp": Fi2,
         "ref": "OTO", 
 
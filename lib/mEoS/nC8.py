@@ -92,6 +92,7 @@ class nC8(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi": "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 569.32, "rhoc": 2.056404127, "M": 114.22852,
         "cp": Fi1,
         "ref": "OTO", 
 
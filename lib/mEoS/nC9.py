@@ -72,6 +72,7 @@ class nC9(MEoS):
                     "ref": "J. Chem. Eng. Data, 2012, 57 (11), pp 3032-3091",
                     "doi":  "10.1021/je300655b"}, 
         "R": 8.314472,
+        "Tc": 594.55, "rhoc": 1.81, "M": 128.2551,
         "cp": Fi2,
         "ref": "OTO", 
 
@@ -18,12 +18,24 @@ if int(__version__.split(".")[1]) < 10:
 else:
     from scipy.constants import Boltzmann
 from scipy.constants import pi, Avogadro, R
-from scipy.optimize import fsolve
+from scipy.interpolate import splev, splrep
+from scipy.optimize import brentq, fsolve
+from scipy.special import gamma
+from numpy import (array, asarray, broadcast_arrays, diff, dot, errstate,
+                   floor, isfinite, linspace, maximum, minimum, nan, ndarray,
+                   newaxis, ones, unique, where, zeros)
 
 from lib import unidades, compuestos
+from lib.utilities import LRUCache
 from physics import R_atml
 from config import Fluid
 
+
+# Saturation states calculated, by fluid, equation and temperature, and
+# saturation tables used as initial values, by fluid and equation
+_saturationCache = LRUCache(4096)
+_saturationTables = {}
+
 data = [(QApplication.translate("pychemqt", "Temperature"), "T", unidades.Temperature),
         (QApplication.translate("pychemqt", "Reduced temperature"), "Tr", unidades.Dimensionless),
         (QApplication.translate("pychemqt", "Pressure"), "P", unidades.Pressure),
@@ -96,6 +108,387 @@ units = [p[2] for p in data]
 properties = dict(zip(keys, propiedades))
 inputData = [data[0], data[2], data[4], data[5], data[6], data[7], data[8], data[9]]
 
+
+class HelmholtzResidual(object):
+    """Compiled representation of the residual Helmholtz free energy terms of
+    a multiparameter equation of state
+
+    The coefficients in the equation dict are packed in contiguous arrays
+    only once per equation, so the evaluation of the terms don't need python
+    loops, and tau and delta can be scalars or arrays of any shape
+
+    >>> from lib.mEoS.H2O import H2O
+    >>> eng = HelmholtzResidual.compile(H2O.helmholtz1)
+    >>> print "%0.9g %0.9g %0.9g" % eng.phir(647.096/500, 838.025/322)[:3]
+    -3.42693206 -5.81403435 -2.23440737
+
+    The non analytic terms are defined too in the critical density
+    >>> st = H2O(T=1.2*H2O.Tc, rho=H2O.rhoc)
+    >>> print "%0.5f" % st.P.MPa
+    58.81077
+    """
+    _cache = {}
+    _cacheSize = 256
+
+    @classmethod
+    def compile(cls, constants):
+        """Return the compiled terms for the equation, reusing it if the
+        equation has been already used"""
+        engine = cls._cache.get(id(constants))
+        if engine is None or engine.constants is not constants:
+            if len(cls._cache) >= cls._cacheSize:
+                cls._cache.clear()
+            engine = cls(constants)
+            cls._cache[id(constants)] = engine
+        return engine
+
+    def __init__(self, constants):
+        self.constants = constants
+
+        # Polinomial terms
+        self.nr1, self.d1, self.t1 = self._pack(constants, "nr1", "d1", "t1")
+        self.dd1 = self.d1*(self.d1-1)
+        self.tt1 = self.t1*(self.t1-1)
+
+        # Exponential terms
+        self.nr2, self.d2, self.g2, self.t2, self.c2 = self._pack(
+            constants, "nr2", "d2", "gamma2", "t2", "c2")
+        self.gc2 = self.g2*self.c2
+        self.tt2 = self.t2*(self.t2-1)
+
+        # Gaussian terms
+        n3 = len(constants.get("nr3", []))
+        self.nr3, self.d3, self.t3, self.a3, self.e3, self.b3, self.g3, \
+            self.ex1, self.ex2 = self._pack(
+                constants, "nr3", "d3", "t3", "alfa3", "epsilon3", "beta3",
+                "gamma3", ("exp1", [2]*n3), ("exp2", [2]*n3))
+
+        # Non analitic terms
+        self.nr4, self.a4, self.b4, self.A, self.B, self.C, self.D, \
+            self.bt4 = self._pack(constants, "nr4", "a4", "b4", "A", "B",
+                                  "C", "D", "beta4")
+        self.e4 = 0.5/self.bt4
+
+        # Hard sphere term
+        self.Fi = constants.get("Fi", None)
+
+        # Special form from Saul, A. and Wagner, W. Water 58 coefficient
+        self.nr5, self.d5, self.t5 = self._pack(constants, "nr5", "d5", "t5")
+
+    @staticmethod
+    def _pack(constants, *keys):
+        """Return the coefficients lists as contiguous float arrays truncated
+        to the same length, like the zip over the terms would do
+        keys can be a key name or a tuple with key name and default value"""
+        values = []
+        for key in keys:
+            if isinstance(key, tuple):
+                key, default = key
+            else:
+                default = []
+            values.append(constants.get(key, default))
+        n = min(len(x) for x in values)
+        return [array(x[:n], dtype=float) for x in values]
+
+    @staticmethod
+    def _output(shape, values):
+        """Return scalar values for scalar input"""
+        if shape:
+            return values
+        return tuple(float(x) for x in values)
+
+    def phir(self, tau, delta):
+        """Residual Helmholtz free energy and its derivatives
+        Input:
+            tau: Inverse reduced temperature, Tc/T
+            delta: Reduced density, rho/rhoc
+        Output:
+            fir, firt, firtt, fird, firdd, firdt, firdtt
+        """
+        tau, delta = broadcast_arrays(asarray(tau, dtype=float),
+                                      asarray(delta, dtype=float))
+        shape = tau.shape
+        null = delta == 0
+        with errstate(all="ignore"):
+            fir = self._phir(tau, where(null, 1., delta))
+        fir = [where(null, 0., x) for x in fir]
+        return self._output(shape, fir)
+
+    def _phir(self, tau, delta):
+        t = tau[..., newaxis]
+        d = delta[..., newaxis]
+
+        # Polinomial terms
+        n, dd, tt = self.nr1, self.d1, self.t1
+        term = n*d**dd*t**tt
+        fir = term.sum(-1)
+        fird = dot(term, dd)/delta
+        firdd = dot(term, self.dd1)/delta**2
+        firt = dot(term, tt)/tau
+        firtt = dot(term, self.tt1)/tau**2
+        firdt = dot(term, tt*dd)/delta/tau
+        firdtt = dot(term, self.tt1*dd)/delta/tau**2
+
+        # Exponential terms
+        if self.nr2.size:
+            n, dd, tt = self.nr2, self.d2, self.t2
+            dc = d**self.c2
+            term = n*d**dd*t**tt*exp(-self.g2*dc)
+            fd = dd-self.gc2*dc
+            termd = term*fd
+            fir += term.sum(-1)
+            fird += termd.sum(-1)/delta
+            firdd += (term*(fd*(fd-1)-self.gc2**2*dc)).sum(-1)/delta**2
+            firt += dot(term, tt)/tau
+            firtt += dot(term, self.tt2)/tau**2
+            firdt += dot(termd, tt)/tau/delta
+            firdtt += dot(termd, self.tt2)/tau**2/delta
+
+        # Gaussian terms
+        if self.nr3.size:
+            n, dd, tt = self.nr3, self.d3, self.t3
+            a, e, b, g = self.a3, self.e3, self.b3, self.g3
+            ex1, ex2 = self.ex1, self.ex2
+            expo = exp(-a*(d-e)**ex1-b*(t-g)**ex2)
+            term = n*d**dd*t**tt*expo
+            ft = tt/t-2*b*(t-g)
+            ftt = ft**ex2-tt/t**2-2*b
+            fd = dd/d-2*a*(d-e)
+            fir += term.sum(-1)
+            fird += (term*(dd/d-ex1*a*(d-e)**(ex1-1))).sum(-1)
+            firdd += (n*t**tt*expo*(
+                -2*a*d**dd+4*a**2*d**dd*(d-e)**ex1 -
+                4*dd*a*d**(dd-1)*(d-e)+dd*(dd-1)*d**(dd-2))).sum(-1)
+            firt += (term*ft).sum(-1)
+            firtt += (term*ftt).sum(-1)
+            firdt += (term*ft*fd).sum(-1)
+            firdtt += (term*ftt*fd).sum(-1)
+
+        # Non analitic terms
+        if self.nr4.size:
+            n, a4, b, bt, e4 = self.nr4, self.a4, self.b4, self.bt4, self.e4
+            A, Bi, Ci, D = self.A, self.B, self.C, self.D
+            d1 = d-1
+            d2 = d1**2
+            t1 = t-1
+            d2e4 = d2**(e4-2)
+            d2e4_1 = d2**(e4-1)
+            d2a4 = d2**(a4-2)
+            d2a4_1 = d2**(a4-1)
+            Tita = (1-t)+A*d2e4_1*d2
+            F = exp(-Ci*d2-D*t1**2)
+            Fd = -2*Ci*F*d1
+            Fdd = 2*Ci*F*(2*Ci*d2-1)
+            Ft = -2*D*F*t1
+            Ftt = 2*D*F*(2*D*t1**2-1)
+            Fdt = 4*Ci*D*F*d1*t1
+            Fdtt = 4*Ci*D*F*d1*(2*D*t1**2-1)
+
+            Delta = Tita**2+Bi*d2a4_1*d2
+            Deltad = d1*(A*Tita*2/bt*d2e4_1+2*Bi*a4*d2a4_1)
+            Deltadd = Deltad/d1+d2*(4*Bi*a4*(a4-1)*d2a4 +
+                                    2*A**2/bt**2*d2e4_1**2 +
+                                    A*Tita*4/bt*(e4-1)*d2e4)
+            DeltaB2 = Delta**(b-2)
+            DeltaB1 = DeltaB2*Delta
+            DeltaB = DeltaB1*Delta
+            DeltaBd = b*DeltaB1*Deltad
+            DeltaBdd = b*(DeltaB1*Deltadd+(b-1)*DeltaB2*Deltad**2)
+            DeltaBt = -2*Tita*b*DeltaB1
+            DeltaBtt = 2*b*DeltaB1+4*Tita**2*b*(b-1)*DeltaB2
+            DeltaBdt = -A*b*2/bt*DeltaB1*d1*d2e4_1 - \
+                2*Tita*b*(b-1)*DeltaB2*Deltad
+            DeltaBdtt = 2*b*(b-1)*DeltaB2*(
+                Deltad*(1+2*Tita**2*(b-2)/Delta)+4*Tita*A*d1/bt*d2e4_1)
+
+            # The derivatives of Delta are undefined in the critical
+            # density, use the limit value
+            critic = d1 == 0
+            if critic.any():
+                Deltadd, DeltaBd, DeltaBdd, DeltaBt, DeltaBtt, DeltaBdt, \
+                    DeltaBdtt = [where(critic, 0., x) for x in (
+                        Deltadd, DeltaBd, DeltaBdd, DeltaBt, DeltaBtt,
+                        DeltaBdt, DeltaBdtt)]
+
+            fir += (n*DeltaB*d*F).sum(-1)
+            fird += (n*(DeltaB*(F+d*Fd)+DeltaBd*d*F)).sum(-1)
+            firdd += (n*(DeltaB*(2*Fd+d*Fdd)+2*DeltaBd*(F+d*Fd) +
+                         DeltaBdd*d*F)).sum(-1)
+            firt += (n*d*(DeltaBt*F+DeltaB*Ft)).sum(-1)
+            firtt += (n*d*(DeltaBtt*F+2*DeltaBt*Ft+DeltaB*Ftt)).sum(-1)
+            firdt += (n*(DeltaB*(Ft+d*Fdt)+d*DeltaBd*Ft +
+                         DeltaBt*(F+d*Fd)+DeltaBdt*d*F)).sum(-1)
+            firdtt += (n*((DeltaBtt*F+2*DeltaBt*Ft+DeltaB*Ftt) +
+                          d*(DeltaBdtt*F+DeltaBtt*Fd+2*DeltaBdt*Ft +
+                             2*DeltaBt*Fdt+DeltaBt*Ftt+DeltaB*Fdtt))).sum(-1)
+
+        # Hard sphere term
+        if self.Fi:
+            f = self.Fi
+            n = 0.1617
+            a = 0.689
+            g = 0.3674
+            t = tau
+            d = delta
+            X = n*d/(a+(1-a)/t**g)
+            Xd = n/(a+(1-a)/t**g)
+            Xt = n*d*(1-a)*g/t**(g+1)/(a+(1-a)/t**g)**2
+            Xdt = n*(1-a)*g/t**(g+1)/(a+(1-a)/t**g)**2
+            Xtt = -n*d*((1-a)*g/t**(g+2)*((g+1)*(a+(1-a)/t**g) -
+                                          2*g*(1-a)/t**g))/(a+(1-a)/t**g)**3
+            Xdtt = -n*((1-a)*g/t**(g+2)*((g+1)*(a+(1-a)/t**g) -
+                                         2*g*(1-a)/t**g))/(a+(1-a)/t**g)**3
+
+            ahdX = -(f**2-1)/(1-X)+(f**2+3*f+X*(f**2-3*f))/(1-X)**3
+            ahdXX = -(f**2-1)/(1-X)**2 + \
+                (3*(f**2+3*f)+(f**2-3*f)*(1+2*X))/(1-X)**4
+            ahdXXX = -2*(f**2-1)/(1-X)**3 + \
+                6*(2*(f**2+3*f)+(f**2-3*f)*(1+X))/(1-X)**5
+
+            fir += (f**2-1)*log(1-X)+((f**2+3*f)*X-3*f*X**2)/(1-X)**2
+            fird += ahdX*Xd
+            firdd += ahdXX*Xd**2
+            firt += ahdX*Xt
+            firtt += ahdXX*Xt**2+ahdX*Xtt
+            firdt += ahdXX*Xt*Xd+ahdX*Xdt
+            firdtt += ahdXXX*Xt**2*Xd+ahdXX*(Xtt*Xd+2*Xdt*Xt)*ahdX*Xdtt
+
+        # Special form from Saul, A. and Wagner, W. Water 58 coefficient
+        if self.nr5.size:
+            t = tau[..., newaxis]
+            d = delta[..., newaxis]
+            n, dd, tt = self.nr5, self.d5, self.t5
+            delta6 = delta**6
+            factor = where(delta < 0.2, 1.6*delta6*(1-1.2*delta6),
+                           exp(0.4*delta6)-exp(-2*delta6))
+            factord = -2.4*exp(-0.4*delta6)+12*exp(-2*delta6)
+            factordd = 5.76*exp(-0.4*delta6)-144*exp(-2*delta6)
+
+            term = n*t**tt
+            fr = (term*d**dd).sum(-1)
+            frd1 = (term*d**(dd+5)).sum(-1)
+            frd2 = (term*dd*d**(dd-1)).sum(-1)
+            frdd1 = (term*d**(dd+10)).sum(-1)
+            frdd2 = (term*(2*dd+5)*d**(dd+4)).sum(-1)
+            frdd3 = (term*dd*(dd-1)*d**(dd-2)).sum(-1)
+            frt = (term*d**dd*tt/t).sum(-1)
+            frtt = (term*d**dd*tt*(tt-1)/t**2).sum(-1)
+            frdt1 = (term*d**(dd+5)*tt/t).sum(-1)
+            frdt2 = (term*dd*d**(dd-1)*tt/t).sum(-1)
+            frdtt1 = (term*d**(dd+5)*tt*(tt-1)/t**2).sum(-1)
+            frdtt2 = (term*dd*d**(dd-1)*tt*(tt-1)/t**2).sum(-1)
+
+            fir += factor*fr
+            fird += factord*frd1+factor*frd2
+            firdd += factordd*frdd1+factord*frdd2+factor*frdd3
+            firt += factor*frt
+            firtt += factor*frtt
+            firdt += factord*frdt1+factor*frdt2
+            firdtt += factord*frdtt1+factor*frdtt2
+
+        return fir, firt, firtt, fird, firdd, firdt, firdtt
+
+    def virial(self, tau):
+        """Second and third virial coefficient, in reduced form, calculated as
+        the limit of the density derivatives of residual Helmholtz free energy
+        at zero density"""
+        tau = asarray(tau, dtype=float)
+        shape = tau.shape
+        t = tau[..., newaxis]
+        delta_0 = 1e-200
+
+        with errstate(all="ignore"):
+            # Polinomial and exponential terms, calculated as the coefficient
+            # of delta and delta² in its series expansion to avoid the
+            # overflow of the delta_0 powers
+            n, d, tt = self.nr1, self.d1, self.t1
+            B = where(d == 1, n*t**tt, 0.).sum(-1)
+            C = where(d == 2, 2*n*t**tt, 0.).sum(-1)
+            if self.nr2.size:
+                B += self._seriesExp(t, 1)
+                C += 2*self._seriesExp(t, 2)
+
+            # Gaussian terms
+            if self.nr3.size:
+                n, d, tt = self.nr3, self.d3, self.t3
+                a, e, b, g = self.a3, self.e3, self.b3, self.g3
+                ex1, ex2 = self.ex1, self.ex2
+                expo = exp(-a*(delta_0-e)**ex1-b*(t-g)**ex2)
+                B += (n*delta_0**d*t**tt*expo *
+                      (d/delta_0-2*a*(delta_0-e))).sum(-1)
+                C += (n*t**tt*expo*(
+                    -2*a*delta_0**d+4*a**2*delta_0**d*(delta_0-e)**ex1 -
+                    4*d*a*delta_0**2*(delta_0-e)+d*2*delta_0)).sum(-1)
+
+            # Non analitic terms
+            if self.nr4.size:
+                n, a4, b, bt = self.nr4, self.a4, self.b4, self.bt4
+                A, Bi, Ci, D = self.A, self.B, self.C, self.D
+                d1 = delta_0-1
+                d2 = d1**2
+                Tita = (1-t)+A*d2**(0.5/bt)
+                Delta = Tita**2+Bi*d2**a4
+                Deltad = d1*(A*Tita*2/bt*d2**(0.5/bt-1) +
+                             2*Bi*a4*d2**(a4-1))
+                Deltadd = Deltad/d1+d2*(
+                    4*Bi*a4*(a4-1)*d2**(a4-2)+2*A**2/bt**2 *
+                    (d2**(0.5/bt-1))**2+A*Tita*4/bt*(0.5/bt-1) *
+                    d2**(0.5/bt-2))
+                DeltaBd = b*Delta**(b-1)*Deltad
+                DeltaBdd = b*(Delta**(b-1)*Deltadd +
+                              (b-1)*Delta**(b-2)*Deltad**2)
+                F = exp(-Ci*d2-D*(t-1)**2)
+                Fd = -2*Ci*F*d1
+                Fdd = 2*Ci*F*(2*Ci*d2-1)
+                B += (n*(Delta**b*(F+delta_0*Fd)+DeltaBd*delta_0*F)).sum(-1)
+                C += (n*(Delta**b*(2*Fd+delta_0*Fdd) +
+                         2*DeltaBd*(F+delta_0*Fd) +
+                         DeltaBdd*delta_0*F)).sum(-1)
+
+            # Hard sphere term
+            if self.Fi:
+                f = self.Fi
+                n = 0.1617
+                a = 0.689
+                g = 0.3674
+                X = n*delta_0/(a+(1-a)/tau**g)
+                Xd = n/(a+(1-a)/tau**g)
+                ahdX = -(f**2-1)/(1-X)+(f**2+3*f+X*(f**2-3*f))/(1-X)**3
+                ahdXX = -(f**2-1)/(1-X)**2 + \
+                    (3*(f**2+3*f)+(f**2-3*f)*(1+2*X))/(1-X)**4
+                B += ahdX*Xd
+                C += ahdXX*Xd**2
+
+            # Special form from Saul, A. and Wagner, W. Water 58 coefficient
+            if self.nr5.size:
+                n, d, tt = self.nr5, self.d5, self.t5
+                term = n*t**tt
+                Bsum1 = (term*delta_0**(d+5)).sum(-1)
+                Bsum2 = where(d == 0, 0., term*d*delta_0**(d-1)).sum(-1)
+                Csum1 = (term*delta_0**(d+10)).sum(-1)
+                Csum2 = (term*(2*d+5)*delta_0**(d+4)).sum(-1)
+                Csum3 = where(d*(d-1) == 0, 0.,
+                              term*d*(d-1)*delta_0**(d-2)).sum(-1)
+                B += (-2.4*exp(-0.4*delta_0**6)+12*exp(-2*delta_0**6))*Bsum1 +\
+                    (exp(0.4*delta_0**6)-exp(-2*delta_0**6))*Bsum2
+                C += (5.76*exp(-0.4*delta_0**6) -
+                      144*exp(-2*delta_0**6))*Csum1 + \
+                    (-2.4*exp(-0.4*delta_0**6)+12*exp(-2*delta_0**6))*Csum2 +\
+                    (exp(0.4*delta_0**6)-exp(-2*delta_0**6))*Csum3
+
+        return self._output(shape, (B, C))
+
+    def _seriesExp(self, t, p):
+        """Coefficient of delta**p in the series expansion of the exponential
+        terms, n·tau^t·delta^d·exp(-gamma·delta^c)"""
+        n, d, g, tt, c = self.nr2, self.d2, self.g2, self.t2, self.c2
+        m = (p-d)/c
+        valid = (m >= 0) & (m == floor(m))
+        m = where(valid, m, 0)
+        coef = where(valid, (-g)**m/gamma(m+1), 0.)
+        return (n*coef*t**tt).sum(-1)
+
+
 class _fase(object):
     """Class to implement a null phase"""
     v = None
@@ -388,7 +781,9 @@ class MEoS(_fase):
             if self.status in (1, 3):
                 converge = True
                 for input in self._mode.split("-"):
-                    if abs(self.kwargs[input]-self.__getattribute__(input)._data) > 1e-9:
+                    value = self.kwargs[input]
+                    if abs(value-self.__getattribute__(input)._data) > \
+                            1e-9*max(1, abs(value)):
                         converge = False
                         break
                 if not converge:
@@ -458,50 +853,7 @@ class MEoS(_fase):
         h = self.kwargs["h"]
         u = self.kwargs["u"]
         x = self.kwargs["x"]
-        eq = self.kwargs["eq"]
-        visco = self.kwargs["visco"]
-        thermal = self.kwargs["thermal"]
-        ref = self.kwargs["ref"]
-        refvalues = self.kwargs["refvalues"]
-        
-        self._ref(ref, refvalues)
-
-        if self.id:
-            self.componente = compuestos.Componente(self.id)
-
-        # Opcion de aceptar el nombre interno de la ecuacion
-        if isinstance(eq, str) and eq in self.__class__.__dict__:
-            eq = self.eq.index(self.__class__.__dict__[eq])
-
-        if eq == "PR":
-            self._eq = self._PengRobinson
-            self._constants = self.eq[0]
-        elif eq == "Generalised":
-            self._eq = self._Helmholtz
-            self._Generalised()
-        elif eq == "GERG":
-            try:
-                self._constants = self.GERG
-            except:
-                self._constants = self.eq[0]
-            if self._constants["__type__"] == "Helmholtz":
-                self._eq = self._Helmholtz
-            else:
-                self._eq = self._MBWR
-        elif self.eq[eq]["__type__"] == "Helmholtz":
-            self._eq = self._Helmholtz
-            self._constants = self.eq[eq]
-        elif self.eq[eq]["__type__"] == "MBWR":
-            self._eq = self._MBWR
-            self._constants = self.eq[eq]
-        elif self.eq[eq]["__type__"] == "ECS":
-            self._eq = self._ECS
-            self._constants = self.eq[eq]
-
-        if self._viscosity:
-            self._viscosity = self._viscosity[visco]
-        if self._thermal:
-            self._thermal = self._thermal[thermal]
+        eq = self._configure()
 
         propiedades = None
 
@@ -587,12 +939,12 @@ class MEoS(_fase):
                     x = (1./rho-1/rhol)/(1/rhov-1/rhol)
                     return Ps-P, vapor["h"]*1000*x+liquido["h"]*1000*(1-x)-h
 
-                rho, T = self.fsolve(funcion, True, funcion2, **{"P": P, "h": h})
+                rho, T = self._flashPX(P, h, "h", funcion, funcion2)
 
             elif self._mode == "P-s":
                 def funcion(parr):
                     par = self._eq(parr[0], parr[1])
-                    return par["P"]*1000-P, par["s"]*1000-s
+                    return par["P"]-P, par["s"]*1000-s
                 def funcion2(parr):
                     rho, T = parr
                     rhol, rhov, Ps = self._saturation(T)
@@ -601,7 +953,7 @@ class MEoS(_fase):
                     x = (1./rho-1./rhol)/(1./rhov-1./rhol)
                     return Ps-P, vapor["s"]*1000*x+liquido["s"]*1000*(1-x)-s
 
-                rho, T = self.fsolve(funcion, True, funcion2, **{"P": P, "s": s})
+                rho, T = self._flashPX(P, s, "s", funcion, funcion2)
 
             elif self._mode == "P-u":
                 def funcion(parr):
@@ -764,13 +1116,11 @@ class MEoS(_fase):
             self.status = 1
 
         elif self._mode == "P-x":
-            # Iterate over saturation routine to get T
-            def funcion(T):
-                T = float(T)
-                rhol, rhov, Ps = self._saturation(T)
-                return Ps-P
-            T = fsolve(funcion, 0.9*self.Tc)[0]
-            rhol, rhov, Ps = self._saturation(T)
+            # Check input P in saturation range
+            if P >= self.Pc:
+                raise ValueError("Wrong input values")
+
+            T, rhol, rhov, Ps = self._Tsat(P)
             rho = 1/(1/rhov*x+1/rhol*(1-x))
             vapor = self._eq(rhov, T)
             liquido = self._eq(rhol, T)
@@ -855,11 +1205,11 @@ class MEoS(_fase):
             self.sigma = unidades.Tension(None)
 
         if 0 < x < 1:
-            self.virialB = unidades.SpecificVolume(vapor["B"]/self.rhoc)
-            self.virialC = unidades.SpecificVolume_square(vapor["C"]/self.rhoc**2)
+            B, C = self._virial(T, vapor)
         else:
-            self.virialB = unidades.SpecificVolume(propiedades["B"]/self.rhoc)
-            self.virialC = unidades.SpecificVolume_square(propiedades["C"]/self.rhoc**2)
+            B, C = self._virial(T, propiedades)
+        self.virialB = unidades.SpecificVolume(B/self.rhoc)
+        self.virialC = unidades.SpecificVolume_square(C/self.rhoc**2)
             
         if self.Tt <= T <= self.Tc:
             self.Hvap = unidades.Enthalpy(vapor["h"]-liquido["h"], "kJkg")
@@ -870,20 +1220,70 @@ class MEoS(_fase):
         self.invT = unidades.InvTemperature(-1/self.T)
 
 
-    def fsolve(self, function, phases=True, function2phase=None, **kwargs):
+    def _configure(self):
+        """Define the reference state and the equations to use from kwargs,
+        return the index of the equation of state"""
+        eq = self.kwargs["eq"]
+        self._ref(self.kwargs["ref"], self.kwargs["refvalues"])
+
+        if self.id:
+            self.componente = compuestos.getComponente(self.id)
+
+        # Opcion de aceptar el nombre interno de la ecuacion
+        if isinstance(eq, str) and eq in self.__class__.__dict__:
+            eq = self.eq.index(self.__class__.__dict__[eq])
+
+        if eq == "PR":
+            self._eq = self._PengRobinson
+            self._constants = self.eq[0]
+        elif eq == "Generalised":
+            self._eq = self._Helmholtz
+            self._Generalised()
+        elif eq == "GERG":
+            try:
+                self._constants = self.GERG
+            except:
+                self._constants = self.eq[0]
+            if self._constants["__type__"] == "Helmholtz":
+                self._eq = self._Helmholtz
+            else:
+                self._eq = self._MBWR
+        elif self.eq[eq]["__type__"] == "Helmholtz":
+            self._eq = self._Helmholtz
+            self._constants = self.eq[eq]
+        elif self.eq[eq]["__type__"] == "MBWR":
+            self._eq = self._MBWR
+            self._constants = self.eq[eq]
+        elif self.eq[eq]["__type__"] == "ECS":
+            self._eq = self._ECS
+            self._constants = self.eq[eq]
+
+        if self._viscosity:
+            self._viscosity = self._viscosity[self.kwargs["visco"]]
+        if self._thermal:
+            self._thermal = self._thermal[self.kwargs["thermal"]]
+        return eq
+
+    def fsolve(self, function, phases=True, function2phase=None, rho0=None,
+               T0=None, **kwargs):
         """Iterate to calculate T and rho
         function: function to iterate
         phases: calculate two phases region
-        funtion2phase: function to iterate in two phase region"""
+        funtion2phase: function to iterate in two phase region
+        rho0, T0: initial values to try first"""
         if "T" not in kwargs:
             to = [self.Tc, self._constants["Tmin"], self._constants["Tmax"]]
             if self.kwargs["T0"]:
                 to.insert(0, self.kwargs["T0"])
+            if T0:
+                to.insert(0, T0)
         if "rho" not in kwargs:
             rhov = self._Vapor_Density(self.Tt)
             ro = [322, rhov, self.rhoc, self._constants["rhomax"]*self.M, 1, 1e-3]
             if self.kwargs["rho0"]:
                 ro.insert(0, self.kwargs["rho0"])
+            if rho0:
+                ro.insert(0, rho0)
         
         rinput = None
         rho, T = 0, 0
@@ -982,6 +1382,25 @@ class MEoS(_fase):
         else:
             return rho, T
 
+    def _flashPX(self, P, value, key, funcion, funcion2):
+        """Calculate the density and temperature of states defined with P and
+        h or s, with the newton method of batch calculation, where the
+        saturation states define the phase so the two phase states are
+        calculated directly. If it doesn't converge use the general fsolve
+            key: name of property, h or s
+            funcion, funcion2: functions to iterate in single phase and two
+                phase region"""
+        with errstate(all="ignore"):
+            try:
+                prop = self._batchPX(array([P], dtype=float),
+                                     array([value], dtype=float), key)
+            except (ValueError, ZeroDivisionError, OverflowError):
+                prop = None
+        if prop is not None and isfinite(prop["T"][0]) and \
+                isfinite(prop["rho"][0]):
+            return prop["rho"][0], prop["T"][0]
+        return self.fsolve(funcion, True, funcion2, P=P, **{key: value})
+
     def fillNone(self, fase):
         """Fill properties in null phase with a explicative msg"""
         if self.x == 0:
@@ -1073,27 +1492,747 @@ class MEoS(_fase):
                 fase.Prandt = None
             fase.epsilon = unidades.Dimensionless(self._Dielectric(fase.rho, self.T))
 
+    @classmethod
+    def batch(cls, transport=True, **kwargs):
+        """Calculate a set of states in a single call, without the creation of
+        the unidades and phase objects for each point, useful for tables with
+        a big number of points
+        Input:
+            Pair of state variables as arrays (or scalars), broadcastables
+                T-P, T-rho, T-x, P-h, P-s
+            The others kwargs (eq, ref, refvalues, visco, thermal) has the
+            same meaning as in the constructor
+            transport: calculate too the transport properties, evaluated
+                point by point with the scalar correlations
+
+        Return a dict with float64 arrays of properties in SI units:
+            T, P, rho, v, x, h, s, u, cp, cv, cp_cv, w, Z, fi, alfap, betap,
+            joule, mu, k
+        The properties undefined in two phase region are returned as nan
+
+        >>> from lib.mEoS.H2O import H2O
+        >>> st = H2O.batch(T=[300, 500], P=[1e5, 1e5], transport=False)
+        >>> print "%0.2f %0.5f" % tuple(st["rho"])
+        996.56 0.43514
+        """
+        variables = [key for key in cls._batchVariables
+                     if kwargs.get(key, None) is not None]
+        mode = "-".join(variables)
+        if mode not in ("T-P", "T-rho", "T-x", "P-h", "P-s"):
+            raise NotImplementedError(
+                "Batch calculation not supported for %s input" % mode)
+
+        options = {}
+        for key, value in kwargs.iteritems():
+            if key not in cls._batchVariables:
+                options[key] = value
+        fluid = cls(**options)
+        fluid._configure()
+
+        a, b = broadcast_arrays(asarray(kwargs[variables[0]], dtype=float),
+                                asarray(kwargs[variables[1]], dtype=float))
+        shape = a.shape
+        a = a.flatten()
+        b = b.flatten()
+
+        with errstate(all="ignore"):
+            if mode == "T-P":
+                rho = fluid._batchRho(a, b)
+                prop = fluid._batchProperties(rho, a)
+            elif mode == "T-rho":
+                prop = fluid._batchTrho(a, b)
+            elif mode == "T-x":
+                rhol, rhov, Ps = fluid._batchSaturation(a)
+                prop = fluid._batchMix(fluid._batchProperties(rhol, a),
+                                       fluid._batchProperties(rhov, a), b)
+            else:
+                prop = fluid._batchPX(a, b, variables[1])
+
+            if transport:
+                fluid._batchTransport(prop)
+            else:
+                prop["mu"] = prop["k"] = a*nan
+
+        for key in prop:
+            prop[key] = prop[key].reshape(shape)
+        return prop
+
+    _batchVariables = ("T", "P", "rho", "h", "s", "x")
+
+    def _batchProperties(self, rho, T):
+        """Properties of single phase states as float arrays in SI units"""
+        if self._eq == self._Helmholtz:
+            estado = self._eq(rho, T)
+        else:
+            estados = [self._eq(r, t) for r, t in zip(rho, T)]
+            estado = {}
+            for key in ("P", "h", "s", "cv", "cp", "w", "alfap", "betap",
+                        "fugacity"):
+                estado[key] = array([e[key] for e in estados], dtype=float)
+
+        prop = {}
+        prop["T"] = T
+        prop["P"] = P = estado["P"]
+        prop["rho"] = rho
+        prop["v"] = v = 1./rho
+        prop["x"] = where((T < self.Tc) & (rho >= self.rhoc), 0., 1.)
+        prop["h"] = estado["h"]*1000
+        prop["s"] = estado["s"]*1000
+        prop["u"] = prop["h"]-P*v
+        prop["cp"] = estado["cp"]*1000
+        prop["cv"] = cv = estado["cv"]*1000
+        prop["cp_cv"] = prop["cp"]/cv
+        prop["w"] = estado["w"]
+        prop["Z"] = P*v/self.R/T
+        prop["fi"] = estado["fugacity"]
+        prop["alfap"] = alfap = estado["alfap"]
+        prop["betap"] = betap = estado["betap"]
+
+        # Joule-Thomson coefficient, (dT/dP)_h, in the same way as derivative
+        dTh = cv+P*v*alfap
+        dvh = P*(T*alfap-v*betap)
+        prop["joule"] = -dvh/(-P*betap*dTh-P*alfap*dvh)
+        return prop
+
+    @staticmethod
+    def _batchMix(liquido, vapor, x):
+        """Properties of two phase states from the saturated phases"""
+        prop = {}
+        for key in liquido:
+            prop[key] = where(x == 0, liquido[key],
+                              where(x == 1, vapor[key], nan))
+        prop["T"] = liquido["T"]
+        prop["P"] = vapor["P"]
+        prop["x"] = x
+        prop["v"] = x*vapor["v"]+(1-x)*liquido["v"]
+        prop["rho"] = 1./prop["v"]
+        for key in ("h", "s", "u", "Z"):
+            prop[key] = x*vapor[key]+(1-x)*liquido[key]
+        return prop
+
+    def _batchRhoGuess(self, T, P):
+        """Initial density for the T-P iteration, using the ancillary
+        equations in subcritical region and the ideal gas elsewhere"""
+        rho = minimum(P/self.R/T, self._constants["rhomax"]*self.M)
+        if self._vapor_Pressure and self._liquid_Density:
+            sub = T < self.Tc
+            Ts = T[sub]
+            Pv = self._ancillary(self._vapor_Pressure, Ts, 0.5)*self.Pc
+            rhol = self._ancillary(self._liquid_Density, Ts, 1./3)*self.rhoc
+            rho[sub] = where(P[sub] > Pv, rhol, rho[sub])
+        return rho
+
+    def _batchRho(self, T, P, rho0=None):
+        """Density of single phase states with T and P as arrays, using a
+        vectorized newton method with the analytic derivative dP/drho, the
+        points without convergence are solved with the scalar fsolve"""
+        if rho0 is None:
+            rho0 = self._batchRhoGuess(T, P)
+        rho = array(rho0, dtype=float)
+
+        todo = ones(T.shape, dtype=bool)
+        if self._eq == self._Helmholtz:
+            for i in range(50):
+                idx = todo.nonzero()[0]
+                if not idx.size:
+                    break
+                r = rho[idx]
+                estado = self._eq(r, T[idx])
+                dpdrho = estado["dpdrho"]
+                step = (estado["P"]-P[idx])/dpdrho
+                # Limit the step to avoid the jump to the other phase
+                step = maximum(minimum(step, 0.5*r), -0.5*r)
+                # In the mechanical unstable region go away from critic
+                step = where(dpdrho > 0, step,
+                             where(r > self.rhoc, -0.1*r, 0.1*r))
+                rho[idx] = r-step
+                todo[idx[abs(step) <= 1e-11*r]] = False
+
+        for i in todo.nonzero()[0]:
+            t, p = float(T[i]), float(P[i])
+            rinput = fsolve(lambda r: self._eq(r, t)["P"]-p, float(rho0[i]),
+                            full_output=True)
+            if rinput[2] == 1:
+                rho[i] = rinput[0][0]
+            else:
+                rho[i] = nan
+        return rho
+
+    def _batchSaturation(self, T):
+        """Saturation densities and pressure for an array of temperatures,
+        each different temperature is solved only once"""
+        rhol = T*nan
+        rhov = T*nan
+        Ps = T*nan
+        sub = (T >= self.Tt) & (T <= self.Tc)
+        values, index = unique(T[sub], return_inverse=True)
+        sat = array([self._saturation(t) for t in values], dtype=float)
+        if sat.size:
+            rhol[sub] = sat[index, 0]
+            rhov[sub] = sat[index, 1]
+            Ps[sub] = sat[index, 2]
+        return rhol, rhov, Ps
+
+    def _batchTrho(self, T, rho):
+        """Properties of states defined by T-rho arrays, checking the two
+        phase region with the saturation densities"""
+        prop = self._batchProperties(rho, T)
+        sub = (T >= self.Tt) & (T < self.Tc)
+        if self._liquid_Density and self._vapor_Density:
+            Ts = T[sub]
+            rhol = self._ancillary(self._liquid_Density, Ts, 1./3)*self.rhoc
+            rhov = self._ancillary(self._vapor_Density, Ts, 1./3)*self.rhoc
+            sub[sub] = (rho[sub] < rhol) & (rho[sub] > rhov)
+
+        idx = sub.nonzero()[0]
+        if idx.size:
+            Ts = T[idx]
+            rhol, rhov, Ps = self._batchSaturation(Ts)
+            twophase = (rho[idx] < rhol) & (rho[idx] > rhov)
+            idx = idx[twophase]
+            Ts, rhol, rhov = Ts[twophase], rhol[twophase], rhov[twophase]
+            x = (1/rho[idx]-1/rhol)/(1/rhov-1/rhol)
+            mix = self._batchMix(self._batchProperties(rhol, Ts),
+                                 self._batchProperties(rhov, Ts), x)
+            for key in prop:
+                prop[key][idx] = mix[key]
+        return prop
+
+    def _batchTsat(self, P):
+        """Saturation temperature for an array of subcritical pressures,
+        each different pressure is solved only once"""
+        values, index = unique(P, return_inverse=True)
+        Tsat = [self._Tsat(p)[0] for p in values]
+        return array(Tsat, dtype=float)[index]
+
+    def _batchPX(self, P, value, key):
+        """Properties of states defined by P and h or s arrays
+        The saturation states define the phase of each point, the single
+        phase states are solved with a vectorized newton method over
+        temperature, using cp as analytic derivative, with the density
+        calculated with the T-P procedure"""
+        # Initial temperature out of critical point, where the density
+        # iteration is singular
+        T = P*0+1.01*self.Tc
+        rho = self._batchRhoGuess(T, P)
+        x = P*0+1
+        twophase = zeros(P.shape, dtype=bool)
+        Tlow = P*0+self._constants["Tmin"]
+        Thigh = P*0+self._constants["Tmax"]
+
+        # Subcritical pressures
+        sub = (P < self.Pc).nonzero()[0]
+        if sub.size:
+            Ps = P[sub]
+            Tsat = self._batchTsat(Ps)
+            rhol, rhov, Ps = self._batchSaturation(Tsat)
+            liquido = self._batchProperties(rhol, Tsat)
+            vapor = self._batchProperties(rhov, Tsat)
+            vl = liquido[key]
+            vv = vapor[key]
+            mix = (value[sub] >= vl) & (value[sub] <= vv)
+            xs = (value[sub]-vl)/(vv-vl)
+            liq = value[sub] < vl
+
+            if key == "h":
+                Tl = Tsat-(vl-value[sub])/liquido["cp"]
+                Tv = Tsat+(value[sub]-vv)/vapor["cp"]
+            else:
+                Tl = Tsat*exp(-(vl-value[sub])/liquido["cp"])
+                Tv = Tsat*exp((value[sub]-vv)/vapor["cp"])
+            T[sub] = where(mix, Tsat, where(liq, Tl, Tv))
+            rho[sub] = where(liq, rhol, rhov)
+            Thigh[sub] = where(liq, Tsat, Thigh[sub])
+            Tlow[sub] = where(liq, Tlow[sub], Tsat)
+            twophase[sub] = mix
+            x[sub] = where(mix, xs, where(liq, 0, 1))
+            T[sub] = maximum(minimum(T[sub], Thigh[sub]), Tlow[sub])
+
+        # Single phase states
+        todo = ~twophase
+        for i in range(100):
+            idx = todo.nonzero()[0]
+            if not idx.size:
+                break
+            t = T[idx]
+            # Below critical temperature at supercritical pressure the
+            # last density can be vapor like, restart from liquid density
+            rho0 = rho[idx]
+            cross = (P[idx] >= self.Pc) & (t < self.Tc)
+            rho0[cross] = self._batchRhoGuess(t[cross], P[idx][cross])
+            r = self._batchRho(t, P[idx], rho0)
+            rho[idx] = r
+            estado = self._eq(r, t)
+            f = estado[key]*1000-value[idx]
+            if key == "h":
+                dfdT = estado["cp"]*1000
+            else:
+                dfdT = estado["cp"]*1000/t
+            # h and s are monotonic in temperature, keep the bracket of
+            # solution and use bisection when newton step go out of it,
+            # necessary near the critical point with very high cp
+            Thigh[idx] = where(f > 0, minimum(Thigh[idx], t), Thigh[idx])
+            Tlow[idx] = where(f < 0, maximum(Tlow[idx], t), Tlow[idx])
+            step = f/dfdT
+            step = maximum(minimum(step, 0.2*t), -0.2*t)
+            Tnew = t-step
+            out = (Tnew <= Tlow[idx]) | (Tnew >= Thigh[idx])
+            Tnew = where(out, (Tlow[idx]+Thigh[idx])/2, Tnew)
+            step = t-Tnew
+            T[idx] = Tnew
+            done = (abs(step) <= 1e-11*t) | ~isfinite(step)
+            todo[idx[done]] = False
+        T[todo] = nan
+
+        prop = self._batchProperties(rho, T)
+        idx = twophase.nonzero()[0]
+        if idx.size:
+            Ts = T[idx]
+            rhol, rhov, Ps = self._batchSaturation(Ts)
+            mix = self._batchMix(self._batchProperties(rhol, Ts),
+                                 self._batchProperties(rhov, Ts), x[idx])
+            for key in prop:
+                prop[key][idx] = mix[key]
+        return prop
+
+    def _batchTransport(self, prop):
+        """Add the transport properties to batch results, calculated point
+        by point in single phase states with the scalar correlations"""
+        mu = prop["T"]*nan
+        k = prop["T"]*nan
+        for i in (isfinite(prop["cp"]) & isfinite(prop["rho"])).nonzero()[0]:
+            T = prop["T"][i]
+            rho = prop["rho"][i]
+            self.T = unidades.Temperature(T)
+            self.P = unidades.Pressure(prop["P"][i])
+            self.rho = unidades.Density(rho)
+            fase = _fase()
+            fase.rho = self.rho
+            fase.v = unidades.SpecificVolume(1./rho)
+            fase.cp = unidades.SpecificHeat(prop["cp"][i])
+            fase.cv = unidades.SpecificHeat(prop["cv"][i])
+            fase.cp_cv = unidades.Dimensionless(prop["cp_cv"][i])
+            fase.h = unidades.Enthalpy(prop["h"][i])
+            fase.s = unidades.SpecificHeat(prop["s"][i])
+            fase.u = unidades.Enthalpy(prop["u"][i])
+            fase.alfap = prop["alfap"][i]
+            fase.betap = prop["betap"][i]
+            fase.dpdT_rho = unidades.PressureTemperature(
+                self.derivative("P", "T", "rho", fase))
+            fase.dpdT = fase.dpdT_rho
+            fase.drhodP_T = self.derivative("rho", "P", "T", fase)
+            fase.alfav = self.derivative("v", "T", "P", fase)/fase.v
+
+            # Ideal gas properties used in the dilute gas terms
+            cp0 = self._prop0(rho, T)
+            self.cp0 = unidades.SpecificHeat(cp0.cp)
+            self.cv0 = unidades.SpecificHeat(cp0.cv)
+
+            # Only the numerical errors of correlations out of its range
+            # are skipped, the point remain as nan
+            try:
+                fase.mu = self._Viscosity(fase.rho, self.T, fase)
+            except (ValueError, ZeroDivisionError, OverflowError):
+                fase.mu = None
+            if fase.mu:
+                mu[i] = fase.mu
+            try:
+                fase.k = self._ThCond(fase.rho, self.T, fase)
+            except (ValueError, ZeroDivisionError, OverflowError):
+                fase.k = None
+            if fase.k:
+                k[i] = fase.k
+        prop["mu"] = mu
+        prop["k"] = k
+
+    @classmethod
+    def isoline(cls, var, values, fix, value, **kwargs):
+        """Calculate the states along a line with a fixed property, using a
+        continuation method: each point is predicted from the previous one
+        with the analytic derivatives of equation of state and corrected with
+        a newton method over density. The points without convergence are
+        calculated with the general procedure of constructor.
+        Input:
+            var: variable of line, T, or P for isotherms
+            values: list with the values of var in the line order
+            fix: fixed property of line, T, P, rho, v, h, s, u, x, in SI
+                units like in constructor
+            value: value of fixed property
+            The others kwargs (eq, ref, refvalues, visco, thermal, recursion)
+            has the same meaning as in the constructor
+
+        Return a list with the states of line, with the saturated states in
+        the points where the line cross the saturation curve
+
+        >>> from lib.mEoS.H2O import H2O
+        >>> line = H2O.isoline("T", [350, 400], "P", 101325)
+        >>> print " ".join(["%0.2f-%i" % (st.T, st.x) for st in line])
+        350.00-0 373.12-0 373.12-1 400.00-1
+        >>> line = H2O.isoline("T", [600, 640, 700], "rho", 200)
+        >>> print " ".join(["%0.2f-%0.3f" % (st.T, st.x) for st in line])
+        600.00-0.284 640.00-0.819 642.96-1.000 700.00-1.000
+        """
+        if fix == "v":
+            fix, value = "rho", 1./value
+        if (var, fix) != ("P", "T") and (
+                var != "T" or fix not in ("P", "rho", "h", "s", "u", "x")):
+            raise NotImplementedError(
+                "Isoline not supported for %s-%s" % (var, fix))
+
+        if not isfinite(value):
+            return []
+
+        options = {}
+        for key, val in kwargs.iteritems():
+            if key in cls.kwargs and key not in cls._isolineVariables:
+                options[key] = val
+        fluid = cls(**options)
+        fluid._configure()
+        fluid._options = options
+
+        states = []
+        for T, rho, x in fluid._isolinePoints(var, values, fix, value):
+            if x is None:
+                st = cls(T=T, rho=rho, **options)
+            else:
+                st = cls(T=T, x=x, **options)
+            if st.status in (1, 3):
+                states.append(st)
+        return states
+
+    _isolineVariables = ("T", "P", "rho", "v", "h", "s", "u", "x", "rho0",
+                         "T0")
+
+    def _isolinePoints(self, var, values, fix, value):
+        """Calculate the points of isoline, return a list of tuples (T, rho,
+        x), with rho None for saturated and two phases points and x None for
+        single phase points"""
+        self._sat = {}
+        if var == "P":
+            prop = "P"
+        else:
+            prop = fix
+
+        points = []
+        last = None
+        prev = None
+        for v in values:
+            if var == "P":
+                T, target = value, v
+            else:
+                T, target = v, value
+            phase, x, rhos = self._isolinePhase(T, prop, target)
+            if phase is None:
+                continue
+
+            rho = None
+            if phase == "two" or prop == "x":
+                point = (T, None, x)
+            elif prop == "rho":
+                point = (T, target, None)
+            else:
+                # Predictor with the slope of line in the previous point
+                rho0 = rhos
+                if prev is not None and (phase == prev[2] or
+                                         "single" in (phase, prev[2])):
+                    rho0 = prev[1]+prev[3]*(v-prev[0])
+                    if not 0 < rho0 < self._constants["rhomax"]*self.M*2:
+                        rho0 = prev[1]
+
+                result = None
+                if rho0:
+                    result = self._isolineNewton(T, prop, target, rho0, phase)
+                if result is None:
+                    point = self._isolineFallback(T, prop, target, rho0)
+                    if point is None:
+                        prev = None
+                        continue
+                    rho = point[1]
+                    if rho is None:
+                        phase = "two"
+                    else:
+                        result = self._isolineNewton(T, prop, target, rho,
+                                                     "single")
+                if result is not None:
+                    rho, slope = result
+                    if var == "T":
+                        prev = (v, rho, phase, slope["T"])
+                    else:
+                        prev = (v, rho, phase, slope["P"])
+                    point = (T, rho, None)
+            if rho is None:
+                prev = None
+
+            # Add the saturated states if the line cross the saturation curve
+            if last is not None:
+                points.extend(self._isolineCross(last, (T, phase), prop,
+                                                 target))
+            points.append(point)
+            last = (T, phase)
+        return points
+
+    def _isolineSaturation(self, T):
+        """Saturation states at T, saved to reuse in the isoline"""
+        if T not in self._sat:
+            rhol, rhov, Ps = self._saturation(T)
+            liquido = self._isolineProp(rhol, T)[0]
+            vapor = self._isolineProp(rhov, T)[0]
+            self._sat[T] = liquido, vapor
+        return self._sat[T]
+
+    def _isolineProp(self, rho, T):
+        """Properties and derivatives of single phase state in SI units
+        Return three dict, the properties values, the derivatives with
+        density at constant temperature and the derivatives with temperature
+        at constant density"""
+        estado = self._eq(rho, T)
+        P = estado["P"]
+        v = 1./rho
+        cv = estado["cv"]*1000
+        alfap = estado["alfap"]
+        betap = estado["betap"]
+
+        prop = {}
+        prop["rho"] = rho
+        prop["P"] = P
+        prop["h"] = estado["h"]*1000
+        prop["s"] = estado["s"]*1000
+        prop["u"] = prop["h"]-P*v
+
+        # Derivatives from alfap and betap, like in derivative method
+        drho = {}
+        drho["P"] = v*v*P*betap
+        drho["h"] = -v*v*P*(T*alfap-v*betap)
+        drho["s"] = -v*v*P*alfap
+        drho["u"] = -v*v*P*(T*alfap-1)
+        dT = {}
+        dT["P"] = P*alfap
+        dT["h"] = cv+P*v*alfap
+        dT["s"] = cv/T
+        dT["u"] = cv
+        return prop, drho, dT
+
+    def _isolinePhase(self, T, prop, target):
+        """Phase of point in isoline, return the phase (liquid, vapor, two or
+        single for states out of saturation range), the quality in two phase
+        states and the density of saturated phase to use as initial value"""
+        if prop == "x":
+            if self.Tt <= T <= self.Tc:
+                return "two", target, None
+            return None, None, None
+        if not self.Tt <= T < self.Tc:
+            return "single", None, None
+
+        # Ancillary equations to avoid the saturation calculation far from
+        # the saturation curve
+        rhol = self._Liquid_Density(T)
+        rhov = self._Vapor_Density(T)
+        if prop == "P":
+            Pv = self._Vapor_Pressure(T)
+            if target > 1.05*Pv:
+                return "liquid", None, rhol
+            elif target < 0.95*Pv:
+                return "vapor", None, rhov
+        else:
+            if prop == "rho":
+                # Use specific volume, increasing from liquid to vapor
+                vl, vv, t = 1./rhol, 1./rhov, 1./target
+            else:
+                vl = self._isolineProp(rhol, T)[0][prop]
+                vv = self._isolineProp(rhov, T)[0][prop]
+                t = target
+            delta = 0.05*abs(vv-vl)
+            if t < min(vl, vv)-delta:
+                return "liquid", None, rhol
+            elif t > max(vl, vv)+delta:
+                return "vapor", None, rhov
+
+        liquido, vapor = self._isolineSaturation(T)
+        if prop == "P":
+            if target >= vapor["P"]:
+                return "liquid", None, liquido["rho"]
+            else:
+                return "vapor", None, vapor["rho"]
+
+        vl = liquido[prop]
+        vv = vapor[prop]
+        if prop == "rho":
+            vl, vv = 1./vl, 1./vv
+            target = 1./target
+        if vl <= target <= vv:
+            return "two", (target-vl)/(vv-vl), None
+        elif target < vl:
+            return "liquid", None, liquido["rho"]
+        else:
+            return "vapor", None, vapor["rho"]
+
+    def _isolineNewton(self, T, prop, target, rho, phase):
+        """Newton method over density for the single phase point with
+        prop=target at T, return the density and a dict with the slopes of
+        line, drho/dT at constant prop and drho/dP at constant T"""
+        rhomax = self._constants["rhomax"]*self.M*2
+        for i in range(50):
+            val, drho, dT = self._isolineProp(rho, T)
+            f = val[prop]-target
+            df = drho[prop]
+            if not df or not isfinite(df):
+                return None
+            step = f/df
+            step = max(min(step, 0.5*rho), -0.5*rho)
+            if prop == "P" and df < 0:
+                # Mechanical unstable region, go away from critic
+                if rho > self.rhoc:
+                    step = -0.1*rho
+                else:
+                    step = 0.1*rho
+            rho -= step
+            if not 0 < rho < rhomax:
+                return None
+            if abs(step) <= 1e-11*rho:
+                break
+        else:
+            return None
+
+        # Check the solution is in the expected phase
+        if phase == "liquid" and rho < self.rhoc:
+            return None
+        if phase == "vapor" and rho > self.rhoc:
+            return None
+
+        slope = {}
+        slope["T"] = -dT[prop]/drho[prop]
+        slope["P"] = 1./drho["P"]
+        return rho, slope
+
+    def _isolineFallback(self, T, prop, target, rho0):
+        """Calculate the point with the constructor procedure, return the
+        point tuple or None if it can't be calculated"""
+        kwargs = self._options.copy()
+        kwargs["T"] = T
+        kwargs[prop] = target
+        kwargs["recursion"] = False
+        if rho0:
+            kwargs["rho0"] = rho0
+        st = self.__class__(**kwargs)
+        if st.status not in (1, 3):
+            return None
+        if 0 < st.x < 1:
+            return (T, None, st.x)
+        return (T, st.rho._data, None)
+
+    def _isolineCross(self, last, current, prop, target):
+        """Return the saturated points between two consecutive points of
+        isoline with different phase
+            last, current: tuples with T and phase of points"""
+        T1, phase1 = last
+        T2, phase2 = current
+        order = ["liquid", "two", "vapor"]
+        if sorted((phase1, phase2)) == ["single", "two"]:
+            # Two phase to supercritical region, the line leave the two
+            # phase region by the saturated liquid or vapor below the
+            # critical temperature, search in both
+            Tsat = self.Tc*(1-1e-6)
+            if max(T1, T2) < self.Tc:
+                return []
+            if phase1 == "single":
+                T1 = Tsat
+            else:
+                T2 = Tsat
+            boundaries = [0, 1]
+        elif phase1 == phase2 or phase1 not in order or phase2 not in order:
+            return []
+        else:
+            # Saturated phases crossed, x=0 between liquid and two phase
+            # region and x=1 between two phase and vapor region
+            i1 = order.index(phase1)
+            i2 = order.index(phase2)
+            if i1 < i2:
+                boundaries = [x for x in (0, 1) if i1 <= x < i2]
+            else:
+                boundaries = [x for x in (1, 0) if i2 <= x < i1]
+
+        def f(T, x):
+            estado = self._isolineSaturation(T)[x]
+            if prop == "rho":
+                return 1./estado[prop]-1./target
+            return estado[prop]-target
+
+        points = []
+        for x in boundaries:
+            if T1 == T2:
+                points.append((T1, None, x))
+                continue
+            try:
+                T = brentq(f, min(T1, T2), max(T1, T2), args=(x, ),
+                           xtol=1e-10)
+            except (ValueError, RuntimeError):
+                continue
+            points.append((T, None, x))
+
+        # The line cross the critical point, use the nearest saturated point
+        if not points and "single" in (phase1, phase2):
+            x = int(abs(f(Tsat, 1)) < abs(f(Tsat, 0)))
+            points.append((Tsat, None, x))
+        return points
+
     def _saturation(self, T=None):
-        """Saturation calculation for two phase search"""
+        """Saturation calculation for two phase search, solving the phase
+        equilibrium conditions with a newton method with analytic jacobian,
+        Akasaka R. (2008), doi: 10.1615/JPropFluids.v1.i1.10
+        The initial values are taken from the saturation table of fluid if
+        it's available, else from the ancillary equations. The result is
+        saved in a cache for the next calls at the same temperature
+        Return the liquid and vapor densities and the vapor pressure"""
         if not T:
             T = self.T
         T = float(T)
-        rhoLo = self._Liquid_Density(T)
-        rhoGo = self._Vapor_Density(T)
-        
-        def f(parr):
-            rhol, rhog = parr
-            deltaL = rhol/self.rhoc
-            deltaG = rhog/self.rhoc
-            liquido = self._eq(rhol, T)
-            vapor = self._eq(rhog, T)
-            Jl = deltaL*(1+deltaL*liquido["fird"])
-            Jv = deltaG*(1+deltaG*vapor["fird"])
-            Kl = deltaL*liquido["fird"]+liquido["fir"]+log(deltaL)
-            Kv = deltaG*vapor["fird"]+vapor["fir"]+log(deltaG)
-            return Kv-Kl, Jv-Jl
+        key = (self.__class__.__name__, repr(self.kwargs["eq"]), T)
+        sat = _saturationCache.get(key)
+        if sat is not None:
+            return sat
+
+        table = _saturationTables.get(key[:2])
+        if table and self.Tt <= T < self.Tc:
+            z = (1-T/self.Tc)**(1./3)
+            rhoLo = float(splev(z, table["rhol"]))
+            rhoGo = float(splev(z, table["rhov"]))
+        else:
+            rhoLo = self._Liquid_Density(T)
+            rhoGo = self._Vapor_Density(T)
+
+        try:
+            rhoL, rhoG = self._saturationNewton(T, rhoLo, rhoGo)
+        except (ValueError, ZeroDivisionError, OverflowError):
+            rhoL = None
+
+        # Discard the solution far from the ancillary vapor pressure, it can
+        # be a spurious root of equation of state
+        if rhoL is not None and self._vapor_Pressure:
+            Ps = self._saturationPressure(T, rhoL, rhoG)
+            if not 0.5 < Ps/self._Vapor_Pressure(T) < 2:
+                rhoL = None
+
+        if rhoL is None:
+            def f(parr):
+                rhol, rhog = parr
+                deltaL = rhol/self.rhoc
+                deltaG = rhog/self.rhoc
+                liquido = self._eq(rhol, T)
+                vapor = self._eq(rhog, T)
+                Jl = deltaL*(1+deltaL*liquido["fird"])
+                Jv = deltaG*(1+deltaG*vapor["fird"])
+                Kl = deltaL*liquido["fird"]+liquido["fir"]+log(deltaL)
+                Kv = deltaG*vapor["fird"]+vapor["fir"]+log(deltaG)
+                return Kv-Kl, Jv-Jl
+
+            rhoL, rhoG = fsolve(f, [rhoLo, rhoGo])
+
+        Ps = self._saturationPressure(T, rhoL, rhoG)
+        _saturationCache.put(key, (rhoL, rhoG, Ps))
+        return rhoL, rhoG, Ps
 
-        rhoL, rhoG = fsolve(f, [rhoLo, rhoGo])
+    def _saturationPressure(self, T, rhoL, rhoG):
+        """Vapor pressure from the saturated densities"""
         if rhoL == rhoG:
             Ps = self.Pc
         else:
@@ -1102,7 +2241,116 @@ class MEoS(_fase):
             deltaL = rhoL/self.rhoc
             deltaG = rhoG/self.rhoc
             Ps = self.R*T*rhoL*rhoG/(rhoL-rhoG)*(liquido["fir"]-vapor["fir"]+log(deltaL/deltaG))
-        return rhoL, rhoG, Ps
+        return Ps
+
+    def _saturationNewton(self, T, rhoL, rhoG):
+        """Newton method for the phase equilibrium conditions at T, equality
+        of pressure and gibbs free energy expressed with the J and K
+        functions of Akasaka, return the saturated densities or None if the
+        method don't converge to a non trivial solution"""
+        deltaL = rhoL/self.rhoc
+        deltaG = rhoG/self.rhoc
+        for i in range(50):
+            liquido = self._eq(deltaL*self.rhoc, T)
+            vapor = self._eq(deltaG*self.rhoc, T)
+            if "firdd" not in liquido:
+                return None, None
+
+            Jl = deltaL*(1+deltaL*liquido["fird"])
+            Jv = deltaG*(1+deltaG*vapor["fird"])
+            Kl = deltaL*liquido["fird"]+liquido["fir"]+log(deltaL)
+            Kv = deltaG*vapor["fird"]+vapor["fir"]+log(deltaG)
+            dJl = 1+2*deltaL*liquido["fird"]+deltaL**2*liquido["firdd"]
+            dJv = 1+2*deltaG*vapor["fird"]+deltaG**2*vapor["firdd"]
+            dKl = 2*liquido["fird"]+deltaL*liquido["firdd"]+1/deltaL
+            dKv = 2*vapor["fird"]+deltaG*vapor["firdd"]+1/deltaG
+
+            det = dKv*dJl-dKl*dJv
+            if not det or not isfinite(det):
+                return None, None
+            stepL = ((Kv-Kl)*dJv-(Jv-Jl)*dKv)/det
+            stepG = ((Kv-Kl)*dJl-(Jv-Jl)*dKl)/det
+
+            # Limit the step to keep the densities positive
+            stepL = max(min(stepL, 0.5*deltaL), -0.5*deltaL)
+            stepG = max(min(stepG, 0.5*deltaG), -0.5*deltaG)
+            deltaL -= stepL
+            deltaG -= stepG
+            if abs(stepL) <= 1e-12*deltaL and abs(stepG) <= 1e-12*deltaG:
+                break
+        else:
+            return None, None
+
+        if not deltaL > deltaG*(1+1e-6):
+            return None, None
+        return deltaL*self.rhoc, deltaG*self.rhoc
+
+    def _saturationTable(self):
+        """Table of saturation states of fluid, with splines of saturated
+        densities with (1-T/Tc)^1/3 and of temperature with the logarithm of
+        vapor pressure, used as initial values in saturation calculations.
+        The table is calculated the first time it's needed"""
+        key = (self.__class__.__name__, repr(self.kwargs["eq"]))
+        if key in _saturationTables:
+            return _saturationTables[key]
+
+        zmax = (1-self.Tt/self.Tc)**(1./3)
+        z = []
+        T = []
+        rhol = []
+        rhov = []
+        lnP = []
+        for zi in linspace(0.05, zmax, 40):
+            Ti = self.Tc*(1-zi**3)
+            try:
+                rl, rv, Ps = self._saturation(Ti)
+            except (ValueError, ZeroDivisionError, OverflowError):
+                continue
+            if not rl > rv > 0 or not Ps > 0:
+                continue
+            z.append(zi)
+            T.append(Ti)
+            rhol.append(rl)
+            rhov.append(rv)
+            lnP.append(log(Ps))
+
+        table = None
+        if len(z) > 3 and (diff(lnP) < 0).all():
+            table = {}
+            table["rhol"] = splrep(z, rhol)
+            table["rhov"] = splrep(z, rhov)
+            table["T"] = splrep(lnP[::-1], T[::-1])
+        _saturationTables[key] = table
+        return table
+
+    def _Tsat(self, P):
+        """Saturation temperature at P, solved with a newton method using the
+        Clausius-Clapeyron equation as analytic derivative, with the initial
+        value from the saturation table
+        Return the saturation temperature, densities and pressure"""
+        P = float(P)
+        table = self._saturationTable()
+        if table:
+            T = float(splev(log(P), table["T"]))
+        else:
+            T = fsolve(lambda T: log(self._Vapor_Pressure(T[0])/P),
+                       0.9*self.Tc)[0]
+        T = min(max(T, self.Tt), self.Tc*(1-1e-9))
+
+        for i in range(50):
+            rhol, rhov, Ps = self._saturation(T)
+            liquido = self._eq(rhol, T)
+            vapor = self._eq(rhov, T)
+            dPdT = (vapor["h"]-liquido["h"])*1000/T/(1./rhov-1./rhol)
+            step = log(Ps/P)*Ps/dPdT
+            if not isfinite(step):
+                break
+            T = min(T-step, self.Tc*(1-1e-9))
+            if abs(step) <= 1e-10*T:
+                return T, rhol, rhov, Ps
+        T = fsolve(lambda T: self._saturation(T[0])[2]-P, T)[0]
+        rhol, rhov, Ps = self._saturation(T)
+        return T, rhol, rhov, Ps
 
     def _Helmholtz(self, rho, T):
         """Implementación general de la ecuación de estado Setzmann-Wagner, ecuación de estado de multiparámetros basada en la energía libre de Helmholtz"""
@@ -1110,8 +2358,9 @@ class MEoS(_fase):
         tau = self.Tc/T
         
         fio, fiot, fiott, fiod, fiodd, fiodt = self._phi0(self._constants["cp"], tau, delta)
-        fir, firt, firtt, fird, firdd, firdt, firdtt, B, C=self._phir(tau, delta)
-        
+        engine = HelmholtzResidual.compile(self._constants)
+        fir, firt, firtt, fird, firdd, firdt, firdtt = engine.phir(tau, delta)
+
         propiedades = {}
         propiedades["fir"] = fir
         propiedades["fird"] = fird
@@ -1119,7 +2368,7 @@ class MEoS(_fase):
 
         propiedades["T"] = T
         propiedades["P"] = (1+delta*fird)*self.R*T*rho
-        if rho:
+        if isinstance(rho, ndarray) or rho:
             propiedades["v"] = 1./rho
         else:
             propiedades["v"] = float("inf")
@@ -1134,12 +2383,10 @@ class MEoS(_fase):
         propiedades["alfap"] = (1-delta*tau*firdt/(1+delta*fird))/T
         propiedades["betap"] = rho*(1+(delta*fird+delta**2*firdd)/(1+delta*fird))
         propiedades["fugacity"] = exp(fir+delta*fird-log(1+delta*fird))
-        propiedades["B"] = B
-        propiedades["C"] = C
         propiedades["dpdrho"] = self.R*T*(1+2*delta*fird+delta**2*firdd)
         propiedades["drhodt"] = -rho*(1+delta*fird-delta*tau*firdt) / \
             (T*(1+2*delta*fird+delta**2*firdd))
-        if rho:
+        if isinstance(rho, ndarray) or rho:
             propiedades["dhdrho"] = self.R*T/rho * \
                 (tau*delta*(fiodt+firdt)+delta*fird+delta**2*firdd)
         else:
@@ -1596,7 +2843,9 @@ class MEoS(_fase):
         fiot=Fi0["ao_log"][1]/tau
         fiott=-Fi0["ao_log"][1]/tau**2
 
-        if delta:
+        # Array input are used only in batch mode, with positive densities
+        nonzero = isinstance(delta, ndarray) or delta
+        if nonzero:
             fiod = 1/delta
             fiodd = -1/delta**2
         else:
@@ -1619,7 +2868,7 @@ class MEoS(_fase):
             fio += Fi0["tau*logtau"]*tau*log(tau)
             fiot += Fi0["tau*logtau"]*(log(tau)+1)
             fiot += Fi0["tau*logtau"]/tau
-        if "tau*logdelta" in Fi0 and delta:
+        if "tau*logdelta" in Fi0 and nonzero:
             fio += Fi0["tau*logdelta"]*tau*log(delta)
             fiot += Fi0["tau*logdelta"]*log(delta)
             fiod += Fi0["tau*logdelta"]*tau/delta
@@ -1645,7 +2894,7 @@ class MEoS(_fase):
 
         R_ = cp.get("R", self._constants["R"])
         factor = R_/self._constants["R"]
-        if delta:
+        if nonzero:
             fio = Fi0["ao_log"][0]*log(delta)+factor*fio
         else:
             fio *= factor
@@ -1704,251 +2953,28 @@ class MEoS(_fase):
         return unidades.SpecificHeat(cpsum*self.M*1000)
         
     def _phir(self, tau, delta):
-        delta_0 = 1e-200
-        fir = fird = firdd = firt = firtt = firdt = firdtt = B = C = 0
-
-        if delta:
-            # Polinomial terms
-            nr1 = self._constants.get("nr1", [])
-            d1 = self._constants.get("d1", [])
-            t1 = self._constants.get("t1", [])
-            for n, d, t in zip(nr1, d1, t1):
-                fir += n*delta**d*tau**t
-                fird += n*d*delta**(d-1)*tau**t
-                firdd += n*d*(d-1)*delta**(d-2)*tau**t
-                firt += n*t*delta**d*tau**(t-1)
-                firtt += n*t*(t-1)*delta**d*tau**(t-2)
-                firdt += n*t*d*delta**(d-1)*tau**(t-1)
-                firdtt += n*t*d*(t-1)*delta**(d-1)*tau**(t-2)
-                B += n*d*delta_0**(d-1)*tau**t
-                C += n*d*(d-1)*delta_0**(d-2)*tau**t
-                
-            # Exponential terms
-            nr2 = self._constants.get("nr2", [])
-            d2 = self._constants.get("d2", [])
-            g2 = self._constants.get("gamma2", [])
-            t2 = self._constants.get("t2", [])
-            c2 = self._constants.get("c2", [])
-            for n, d, g, t, c in zip(nr2, d2, g2, t2, c2):
-                fir += n*delta**d*tau**t*exp(-g*delta**c)
-                fird += n*exp(-g*delta**c)*delta**(d-1)*tau**t*(d-g*c*delta**c)
-                firdd += n*exp(-g*delta**c)*delta**(d-2)*tau**t * \
-                    ((d-g*c*delta**c)*(d-1-g*c*delta**c)-g**2*c**2*delta**c)
-                firt += n*t*delta**d*tau**(t-1)*exp(-g*delta**c)
-                firtt += n*t*(t-1)*delta**d*tau**(t-2)*exp(-g*delta**c)
-                firdt += n*t*delta**(d-1)*tau**(t-1)*(d-g*c*delta**c)*exp(-g*delta**c)
-                firdtt += n*t*(t-1)*delta**(d-1)*tau**(t-2)*(d-g*c*delta**c) * \
-                    exp(-g*delta**c)
-                B += n*exp(-g*delta_0**c)*delta_0**(d-1)*tau**t*(d-g*c*delta_0**c)
-                C += n*exp(-g*delta_0**c)*(delta_0**(d-2)*tau**t *
-                    ((d-g*c*delta_0**c)*(d-1-g*c*delta_0**c)-g**2*c**2*delta_0**c))
-
-            # Gaussian terms
-            nr3 = self._constants.get("nr3", [])
-            d3 = self._constants.get("d3", [])
-            t3 = self._constants.get("t3", [])
-            a3 = self._constants.get("alfa3", [])
-            e3 = self._constants.get("epsilon3", [])
-            b3 = self._constants.get("beta3", [])
-            g3 = self._constants.get("gamma3", [])
-            exp1 = self._constants.get("exp1", [2]*len(nr3))
-            exp2 = self._constants.get("exp2", [2]*len(nr3))            
-            for n, d, t, a, e, b, g, ex1, ex2 in zip(nr3, d3, t3, a3, e3, b3, g3, exp1, exp2):
-                fir += n*delta**d*tau**t * \
-                    exp(-a*(delta-e)**ex1-b*(tau-g)**ex2)
-                fird += n*delta**d*tau**t * \
-                    exp(-a*(delta-e)**ex1-b*(tau-g)**ex2) * \
-                    (d/delta-ex1*a*(delta-e)**(ex1-1))
-                firdd += n*tau**t*exp(-a*(delta-e)**ex1-b *
-                    (tau-g)**ex2)*(-2*a*delta**d+4*a**2 *
-                    delta**d*(delta-e)**ex1-4*d*a*delta**(d-1) *
-                    (delta-e)+d*(d-1)*delta**(d-2))
-                firt += n*delta**d*tau**t * \
-                    exp(-a*(delta-e)**ex1-b*(tau-g)**ex2) * \
-                    (t/tau-2*b*(tau-g))
-                firtt += n*delta**d*tau**t * \
-                    exp(-a*(delta-e)**ex1-b*(tau-g)**ex2) * \
-                    ((t/tau-2*b*(tau-g))**ex2-t/tau**2-2*b)
-                firdt += n*delta**d*tau**t * \
-                    exp(-a*(delta-e)**ex1-b*(tau-g)**ex2) * \
-                    (t/tau-2*b*(tau-g))*(d/delta-2*a*(delta-e))
-                firdtt += n*delta**d*tau**t * \
-                    exp(-a*(delta-e)**ex1-b*(tau-g)**ex2) * \
-                    ((t/tau-2*b*(tau-g))**ex2-t/tau**2-2*b) * \
-                    (d/delta-2*a*(delta-e))
-                B += n*delta_0**d*tau**t * \
-                    exp(-a*(delta_0-e)**ex1-b*(tau-g)**ex2) * \
-                    (d/delta_0-2*a*(delta_0-e))
-                C += n*tau**t * \
-                    exp(-a*(delta_0-e)**ex1-b*(tau-g)**ex2) * \
-                    (-2*a*delta_0**d+4*a**2*delta_0**d *
-                    (delta_0-e)**ex1-4*d*a*delta_0**2*(delta_0-e) +
-                    d*2*delta_0)
-
-            # Non analitic terms
-            nr4 = self._constants.get("nr4", [])
-            a4 = self._constants.get("a4", [])
-            b = self._constants.get("b4", [])
-            A = self._constants.get("A", [])
-            Bi = self._constants.get("B", [])
-            Ci = self._constants.get("C", [])
-            D = self._constants.get("D", [])
-            bt = self._constants.get("beta4", [])
-            for i in range(len(nr4)):
-                Tita = (1-tau)+A[i]*((delta-1)**2)**(0.5/bt[i])
-                F = exp(-Ci[i]*(delta-1)**2-D[i]*(tau-1)**2)
-                Fd = -2*Ci[i]*F*(delta-1)
-                Fdd = 2*Ci[i]*F*(2*Ci[i]*(delta-1)**2-1)
-                Ft = -2*D[i]*F*(tau-1)
-                Ftt = 2*D[i]*F*(2*D[i]*(tau-1)**2-1)
-                Fdt = 4*Ci[i]*D[i]*F*(delta-1)*(tau-1)
-                Fdtt = 4*Ci[i]*D[i]*F*(delta-1)*(2*D[i]*(tau-1)**2-1)
-
-                Delta = Tita**2+Bi[i]*((delta-1)**2)**a4[i]
-                Deltad = (delta-1)*(A[i]*Tita*2/bt[i]*((delta-1)**2)**(0.5/bt[i]-1) \
-                    + 2*Bi[i]*a4[i]*((delta-1)**2)**(a4[i]-1))
-                if delta == 1:
-                    Deltadd = 0
-                    DeltaBd = 0
-                    DeltaBdd = 0
-                    DeltaBt = 0
-                    DeltaBtt = 0
-                    DeltaBdt = 0
-                    DeltaBdtt = 0
-                else:
-                    Deltadd = Deltad/(delta-1)+(delta-1)**2 * \
-                        (4*Bi[i]*a4[i]*(a4[i]-1)*((delta-1)**2)**(a4[i]-2) +
-                        2*A[i]**2/bt[i]**2*(((delta-1)**2)**(0.5/bt[i]-1))**2 +
-                        A[i]*Tita*4/bt[i]*(0.5/bt[i]-1)*((delta-1)**2)**(0.5/bt[i]-2))
-                    DeltaBd = b[i]*Delta**(b[i]-1)*Deltad
-                    DeltaBdd = b[i]*(Delta**(b[i]-1)*Deltadd+(b[i]-1)*Delta**(b[i]-2)*Deltad**2)
-                    DeltaBt = -2*Tita*b[i]*Delta**(b[i]-1)
-                    DeltaBtt = 2*b[i]*Delta**(b[i]-1)+4*Tita**2*b[i]*(b[i]-1)*Delta**(b[i]-2)
-                    DeltaBdt = -A[i]*b[i]*2/bt[i]*Delta**(b[i]-1)*(delta-1)*((delta-1)**2) ** \
-                        (0.5/bt[i]-1)-2*Tita*b[i]*(b[i]-1)*Delta**(b[i]-2)*Deltad
-                    DeltaBdtt = 2*b[i]*(b[i]-1)*Delta**(b[i]-2) * \
-                        (Deltad*(1+2*Tita**2*(b[i]-2)/Delta)+4*Tita*A[i] *
-                        (delta-1)/bt[i]*((delta-1)**2)**(0.5/bt[i]-1))
-
-                fir += nr4[i]*Delta**b[i]*delta*F
-                fird += nr4[i]*(Delta**b[i]*(F+delta*Fd)+DeltaBd*delta*F)
-                firdd += nr4[i]*(Delta**b[i]*(2*Fd+delta*Fdd)+2*DeltaBd *
-                    (F+delta*Fd)+DeltaBdd*delta*F)
-                firt += nr4[i]*delta*(DeltaBt*F+Delta**b[i]*Ft)
-                firtt += nr4[i]*delta*(DeltaBtt*F+2*DeltaBt*Ft+Delta**b[i]*Ftt)
-                firdt += nr4[i]*(Delta**b[i]*(Ft+delta*Fdt)+delta*DeltaBd*Ft +
-                    DeltaBt*(F+delta*Fd)+DeltaBdt*delta*F)
-                firdtt += nr4[i]*((DeltaBtt*F+2*DeltaBt*Ft+Delta**b[i]*Ftt) +
-                    delta*(DeltaBdtt*F+DeltaBtt*Fd+2*DeltaBdt*Ft+2*DeltaBt*Fdt +
-                    DeltaBt*Ftt+Delta**b[i]*Fdtt))
-
-                Tita_ = (1-tau)+A[i]*((delta_0-1)**2)**(0.5/bt[i])
-                Delta_ = Tita_**2+Bi[i]*((delta_0-1)**2)**a4[i]
-                Deltad_ = (delta_0-1)*(A[i]*Tita_*2/bt[i]*((delta_0-1)**2) **
-                    (0.5/bt[i]-1)+2*Bi[i]*a4[i]*((delta_0-1)**2)**(a4[i]-1))
-                Deltadd_ = Deltad_/(delta_0-1)+(delta_0-1)**2 * \
-                    (4*Bi[i]*a4[i]*(a4[i]-1)*((delta_0-1)**2)**(a4[i]-2)+2*A[i]**2 /
-                    bt[i]**2*(((delta_0-1)**2)**(0.5/bt[i]-1))**2+A[i]*Tita_ *
-                    4/bt[i]*(0.5/bt[i]-1)*((delta_0-1)**2)**(0.5/bt[i]-2))
-                DeltaBd_ = b[i]*Delta_**(b[i]-1)*Deltad_
-                DeltaBdd_ = b[i]*(Delta_**(b[i]-1)*Deltadd_ +
-                    (b[i]-1)*Delta_**(b[i]-2)*Deltad_**2)
-                F_ = exp(-Ci[i]*(delta_0-1)**2-D[i]*(tau-1)**2)
-                Fd_ = -2*Ci[i]*F_*(delta_0-1)
-                Fdd_ = 2*Ci[i]*F_*(2*Ci[i]*(delta_0-1)**2-1)
-
-                B += nr4[i]*(Delta_**b[i]*(F_+delta_0*Fd_) +
-                    DeltaBd_*delta_0*F_)
-                C += nr4[i]*(Delta_**b[i]*(2*Fd_+delta_0*Fdd_) +
-                    2*DeltaBd_*(F_+delta_0*Fd_) +
-                    DeltaBdd_*delta_0*F_)
-
-            # Hard sphere term
-            if self._constants.get("Fi", None):
-                f = self._constants["Fi"]
-                n = 0.1617
-                a = 0.689
-                g = 0.3674
-                X = n*delta/(a+(1-a)/tau**g)
-                Xd = n/(a+(1-a)/tau**g)
-                Xt = n*delta*(1-a)*g/tau**(g+1)/(a+(1-a)/tau**g)**2
-                Xdt = n*(1-a)*g/tau**(g+1)/(a+(1-a)/tau**g)**2
-                Xtt = -n*delta*((1-a)*g/tau**(g+2)*((g+1)*(a+(1-a)/tau**g)-2*g*(1-a)/tau**g))/(a+(1-a)/tau**g)**3
-                Xdtt = -n*((1-a)*g/tau**(g+2)*((g+1)*(a+(1-a)/tau**g)-2*g*(1-a)/tau**g))/(a+(1-a)/tau**g)**3
-
-                ahdX = -(f**2-1)/(1-X)+(f**2+3*f+X*(f**2-3*f))/(1-X)**3
-                ahdXX = -(f**2-1)/(1-X)**2+(3*(f**2+3*f)+(f**2-3*f)*(1+2*X))/(1-X)**4
-                ahdXXX = -2*(f**2-1)/(1-X)**3+6*(2*(f**2+3*f)+(f**2-3*f)*(1+X))/(1-X)**5
-
-                fir += (f**2-1)*log(1-X)+((f**2+3*f)*X-3*f*X**2)/(1-X)**2
-                fird += ahdX*Xd
-                firdd += ahdXX*Xd**2
-                firt += ahdX*Xt
-                firtt += ahdXX*Xt**2+ahdX*Xtt
-                firdt += ahdXX*Xt*Xd+ahdX*Xdt
-                firdtt += ahdXXX*Xt**2*Xd+ahdXX*(Xtt*Xd+2*Xdt*Xt)*ahdX*Xdtt
-
-                X_virial = n*delta_0/(a+(1-a)/tau**g)
-                ahdX_virial = -(f**2-1)/(1-X_virial)+(f**2+3*f+X_virial*(f**2-3*f))/(1-X_virial)**3
-                ahdXX_virial = -(f**2-1)/(1-X_virial)**2+(3*(f**2+3*f)+(f**2-3*f)*(1+2*X_virial))/(1-X_virial)**4
-                B += ahdX_virial*Xd
-                C += ahdXX_virial*Xd**2
-            
-            # Special form from Saul, A. and Wagner, W. Water 58 coefficient equation
-            if "nr5" in self._constants:
-                delta_0 = 1e-200
-                if delta < 0.2:
-                    factor = 1.6*delta**6*(1-1.2*delta**6)
-                else:
-                    factor = exp(0.4*delta**6)-exp(-2*delta**6)
-
-                nr5 = self._constants.get("nr5", [])
-                d5 = self._constants.get("d5", [])
-                t5 = self._constants.get("t5", [])
-                fr, frt, frtt, frdtt1, frdtt2 = 0, 0, 0, 0, 0
-                frd1, frd2 = 0, 0
-                frdd1, frdd2, frdd3 = 0, 0, 0
-                frdt1, frdt2, frdt3 = 0, 0, 0
-                Bsum1, Bsum2, Csum1, Csum2, Csum3 = 0, 0, 0, 0, 0
-                for n, d, t in zip(nr5, d5, t5):
-                    fr += n*delta**d*tau**t
-                    frd1 += n*delta**(d+5)*tau**t
-                    frd2 += n*d*delta**(d-1)*tau**t
-                    frdd1 += n*delta**(d+10)*tau**t
-                    frdd2 += n*(2*d+5)*delta**(d+4)*tau**t
-                    frdd3 += n*d*(d-1)*delta**(d-2)*tau**t
-                    frt += n*delta**d*t*tau**(t-1)
-                    frtt += n*delta**d*t*(t-1)*tau**(t-2)
-                    frdt1 += n*delta**(d+5)*t*tau**(t-1)
-                    frdt2 += n*d*delta**(d-1)*t*tau**(t-1)
-                    frdtt1 += n*delta**(d+5)*t*(t-1)*tau**(t-2)
-                    frdtt2 += n*d*delta**(d-1)*t*(t-1)*tau**(t-2)
-                    Bsum1 += n*delta_0**(d+5)*tau**t
-                    Bsum2 += n*d*delta_0**(d-1)*tau**t
-                    Csum1 += n*delta_0**(d+10)*tau**t
-                    Csum2 += n*(2*d+5)*delta_0**(d+4)*tau**t
-                    Csum3 += n*d*(d-1)*delta_0**(d-2)*tau**t
-                    
-                fir += factor*fr
-                fird += (-2.4*exp(-0.4*delta**6)+12*exp(-2*delta**6))*frd1 +\
-                    factor*frd2
-                firdd += (5.76*exp(-0.4*delta**6)-144*exp(-2*delta**6))*frdd1 +\
-                    (-2.4*exp(-0.4*delta**6)+12*exp(-2*delta**6))*frdd2 +\
-                    factor*frdd3
-                firt += factor*frt
-                firtt += factor*frtt
-                firdt += (-2.4*exp(-0.4*delta**6)+12*exp(-2*delta**6))*frdt1 +\
-                    factor*frdt2
-                firdtt += (-2.4*exp(-0.4*delta**6)+12*exp(-2*delta**6))*frdtt1 +\
-                    factor*frdtt2
-                B += (-2.4*exp(-0.4*delta_0**6)+12*exp(-2*delta_0**6))*Bsum1 +\
-                    (exp(0.4*delta_0**6)-exp(-2*delta_0**6))*Bsum2
-                C += (5.76*exp(-0.4*delta_0**6)-144*exp(-2*delta_0**6))*Csum1 +\
-                    (-2.4*exp(-0.4*delta_0**6)+12*exp(-2*delta_0**6))*Csum2 +\
-                    (exp(0.4*delta_0**6)-exp(-2*delta_0**6))*Csum3
-                    
-        return fir, firt, firtt, fird, firdd, firdt, firdtt, B, C
-
+        """Residual Helmholtz free energy, its derivatives and the reduced
+        virial coefficients, tau and delta can be scalars or arrays
+
+        >>> from lib.mEoS.H2O import H2O
+        >>> fir = H2O()._phir([647.096/500]*2, [838.025/322, 0.01])
+        >>> print "%0.9g %0.9g" % tuple(fir[0])
+        -3.42693206 -0.0306250957
+        >>> print "%0.6g %0.6g" % tuple(fir[-2])
+        -3.03121 -3.03121
+        """
+        engine = HelmholtzResidual.compile(self._constants)
+        fir = engine.phir(tau, delta)
+        B, C = engine.virial(tau)
+        return tuple(fir) + (B, C)
+
+    def _virial(self, T, estado):
+        """Reduced second and third virial coefficient, the equations with
+        compiled residual terms calculate it only when it's necessary"""
+        if "B" in estado:
+            return estado["B"], estado["C"]
+        engine = HelmholtzResidual.compile(self._constants)
+        return engine.virial(self.Tc/T)
 
     def derivative(self, z, x, y, fase):
         """Calculate generic partial derivative: (δz/δx)y
@@ -2050,59 +3076,43 @@ class MEoS(_fase):
         else:
             return None
 
+    def _ancillary(self, data, T, root):
+        """Reduced value of an ancillary equation, T can be an array
+        data: dict with the equation parameters
+        root: root exponent of the reduced temperature difference used in
+            the equation of type 2, 4 and 6"""
+        eq = data["eq"]
+        Tita = 1-T/self.Tc
+        if eq in [2, 4, 6]:
+            Tita = Tita**root
+        suma = sum([n*Tita**x for n, x in zip(data["ao"], data["exp"])])
+        if eq in [1, 2]:
+            return suma+1
+        elif eq in [3, 4]:
+            return exp(suma)
+        else:
+            return exp(self.Tc/T*suma)
+
     def _Vapor_Pressure(self, T):
         if self._vapor_Pressure:
-            eq = self._vapor_Pressure["eq"]
-            Tita = 1-T/self.Tc
-            if eq in [2, 4, 6]:
-                Tita = Tita**0.5
-            suma = sum([n*Tita**x for n, x in zip(
-                self._vapor_Pressure["ao"], self._vapor_Pressure["exp"])])
-            if eq in [1, 2]:
-                Pr = suma+1
-            elif eq in [3, 4]:
-                Pr = exp(suma)
-            else:
-                Pr = exp(self.Tc/T*suma)
-            Pv = unidades.Pressure(Pr*self.Pc)
+            Pv = self._ancillary(self._vapor_Pressure, T, 0.5)*self.Pc
+            Pv = unidades.Pressure(Pv)
         else:
             Pv = self.componente.Pv(T)
         return Pv
 
     def _Liquid_Density(self, T):
         if self._liquid_Density:
-            eq = self._liquid_Density["eq"]
-            Tita = 1-T/self.Tc
-            if eq in [2, 4, 6]:
-                Tita = Tita**(1./3)
-            suma = sum([n*Tita**x for n, x in zip(
-                self._liquid_Density["ao"], self._liquid_Density["exp"])])
-            if eq in [1, 2]:
-                Pr = suma+1
-            elif eq in [3, 4]:
-                Pr = exp(suma)
-            else:
-                Pr = exp(self.Tc/T*suma)
-            rho = unidades.Density(Pr*self.rhoc)
+            rho = self._ancillary(self._liquid_Density, T, 1./3)*self.rhoc
+            rho = unidades.Density(rho)
         else:
             rho = self.componente.RhoL_DIPPR(T)
         return rho
 
     def _Vapor_Density(self, T):
         if self._vapor_Density:
-            eq = self._vapor_Density["eq"]
-            Tita = 1-T/self.Tc
-            if eq in [2, 4, 6]:
-                Tita = Tita**(1./3)
-            suma = sum([n*Tita**x for n, x in zip(
-                self._vapor_Density["ao"], self._vapor_Density["exp"])])
-            if eq in [1, 2]:
-                Pr = suma+1
-            elif eq in [3, 4]:
-                Pr = exp(suma)
-            else:
-                Pr = exp(self.Tc/T*suma)
-            rho = unidades.Density(Pr*self.rhoc)
+            rho = self._ancillary(self._vapor_Density, T, 1./3)*self.rhoc
+            rho = unidades.Density(rho)
         else:
             rho = self._Vapor_Density_Chouaieb(T)
         return rho
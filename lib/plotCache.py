@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+# Persistent cache of calculated MEoS plot lines
+#   - PlotCache: Content addressed storage of lines for a fluid configuration
+#   - clean: Remove the least recently used files when the cache is too big
+#
+#   Each line (melting, sublimation, saturation or isoline) is saved in a
+#   compressed numpy file, named with the hash of all parameters used in
+#   the calculation, so changing an isoline list only need calculate the
+#   new lines. The complete plot data pickles saved by the plot windows in
+#   the same directory are counted and removed too
+###############################################################################
+
+from hashlib import sha1
+import os
+import tempfile
+
+from numpy import array, isnan, load, nan, savez_compressed
+
+from lib.config import conf_dir
+
+
+cache_dir = conf_dir + "plotCache" + os.sep
+maxSize = 200*2**20
+
+
+class PlotCache(object):
+    """Cache of plot lines for a meos fluid with a configuration
+        fluid: class of meos fluid
+        config: project configuration with MEoS section
+        points: number of points of lines, definition level of plot"""
+    def __init__(self, fluid, config, points):
+        reference = []
+        for option in ("reference", "Tref", "Pref", "ho", "so"):
+            if config.has_option("MEoS", option):
+                reference.append(config.get("MEoS", option))
+
+        self.base = (fluid.__name__,
+                     config.getint("MEoS", "eq"),
+                     config.getint("MEoS", "visco"),
+                     config.getint("MEoS", "thermal"),
+                     tuple(reference), points)
+
+    def key(self, line, value=None):
+        """Return the hash key of line, line can be the name of special lines
+        (melting, sublimation, saturation_0...) or the variable of isoline
+        with its value"""
+        if value is not None:
+            value = float(value)
+        return sha1(repr(self.base+(line, value))).hexdigest()
+
+    def plotKey(self, lines):
+        """Return the hash key for the complete plot data
+            lines: dict with the isoline values list for each variable"""
+        values = []
+        for line in sorted(lines):
+            values.append((line, tuple([float(x) for x in lines[line]])))
+        return sha1(repr(self.base+tuple(values))).hexdigest()
+
+    def get(self, line, value=None):
+        """Return the saved line data, dict with properties values list, or
+        None if the line isn't in cache"""
+        filename = cache_dir + self.key(line, value) + ".npz"
+        if not os.path.isfile(filename):
+            return None
+
+        try:
+            with open(filename, "rb") as archivo:
+                npz = load(archivo)
+                data = {}
+                for prop in npz.files:
+                    data[prop] = [None if isnan(x) else x
+                                  for x in npz[prop].tolist()]
+        except (IOError, ValueError, KeyError):
+            return None
+
+        # Update modification time, used as last access for clean
+        os.utime(filename, None)
+        return data
+
+    def save(self, line, data, value=None):
+        """Save the line data to cache
+            data: dict with properties values list, None for undefined"""
+        if not os.path.isdir(cache_dir):
+            os.mkdir(cache_dir)
+
+        arrays = {}
+        for prop, values in data.iteritems():
+            arrays[prop] = array([nan if x is None else x for x in values],
+                                 dtype=float)
+
+        # Write to temporary file and rename so a crash can't leave a
+        # partial file
+        fd, tmp = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, "wb") as archivo:
+            savez_compressed(archivo, **arrays)
+        os.rename(tmp, cache_dir + self.key(line, value) + ".npz")
+        clean()
+
+
+def clean(size=None):
+    """Remove the least recently used line and plot files until the cache
+    size is lower than size, default maxSize"""
+    if size is None:
+        size = maxSize
+    if not os.path.isdir(cache_dir):
+        return
+
+    files = []
+    total = 0
+    for name in os.listdir(cache_dir):
+        if not name.endswith((".npz", ".pkl")):
+            continue
+        stat = os.stat(cache_dir+name)
+        files.append((stat.st_mtime, stat.st_size, name))
+        total += stat.st_size
+
+    for mtime, filesize, name in sorted(files):
+        if total <= size:
+            break
+        os.remove(cache_dir+name)
+        total -= filesize
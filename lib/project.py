@@ -5,7 +5,12 @@
 # Module for project (group of equipment asociated in a graph) and many more
 ###############################################################################
 
+import cPickle
+from hashlib import sha1
+import logging
 import os
+from Queue import Empty, Queue
+import traceback
 from ConfigParser import ConfigParser
 
 from pygraph.classes.graph import graph
@@ -15,15 +20,195 @@ try:
 except:
     from pygraph.readwrite.markup import write
 
+from numpy import array, dot, eye, maximum, outer, zeros
+from numpy import abs as abs_a
+
 from lib.config import conf_dir
 from lib.corriente import Corriente
+from lib.thread import createPool
 from equipment import equipments
 from equipment.flux import Mixer
+from equipment.parents import readStatefromStream, writeStatetoStream
+
+
+def _scc(nodes, edges):
+    """Strongly connected components of a directed graph, Tarjan algorithm
+    in iterative form to avoid recursion limit in big flowsheets
+    Input:
+        nodes: list of nodes
+        edges: dict with the list of successors of each node
+    Output:
+        list of components, each a list of nodes, in topological order
+    """
+    index = {}
+    low = {}
+    stack = []
+    onstack = set()
+    components = []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, i = work.pop()
+            if i == 0:
+                index[node] = low[node] = counter
+                counter += 1
+                stack.append(node)
+                onstack.add(node)
+            successors = edges.get(node, [])
+            if i < len(successors):
+                work.append((node, i+1))
+                succ = successors[i]
+                if succ not in index:
+                    work.append((succ, 0))
+                elif succ in onstack:
+                    low[node] = min(low[node], index[succ])
+                continue
+
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    onstack.remove(w)
+                    component.append(w)
+                    if w == node:
+                        break
+                components.append(component)
+
+    # Tarjan return the components in reverse topological order
+    components.reverse()
+    return components
+
+
+def _tear(component, streams, entry):
+    """Select the tear streams of a strongly connected component as the
+    back edges of a depth first search from the entry node, so the rest
+    of component is acyclic
+    Input:
+        component: list of nodes
+        streams: list of (id, up, down) of streams inside the component
+        entry: node of component where start the search
+    Output:
+        order: nodes in calculation order
+        tears: list of tear streams id
+    """
+    succ = {}
+    for id, up, down in streams:
+        succ.setdefault(up, []).append((id, down))
+
+    visited = set([entry])
+    onstack = set([entry])
+    postorder = []
+    tears = []
+    work = [(entry, iter(succ.get(entry, [])))]
+    while work:
+        node, children = work[-1]
+        for id, down in children:
+            if down in onstack:
+                tears.append(id)
+            elif down not in visited:
+                visited.add(down)
+                onstack.add(down)
+                work.append((down, iter(succ.get(down, []))))
+                break
+        else:
+            work.pop()
+            onstack.remove(node)
+            postorder.append(node)
+    postorder.reverse()
+    return postorder, sorted(tears)
+
+
+def _streamHash(stream):
+    """Content hash of a stream from its calculated values, None for a
+    stream not solved"""
+    if not stream or not stream.status:
+        return None
+    values = [stream.T, stream.P]+list(stream.mezcla.caudalunitariomolar)
+    if stream.solido:
+        values += list(getattr(stream.solido, "caudalUnitario", []))
+    return sha1(repr([float(v) for v in values])).hexdigest()
+
+
+def _kwargsHash(entity, saved=False):
+    """Representation of the input kwargs of an entity for the node hash
+    saved: boolean to use the float precision of file, so the hash is the
+        same after a save/load cycle"""
+    def normalize(value):
+        if saved and isinstance(value, float):
+            return "%.6g" % value
+        elif isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+
+    return [(key, normalize(value))
+            for key, value in sorted(entity.kwargs.items())
+            if key not in entity.kwargs_forbidden and value]
+
+
+def _solveWorker(task):
+    """Calculate a block of flowsheet in a worker process
+        task: tuple with the block index and the pickled block, project
+            configuration and convergence options, block nodes, tears,
+            method, and the block items and streams
+    Return the block index, the pickled calculated items, streams and
+    convergence report, and the error traceback, data is None in error"""
+    index, data = task
+    try:
+        config, options, nodes, tears, method, items, streams = \
+            cPickle.loads(data)
+        project = Project(items, streams, config)
+        for key, value in options.iteritems():
+            setattr(project, key, value)
+        project.convergence = []
+        converged = project._solveBlock(nodes, tears, method)
+
+        outputs = {}
+        for key, stream in project.streams.iteritems():
+            if stream[0] in nodes:
+                outputs[key] = stream
+        items = dict([(node, project.items.get(node)) for node in nodes])
+        result = (items, outputs, project.convergence, converged)
+        return index, cPickle.dumps(result, 2), ""
+    except Exception:
+        return index, None, traceback.format_exc()
 
 
 class Project(object):
     MAGIC_NUMBER = 0x3051E
-    FILE_VERSION = 10
+    FILE_VERSION = 12
+    # Oldest file version readable, the version 10 has no results section and
+    # the results of version 11 are ignored
+    FILE_VERSION_COMPATIBLE = 10
+
+    # Convergence of recycle loops
+    #   tolerance of tear streams for each iteration, temperature in K,
+    #   pressure in Pa, component molar flows relative to total molar flow
+    #   and molar fractions
+    #   maxIter: Maximum number of iterations for each loop
+    #   method: Acceleration method, Direct (successive substitution),
+    #       Wegstein or Broyden
+    tolerance = {"T": 1e-3, "P": 1., "flow": 1e-6, "x": 1e-6}
+    maxIter = 50
+    method = "Wegstein"
+    # Bounds of Wegstein acceleration factor
+    qmin = -5.
+    qmax = 0.
+    # Flow of the initial value of tear streams without user estimate,
+    # relative to the loop feed, the stream can't have zero flow
+    tearFlow = 1e-6
+    # Number of worker process for the independent branches of flowsheet,
+    # None for the number of cpu, 1 to calculate all in the current process
+    processes = None
+    # Function called with the project to recalculate it after a change,
+    # None to solve it in place
+    solver = None
+
     def __init__(self, items={}, streams={}, config=None):
         """
         items: diccionario con los equipos
@@ -38,6 +223,13 @@ class Project(object):
         self.streams=streams
         self.graph=self.calGraph()
 
+        # Input hash of each node at its last calculation, used to
+        # recalculate only the nodes with changed inputs
+        self.hash={}
+        # Results loaded from file not restored yet, for each node a tuple
+        # with its input hash and its compressed calculated state
+        self.results={}
+
         self.downToStream={}
 
 #        import gv
@@ -120,6 +312,8 @@ class Project(object):
     def setStream(self, id, obj):
         stream=self.streams[id]
         self.streams[id]=stream[0:4]+(obj, )
+        if stream[0][0]=="i":
+            self.items[stream[0]]=obj
         self.run("s%i" %id)
 
     def getStream(self, id):
@@ -139,38 +333,507 @@ class Project(object):
                 lista.append((key, value))
         return lista
 
-    def run(self, name):
-        """Ejecuta el projecto de forma recursiva hasta que encuentra un equipo no resuelto"""
-        tipo=name[0]
-        ind=int(name[1])
-
-        if tipo=="i":
-            obj=self.getInput(ind)
-            if obj.status:
-                key, (up, down, ind_up, ind_down, oldobj)=self.getDownToEquip(name)[0]
-                self.setStream(key, obj)
-                self.run("s%i" %key)
-
-        elif tipo=="e":
-            obj=self.getItem(ind)
-            if obj.status:
-                for key, (up, down, ind_up, ind_down, oldobj) in self.getDownToEquip(name):
-                    self.setStream(key, obj.salida[ind_up])
-                    self.run("s%i" %key)
-
-        elif tipo=="s":
-            up, down, ind_up, ind_down, stream=self.streams[ind]
-            if stream.status:
-                if down[0]=="e":
-                    equip=self.items[down]
-                    if isinstance(equip, Mixer):
-                        kwargs={"entrada": stream, "id_entrada": ind_down}
+    def run(self, name=None):
+        """Recalculate the project after a change in a node, only the nodes
+        with changed inputs are calculated
+        name: changed node, kept for compatibility, the changed nodes are
+            detected by its input hash
+        If the project has a solver function, used by gui to calculate in a
+        thread, the calculation is delegated to it"""
+        if self.solver is not None:
+            return self.solver(self)
+        return self.solve()
+
+    def inputHash(self, name, saved=False):
+        """Content hash of node inputs, the kwargs of input streams and
+        equipment and the calculated values of its input streams
+        saved: boolean to hash the kwargs with the precision saved to file,
+            used to check the results loaded from file"""
+        obj = self.items.get(name)
+        content = [name]
+        if name[0] in "ie" and obj is not None:
+            content += [obj.__class__.__name__, repr(_kwargsHash(obj, saved))]
+        for key, stream in sorted(self.streams.items()):
+            if stream[1] == name:
+                content.append((stream[3], _streamHash(stream[4])))
+        return sha1(repr(content)).hexdigest()
+
+    def stale(self):
+        """List of nodes to recalculate in calculation order, the nodes with
+        changed input hash and all nodes downstream of them"""
+        stale = set()
+        for nodes, tears in self.calculationOrder():
+            for node in nodes:
+                if self.inputHash(node) != self.hash.get(node):
+                    stale.update(nodes)
+                    break
+                for stream in self.streams.itervalues():
+                    if stream[1] == node and stream[0] in stale:
+                        stale.update(nodes)
+                        break
+        return [node for nodes, tears in self.calculationOrder()
+                for node in nodes if node in stale]
+
+    def calculationOrder(self):
+        """Calculation order of flowsheet, the directed graph of streams is
+        divided in strongly connected components in topological order, the
+        components with more than a node are recycle loops, converged
+        with tear streams
+        Output:
+            list of blocks (nodes, tears), with nodes in calculation order
+            and the tear streams id, empty list for acyclic blocks
+        """
+        nodes = sorted(self.items)
+        edges = {}
+        for id in sorted(self.streams):
+            up, down = self.streams[id][0:2]
+            for node in (up, down):
+                if node not in nodes:
+                    nodes.append(node)
+            edges.setdefault(up, []).append(down)
+
+        blocks = []
+        for component in _scc(nodes, edges):
+            inside = [(id, s[0], s[1]) for id, s in sorted(self.streams.items())
+                      if s[0] in component and s[1] in component]
+            if not inside:
+                blocks.append((component, []))
+                continue
+
+            # Start the search in the node with feeds from outside the loop
+            entry = sorted(component)[0]
+            for id, s in sorted(self.streams.items()):
+                if s[1] in component and s[0] not in component:
+                    entry = s[1]
+                    break
+            blocks.append(_tear(component, inside, entry))
+        return blocks
+
+    def _calculate(self, name):
+        """Calculate a node with its actual input streams and set the output
+        streams, without propagate the change downstream"""
+        if name[0] == "i":
+            obj = self.items[name]
+            if not obj.status:
+                obj()
+            self._setOutputs(name)
+
+        elif name[0] == "e":
+            equip = self.items[name]
+            inputs = [(s[3], s[4]) for key, s in sorted(self.streams.items())
+                      if s[1] == name]
+            if isinstance(equip, Mixer):
+                for ind_down, obj in inputs:
+                    equip(entrada=obj, id_entrada=ind_down)
+            else:
+                kwargs = {}
+                for ind_down, obj in inputs:
+                    kwargs[equip.kwargsInput[ind_down]] = obj
+                equip(**kwargs)
+            if equip.status:
+                self._setOutputs(name)
+
+        elif name[0] == "o":
+            for key, stream in self.streams.iteritems():
+                if stream[1] == name:
+                    self.items[name] = stream[4]
+
+    def _setOutputs(self, name, salida=None):
+        """Set the output streams of an input stream or equipment node
+        salida: list of output streams of equipment, default the outputs of
+            node item"""
+        if salida is None and name[0] == "e":
+            salida = self.items[name].salida
+        for key, (up, down, ind_up, ind_down, old) in \
+                self.getDownToEquip(name):
+            if name[0] == "e":
+                out = salida[ind_up]
+            else:
+                out = self.items[name]
+            self.streams[key] = (up, down, ind_up, ind_down, out)
+
+    def _restore(self, nodes):
+        """Restore the calculated state of a block of nodes from the results
+        loaded from file, only if the input hash of all nodes, calculated
+        with the restored streams, is the saved hash
+        Return a boolean with the restore success"""
+        states = {}
+        for node in nodes:
+            if node not in self.results:
+                return False
+            if node[0] == "e":
+                states[node] = self.results[node][1]
+
+        # The output streams of block are restored before check the hash,
+        # so the recycle streams are defined in loops
+        for node, state in states.iteritems():
+            self._setOutputs(node, state["salida"])
+        for node in nodes:
+            if node[0] == "i":
+                self._calculate(node)
+            if self.inputHash(node, True) != self.results[node][0]:
+                return False
+
+        for node in nodes:
+            if node in states:
+                self._setState(node, states[node])
+            elif node[0] != "i":
+                self._calculate(node)
+        return True
+
+    def _setState(self, name, state):
+        """Set the calculated state restored from file in a equipment node,
+        with the actual input streams, without calculate it"""
+        equip = self.items[name]
+        inputs = [(s[3], s[4]) for key, s in sorted(self.streams.items())
+                  if s[1] == name]
+        if isinstance(equip, Mixer):
+            for ind_down, obj in inputs:
+                equip.cleanOldValues(entrada=obj, id_entrada=ind_down)
+            equip.entrada = equip.kwargs["entrada"]
+        else:
+            for ind_down, obj in inputs:
+                key = equip.kwargsInput[ind_down]
+                equip.cleanOldValues(**{key: obj})
+                setattr(equip, key, obj)
+        equip.setState(state)
+
+    def solve(self, method=None, force=False, processes=None, progress=None):
+        """Solve the flowsheet in calculation order, converging the recycle
+        loops with the tear streams, the blocks with unchanged input hash
+        are not recalculated
+        method: acceleration method, default the class method attribute
+        force: boolean to recalculate all the flowsheet
+        processes: number of worker process, the independent branches of
+            flowsheet are calculated in parallel, default the class
+            processes attribute
+        progress: optional function called with the finished blocks count
+            and the total blocks count
+        The convergence report of each loop is saved in convergence list,
+        a dict with the loop nodes, tears, method, converged boolean,
+        message and the iteration history
+        The calculation can be stopped with cancel, the cancelled attribute
+        is then True and the blocks not finished are calculated in the next
+        solve
+        Return a boolean with the global convergence"""
+        if method is None:
+            method = self.method
+        if processes is None:
+            processes = self.processes
+        self.convergence = []
+        self.cancelled = False
+        converged = True
+
+        blocks = self.calculationOrder()
+        depends = self._blockDepends(blocks)
+        done = set()
+        running = set()
+        queue = Queue()
+        pool = None
+        try:
+            while len(done) < len(blocks) and not self.cancelled:
+                ready = [i for i in range(len(blocks)) if i not in done and
+                         i not in running and depends[i] <= done]
+
+                # The blocks up to date or without equipment are finished in
+                # place, the rest are calculated in the pool if there are
+                # several blocks to calculate at the same time
+                pending = []
+                for i in ready:
+                    nodes, tears = blocks[i]
+                    if self._upToDate(nodes, force):
+                        done.add(i)
+                    elif not self._parallelizable(nodes):
+                        converged = self._solveBlock(nodes, tears, method) \
+                            and converged
+                        done.add(i)
                     else:
-                        kwargs={equip.kwargsInput[ind_down]: stream}
-                    equip(**kwargs)
-                    self.run(down)
-                elif down[0]=="o":
-                    self.setOutput(int(down[1]), stream)
+                        pending.append(i)
+                    if i in done and progress:
+                        progress(len(done), len(blocks))
+                if len(pending) < len(ready):
+                    continue
+
+                if pool is None and (running or len(pending) > 1):
+                    pool = createPool(processes)
+                if pool is None:
+                    for i in pending:
+                        converged = self._solveBlock(
+                            blocks[i][0], blocks[i][1], method) and converged
+                        done.add(i)
+                        if progress:
+                            progress(len(done), len(blocks))
+                    continue
+
+                for i in pending:
+                    try:
+                        task = self._blockTask(blocks[i], method)
+                    except Exception:
+                        # Entities not pickables are calculated in process
+                        converged = self._solveBlock(
+                            blocks[i][0], blocks[i][1], method) and converged
+                        done.add(i)
+                        if progress:
+                            progress(len(done), len(blocks))
+                        continue
+                    pool.apply_async(_solveWorker, ((i, task), ),
+                                     callback=queue.put)
+                    running.add(i)
+                if not running:
+                    continue
+
+                # Wait for a calculated block, checking the cancellation
+                while not self.cancelled:
+                    try:
+                        i, data, error = queue.get(timeout=0.1)
+                        break
+                    except Empty:
+                        pass
+                else:
+                    break
+                running.remove(i)
+                if data is None:
+                    logging.warning("Parallel calculation failed, block %s "
+                                    "calculated in process\n%s",
+                                    blocks[i][0], error)
+                    ok = self._solveBlock(blocks[i][0], blocks[i][1], method)
+                else:
+                    ok = self._mergeBlock(blocks[i][0], data)
+                converged = ok and converged
+                done.add(i)
+                if progress:
+                    progress(len(done), len(blocks))
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        return converged and not self.cancelled
+
+    def cancel(self):
+        """Stop the solve in process, called from other thread"""
+        self.cancelled = True
+
+    def _blockDepends(self, blocks):
+        """List with the set of upstream blocks index of each block"""
+        index = {}
+        for i, (nodes, tears) in enumerate(blocks):
+            for node in nodes:
+                index[node] = i
+        depends = [set() for block in blocks]
+        for up, down, ind_up, ind_down, obj in self.streams.itervalues():
+            if index[up] != index[down]:
+                depends[index[down]].add(index[up])
+        return depends
+
+    def _upToDate(self, nodes, force=False):
+        """Check if a block has the input hash of its last calculation or
+        restore it from the results loaded from file
+        Return a boolean, False if the block must be calculated"""
+        if force:
+            return False
+        if all([self.inputHash(node) == self.hash.get(node)
+                for node in nodes]):
+            return True
+        restored = self._restore(nodes)
+        for node in nodes:
+            self.results.pop(node, None)
+        if restored:
+            self._storeHash(nodes, True)
+        return restored
+
+    def _parallelizable(self, nodes):
+        """Check if a block can be calculated in a worker process, the blocks
+        without equipment are cheaper in the current process and the
+        equipment with access to project, like spreadsheet, can't be moved
+        to other process"""
+        equipment = [self.items[node] for node in nodes if node[0] == "e"]
+        if not equipment:
+            return False
+        for equip in equipment:
+            if equip.kwargs.get("project"):
+                return False
+        return True
+
+    def _solveBlock(self, nodes, tears, method):
+        """Calculate a block of flowsheet, a recycle loop or a single node
+        Return a boolean with the convergence of block"""
+        converged = True
+        if tears:
+            converged = self._converge(nodes, tears, method)
+        else:
+            self._calculate(nodes[0])
+        self._storeHash(nodes, converged)
+        return converged
+
+    def _storeHash(self, nodes, converged):
+        """Save the input hash of the nodes of a calculated block, only if
+        the block is converged and the output streams of node are solved,
+        else the node is calculated again in the next solve"""
+        for node in nodes:
+            outputs = [s[4] for s in self.streams.itervalues()
+                       if s[0] == node]
+            if converged and all([obj.status == 1 for obj in outputs]):
+                self.hash[node] = self.inputHash(node)
+            else:
+                self.hash.pop(node, None)
+
+    def _blockTask(self, block, method):
+        """Pickled data of a block to calculate it in a worker process"""
+        nodes, tears = block
+        items = dict([(node, self.items.get(node)) for node in nodes])
+        streams = {}
+        for key, stream in self.streams.iteritems():
+            if stream[0] in nodes or stream[1] in nodes:
+                streams[key] = stream
+        options = {"tolerance": self.tolerance, "maxIter": self.maxIter,
+                   "qmin": self.qmin, "qmax": self.qmax,
+                   "tearFlow": self.tearFlow}
+        return cPickle.dumps((self.config, options, nodes, tears, method,
+                              items, streams), 2)
+
+    def _mergeBlock(self, nodes, data):
+        """Set the items and output streams of a block calculated in a
+        worker process
+        Return a boolean with the convergence of block"""
+        items, streams, convergence, converged = cPickle.loads(data)
+        for node, obj in items.iteritems():
+            self.items[node] = obj
+        self.streams.update(streams)
+        self.convergence += convergence
+        self._storeHash(nodes, converged)
+        return converged
+
+    def _tearVector(self, ids):
+        """Vector of variables of tear streams, T, P and molar flow of each
+        component"""
+        x = []
+        for id in ids:
+            stream = self.getStream(id)
+            x += [stream.T, stream.P]+stream.mezcla.caudalunitariomolar
+        return array(x, dtype=float)
+
+    def _setTear(self, ids, x):
+        """Set the tear streams from the vector of variables"""
+        i = 0
+        for id in ids:
+            up, down, ind_up, ind_down, old = self.streams[id]
+            n = len(old.mezcla.caudalunitariomolar)
+            flows = maximum(x[i+2:i+2+n], 0)
+            obj = old.clone(T=x[i], P=x[i+1], x=None, caudalUnitarioMasico=[],
+                            caudalUnitarioMolar=list(flows))
+            self.streams[id] = (up, down, ind_up, ind_down, obj)
+            i += 2+n
+
+    def _tearError(self, ids, x, g):
+        """Maximum error of tear streams for each variable kind"""
+        error = {"T": 0, "P": 0, "flow": 0, "x": 0}
+        i = 0
+        for id in ids:
+            n = len(self.getStream(id).mezcla.caudalunitariomolar)
+            error["T"] = max(error["T"], abs(g[i]-x[i]))
+            error["P"] = max(error["P"], abs(g[i+1]-x[i+1]))
+            fx = x[i+2:i+2+n]
+            fg = g[i+2:i+2+n]
+            total = max(fg.sum(), 1e-30)
+            error["flow"] = max(error["flow"], abs_a(fg-fx).max()/total)
+            if fx.sum() > 0:
+                error["x"] = max(error["x"],
+                                 abs_a(fg/total-fx/fx.sum()).max())
+            i += 2+n
+        return error
+
+    def _tearEstimate(self, nodes, id):
+        """Set a initial value to a tear stream not defined by user, the
+        loop feed entering the same node, or the first loop feed, at its
+        temperature and pressure and with negligible flow, so the first
+        iteration is the loop without recycle
+        Return a boolean, False if the loop has no calculated feed"""
+        up, down, ind_up, ind_down, old = self.streams[id]
+        feeds = [s for key, s in sorted(self.streams.items())
+                 if s[0] not in nodes and s[1] in nodes and s[4].status]
+        if not feeds:
+            return False
+        feeds.sort(key=lambda s: s[1] != down)
+        feed = feeds[0][4]
+        flows = [self.tearFlow*f for f in feed.mezcla.caudalunitariomolar]
+        obj = feed.clone(T=feed.T, P=feed.P, x=None, caudalUnitarioMasico=[],
+                         caudalUnitarioMolar=flows)
+        self.streams[id] = (up, down, ind_up, ind_down, obj)
+        return True
+
+    def _converge(self, nodes, tears, method):
+        """Converge a recycle loop by successive substitution of tear
+        streams, accelerated with the Wegstein or Broyden methods
+        Input:
+            nodes: nodes of loop in calculation order
+            tears: list of tear streams id
+            method: Direct, Wegstein or Broyden
+        Output:
+            boolean with the convergence of loop
+        """
+        report = {"nodes": nodes, "tears": tears, "method": method,
+                  "converged": False, "msg": "", "history": []}
+        self.convergence.append(report)
+        for id in tears:
+            # Streams loaded from file have only the input values
+            if not self.getStream(id).status:
+                self.getStream(id)()
+            if not self.getStream(id).status and \
+                    not self._tearEstimate(nodes, id):
+                report["msg"] = "Tear stream %i without initial estimate" % id
+                return False
+
+        x = self._tearVector(tears)
+        # Scale of variables used in Broyden method
+        scale = abs_a(x)+1e-10
+        xold = gold = None
+        H = eye(len(x))
+        for k in range(self.maxIter):
+            self._setTear(tears, x)
+            for node in nodes:
+                self._calculate(node)
+            for id in tears:
+                if not self.getStream(id).status:
+                    report["msg"] = "Tear stream %i not calculated" % id
+                    return False
+            g = self._tearVector(tears)
+
+            error = self._tearError(tears, x, g)
+            report["history"].append({"iteration": k+1, "error": error})
+            if all([error[key] < self.tolerance[key] for key in error]):
+                report["converged"] = True
+                self._setTear(tears, g)
+                return True
+
+            if method == "Wegstein" and xold is not None:
+                dx = x-xold
+                dg = g-gold
+                q = zeros(len(x))
+                mask = dx != 0
+                s = dg[mask]/dx[mask]
+                q[mask] = s/(s-1)
+                q[q < self.qmin] = self.qmin
+                q[q > self.qmax] = self.qmax
+                xnew = q*x+(1-q)*g
+            elif method == "Broyden" and xold is not None:
+                # Broyden update of inverse jacobian in scaled variables,
+                # initial value as identity equivalent to direct
+                # substitution
+                f = (g-x)/scale
+                du = (x-xold)/scale
+                df = f-(gold-xold)/scale
+                Hdf = dot(H, df)
+                den = dot(du, Hdf)
+                if den != 0:
+                    H -= outer(du+Hdf, dot(du, H))/den
+                xnew = x+dot(H, f)*scale
+            else:
+                xnew = g
+            xold, gold = x, g
+            x = xnew
+
+        report["msg"] = "Maximum number of iterations reached"
+        return False
 
     def writeToStream(self, stream):
         """Write the project to stream"""
@@ -201,9 +864,39 @@ class Project(object):
             stream.writeInt32(item[3])
             item[4].writeToStream(stream)
 
-    def loadFromStream(self, stream, huella=True, run=True):
+        # write results, the input hash of calculated nodes and the calculated
+        # state of equipment, the input streams are calculated from its kwargs
+        results = {}
+        for node, digest in self.hash.iteritems():
+            if node not in self.items or digest != self.inputHash(node):
+                continue
+            state = None
+            if node[0] == "e":
+                state = self.items[node].getState()
+                if state is None:
+                    continue
+            results[node] = (self.inputHash(node, True), state)
+        for node, result in self.results.iteritems():
+            results.setdefault(node, result)
+
+        stream.writeInt32(len(results))
+        for node, (digest, state) in results.iteritems():
+            stream.writeString(node)
+            stream.writeString(digest)
+            if node[0] == "e":
+                writeStatetoStream(stream, state)
+
+    def loadFromStream(self, stream, huella=True, run=True, version=None,
+                       temporal=True):
         """Read project from stream
-        huella: boolean to save project file to pychemqt_temporal"""
+        huella: boolean to save project file to pychemqt_temporal
+        run: boolean to solve the project, the nodes with saved results and
+            unchanged input hash are restored without calculation
+        version: file format version, default the actual version
+        temporal: boolean to write the project config to pychemqtrc_temporal,
+            without gui the config is set with config.setProjectConfig"""
+        if version is None:
+            version = self.FILE_VERSION
         # read configuration
         config = ConfigParser()
         for i in range(stream.readInt32()):
@@ -219,9 +912,10 @@ class Project(object):
         config.set("Units", "MolarSpecificHeat", "0")
 
         self.setConfig(config)
-        if not huella:
-            os.rename(conf_dir+"pychemqtrc_temporal", conf_dir+"pychemqtrc_temporal_bak")
-        config.write(open(conf_dir+"pychemqtrc_temporal", "w"))
+        if temporal:
+            if not huella:
+                os.rename(conf_dir+"pychemqtrc_temporal", conf_dir+"pychemqtrc_temporal_bak")
+            config.write(open(conf_dir+"pychemqtrc_temporal", "w"))
 
         # read equipments
         items = {}
@@ -230,7 +924,7 @@ class Project(object):
             id = stream.readString()
             if id[0] == "e":
                 equip = equipments[stream.readInt32()]()
-                equip.readFromStream(stream, run)
+                equip.readFromStream(stream, False)
             else:
                 equip = None
             items[id] = equip
@@ -246,19 +940,35 @@ class Project(object):
             ind_up = stream.readInt32()
             ind_down = stream.readInt32()
             obj = Corriente()
-            obj.readFromStream(stream, run)
+            # The streams are calculated or restored in solve
+            obj.readFromStream(stream, False)
             streams[id] = (up, down, ind_up, ind_down, obj)
-            if huella:
-                if down[0] == "e":
-                    equip = self.items[down]
-                    if isinstance(equip, Mixer):
-                        kwargs = {"entrada": obj, "id_entrada": ind_down}
-                    else:
-                        kwargs = {equip.kwargsInput[ind_down]: obj}
-                    equip(**kwargs)
+            if up[0] == "i":
+                self.items[up] = obj
         self.setStreams(streams)
 
-        if not huella:
+        # read results
+        self.results = {}
+        if version == 11:
+            for i in range(stream.readInt32()):
+                stream.readString()
+                stream.readString()
+                stream.readBytes()
+        elif version >= 12:
+            for i in range(stream.readInt32()):
+                node = stream.readString()
+                digest = stream.readString()
+                state = None
+                if node[0] == "e":
+                    state = readStatefromStream(stream)
+                self.results[node] = (digest, state)
+
+        # Calculate each node once in calculation order
+        self.hash = {}
+        if run:
+            self.solve()
+
+        if temporal and not huella:
             os.rename(conf_dir+"pychemqtrc_temporal_bak", conf_dir+"pychemqtrc_temporal")
 
     def printer(self):
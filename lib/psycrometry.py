@@ -21,6 +21,7 @@ from lib.physics import R_atml
 from lib.config import conf_dir
 from lib import unidades
 from lib.iapws import _PSat_T, _Sublimation_Pressure
+from lib.thread import parallelMap
 
 
 def _Pbar(Z):
@@ -293,6 +294,26 @@ def _twb(tdb, W, P):
     return twb
 
 
+def _calcLine(args):
+    """Calculate a line of psychrometric chart, function to run in worker
+    process
+        args: tuple with (line, value, P), line can be Twb for isowetbulb or
+            v for isochor lines
+    Return the line, value and a tuple with the lists of abscisa (Tdb) and
+    ordinate (humidity ratio) values"""
+    line, value, P = args
+    if line == "Twb":
+        H = concatenate((arange(_W(P, value), 0, -0.001), [0.]))
+        Tw = [unidades.Temperature(_Tdb(value, h, P)).config() for h in H]
+        return line, value, (H, Tw)
+    else:
+        ts = _Tdb_V(value, P)
+        T = linspace(ts, value*P/287.055, 50)
+        Td = [unidades.Temperature(ti).config() for ti in T]
+        H = [_W_V(ti, P, value) for ti in T]
+        return line, value, (Td, H)
+
+
 class PsyState(object):
     """
     Class to model a psychrometric state with properties
@@ -664,31 +685,21 @@ class PsyIdeal(PsyState):
                 parent.progressBar.setValue(5+10*cont/len(hr)/len(Hs))
         data["Hr"] = Hr
 
-        # Twb
-        lines = cls.LineList("isotwb", Preferences)
+        # Twb and v lines, calculated in parallel
+        twb = cls.LineList("isotwb", Preferences)
+        isochor = cls.LineList("isochor", Preferences)
+        tasks = [("Twb", T, P) for T in twb]+[("v", v, P) for v in isochor]
         Twb = {}
-        cont = 0
-        for T in lines:
-            H = concatenate((arange(_W(P, T), 0, -0.001), [0.]))
-            Tw = []
-            for h in H:
-                Tw.append(unidades.Temperature(_Tdb(T, h, P)).config())
-            cont += 1
-            parent.progressBar.setValue(15+75*cont/len(lines))
-            Twb[T] = (H, Tw)
-        data["Twb"] = Twb
-
-        # v
-        lines = cls.LineList("isochor", Preferences)
         V = {}
-        for cont, v in enumerate(lines):
-            ts = _Tdb_V(v, P)
-            T = linspace(ts, v*P/287.055, 50)
-            Td = [unidades.Temperature(ti).config() for ti in T]
-            _W_V
-            H = [_W_V(ti, P, v) for ti in T]
-            parent.progressBar.setValue(90+10*cont/len(lines))
-            V[v] = (Td, H)
+        for cont, (line, value, result) in enumerate(
+                parallelMap(_calcLine, tasks)):
+            if line == "Twb":
+                Twb[value] = result
+            else:
+                V[value] = result
+            parent.progressBar.setValue(15+85*(cont+1)/len(tasks))
+            QApplication.processEvents()
+        data["Twb"] = Twb
         data["v"] = V
 
         return data
@@ -6,14 +6,51 @@
 #   -createDatabase: Create empty database
 #
 #   -getElement
+#   -getElements
 #   -copyElement
 #   -deleteElement
 #   -inserElementFromArray
 #   -updateElement
 #   -transformElement
+#
+#   -getConnection: Persistent connection to a database
+#   -invalidate: Clean cached elements after a database modification
 ###############################################################################
 
-import sqlite3, os
+import sqlite3, os, threading
+
+from lib.utilities import LRUCache
+
+
+# Cache of raw database rows, and cache of parsed components used by
+# compuestos.getComponente, both cleaned in any database modification
+elementCache = LRUCache(512)
+componentCache = LRUCache(256)
+
+_connections = {}
+_lock = threading.RLock()
+
+
+def getConnection(name):
+    """Return the persistent connection to database name, only one
+    connection is opened for each database file and process, the worker
+    process created with fork can't use the connections of parent"""
+    key = (os.getpid(), name)
+    with _lock:
+        if key not in _connections:
+            _connections[key] = sqlite3.connect(name, check_same_thread=False)
+        return _connections[key]
+
+
+def invalidate(indice=None):
+    """Clean the cached elements after a database modification
+    indice: id of element modified, None to clean all cache"""
+    if indice is None:
+        elementCache.clear()
+        componentCache.clear()
+    else:
+        elementCache.pop(int(indice))
+        componentCache.pop(int(indice))
 
 
 def createDatabase(name):
@@ -295,7 +332,7 @@ def transformElement(elemento):
 
 def inserElementsFromArray(name, lista):
     """lista: array con datos de componentes en formato texto"""
-    conn = sqlite3.connect(name)
+    conn = getConnection(name)
     curs = conn.cursor()
     curs.execute("SELECT COUNT(*) AS Total FROM compuestos")
     numero=curs.fetchone()[0]
@@ -306,16 +343,16 @@ def inserElementsFromArray(name, lista):
         vals=transformElement(elemento)
         vals.insert(0, numero+indice+1)
         curs.execute(query+str(tuple(vals)))
+        invalidate(numero+indice+1)
 
     conn.commit()
-    conn.close()
 
 def updateElement(elemento, indice):
     """lista: array con datos de componentes en formato texto"""
     variables=["formula", "nombre", "peso_molecular", "tc", "pc", "vc", "API", "Cp_ideal_A", "Cp_ideal_B", "Cp_ideal_C", "Cp_ideal_D", "Cp_ideal_E", "Cp_ideal_F", "antoine_A", "antoine_B", "antoine_C", "henry_A", "henry_B", "henry_C", "henry_D", "visco_A", "visco_B", "tension_A", "tension_B", "rhoS_DIPPR_EQ", "rhoS_DIPPR_A", "rhoS_DIPPR_B", "rhoS_DIPPR_C", "rhoS_DIPPR_D", "rhoS_DIPPR_E", "rhoS_DIPPR_tmin", "rhoS_DIPPR_tmax", "rhoL_DIPPR_EQ", "rhoL_DIPPR_A", "rhoL_DIPPR_B", "rhoL_DIPPR_C", "rhoL_DIPPR_D", "rhoL_DIPPR_E", "rhoL_DIPPR_tmin", "rhoL_DIPPR_tmax", "Pv_DIPPR_EQ", "Pv_DIPPR_A", "Pv_DIPPR_B", "Pv_DIPPR_C", "Pv_DIPPR_D", "Pv_DIPPR_E", "Pv_DIPPR_tmin", "Pv_DIPPR_tmax", "Hv_DIPPR_EQ", "Hv_DIPPR_A", "Hv_DIPPR_B", "Hv_DIPPR_C", "Hv_DIPPR_D", "Hv_DIPPR_E", "Hv_DIPPR_tmin", "Hv_DIPPR_tmax", "CpS_DIPPR_EQ", "CpS_DIPPR_A", "CpS_DIPPR_B", "CpS_DIPPR_C", "CpS_DIPPR_D", "CpS_DIPPR_E", "CpS_DIPPR_tmin", "CpS_DIPPR_tmax", "CpL_DIPPR_EQ", "CpL_DIPPR_A", "CpL_DIPPR_B", "CpL_DIPPR_C", "CpL_DIPPR_D", "CpL_DIPPR_E", "CpL_DIPPR_tmin", "CpL_DIPPR_tmax", "CpG_DIPPR_EQ", "CpG_DIPPR_A", "CpG_DIPPR_B", "CpG_DIPPR_C", "CpG_DIPPR_D", "CpG_DIPPR_E", "CpG_DIPPR_tmin", "CpG_DIPPR_tmax", "muL_DIPPR_EQ", "muL_DIPPR_A", "muL_DIPPR_B", "muL_DIPPR_C", "muL_DIPPR_D", "muL_DIPPR_E", "muL_DIPPR_tmin", "muL_DIPPR_tmax", "muG_DIPPR_EQ", "muG_DIPPR_A", "muG_DIPPR_B", "muG_DIPPR_C", "muG_DIPPR_D", "muG_DIPPR_E", "muG_DIPPR_tmin", "muG_DIPPR_tmax", "ThcondL_DIPPR_EQ", "ThcondL_DIPPR_A", "ThcondL_DIPPR_B", "ThcondL_DIPPR_C", "ThcondL_DIPPR_D", "ThcondL_DIPPR_E", "ThcondL_DIPPR_tmin", "ThcondL_DIPPR_tmax", "ThcondG_DIPPR_EQ", "ThcondG_DIPPR_A", "ThcondG_DIPPR_B", "ThcondG_DIPPR_C", "ThcondG_DIPPR_D", "ThcondG_DIPPR_E", "ThcondG_DIPPR_tmin", "ThcondG_DIPPR_tmax", "tension_DIPPR_EQ", "tension_DIPPR_A", "tension_DIPPR_B", "tension_DIPPR_C", "tension_DIPPR_D", "tension_DIPPR_E", "tension_DIPPR_tmin", "tension_DIPPR_tmax", "momento_dipolar", "constante_volumen_liquido", "constante_rackett", "densidad_especifica", "factor_acentrico", "parametro_solubilidad", "watson", "MSRK_A", "MSRK_B", "Stiehl", "t_ebullicion", "t_fusion", "CAS_id", "formula_alternativa", "UNIFAC", "diametro_molecular", "Eps_k", "UNIQUAC_area", "UNIQUAC_volumen", "factor_acentrico_modificado", "calor_formacion_gas", "energia_libre_gas", "volumen_wilson", "calor_combustion_neto", "calor_combustion_bruto", "nombre_alternativo", "volumen_caracteristico", "calor_formacion_solido", "energia_libre_solido", "parametro_polar", "smile"]
     vals=transformElement(elemento)
 
-    conn = sqlite3.connect(databank_Custom_name)
+    conn = getConnection(databank_Custom_name)
     curs = conn.cursor()
     for variable, valor in zip(variables, vals):
         if isinstance(valor, int):
@@ -326,27 +363,58 @@ def updateElement(elemento, indice):
             valor='"'+valor+'"'
             curs.execute('UPDATE compuestos SET %s=%s WHERE id==%i' %(variable, valor, indice))
     conn.commit()
-    conn.close()
+    invalidate(indice)
 
 def deleteElement(indice):
     """lista: array con datos de componentes en formato texto"""
-    conn = sqlite3.connect(databank_Custom_name)
+    conn = getConnection(databank_Custom_name)
     curs = conn.cursor()
     curs.execute("DELETE FROM compuestos WHERE id=%i" % indice)
     conn.commit()
-    conn.close()
+    invalidate(indice)
 
-def getElement(indice):
+def _databank(indice):
+    """Return the name of database with the element indice"""
     if indice>1000:
-        databank_Custom=sqlite3.connect(databank_Custom_name).cursor()
-        databank_Custom.execute("select * from compuestos where id==%i"%indice)
-        componente=databank_Custom.fetchone()
+        return databank_Custom_name
     else:
-        databank=sqlite3.connect(databank_name).cursor()
-        databank.execute("select * from compuestos where id==%i"%indice)
-        componente=databank.fetchone()
+        return databank_name
+
+def getElement(indice):
+    indice=int(indice)
+    componente=elementCache.get(indice)
+    if componente is None:
+        curs=getConnection(_databank(indice)).cursor()
+        curs.execute("select * from compuestos where id==%i"%indice)
+        componente=curs.fetchone()
+        if componente is not None:
+            elementCache.put(indice, componente)
     return componente
 
+def getElements(indices):
+    """Return the list of elements with ids in indices, the elements not
+    cached are read with a only query for each database"""
+    indices=[int(i) for i in indices]
+    faltan={}
+    for indice in indices:
+        if indice not in elementCache:
+            faltan.setdefault(_databank(indice), []).append(indice)
+
+    for name, ids in faltan.iteritems():
+        curs=getConnection(name).cursor()
+        curs.execute("select * from compuestos where id in (%s)" % ", ".join(
+            ["%i" % i for i in ids]))
+        for componente in curs.fetchall():
+            elementCache.put(componente[0], componente)
+
+    elementos=[]
+    for indice in indices:
+        componente=elementCache.get(indice)
+        if componente is None:
+            componente=getElement(indice)
+        elementos.append(componente)
+    return elementos
+
 def copyElement(indice):
     elemento=getElement(indice)
     vals=[]
@@ -355,14 +423,14 @@ def copyElement(indice):
             vals.append(i.encode())
         else:
             vals.append(i)
-    conn = sqlite3.connect(databank_Custom_name)
+    conn = getConnection(databank_Custom_name)
     curs = conn.cursor()
     curs.execute("INSERT INTO compuestos VALUES"+str((1000+N_comp_Custom+1, )+ tuple(vals)))
     conn.commit()
-    conn.close()
+    invalidate(1000+N_comp_Custom+1)
 
 databank_name=os.environ["pychemqt"] + 'dat'+os.sep+'databank.db'
-databank=sqlite3.connect(databank_name).cursor()
+databank=getConnection(databank_name).cursor()
 databank.execute("SELECT COUNT(*) AS Total FROM compuestos")
 N_comp=databank.fetchone()[0]
 
@@ -372,7 +440,7 @@ if not os.path.isdir(conf_dir):
 if not os.path.isfile(conf_dir + "databank.db"):
     createDatabase(conf_dir + 'databank.db')
 databank_Custom_name=conf_dir + 'databank.db'
-databank_Custom=sqlite3.connect(databank_Custom_name).cursor()
+databank_Custom=getConnection(databank_Custom_name).cursor()
 databank_Custom.execute("SELECT COUNT(*) AS Total FROM compuestos")
 N_comp_Custom=databank_Custom.fetchone()[0]
 
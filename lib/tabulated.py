@@ -0,0 +1,1153 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+# Tabulated properties of pure fluids for fast calculation
+#   - Table: Bicubic interpolation table of a phase
+#   - TabulatedFluid: Tables of a fluid in (log P, h) and (T, rho) grids
+#   - Tabulated: Stream class with the properties interpolated from tables
+#   - getTable: Load the tables of a fluid saved in disk
+#   - buildTable: Calculate and save the tables of a fluid
+#   - buildTables: Calculate the missing tables of a component list
+#
+#   Each phase has its own table, fitted to saturation line: the rows have
+#   constant pressure (or temperature) and the nodes of a row are
+#   distributed between the saturation line and the limit of table, so a
+#   cell never cross the saturation line. Over the critical point the phases
+#   are separated by the critical isotherm (or isochor).
+#   The properties are interpolated with a bicubic hermite polynomial, with
+#   the derivatives in nodes calculated with finite differences. The error
+#   of interpolation is checked in the center of each cell against the
+#   equation of state, the states in cells with an error greater than
+#   tolerance are calculated with the equation of state.
+#   The tables are saved in disk and loaded as memory mapped arrays. The
+#   calculation of tables is slow (minutes), so it's never done in the
+#   property calculation, the tables must be built before with the action in
+#   thermodynamic configuration dialog or from command line:
+#       python lib/tabulated.py H2O [eq]
+#       python lib/tabulated.py IAPWS97
+###############################################################################
+
+from hashlib import sha1
+import logging
+import os
+import shutil
+import tempfile
+
+from numpy import (abs, array, broadcast_arrays, ceil, concatenate, einsum,
+                   errstate, exp, gradient, inf, isfinite, linspace, load,
+                   log, nan, save, searchsorted, sqrt, where, zeros)
+from scipy.constants import R
+from scipy.optimize import brentq
+
+from lib import unidades, iapws
+from lib.config import conf_dir
+from lib.meos import _fase
+
+
+tables_dir = conf_dir + "tables" + os.sep
+
+# Maximum relative error of interpolated properties
+tolerance = 1e-4
+
+# Number of rows and columns of tables
+rows = 80
+columns = 40
+
+# Version of tables format, change it to invalidate the saved tables
+version = 1
+
+# Properties saved in tables, the pressure and density are saved as logarithm
+_PhProps = ("T", "rho", "s", "cp", "cv", "w", "mu", "k")
+_TrhoProps = ("P", "h", "s", "cp", "cv", "w", "mu", "k")
+_logProps = ("P", "rho")
+
+
+def _hermite(t):
+    """Cubic hermite basis functions in t, for values at 0 and 1 and
+    derivatives at 0 and 1"""
+    t2 = t*t
+    t3 = t2*t
+    return 2*t3-3*t2+1, 3*t2-2*t3, t3-2*t2+t, t3-t2
+
+
+def _position(eta, sat):
+    """Relative position in row of the column coordinate eta, from 0 to 1,
+    with the nodes concentrated near the saturation side of row, sat"""
+    if sat:
+        return 1-(1-eta)**2
+    return eta**2
+
+
+def _coordinate(xi, sat):
+    """Column coordinate of the relative position xi in row, inverse of
+    _position"""
+    if sat:
+        return 1-sqrt(1-xi)
+    return sqrt(xi)
+
+
+def _hermiteRoot(f0, f1, d0, d1, target):
+    """Solve a cubic hermite polynomial in [0, 1] with a newton method
+    safeguarded with bisection, target must be between f0 and f1, with
+    f0 <= f1"""
+    low, high = 0., 1.
+    if f1 > f0:
+        t = (target-f0)/(f1-f0)
+    else:
+        t = 0.5
+    for i in range(50):
+        h00, h01, h10, h11 = _hermite(t)
+        f = h00*f0+h01*f1+h10*d0+h11*d1-target
+        if f > 0:
+            high = t
+        else:
+            low = t
+        df = 6*t*(t-1)*(f0-f1)+(3*t*t-4*t+1)*d0+(3*t*t-2*t)*d1
+        if df:
+            new = t-f/df
+        else:
+            new = low-1
+        if not low <= new <= high:
+            new = (low+high)/2
+        if abs(new-t) < 1e-13:
+            return new
+        t = new
+    return t
+
+
+def _hermiteSolve(f, d, target):
+    """Search the target in a list of nodes values f, with the derivatives
+    d with node index, interpolated with cubic hermite polynomials
+    Return the node interval and the relative position in it, or None if
+    the values aren't monotonic or don't include target"""
+    if not isfinite(f).all() or not isfinite(d).all():
+        return None
+    if f[-1] < f[0]:
+        f, d, target = -f, -d, -target
+    if not f[0] <= target <= f[-1]:
+        return None
+    j = min(int(searchsorted(f, target, "right"))-1, len(f)-2)
+    if not f[j] <= target <= f[j+1]:
+        return None
+    return j, _hermiteRoot(f[j], f[j+1], d[j], d[j+1], target)
+
+
+class Table(object):
+    """Interpolation table of a phase
+        x: array with the coordinate of rows, log(P) or T
+        bound: array (nx, 2, 2) with the lower and upper limits of rows, its
+            values and derivatives with row index. The nodes of rows are
+            distributed between the limits, concentrated near saturation
+        data: array (nx, ny, nprop, 4) with properties values in nodes, its
+            derivative with row index, with column index and the cross
+            derivative
+        error: array (nx-1, ny-1) with the maximum relative error in cells
+        edge: array (nx-1, 2) with the maximum relative error in the lower
+            and upper limits of rows, used for the saturated states
+        props: name of properties in data
+        xname, yname: name of row and column variables
+        xlog, ylog: the row or column coordinate is the logarithm of variable
+        sat: relative position of saturation line in rows, 0 or 1"""
+    def __init__(self, x, bound, data, error, edge, props, xname, yname,
+                 xlog, ylog, sat):
+        self.x = x
+        self.bound = bound
+        self.data = data
+        self.error = error
+        self.edge = edge
+        self.props = props
+        self.xname = xname
+        self.yname = yname
+        self.xlog = xlog
+        self.ylog = ylog
+        self.sat = sat
+        self.ny = data.shape[1]
+
+    def locate(self, x):
+        """Return the row interval of variable x and the relative position
+        in it, or None if x is out of table"""
+        if self.xlog:
+            x = log(x)
+        if not self.x[0] <= x <= self.x[-1]:
+            return None
+        i = min(int(searchsorted(self.x, x, "right"))-1, len(self.x)-2)
+        return i, (x-self.x[i])/(self.x[i+1]-self.x[i])
+
+    def limits(self, cell):
+        """Return the limits of column coordinate in position cell"""
+        i, u = cell
+        w = _hermite(u)
+        b = self.bound[i:i+2]
+        return [w[0]*b[0, k, 0]+w[1]*b[1, k, 0]+w[2]*b[0, k, 1] +
+                w[3]*b[1, k, 1] for k in (0, 1)]
+
+    def coordinate(self, cell, y):
+        """Return the relative position of column variable y in the row"""
+        low, high = self.limits(cell)
+        if self.ylog:
+            y = log(y)
+        if high == low:
+            return 0.
+        return (y-low)/(high-low)
+
+    def variable(self, cell, xi):
+        """Return the column variable at relative position xi in the row"""
+        low, high = self.limits(cell)
+        y = low+xi*(high-low)
+        if self.ylog:
+            y = exp(y)
+        return float(y)
+
+    def _interpolate(self, cell, xi):
+        """Return the column interval and the interpolated properties in
+        relative position xi in the row"""
+        i, u = cell
+        t = _coordinate(xi, self.sat)*(self.ny-1)
+        j = min(int(t), self.ny-2)
+        v = t-j
+        wu = _hermite(u)
+        wv = _hermite(v)
+        w = array([[[wu[a]*wv[b], wu[a+2]*wv[b], wu[a]*wv[b+2],
+                     wu[a+2]*wv[b+2]] for b in (0, 1)] for a in (0, 1)])
+        return j, einsum("abpk,abk->p", self.data[i:i+2, j:j+2], w)
+
+    def value(self, cell, xi, prop):
+        """Return the interpolated value of a property without error check,
+        used to locate the phase boundaries"""
+        j, values = self._interpolate(cell, xi)
+        value = values[self.props.index(prop)]
+        if prop in _logProps:
+            value = exp(value)
+        return float(value)
+
+    def properties(self, cell, xi, tolerance=tolerance):
+        """Return a dict with the interpolated properties at relative
+        position xi in the row, or None if it's out of table or the error
+        in its cell is greater than tolerance"""
+        if not 0 <= xi <= 1:
+            return None
+        j, values = self._interpolate(cell, xi)
+        if xi in (0, 1):
+            error = self.edge[cell[0], int(xi)]
+        else:
+            error = self.error[cell[0], j]
+        if not error <= tolerance:
+            return None
+
+        prop = {}
+        for name, value in zip(self.props, values):
+            if name in _logProps:
+                value = exp(value)
+            prop[name] = float(value)
+        i, u = cell
+        x = self.x[i]+u*(self.x[i+1]-self.x[i])
+        if self.xlog:
+            x = exp(x)
+        prop[self.xname] = float(x)
+        prop[self.yname] = self.variable(cell, xi)
+        return prop
+
+    def solve(self, cell, prop, target):
+        """Return the relative position in the row where the property has
+        the target value, or None if it isn't in the row"""
+        i, u = cell
+        p = self.props.index(prop)
+        if prop in _logProps:
+            target = log(target)
+        w = _hermite(u)
+        d = self.data[i:i+2, :, p, :]
+        f = w[0]*d[0, :, 0]+w[1]*d[1, :, 0]+w[2]*d[0, :, 1]+w[3]*d[1, :, 1]
+        g = w[0]*d[0, :, 2]+w[1]*d[1, :, 2]+w[2]*d[0, :, 3]+w[3]*d[1, :, 3]
+        root = _hermiteSolve(f, g, target)
+        if root is None:
+            return None
+        j, v = root
+        return _position((j+v)/(self.ny-1.), self.sat)
+
+    def solveSaturation(self, prop, target, rows):
+        """Return the position in rows where the property has the target
+        value in saturation line, searching only in the first rows"""
+        j = int(self.sat*(self.ny-1))
+        p = self.props.index(prop)
+        if prop in _logProps:
+            target = log(target)
+        f = self.data[:rows, j, p, 0]
+        d = self.data[:rows, j, p, 1]
+        return _hermiteSolve(f, d, target)
+
+
+class TabulatedFluid(object):
+    """Tables of properties of a pure fluid
+        tablePh: list with the liquid and vapor tables in (log P, h) grid
+        tableTrho: list with the liquid and vapor tables in (T, rho) grid, None
+            if the equation can't be calculated with T, rho as input
+        Tc, Pc, rhoc, M: critical properties and molecular weight
+        tolerance: maximum relative error of interpolated properties
+
+    The methods to calculate states return a tuple with the quality and the
+    dict with the properties of liquid and vapor phases (None if the phase
+    isn't present) or None if the state can't be interpolated"""
+    def __init__(self, fluido, constants, arrays, tolerance=tolerance):
+        self.fluido = fluido
+        self.Tc, self.Pc, self.rhoc, self.M = constants
+        self.tolerance = tolerance
+
+        self.tablePh = [Table(arrays["Ph_x"], arrays["Ph_bound"][i],
+                              arrays["Ph_data"][i], arrays["Ph_error"][i],
+                              arrays["Ph_edge"][i], _PhProps, "P", "h",
+                              True, False, 1-i)
+                        for i in (0, 1)]
+        # Index of critical pressure in the rows of (log P, h) tables
+        self.ic = int(searchsorted(arrays["Ph_x"], log(self.Pc)))+1
+
+        if "Trho_x" in arrays:
+            self.tableTrho = [
+                Table(arrays["Trho_x"], arrays["Trho_bound"][i],
+                      arrays["Trho_data"][i], arrays["Trho_error"][i],
+                      arrays["Trho_edge"][i], _TrhoProps, "T", "rho",
+                      False, bool(i), i)
+                for i in (0, 1)]
+        else:
+            self.tableTrho = None
+
+    def _single(self, tables, phase, cell, xi):
+        """Return the state of a single phase point"""
+        prop = tables[phase].properties(cell, xi, self.tolerance)
+        if prop is None:
+            return None
+        if phase:
+            return 1., None, prop
+        return 0., prop, None
+
+    def _mix(self, tables, cell, x):
+        """Return the state of two phases point, with the properties of the
+        saturated phases"""
+        liquido, vapor = tables
+        liquid = liquido.properties(cell, liquido.sat, self.tolerance)
+        gas = vapor.properties(cell, vapor.sat, self.tolerance)
+        if liquid is None or gas is None:
+            return None
+        return x, liquid, gas
+
+    def TP(self, T, P):
+        liquido, vapor = self.tablePh
+        cell = liquido.locate(P)
+        if cell is None:
+            return None
+        if T < liquido.value(cell, 1, "T"):
+            phase = 0
+        else:
+            phase = 1
+        xi = self.tablePh[phase].solve(cell, "T", T)
+        if xi is None:
+            return None
+        return self._single(self.tablePh, phase, cell, xi)
+
+    def Ph(self, P, h):
+        liquido, vapor = self.tablePh
+        cell = liquido.locate(P)
+        if cell is None:
+            return None
+        hl = liquido.variable(cell, 1)
+        if h <= hl:
+            return self._single(
+                self.tablePh, 0, cell, liquido.coordinate(cell, h))
+        hv = vapor.variable(cell, 0)
+        if P < self.Pc and h < hv:
+            return self._mix(self.tablePh, cell, (h-hl)/(hv-hl))
+        return self._single(
+            self.tablePh, 1, cell, vapor.coordinate(cell, h))
+
+    def Ps(self, P, s):
+        liquido, vapor = self.tablePh
+        cell = liquido.locate(P)
+        if cell is None:
+            return None
+        sl = liquido.value(cell, 1, "s")
+        sv = vapor.value(cell, 0, "s")
+        if P < self.Pc and sl < s < sv:
+            return self._mix(self.tablePh, cell, (s-sl)/(sv-sl))
+        if s <= sl:
+            phase = 0
+        else:
+            phase = 1
+        xi = self.tablePh[phase].solve(cell, "s", s)
+        if xi is None:
+            return None
+        return self._single(self.tablePh, phase, cell, xi)
+
+    def Px(self, P, x):
+        if P >= self.Pc:
+            return None
+        cell = self.tablePh[0].locate(P)
+        if cell is None:
+            return None
+        return self._mix(self.tablePh, cell, x)
+
+    def Tx(self, T, x):
+        if T >= self.Tc:
+            return None
+        cell = self.tablePh[0].solveSaturation("T", T, self.ic)
+        if cell is None:
+            return None
+        return self._mix(self.tablePh, cell, x)
+
+    def Trho(self, T, rho):
+        if self.tableTrho is None:
+            return None
+        liquido, vapor = self.tableTrho
+        cell = liquido.locate(T)
+        if cell is None:
+            return None
+        rhol = liquido.variable(cell, 0)
+        if rho >= rhol:
+            return self._single(
+                self.tableTrho, 0, cell, liquido.coordinate(cell, rho))
+        rhov = vapor.variable(cell, 1)
+        if T < self.Tc and rho > rhov:
+            x = (1./rho-1./rhol)/(1./rhov-1./rhol)
+            return self._mix(self.tableTrho, cell, x)
+        return self._single(
+            self.tableTrho, 1, cell, vapor.coordinate(cell, rho))
+
+
+class Tabulated(object):
+    """Stream class using the tabulated properties of a pure fluid, the
+    states out of the tables or in cells with an interpolation error greater
+    than tolerance are calculated with the equation of state"""
+    kwargs = {"fluido": None,
+              "eq": 0,
+
+              "T": 0.0,
+              "P": 0.0,
+              "x": None,
+              "rho": None,
+              "h": None,
+              "s": None}
+
+    status = 0
+    msg = "Unknown variables"
+
+    def __init__(self, **kwargs):
+        """Parameters needed to define it are:
+
+        -fluido: Class of fluid, MEoS subclass or iapws.IAPWS97
+        -eq: Index of equation of state for MEoS fluids
+
+        -T: Temperature, Kelvin
+        -P: Pressure, Pa
+        -rho: Density, kg/m3
+        -h: Enthalpy, J/kg
+        -s: Entropy, J/kgK
+        -x: Quality, -
+        """
+        self.kwargs = Tabulated.kwargs.copy()
+        self.__call__(**kwargs)
+
+    def __call__(self, **kwargs):
+        self.kwargs.update(kwargs)
+
+        if self.calculable:
+            self.calculo()
+
+    @property
+    def calculable(self):
+        self._thermo = ""
+        if self.kwargs["fluido"] is None:
+            return self._thermo
+        if self.kwargs["T"] and self.kwargs["P"]:
+            self._thermo = "TP"
+        elif self.kwargs["P"] and self.kwargs["h"] is not None:
+            self._thermo = "Ph"
+        elif self.kwargs["P"] and self.kwargs["s"] is not None:
+            self._thermo = "Ps"
+        elif self.kwargs["T"] and self.kwargs["rho"]:
+            self._thermo = "Trho"
+        elif self.kwargs["T"] and self.kwargs["x"] is not None:
+            self._thermo = "Tx"
+        elif self.kwargs["P"] and self.kwargs["x"] is not None:
+            self._thermo = "Px"
+        return self._thermo
+
+    def calculo(self):
+        fluido = self.kwargs["fluido"]
+        var1 = self._thermo[0]
+        var2 = self._thermo[1:]
+        args = (float(self.kwargs[var1]), float(self.kwargs[var2]))
+
+        try:
+            table = getTable(fluido, self.kwargs["eq"])
+        except (IOError, OSError, ValueError):
+            table = None
+        if table is None:
+            state = None
+        else:
+            state = getattr(table, self._thermo)(*args)
+
+        if state is None:
+            self._calculoEoS({var1: args[0], var2: args[1]})
+        else:
+            self.tabulated = True
+            self.fill(table, state, {var1: args[0], var2: args[1]})
+            self.status = 1
+            self.msg = ""
+
+    def _calculoEoS(self, kwargs):
+        """Calculate the state with the equation of state of fluid"""
+        self.tabulated = False
+        if self.kwargs["fluido"] is not iapws.IAPWS97:
+            kwargs["eq"] = self.kwargs["eq"]
+        try:
+            compuesto = self.kwargs["fluido"](**kwargs)
+        except (ValueError, NotImplementedError, OverflowError,
+                ZeroDivisionError):
+            compuesto = None
+        if compuesto is None or compuesto.status != 1:
+            self.status = 0
+            self.msg = "Input out of bounds"
+            return
+
+        for key in ("T", "P", "x", "M", "Tc", "Pc", "rhoc", "rho", "v", "h",
+                    "s", "u", "cp", "cv", "cp_cv", "w", "mu", "k", "Liquido",
+                    "Gas"):
+            self.__setattr__(key, getattr(compuesto, key, None))
+        self.status = 1
+        self.msg = ""
+
+    def fill(self, table, state, inputs):
+        """Fill the properties with the interpolated state"""
+        x, liquido, vapor = state
+        fases = [fase for fase in (liquido, vapor) if fase is not None]
+
+        # Use the exact values of input variables
+        for fase in fases:
+            for var in ("T", "P"):
+                if var in inputs:
+                    fase[var] = inputs[var]
+            if len(fases) == 1:
+                fase.update(inputs)
+                fase.pop("x", None)
+
+        self.M = unidades.Dimensionless(table.M)
+        self.Tc = unidades.Temperature(table.Tc)
+        self.Pc = unidades.Pressure(table.Pc)
+        self.rhoc = unidades.Density(table.rhoc)
+        self.x = unidades.Dimensionless(x)
+        self.T = unidades.Temperature(fases[0]["T"])
+        self.P = unidades.Pressure(fases[-1]["P"])
+        self.Tr = unidades.Dimensionless(self.T/self.Tc)
+        self.Pr = unidades.Dimensionless(self.P/self.Pc)
+
+        self.Liquido = _fase()
+        self.Gas = _fase()
+        if liquido is not None:
+            self.fillPhase(self.Liquido, liquido)
+        if vapor is not None:
+            self.fillPhase(self.Gas, vapor)
+
+        if len(fases) == 1:
+            self.fillPhase(self, fases[0])
+        else:
+            self.v = unidades.SpecificVolume(
+                x*self.Gas.v+(1-x)*self.Liquido.v)
+            self.rho = unidades.Density(1./self.v)
+            self.h = unidades.Enthalpy(x*self.Gas.h+(1-x)*self.Liquido.h)
+            self.s = unidades.SpecificHeat(x*self.Gas.s+(1-x)*self.Liquido.s)
+            self.u = unidades.Enthalpy(x*self.Gas.u+(1-x)*self.Liquido.u)
+            self.cp = unidades.SpecificHeat(None)
+            self.cv = unidades.SpecificHeat(None)
+            self.cp_cv = unidades.Dimensionless(None)
+            self.w = unidades.Speed(None)
+            self.mu = unidades.Viscosity(None)
+            self.k = unidades.ThermalConductivity(None)
+
+    def fillPhase(self, fase, estado):
+        """Fill phase properties"""
+        fase.M = unidades.Dimensionless(self.M)
+        fase.rho = unidades.Density(estado["rho"])
+        fase.v = unidades.SpecificVolume(1./estado["rho"])
+        fase.h = unidades.Enthalpy(estado["h"])
+        fase.s = unidades.SpecificHeat(estado["s"])
+        fase.u = unidades.Enthalpy(fase.h-estado["P"]*fase.v)
+        fase.a = unidades.Enthalpy(fase.u-estado["T"]*fase.s)
+        fase.g = unidades.Enthalpy(fase.h-estado["T"]*fase.s)
+        fase.Z = unidades.Dimensionless(
+            estado["P"]*fase.v*self.M/R/estado["T"]/1000)
+
+        fase.cp = unidades.SpecificHeat(estado["cp"])
+        fase.cv = unidades.SpecificHeat(estado["cv"])
+        fase.cp_cv = unidades.Dimensionless(fase.cp/fase.cv)
+        fase.w = unidades.Speed(estado["w"])
+
+        fase.rhoM = unidades.MolarDensity(fase.rho/self.M)
+        fase.hM = unidades.MolarEnthalpy(fase.h*self.M)
+        fase.sM = unidades.MolarSpecificHeat(fase.s*self.M)
+        fase.uM = unidades.MolarEnthalpy(fase.u*self.M)
+        fase.cvM = unidades.MolarSpecificHeat(fase.cv*self.M)
+        fase.cpM = unidades.MolarSpecificHeat(fase.cp*self.M)
+
+        if isfinite(estado["mu"]):
+            fase.mu = unidades.Viscosity(estado["mu"])
+            fase.nu = unidades.Diffusivity(fase.mu/fase.rho)
+        else:
+            fase.mu = None
+            fase.nu = None
+        if isfinite(estado["k"]):
+            fase.k = unidades.ThermalConductivity(estado["k"])
+            fase.alfa = unidades.Diffusivity(fase.k/fase.rho/fase.cp)
+        else:
+            fase.k = None
+            fase.alfa = None
+        if fase.mu and fase.k:
+            fase.Prandt = unidades.Dimensionless(fase.mu*fase.cp/fase.k)
+        else:
+            fase.Prandt = None
+
+
+# Sources of table nodes, with the interface:
+#   TP(T, P, phase), Ph(P, h, phase): Properties of single phase states
+#   saturation(P): Properties of saturated liquid and vapor
+#   Trho(T, rho), saturationT(T): The same with T, rho and T as input, only
+#       if the equation can be calculated with this input
+# All functions use arrays as input and return dict with SI properties
+# arrays: T, P, rho, h, s, cp, cv, w, mu, k
+
+class _MEoSSource(object):
+    """Calculate the table nodes of a MEoS fluid with its batch api"""
+    def __init__(self, fluido, eq=0):
+        self.fluido = fluido
+        self.eq = eq
+        self.fluid = fluido(eq=eq)
+        self.fluid._configure()
+        constants = self.fluid._constants
+        self.Tc = float(fluido.Tc)
+        self.Pc = float(fluido.Pc)
+        self.rhoc = float(fluido.rhoc)
+        self.M = float(fluido.M)
+        self.Tmin = max(float(constants["Tmin"]), float(fluido.Tt))
+        self.Tmax = float(constants["Tmax"])
+        self.Pt = self.fluid._saturation(self.Tmin)[2]
+        self.Pmax = min(constants["Pmax"]*1000, 10*self.Pc)
+
+    def _properties(self, rho, T):
+        prop = self.fluid._batchProperties(rho, T)
+        self.fluid._batchTransport(prop)
+        return prop
+
+    def TP(self, T, P, phase):
+        T, P = broadcast_arrays(array(T, dtype=float), array(P, dtype=float))
+        with errstate(all="ignore"):
+            rho0 = self.fluid._batchRhoGuess(T, P)
+            sub = T < self.Tc
+            if sub.any():
+                rhol, rhov, Ps = self.fluid._batchSaturation(T[sub])
+                rho0[sub] = [rhov, rhol][phase == 0]
+            rho = self.fluid._batchRho(T, P, rho0)
+            return self._properties(rho, T)
+
+    def Ph(self, P, h, phase):
+        return self.fluido.batch(P=P, h=h, eq=self.eq)
+
+    def saturation(self, P):
+        with errstate(all="ignore"):
+            T = self.fluid._batchTsat(array(P, dtype=float))
+        return self.saturationT(T)
+
+    def saturationT(self, T):
+        with errstate(all="ignore"):
+            rhol, rhov, Ps = self.fluid._batchSaturation(array(T, dtype=float))
+            return self._properties(rhol, T), self._properties(rhov, T)
+
+    def Trho(self, T, rho):
+        return self.fluido.batch(T=T, rho=rho, eq=self.eq)
+
+
+class _IAPWSSource(object):
+    """Calculate the table nodes of IAPWS-IF97 point by point with the
+    equations of regions"""
+    Trho = None
+    saturationT = None
+
+    def __init__(self, fluido, eq=0):
+        self.fluido = fluido
+        self.Tc = iapws.Tc
+        self.Pc = iapws.Pc*1e6
+        self.rhoc = float(iapws.rhoc)
+        self.M = iapws.M
+        self.Tmin = iapws.Tt
+        self.Tmax = 1073.15
+        self.Pt = iapws._PSat_T(self.Tmin)*1e6
+        self.Pmax = 100e6
+
+    def _rho3(self, T, P, phase):
+        """Density in region 3, the root of liquid or vapor phase"""
+        f = lambda rho: iapws._Region3(rho, T)["P"]-P
+        rho = linspace(100, 800, 71)
+        values = array([f(r) for r in rho])
+        roots = (values[:-1]*values[1:] <= 0).nonzero()[0]
+        if not roots.size:
+            return nan
+        if phase:
+            i = roots[0]
+        else:
+            i = roots[-1]
+        return brentq(f, rho[i], rho[i+1], xtol=1e-12)
+
+    def _state(self, T, P, phase):
+        """Properties of a single phase state, with P in MPa"""
+        if P <= iapws.Ps_623:
+            if phase:
+                estado = iapws._Region2(T, P)
+            else:
+                estado = iapws._Region1(T, P)
+        elif T <= 623.15:
+            estado = iapws._Region1(T, P)
+        elif T >= iapws._t_P(P):
+            estado = iapws._Region2(T, P)
+        else:
+            estado = iapws._Region3(self._rho3(T, P, phase), T)
+        return estado
+
+    def _batch(self, function, a, b, *args):
+        """Calculate the states with function for arrays a, b"""
+        a, b = broadcast_arrays(array(a, dtype=float), array(b, dtype=float))
+        prop = {}
+        for key in ("T", "P", "rho", "h", "s", "cp", "cv", "w", "mu", "k"):
+            prop[key] = zeros(a.shape)*nan
+        for i in range(a.size):
+            try:
+                estado = function(float(a.flat[i]), float(b.flat[i]), *args)
+                rho = 1./estado["v"]
+                T = estado["T"]
+                values = (T, estado["P"]*1e6, rho, estado["h"]*1e3,
+                          estado["s"]*1e3, estado["cp"]*1e3,
+                          estado["cv"]*1e3, estado["w"],
+                          iapws._Viscosity(rho, T), iapws._ThCond(rho, T))
+            except (ValueError, TypeError, ZeroDivisionError, OverflowError,
+                    KeyError, NotImplementedError):
+                continue
+            for key, value in zip(("T", "P", "rho", "h", "s", "cp", "cv",
+                                   "w", "mu", "k"), values):
+                prop[key].flat[i] = value
+        return prop
+
+    def TP(self, T, P, phase):
+        return self._batch(lambda T, P: self._state(T, P/1e6, phase), T, P)
+
+    def Ph(self, P, h, phase):
+        def state(P, h):
+            P /= 1e6
+            if P < iapws.Pc:
+                Tsat = iapws._TSat_P(P)
+            else:
+                Tsat = iapws.Tc
+            if phase:
+                Tlow, Thigh = Tsat, self.Tmax
+            else:
+                Tlow, Thigh = self.Tmin, Tsat
+            f = lambda T: self._state(T, P, phase)["h"]-h/1000
+            T = brentq(f, Tlow, Thigh, xtol=1e-12)
+            return self._state(T, P, phase)
+        return self._batch(state, P, h)
+
+    def saturation(self, P):
+        T = array([iapws._TSat_P(p/1e6) for p in P])
+        liquido = self._batch(lambda T, P: self._state(T, P/1e6, 0), T, P)
+        vapor = self._batch(lambda T, P: self._state(T, P/1e6, 1), T, P)
+        return liquido, vapor
+
+
+def _source(fluido, eq=0):
+    """Return the source of table nodes for fluid class"""
+    if fluido is iapws.IAPWS97:
+        return _IAPWSSource(fluido)
+    return _MEoSSource(fluido, eq)
+
+
+def _grid(low, critic, high, points):
+    """Return the rows coordinates, between low and high, with critic as a
+    node and approximately equidistant"""
+    n1 = max(int(ceil(points*(critic-low)/(high-low))), 2)
+    n2 = max(points-n1, 2)
+    return concatenate((linspace(low, critic, n1+1)[:-1],
+                        linspace(critic, high, n2+1)))
+
+
+def _gradient(values, axis):
+    """Derivative of values with node index along axis by fourth order
+    finite differences"""
+    f = values.swapaxes(0, axis)
+    if len(f) < 5:
+        return gradient(values, axis=axis, edge_order=2)
+    d = zeros(f.shape)
+    d[2:-2] = (f[:-4]-8*f[1:-3]+8*f[3:-1]-f[4:])/12
+    d[0] = (-25*f[0]+48*f[1]-36*f[2]+16*f[3]-3*f[4])/12
+    d[1] = (-3*f[0]-10*f[1]+18*f[2]-6*f[3]+f[4])/12
+    d[-2] = (3*f[-1]+10*f[-2]-18*f[-3]+6*f[-4]-f[-5])/12
+    d[-1] = (25*f[-1]-48*f[-2]+36*f[-3]-16*f[-4]+3*f[-5])/12
+    return d.swapaxes(0, axis)
+
+
+def _derivatives(values):
+    """Return the array (nx, ny, nprop, 4) with the values in grid nodes and
+    its derivatives with row and column index by finite differences"""
+    with errstate(all="ignore"):
+        dx = _gradient(values, 0)
+        dy = _gradient(values, 1)
+        dxy = _gradient(dx, 1)
+    data = zeros(values.shape+(4, ))
+    data[..., 0] = values
+    data[..., 1] = dx
+    data[..., 2] = dy
+    data[..., 3] = dxy
+    return data
+
+
+def _pack(prop, props):
+    """Return array (..., nprop) with the properties to save in table"""
+    values = []
+    for name in props:
+        value = prop[name]
+        if name in _logProps:
+            with errstate(all="ignore"):
+                value = log(value)
+        values.append(value)
+    return concatenate([value[..., None] for value in values], axis=-1)
+
+
+def _error(interpolated, exact, props):
+    """Relative error of interpolated properties of cell centers, the
+    entropy and enthalpy errors are relative to cp and cp·T"""
+    error = zeros(exact["T"].shape)
+    with errstate(all="ignore"):
+        for name in props:
+            if name == "s":
+                e = abs(interpolated[name]-exact[name])/exact["cp"]
+            elif name == "h":
+                e = abs(interpolated[name]-exact[name])/exact["cp"] / \
+                    exact["T"]
+            else:
+                e = abs(interpolated[name]/exact[name]-1)
+            if name in ("mu", "k"):
+                # Transport properties can be unavailable
+                e = where(isfinite(exact[name]), e, 0)
+            e = where(isfinite(e), e, inf)
+            error = where(e > error, e, error)
+    return error
+
+
+def _tables(xnodes, boundFunction, nodeFunction, props, names, ylogs, sats):
+    """Calculate the tables of both phases
+        xnodes: coordinates of rows
+        boundFunction: function with the rows coordinates as input and
+            return the array (n, 2, 2) with the limits of phase rows and the
+            properties in the limits for each phase as [[low, high], ...]
+        nodeFunction: function with rows variable, columns variable and
+            phase as input, return the properties of single phase states
+        names: name of row and column variables
+    Return the x, bound, data, error and edge arrays"""
+    ny = columns+1
+    eta = linspace(0, 1, ny)
+    xmid = (xnodes[1:]+xnodes[:-1])/2
+    xname, yname = names
+    xlog = xname == "P"
+
+    def var(x):
+        if xlog:
+            return exp(x)
+        return x
+
+    bound, edges = boundFunction(var(xnodes))
+    boundmid, edgesmid = boundFunction(var(xmid))
+
+    data = []
+    errors = []
+    edgeErrors = []
+    bounds = []
+    for phase in (0, 1):
+        ylog = ylogs[phase]
+        xi = _position(eta, sats[phase])
+        ximid = _position((eta[1:]+eta[:-1])/2, sats[phase])
+        low = bound[:, phase, 0][:, None]
+        high = bound[:, phase, 1][:, None]
+        y = low+xi[1:-1]*(high-low)
+        if ylog:
+            y = exp(y)
+        x = var(xnodes)[:, None]+0*y
+        prop = nodeFunction(x, y, phase)
+        values = zeros((len(xnodes), ny, len(props)))
+        values[:, 1:-1] = _pack(prop, props)
+        values[:, 0] = _pack(edges[phase][0], props)
+        values[:, -1] = _pack(edges[phase][1], props)
+
+        with errstate(all="ignore"):
+            b = _gradient(bound[:, phase], 0)
+        phaseBound = zeros(bound[:, phase].shape+(2, ))
+        phaseBound[..., 0] = bound[:, phase]
+        phaseBound[..., 1] = b
+        phaseData = _derivatives(values)
+        table = Table(xnodes, phaseBound, phaseData,
+                      zeros((len(xnodes)-1, ny-1)),
+                      zeros((len(xnodes)-1, 2)), props, xname, yname,
+                      xlog, ylog, sats[phase])
+
+        # Check the interpolation in center of cells
+        rowError = zeros(len(xmid))
+        limits = []
+        for i in range(len(xmid)):
+            lim = table.limits((i, 0.5))
+            span = boundmid[i, phase, 1]-boundmid[i, phase, 0]
+            with errstate(all="ignore"):
+                e = max(abs(lim[0]-boundmid[i, phase, 0]),
+                        abs(lim[1]-boundmid[i, phase, 1]))/abs(span)
+            if not isfinite(e):
+                e = inf
+            rowError[i] = e
+            limits.append(lim)
+        limits = array(limits)
+        y = limits[:, 0][:, None]+ximid*(limits[:, 1]-limits[:, 0])[:, None]
+        if ylog:
+            y = exp(y)
+        x = var(xmid)[:, None]+0*y
+        exact = nodeFunction(x, y, phase)
+
+        interpolated = {}
+        for name in props:
+            interpolated[name] = zeros(y.shape)
+        for i in range(len(xmid)):
+            for j in range(len(ximid)):
+                k, values = table._interpolate((i, 0.5), ximid[j])
+                for name, value in zip(props, values):
+                    if name in _logProps:
+                        value = exp(value)
+                    interpolated[name][i, j] = value
+        error = _error(interpolated, exact, props)
+        # The limits error can misplace the states only in the edge cells,
+        # the inner cells are checked yet with the interpolated limits
+        for j in (0, -1):
+            error[:, j] = where(error[:, j] > rowError, error[:, j], rowError)
+
+        # Check the interpolation along the limits of rows
+        edge = zeros((len(xmid), 2))
+        for k in (0, 1):
+            interpolated = {}
+            for name in props:
+                interpolated[name] = zeros(len(xmid))
+            for i in range(len(xmid)):
+                j, values = table._interpolate((i, 0.5), k)
+                for name, value in zip(props, values):
+                    if name in _logProps:
+                        value = exp(value)
+                    interpolated[name][i] = value
+            e = _error(interpolated, edgesmid[phase][k], props)
+            edge[:, k] = where(e > rowError, e, rowError)
+
+        bounds.append(phaseBound)
+        data.append(phaseData)
+        errors.append(error)
+        edgeErrors.append(edge)
+    return xnodes, array(bounds), array(data), array(errors), \
+        array(edgeErrors)
+
+
+def _assemble(n, parts):
+    """Join the properties dicts calculated for the masks of parts, a list of
+    (mask, dict)"""
+    prop = {}
+    for mask, values in parts:
+        for key in ("T", "P", "rho", "h", "s", "cp", "cv", "w", "mu", "k"):
+            if key not in prop:
+                prop[key] = zeros(n)*nan
+            prop[key][mask] = values[key]
+    return prop
+
+
+def _PhBounds(source):
+    """Return the function to calculate the limits of (log P, h) rows:
+        liquid: from minimum temperature to saturation or critical isotherm
+        vapor: from saturation or critical isotherm to maximum temperature"""
+    def bounds(P):
+        n = len(P)
+        low = source.TP(P*0+source.Tmin, P, 0)
+        high = source.TP(P*0+source.Tmax, P, 1)
+        sub = P < source.Pc
+        critic = source.TP(P[~sub]*0+source.Tc, P[~sub], 0)
+        if sub.any():
+            liquid, vapor = source.saturation(P[sub])
+        else:
+            liquid = vapor = {}
+        satl = _assemble(n, [(sub, liquid), (~sub, critic)])
+        satv = _assemble(n, [(sub, vapor), (~sub, critic)])
+
+        bound = zeros((n, 2, 2))
+        bound[:, 0, 0] = low["h"]
+        bound[:, 0, 1] = satl["h"]
+        bound[:, 1, 0] = satv["h"]
+        bound[:, 1, 1] = high["h"]
+        return bound, [[low, satl], [satv, high]]
+    return bounds
+
+
+def _TrhoBounds(source):
+    """Return the function to calculate the limits of (T, rho) rows:
+        liquid: from saturation or critical isochor to maximum pressure
+        vapor: from the triple point pressure to saturation or critical
+            isochor, in logarithmic scale"""
+    def bounds(T):
+        n = len(T)
+        high = source.TP(T, T*0+source.Pmax, 0)
+        low = source.TP(T, T*0+0.99*source.Pt, 1)
+        sub = T < source.Tc
+        # The residual terms of some equations are singular just in the
+        # critical density
+        critic = source.Trho(T[~sub], T[~sub]*0+source.rhoc*(1+1e-9))
+        if sub.any():
+            liquid, vapor = source.saturationT(T[sub])
+        else:
+            liquid = vapor = {}
+        satl = _assemble(n, [(sub, liquid), (~sub, critic)])
+        satv = _assemble(n, [(sub, vapor), (~sub, critic)])
+
+        bound = zeros((n, 2, 2))
+        with errstate(all="ignore"):
+            bound[:, 0, 0] = satl["rho"]
+            bound[:, 0, 1] = high["rho"]
+            bound[:, 1, 0] = log(low["rho"])
+            bound[:, 1, 1] = log(satv["rho"])
+        return bound, [[satl, high], [low, satv]]
+    return bounds
+
+
+def _build(source):
+    """Calculate the tables of fluid, return a dict with the arrays"""
+    arrays = {}
+    # The critical row is a bit over the critical pressure, so the rounding
+    # don't define it as subcritical
+    x = _grid(log(1.02*source.Pt), log(source.Pc)+1e-9, log(source.Pmax),
+              rows)
+    tables = _tables(x, _PhBounds(source), source.Ph, _PhProps, ("P", "h"),
+                     (False, False), (1, 0))
+    for name, value in zip(("x", "bound", "data", "error", "edge"), tables):
+        arrays["Ph_"+name] = value
+
+    if source.Trho is not None:
+        x = _grid(source.Tmin, source.Tc, source.Tmax, rows)
+        tables = _tables(x, _TrhoBounds(source),
+                         lambda T, rho, phase: source.Trho(T, rho),
+                         _TrhoProps, ("T", "rho"), (False, True), (0, 1))
+        for name, value in zip(("x", "bound", "data", "error", "edge"),
+                               tables):
+            arrays["Trho_"+name] = value
+    return arrays
+
+
+def _save(path, arrays):
+    """Save the tables arrays in directory path, using a temporary directory
+    so other process can't load the tables partially saved"""
+    if not os.path.isdir(tables_dir):
+        os.makedirs(tables_dir)
+    tmp = tempfile.mkdtemp(dir=tables_dir)
+    for name, value in arrays.iteritems():
+        save(os.path.join(tmp, name+".npy"), value)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Other process has saved the tables before
+        shutil.rmtree(tmp)
+
+
+def _load(path):
+    """Load the tables arrays saved in directory path as memory mapped"""
+    arrays = {}
+    for name in os.listdir(path):
+        if name.endswith(".npy"):
+            arrays[name[:-4]] = load(os.path.join(path, name), mmap_mode="r")
+    return arrays
+
+
+_loaded = {}
+
+
+def _path(fluido, eq=0):
+    """Return the directory of tables of a fluid class and equation"""
+    if fluido is iapws.IAPWS97:
+        key = (fluido.__name__, )
+    else:
+        key = (fluido.__name__, eq, fluido.kwargs["visco"],
+               fluido.kwargs["thermal"])
+    key = sha1(repr((version, rows, columns)+key)).hexdigest()
+    return tables_dir + fluido.__name__ + "-" + key
+
+
+def getTable(fluido, eq=0):
+    """Return the TabulatedFluid of a fluid class, MEoS subclass or
+    iapws.IAPWS97, with the tables saved in disk, None if the tables of
+    fluid haven't been built
+        eq: index of equation of state for MEoS fluids"""
+    if fluido is iapws.IAPWS97:
+        eq = 0
+    if (fluido, eq) in _loaded:
+        return _loaded[(fluido, eq)]
+
+    path = _path(fluido, eq)
+    if not os.path.isdir(path):
+        return None
+
+    if fluido is iapws.IAPWS97:
+        constants = (iapws.Tc, iapws.Pc*1e6, float(iapws.rhoc), iapws.M)
+    else:
+        constants = (float(fluido.Tc), float(fluido.Pc), float(fluido.rhoc),
+                     float(fluido.M))
+    table = TabulatedFluid(fluido, constants, _load(path))
+    _loaded[(fluido, eq)] = table
+    return table
+
+
+def buildTable(fluido, eq=0):
+    """Calculate and save the tables of a fluid class if they aren't saved
+    yet, it can take some minutes
+        eq: index of equation of state for MEoS fluids"""
+    path = _path(fluido, eq)
+    if not os.path.isdir(path):
+        _save(path, _build(_source(fluido, eq)))
+
+
+def buildTables(ids, iapws97=False, eq=0):
+    """Calculate the missing tables of the components with MEoS in a list of
+    component ids, used in the background build of tables
+        iapws97: build the IAPWS97 tables for water instead of MEoS
+        eq: index of equation of state for MEoS fluids"""
+    from lib import mEoS
+    for id in ids:
+        if id == 62 and iapws97:
+            fluido = iapws.IAPWS97
+        elif id in mEoS.id_mEoS:
+            fluido = mEoS.__all__[mEoS.id_mEoS.index(id)]
+        else:
+            continue
+        try:
+            buildTable(fluido, eq)
+        except (ValueError, ZeroDivisionError, OverflowError, IndexError,
+                KeyError) as error:
+            # The fluid without tables is calculated with the equation
+            logging.warning("Tables of %s can't be built: %s" % (
+                fluido.__name__, error))
+
+
+if __name__ == "__main__":
+    import sys
+    from lib import mEoS
+    if len(sys.argv) < 2:
+        print("Usage: python lib/tabulated.py fluid [eq]")
+        sys.exit(1)
+    name = sys.argv[1]
+    if len(sys.argv) > 2:
+        eq = int(sys.argv[2])
+    else:
+        eq = 0
+    if name == "IAPWS97":
+        buildTable(iapws.IAPWS97)
+    else:
+        fluidos = dict([(f.__name__, f) for f in mEoS.__all__])
+        buildTable(fluidos[name], eq)
@@ -6,11 +6,15 @@
 #   - WaitforClick: Thread for draw stream in PFD
 #   - Evaluate: Thread to insolate entity calculation from gui, used in streams,
 #       equipment, and project
+#   - Solve: Thread to solve a project with progress report and cancellation
+#   - parallelMap: Distribute independent calculations in a process pool
+#   - createPool: Create a process pool, None if it isn't available
 ###############################################################################
 
+import multiprocessing
 from time import sleep
 
-from PyQt4.QtCore import QThread, QMutex
+from PyQt4.QtCore import QThread, QMutex, pyqtSignal
 
 
 class WaitforClick(QThread):
@@ -45,3 +49,87 @@ class Evaluate(QThread):
         self.mutex.lock()
         self.entity(**self.kwargs)
         self.mutex.unlock()
+
+
+class Solve(QThread):
+    """Thread used to solve a project, the independent branches of flowsheet
+    are calculated in a pool of process, the progress signal is emitted with
+    the count of finished blocks and the total blocks of flowsheet"""
+    progress = pyqtSignal(int, int)
+
+    def __init__(self, parent=None):
+        super(Solve, self).__init__(parent)
+        self.mutex = QMutex()
+        self.project = None
+        self.converged = False
+
+    def start(self, project, **kwargs):
+        """Start the project solve, kwargs are the solve method arguments"""
+        self.project = project
+        self.kwargs = kwargs
+        self.converged = False
+        QThread.start(self)
+
+    def run(self):
+        self.mutex.lock()
+        try:
+            self.converged = self.project.solve(progress=self.progress.emit,
+                                                **self.kwargs)
+        finally:
+            self.mutex.unlock()
+
+    def cancel(self):
+        """Stop the calculation, the blocks in process are discarded"""
+        if self.project is not None:
+            self.project.cancel()
+
+
+def cpuCount():
+    """Number of cpu available, 1 if it can't be determined"""
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def createPool(processes=None):
+    """Create a pool of worker process, return None with a only process or
+    when the pool can't be created
+        processes: number of worker process, default the number of cpu"""
+    if processes is None:
+        processes = cpuCount()
+    if processes > 1:
+        try:
+            return multiprocessing.Pool(processes)
+        except (OSError, ImportError):
+            pass
+    return None
+
+
+def parallelMap(function, tasks, processes=None):
+    """Generator to calculate function for each element of tasks in a pool of
+    process, the results are yielded as they are finished, not in the tasks
+    order, so function must return enough info to identify the task
+        function: function to calculate, it must be defined at module level
+            and its arguments and return value must be pickables
+        tasks: list with the argument of each function call
+        processes: number of worker process, default the number of cpu
+
+    With a only task or when the pool can't be created the calculation is
+    done in the current process"""
+    if processes is None:
+        processes = cpuCount()
+    pool = createPool(min(processes, len(tasks)))
+
+    if pool is None:
+        for task in tasks:
+            yield function(task)
+        return
+
+    try:
+        for result in pool.imap_unordered(function, tasks):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -2,12 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import cPickle
-from ConfigParser import ConfigParser
 
 from PyQt4.QtGui import QApplication
 import scipy.constants as k
 
-from lib.config import conf_dir, getMainWindowConfig
+from lib.config import conf_dir, getConfig, getPreferences
 from lib.utilities import representacion
 from lib.firstrun import getrates
 
@@ -78,6 +77,40 @@ def K2Re(K):
     return (K - 273.15) / 1.25
 
 
+class _Conversion(object):
+    """Descriptor for a unit conversion, the value is calculated only when
+    the attribute is accessed, using the conversion rate of class"""
+    __slots__ = ("rate", )
+
+    def __init__(self, rate):
+        self.rate = rate
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        return obj._data / self.rate
+
+
+class _UnitType(type):
+    """Metaclass for units, define the conversion descriptors from the rates
+    dict and the empty __slots__ to avoid the __dict__ of each instance"""
+    def __new__(mcs, name, bases, dct):
+        dct.setdefault("__slots__", ())
+        for key, rate in dct.get("rates", {}).iteritems():
+            if key not in dct:
+                dct[key] = _Conversion(rate)
+        return type.__new__(mcs, name, bases, dct)
+
+
+def _restore(cls, data, code, magnitud):
+    """Rebuild a unit instance from its pickled state"""
+    obj = float.__new__(cls, data)
+    obj._data = data
+    obj.code = code
+    obj.magnitud = magnitud
+    return obj
+
+
 class unidad(float):
     """
     Generic class to model units
@@ -91,7 +124,10 @@ class unidad(float):
             Each magnitud is a tuple with format (Name, title)
         __units_set__: Dict with standart unit for units system,
             altsi, si, metric, cgs, english
+    The conversion to each unit of rates are calculated in attribute access
     """
+    __metaclass__ = _UnitType
+    __slots__ = ("_data", "code", "magnitud")
     __title__ = ""
     rates = {}
     __text__ = []
@@ -99,12 +135,10 @@ class unidad(float):
     __tooltip__ = []
     _magnitudes = []
     __units_set__ = []
-    Config = getMainWindowConfig()
 
     def __init__(self, data, unit="", magnitud=""):
         """Non proportional magnitudes (Temperature, Pressure)
         must rewrite this method"""
-        self.Config = getMainWindowConfig()
         if not magnitud:
             magnitud = self.__class__.__name__
         self.magnitud = magnitud
@@ -118,12 +152,10 @@ class unidad(float):
             self.code = ""
 
         if unit == "conf":
-            unit = self.__units__[self.Config.getint('Units', magnitud)]
+            unit = self.__units__[getConfig().getint('Units', magnitud)]
         elif not unit:
             unit = self.__units__[0]
         self._data = self._getBaseValue(data, unit, magnitud)
-        for key in self.__class__.rates:
-            self.__setattr__(key, self._data / self.__class__.rates[key])
 
     def __new__(cls, data, unit="", magnitud=""):
         if not magnitud:
@@ -134,14 +166,26 @@ class unidad(float):
             data = cls._getBaseValue(data, unit, magnitud)
 
         return float.__new__(cls, data)
-    
+
+    def __reduce__(self):
+        return (_restore, (self.__class__, self._data, self.code,
+                           self.magnitud))
+
+    def __setstate__(self, state):
+        """Support for units pickled with the conversions as attributes"""
+        if isinstance(state, tuple):
+            state = state[-1]
+        self._data = state.get("_data", float(self))
+        self.code = state.get("code", "")
+        self.magnitud = state.get("magnitud", self.__class__.__name__)
+
     @classmethod
     def _getBaseValue(cls, data, unit, magnitud):
         if data is None:
             data = 0
 
         if unit == "conf":
-            unit = cls.__units__[cls.Config.getint('Units', magnitud)]
+            unit = cls.__units__[getConfig().getint('Units', magnitud)]
         elif not unit:
             unit = cls.__units__[0]
             
@@ -158,7 +202,7 @@ class unidad(float):
         """Using config file return the value in the configurated unit"""
         if not magnitud:
             magnitud = self.__class__.__name__
-        value = self.Config.getint('Units', magnitud)
+        value = getConfig().getint('Units', magnitud)
         return self.__getattribute__(self.__units__[value])
 
     @classmethod
@@ -166,14 +210,14 @@ class unidad(float):
         """Using config file return the configurated unit text"""
         if not magnitud:
             magnitud = cls.__name__
-        return cls.__text__[cls.Config.getint("Units", magnitud)]
+        return cls.__text__[getConfig().getint("Units", magnitud)]
 
     @classmethod
     def func(cls, magnitud=""):
         """Return the configurated unit name for getattribute call"""
         if not magnitud:
             magnitud = cls.__name__
-        return cls.__units__[cls.Config.getint("Units", magnitud)]
+        return cls.__units__[getConfig().getint("Units", magnitud)]
 
     @classmethod
     def magnitudes(cls):
@@ -190,9 +234,7 @@ class unidad(float):
             magnitud = self.__class__.__name__
         if not unit:
             unit = self.func(magnitud)
-        Preferences = ConfigParser()
-        Preferences.read(conf_dir+"pychemqtrc")
-        kwargs = eval(Preferences.get("NumericFormat", magnitud))
+        kwargs = eval(getPreferences().get("NumericFormat", magnitud))
         value = self.__getattribute__(unit)
         return representacion(value, **kwargs)
 
@@ -248,9 +290,7 @@ with support for class unidad operations: txt, config. func."""
 
     def format(self, unit):
         """Using config file return the unit value in desired numeric format"""
-        Preferences = ConfigParser()
-        Preferences.read(conf_dir+"pychemqtrc")
-        kwargs = eval(Preferences.get("NumericFormat", "Dimensionless"))
+        kwargs = eval(getPreferences().get("NumericFormat", "Dimensionless"))
         return representacion(self, **kwargs)
 
     @property
@@ -283,8 +323,6 @@ class Temperature(unidad):
                      "english": "F"}
 
     def __init__(self, data, unit="K", magnitud=""):
-        self.Config = getMainWindowConfig()
-
         if not magnitud:
             magnitud = self.__class__.__name__
         self.magnitud = magnitud
@@ -297,7 +335,7 @@ class Temperature(unidad):
             self.code = ""
 
         if unit == "conf":
-            unit = self.__units__[self.Config.getint('Units', magnitud)]
+            unit = self.__units__[getConfig().getint('Units', magnitud)]
 
         if unit == "K":
             self._data = data
@@ -313,11 +351,26 @@ class Temperature(unidad):
             raise ValueError(
                 QApplication.translate("pychemqt", "Wrong input code"))
 
-        self.K = self._data
-        self.C = K2C(self._data)
-        self.F = K2F(self._data)
-        self.R = K2R(self._data)
-        self.Re = K2Re(self._data)
+
+    @property
+    def K(self):
+        return self._data
+
+    @property
+    def C(self):
+        return K2C(self._data)
+
+    @property
+    def F(self):
+        return K2F(self._data)
+
+    @property
+    def R(self):
+        return K2R(self._data)
+
+    @property
+    def Re(self):
+        return K2Re(self._data)
 
     @classmethod
     def _getBaseValue(cls, data, unit, magnitud):
@@ -327,7 +380,7 @@ class Temperature(unidad):
             magnitud = cls.__name__
 
         if unit == "conf":
-            unit = cls.__units__[cls.Config.getint('Units', magnitud)]
+            unit = cls.__units__[getConfig().getint('Units', magnitud)]
         elif not unit:
             unit = "K"
             
@@ -1144,14 +1197,12 @@ class Pressure(unidad):
                      "cgs": "dyncm2", "english": "psi"}
 
     def __init__(self, data, unit="Pa", magnitud=""):
-        self.Config = getMainWindowConfig()
-
         if not magnitud:
             magnitud = self.__class__.__name__
         self.magnitud = magnitud
 
         if unit == "conf":
-            unit = self.__units__[self.Config.getint('Units', magnitud)]
+            unit = self.__units__[getConfig().getint('Units', magnitud)]
 
         if unit == "barg":
             self._data = data*k.bar+k.atm
@@ -1168,12 +1219,17 @@ class Pressure(unidad):
         else:
             self.code = ""
 
-        for key in self.__class__.rates:
-            self.__setattr__(key, self._data/self.__class__.rates[key])
+    @property
+    def barg(self):
+        return (self._data-k.atm)/k.bar
 
-        self.barg = (self.Pa-k.atm)/k.bar
-        self.psig = (self.Pa-k.atm)/k.psi
-        self.kgcm2g = (self.Pa-k.atm)*k.centi**2/k.g
+    @property
+    def psig(self):
+        return (self._data-k.atm)/k.psi
+
+    @property
+    def kgcm2g(self):
+        return (self._data-k.atm)*k.centi**2/k.g
 
     @classmethod
     def _getBaseValue(cls, data, unit, magnitud):
@@ -1183,7 +1239,7 @@ class Pressure(unidad):
             magnitud = cls.__name__
 
         if unit == "conf":
-            unit = cls.__units__[cls.Config.getint('Units', magnitud)]
+            unit = cls.__units__[getConfig().getint('Units', magnitud)]
         elif not unit:
             unit = "Pa"
 
@@ -7,12 +7,15 @@
 #   - representacion: Function for string representation of float values
 #   - colors: Function to generate colors
 #   - exportTable; Save data to a file
+#   - LRUCache: Dict with bounded size for calculation caches
 #################################################################################
 
 
+from collections import OrderedDict
 import random
 import os
 from string import maketrans
+import threading
 
 from PyQt4.QtGui import QApplication
 
@@ -214,6 +217,46 @@ def spreadsheetColumn(index):
     return "".join(reversed(letters))
 
 
+class LRUCache(object):
+    """Dict with bounded size, when full the least recently used item is
+    discarded, the access is protected with a lock to let the use from the
+    calculation threads"""
+    def __init__(self, size=256):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data.pop(key)
+            self._data[key] = value
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
 if __name__ == "__main__":
 #    import math
 #    print representacion(math.pi, decimales=6, tol=1)
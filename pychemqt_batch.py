@@ -0,0 +1,53 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+###############################################################################
+# Command line calculation of pychemqt projects without gui, case studies and
+# sensitivity sweeps, usable in servers without X display
+#   pychemqt_batch.py project.pcq -s s1.T=300:400:11 -o results.csv
+# Run with --help for all options
+###############################################################################
+
+import os
+import shutil
+import sys
+import logging
+
+path = os.path.dirname(os.path.realpath(sys.argv[0]))
+sys.path.append(path)
+
+conf_dir = os.path.expanduser('~') + os.sep+".pychemqt"+os.sep
+os.environ["pychemqt"] = path + os.path.sep
+
+# Check external modules
+from tools.dependences import optional_modules
+for module, use in optional_modules:
+    try:
+        __import__(module)
+        os.environ[module] = "True"
+    except ImportError:
+        os.environ[module] = ""
+
+logging.basicConfig(level=logging.WARNING,
+                    format='%(levelname)s: %(message)s')
+
+# Check config files
+from lib import firstrun
+if not os.path.isdir(conf_dir):
+    os.mkdir(conf_dir)
+if not os.path.isfile(conf_dir + "pychemqtrc"):
+    Preferences = firstrun.Preferences()
+    Preferences.write(open(conf_dir + "pychemqtrc", "w"))
+if not os.path.isfile(conf_dir + "CostIndex.dat"):
+    with open(os.environ["pychemqt"] + "dat/costindex.dat") as cost_index:
+        lista = cost_index.readlines()[-1][:-1].split(" ")
+        with open(conf_dir + "CostIndex.dat", "w") as archivo:
+            for data in lista:
+                archivo.write(data + os.linesep)
+# Without internet connection in servers, use the archived currency rates
+if not os.path.isfile(conf_dir+"moneda.dat"):
+    shutil.copy(os.environ["pychemqt"]+"dat"+os.sep+"moneda.dat",
+                conf_dir+"moneda.dat")
+
+from lib.batch import main
+sys.exit(main())
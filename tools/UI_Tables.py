@@ -57,7 +57,8 @@ from numpy import (arange, append, concatenate, linspace,
 from scipy.optimize import fsolve
 from matplotlib.font_manager import FontProperties
 
-from lib import meos, mEoS, unidades, plot, config
+from lib import meos, mEoS, unidades, plot, config, plotCache
+from lib.thread import parallelMap
 from lib.utilities import representacion, exportTable
 from UI.widgets import (Entrada_con_unidades, createAction, LineStyleCombo,
                         MarkerCombo, ColorSelector, InputFond, Status, Tabla)
@@ -418,7 +419,10 @@ class plugin(QtGui.QMenu):
         z: property for axis z, optional to 3D plot"""
         index = self.config.getint("MEoS", "fluid")
         fluid = mEoS.__all__[index]
-        filename = "%s.pkl" % (fluid.formula)
+        points = get_points(self.parent().Preferences)
+        cache = plotCache.PlotCache(fluid, self.config, points)
+        key = cache.plotKey(self._plotLines(fluid))
+        filename = "plotCache%s%s-%s.pkl" % (os.sep, fluid.formula, key)
 
         if z:
             title = QtGui.QApplication.translate(
@@ -448,18 +452,47 @@ class plugin(QtGui.QMenu):
             k = self.config.getint("Units", unitz)
             ztxt = "%s, %s" % (z, meos.units[meos.keys.index(z)].__text__[k])
             grafico.plot.ax.set_zlabel(ztxt)
+        else:
+            if not xscale:
+                if x in ["P", "rho", "v"]:
+                    xscale = "log"
+                else:
+                    xscale = "linear"
+            grafico.plot.ax.set_xscale(xscale)
+            if not yscale:
+                if y in ["P", "rho", "v"]:
+                    yscale = "log"
+                else:
+                    yscale = "linear"
+            grafico.plot.ax.set_yscale(yscale)
 
         self.parent().statusbar.showMessage(QtGui.QApplication.translate(
             "pychemqt", "Loading cached data..."))
         QtGui.QApplication.processEvents()
         data = grafico._getData()
+        shown = False
         if not data:
             self.parent().progressBar.setValue(0)
             self.parent().progressBar.setVisible(True)
             self.parent().statusbar.showMessage(QtGui.QApplication.translate(
                 "pychemqt", "Calculating data, be patient..."))
+
+            # Show the plot window to draw each line when it's calculated,
+            # at end the preview lines are replaced by the complete plot
+            self.parent().centralwidget.currentWidget().addSubWindow(grafico)
+            grafico.show()
+            shown = True
             QtGui.QApplication.processEvents()
-            data = self.calculatePlot(fluid)
+            preview = []
+
+            def lineReady(name, line):
+                preview.extend(plotLine(grafico, name, line,
+                                        self.parent().Preferences, x, y, z))
+                grafico.plot.draw()
+
+            data = self.calculatePlot(fluid, lineReady)
+            for line in preview:
+                line.remove()
             conf = {}
             conf["fluid"] = index
             conf["eq"] = self.config.getint("MEoS", "eq")
@@ -478,134 +511,49 @@ class plugin(QtGui.QMenu):
         else:
             plot2D3D(grafico, data, self.parent().Preferences, x, y)
 
-            if not xscale:
-                if x in ["P", "rho", "v"]:
-                    xscale = "log"
-                else:
-                    xscale = "linear"
-            grafico.plot.ax.set_xscale(xscale)
-            if not yscale:
-                if y in ["P", "rho", "v"]:
-                    yscale = "log"
-                else:
-                    yscale = "linear"
-            grafico.plot.ax.set_yscale(yscale)
-
         grid = self.parent().Preferences.getboolean("MEOS", "grid")
         grafico.plot.ax._gridOn = grid
         grafico.plot.ax.grid(grid)
 
-        self.parent().centralwidget.currentWidget().addSubWindow(grafico)
-        grafico.show()
+        if shown:
+            grafico.plot.draw()
+        else:
+            self.parent().centralwidget.currentWidget().addSubWindow(grafico)
+            grafico.show()
         self.parent().statusbar.clearMessage()
 
-    def calculatePlot(self, fluid):
-        """Calculate data for plot
-            fluid: class of meos fluid to calculate"""
-        data = {}
+    def calculatePlot(self, fluid, lineReady=None):
+        """Calculate data for plot, the lines calculated before with the same
+        configuration are loaded from plot cache, the others are distributed
+        in a process pool
+            fluid: class of meos fluid to calculate
+            lineReady: optional function called with the name and data of
+                each line when it's available, to plot it without wait for
+                the others"""
         points = get_points(self.parent().Preferences)
+        cache = plotCache.PlotCache(fluid, self.config, points)
 
-        # Calculate melting line
+        # Define the lines to calculate, as (name, value, var, vvar) with
+        # value the fixed property value for isolines
+        lines = []
         if fluid._melting:
-            self.parent().statusbar.showMessage(QtGui.QApplication.translate(
-                "pychemqt", "Calculating melting line..."))
-            T = linspace(fluid._melting["Tmin"], fluid._melting["Tmax"], points)
-            fluidos = []
-            for Ti in T:
-                P = fluid._Melting_Pressure(Ti)
-                fluido = calcPoint(fluid, self.config, T=Ti, P=P)
-                if fluido:
-                    fluidos.append(fluido)
-                self.parent().progressBar.setValue(5*len(fluidos)/len(T))
-                QtGui.QApplication.processEvents()
-            if fluidos:
-                data["melting"] = {}
-                for x in prop_pickle:
-                    dat_propiedad = []
-                    for fluido in fluidos:
-                        num = fluido.__getattribute__(x)
-                        if num is not None:
-                            dat_propiedad.append(num._data)
-                        else:
-                            dat_propiedad.append(None)
-                    data["melting"][x] = dat_propiedad
-
-        # Calculate sublimation line
+            T = linspace(fluid._melting["Tmin"], fluid._melting["Tmax"],
+                         points)
+            lines.append(("melting", None, "T", list(T)))
         if fluid._sublimation:
-            self.parent().statusbar.showMessage(QtGui.QApplication.translate(
-                "pychemqt", "Calculating sublimation line..."))
-            T = linspace(fluid._sublimation["Tmin"], fluid._sublimation["Tmax"], points)
-            fluidos = []
-            for Ti in T:
-                P = fluid._Sublimation_Pressure(Ti)
-                fluido = calcPoint(fluid, self.config, T=Ti, P=P)
-                if fluido:
-                    fluidos.append(fluido)
-                self.parent().progressBar.setValue(5+5*len(fluidos)/len(T))
-                QtGui.QApplication.processEvents()
-            if fluidos:
-                data["sublimation"] = {}
-                for x in prop_pickle:
-                    dat_propiedad = []
-                    for fluido in fluidos:
-                        num = fluido.__getattribute__(x)
-                        if num is not None:
-                            dat_propiedad.append(num._data)
-                        else:
-                            dat_propiedad.append(None)
-                    data["sublimation"][x] = dat_propiedad
+            T = linspace(fluid._sublimation["Tmin"],
+                         fluid._sublimation["Tmax"], points)
+            lines.append(("sublimation", None, "T", list(T)))
 
         T = list(concatenate([linspace(fluid.Tt, 0.9*fluid.Tc, points),
                               linspace(0.9*fluid.Tc, 0.99*fluid.Tc, points),
                               linspace(0.99*fluid.Tc, fluid.Tc, points)]))
         for i in range(2, 0, -1):
             del T[points*i]
-
-        # Calculate saturation
-        self.parent().statusbar.showMessage(QtGui.QApplication.translate(
-            "pychemqt", "Calculating Liquid-Vapour saturation line..."))
-        if x == "P" and y == "T":
-            fases = [0]
-        else:
-            fases = [0, 1]
-        for fase in fases:
-            fluidos = []
-            for Ti in T:
-                fluidos.append(fluid(T=Ti, x=fase))
-                self.parent().progressBar.setValue(10+5*fase+5*len(fluidos)/len(T))
-                QtGui.QApplication.processEvents()
-
-            data["saturation_%i" % fase] = {}
-            for x in prop_pickle:
-                dat_propiedad = []
-                for fluido in fluidos:
-                    num = fluido.__getattribute__(x)
-                    if num is not None:
-                        dat_propiedad.append(num._data)
-                    else:
-                        dat_propiedad.append(None)
-                data["saturation_%i" % fase][x] = dat_propiedad
-
-        # Calculate isoquality lines
-        data["x"] = {}
-        self.parent().statusbar.showMessage(QtGui.QApplication.translate(
-            "pychemqt", "Calculating isoquality lines..."))
-        values = self.LineList("Isoquality", self.parent().Preferences)
-        for i, value in enumerate(values):
-            fluidos = calcIsoline(fluid, self.config,
-                                  "T", "x", T, value, 20, i, 20,
-                                  len(values), self.parent().progressBar)
-
-            data["x"][value] = {}
-            for x in prop_pickle:
-                dat_propiedad = []
-                for fluido in fluidos:
-                    num = fluido.__getattribute__(x)
-                    if num is not None:
-                        dat_propiedad.append(num._data)
-                    else:
-                        dat_propiedad.append(None)
-                data["x"][value][x] = dat_propiedad
+        lines.append(("saturation_0", None, "T", T))
+        lines.append(("saturation_1", None, "T", T))
+        for value in self.LineList("Isoquality", self.parent().Preferences):
+            lines.append(("x", value, "T", T))
 
         eq = fluid.eq[self.parent().currentConfig.getint("MEoS", "eq")]
         T = list(concatenate([linspace(eq["Tmin"], 0.9*fluid.Tc, points),
@@ -626,108 +574,64 @@ class plugin(QtGui.QMenu):
             del T[points*i]
             del P[points*i]
 
-        # Calculate isotherm lines
-        data["T"] = {}
-        self.parent().statusbar.showMessage(QtGui.QApplication.translate(
-            "pychemqt", "Calculating isotherm lines..."))
-        values = self.LineList("Isotherm", self.parent().Preferences, fluid)
-        for i, value in enumerate(values):
-            fluidos = calcIsoline(fluid, self.config,
-                                  "P", "T", P, value, 40, i, 10,
-                                  len(values), self.parent().progressBar)
-            data["T"][value] = {}
-            for x in prop_pickle:
-                dat_propiedad = []
-                for fluido in fluidos:
-                    num = fluido.__getattribute__(x)
-                    if num is not None:
-                        dat_propiedad.append(num._data)
-                    else:
-                        dat_propiedad.append(None)
-                data["T"][value][x] = dat_propiedad
-
-        # Calculate isobar lines
-        data["P"] = {}
-        self.parent().statusbar.showMessage(QtGui.QApplication.translate(
-            "pychemqt", "Calculating isobar lines..."))
-        values = self.LineList("Isobar", self.parent().Preferences, fluid)
-        for i, value in enumerate(values):
-            fluidos = calcIsoline(fluid, self.config,
-                                  "T", "P", T, value, 50, i, 10,
-                                  len(values), self.parent().progressBar)
-            data["P"][value] = {}
-            for x in prop_pickle:
-                dat_propiedad = []
-                for fluido in fluidos:
-                    num = fluido.__getattribute__(x)
-                    if num is not None:
-                        dat_propiedad.append(num._data)
-                    else:
-                        dat_propiedad.append(None)
-                data["P"][value][x] = dat_propiedad
-
-        # Calculate isochor lines
-        data["v"] = {}
-        self.parent().statusbar.showMessage(QtGui.QApplication.translate(
-            "pychemqt", "Calculating isochor lines..."))
-        values = self.LineList("Isochor", self.parent().Preferences, fluid)
-        for i, value in enumerate(values):
-            fluidos = calcIsoline(fluid, self.config,
-                                  "T", "v", T, value, 60, i, 10,
-                                  len(values), self.parent().progressBar)
-            data["v"][value] = {}
-            for x in prop_pickle:
-                dat_propiedad = []
-                for fluido in fluidos:
-                    num = fluido.__getattribute__(x)
-                    if num is not None:
-                        dat_propiedad.append(num._data)
-                    else:
-                        dat_propiedad.append(None)
-                data["v"][value][x] = dat_propiedad
-
-        # Calculate isoenthalpic lines
-        data["h"] = {}
-        self.parent().statusbar.showMessage(QtGui.QApplication.translate(
-            "pychemqt", "Calculating isoenthalpic lines..."))
-        values = self.LineList("Isoenthalpic", self.parent().Preferences, fluid)
-        for i, value in enumerate(values):
-            fluidos = calcIsoline(fluid, self.config,
-                                  "T", "h", T, value, 70, i, 10,
-                                  len(values), self.parent().progressBar)
-            data["h"][value] = {}
-            for x in prop_pickle:
-                dat_propiedad = []
-                for fluido in fluidos:
-                    num = fluido.__getattribute__(x)
-                    if num is not None:
-                        dat_propiedad.append(num._data)
-                    else:
-                        dat_propiedad.append(None)
-                data["h"][value][x] = dat_propiedad
+        for fix, name, var, vvar in (("T", "Isotherm", "P", P),
+                                     ("P", "Isobar", "T", T),
+                                     ("v", "Isochor", "T", T),
+                                     ("h", "Isoenthalpic", "T", T),
+                                     ("s", "Isoentropic", "T", T)):
+            values = self.LineList(name, self.parent().Preferences, fluid)
+            for value in values:
+                lines.append((fix, value, var, vvar))
+
+        # Load the cached lines and calculate the others in parallel, the
+        # progress is updated with each finished line
+        result = [cache.get(name, value) for name, value, var, vvar in lines]
+        option = {}
+        option["eq"] = self.config.getint("MEoS", "eq")
+        option["visco"] = self.config.getint("MEoS", "visco")
+        option["thermal"] = self.config.getint("MEoS", "thermal")
+        tasks = [(i, fluid, option)+line for i, line in enumerate(lines)
+                 if result[i] is None]
+        if lineReady:
+            for (name, value, var, vvar), line in zip(lines, result):
+                if line is not None:
+                    lineReady(name, line)
 
-        # Calculate isoentropic lines
-        data["s"] = {}
         self.parent().statusbar.showMessage(QtGui.QApplication.translate(
-            "pychemqt", "Calculating isoentropic lines..."))
-        values = self.LineList("Isoentropic", self.parent().Preferences, fluid)
-        for i, value in enumerate(values):
-            fluidos = calcIsoline(fluid, self.config,
-                                  "T", "s", T, value, 80, i, 20,
-                                  len(values), self.parent().progressBar)
-            data["s"][value] = {}
-            for x in prop_pickle:
-                dat_propiedad = []
-                for fluido in fluidos:
-                    num = fluido.__getattribute__(x)
-                    if num is not None:
-                        dat_propiedad.append(num._data)
-                    else:
-                        dat_propiedad.append(None)
-                data["s"][num][x] = dat_propiedad
+            "pychemqt", "Calculating lines..."))
+        done = len(lines)-len(tasks)
+        self.parent().progressBar.setValue(100*done/len(lines))
+        QtGui.QApplication.processEvents()
+        for i, line in parallelMap(_calcLine, tasks):
+            name, value = lines[i][:2]
+            cache.save(name, line, value)
+            result[i] = line
+            if lineReady:
+                lineReady(name, line)
+            done += 1
+            self.parent().progressBar.setValue(100*done/len(lines))
+            QtGui.QApplication.processEvents()
 
+        data = {}
+        for (name, value, var, vvar), line in zip(lines, result):
+            if value is None:
+                if line["T"] or name.startswith("saturation"):
+                    data[name] = line
+            else:
+                data.setdefault(name, {})[value] = line
         return data
 
+    def _plotLines(self, fluid):
+        """Return a dict with the values of isolines to plot, used to define
+        the key of plot data"""
+        Preferences = self.parent().Preferences
+        lines = {"x": self.LineList("Isoquality", Preferences)}
+        for var, name in (("T", "Isotherm"), ("P", "Isobar"),
+                          ("v", "Isochor"), ("h", "Isoenthalpic"),
+                          ("s", "Isoentropic")):
+            lines[var] = self.LineList(name, Preferences, fluid)
+        return lines
+
     @staticmethod
     def LineList(name, Preferences, fluid=None):
         """Return a list with the values of isoline name to plot"""
@@ -2201,7 +2105,8 @@ class TablaMEoS(Tabla):
                 if unit == unidades.Dimensionless:
                     self.orderUnit.append(0)
                 else:
-                    self.orderUnit.append(unit.Config.getint('Units', unit.__name__))
+                    self.orderUnit.append(config.getConfig().getint(
+                        'Units', unit.__name__))
 
         if "format" in kwargs:
             self.format = kwargs["format"]
@@ -3199,6 +3104,8 @@ class PlotMEoS(QtGui.QWidget):
         if os.path.isfile(filenameSoft):
             with open(filenameSoft) as archivo:
                 data = cPickle.load(archivo)
+            # Update modification time, used as last access for cache clean
+            os.utime(filenameSoft, None)
             return data
         elif os.path.isfile(filenameHard):
             with gzip.GzipFile(filenameHard, 'rb') as archivo:
@@ -3208,8 +3115,12 @@ class PlotMEoS(QtGui.QWidget):
 
     def _saveData(self, data):
         """Save changes in data to file"""
+        path = os.path.dirname(config.conf_dir+self.filename)
+        if not os.path.isdir(path):
+            os.makedirs(path)
         with open(config.conf_dir+self.filename, 'wb') as file:
             cPickle.dump(data, file)
+        plotCache.clean()
 
     def click(self, event):
         """Update input and graph annotate when mouse click over chart"""
@@ -3750,16 +3661,7 @@ class EditPlot(QtGui.QWidget):
                 name = "Isoquality"
                 unit = unidades.Dimensionless
 
-            line = {value: {}}
-            for x in prop_pickle:
-                dat_propiedad = []
-                for fluido in fluidos:
-                    num = fluido.__getattribute__(x)
-                    if num is not None:
-                        dat_propiedad.append(num._data)
-                    else:
-                        dat_propiedad.append(None)
-                line[value][x] = dat_propiedad
+            line = {value: _getLineData(fluidos)}
 
             style = getLineFormat(self.mainwindow.Preferences, name)
             functionx = _getunitTransform(self.plotMEoS.x)
@@ -4046,51 +3948,92 @@ class AxisWidget(QtGui.QGroupBox):
         lyt.addWidget(self.max, 4, 2)
 
 
-def calcIsoline(f, config, var, fix, vvar, vfix, ini, step, end, total, bar):
-    """Procedure to calculate isoline. In isotherm and isobar add to calculate
-    point the saturated states in two-phases region"""
+def _getLineData(fluidos):
+    """Return a dict with the list of values of each property in prop_pickle
+    for the states of a line, None for undefined values"""
+    data = {}
+    for x in prop_pickle:
+        dat_propiedad = []
+        for fluido in fluidos:
+            num = fluido.__getattribute__(x)
+            if num is not None:
+                dat_propiedad.append(num._data)
+            else:
+                dat_propiedad.append(None)
+        data[x] = dat_propiedad
+    return data
+
+
+def _calcLine(args):
+    """Calculate a plot line, function to run in worker process
+        args: tuple with (index, fluid, option, name, value, var, vvar)
+    Return the index with the dict of line data"""
+    i, fluid, option, name, value, var, vvar = args
+    if name == "melting":
+        fluidos = []
+        for Ti in vvar:
+            P = fluid._Melting_Pressure(Ti)
+            fluido = calcPoint(fluid, option, T=Ti, P=P)
+            if fluido:
+                fluidos.append(fluido)
+    elif name == "sublimation":
+        fluidos = []
+        for Ti in vvar:
+            P = fluid._Sublimation_Pressure(Ti)
+            fluido = calcPoint(fluid, option, T=Ti, P=P)
+            if fluido:
+                fluidos.append(fluido)
+    elif name.startswith("saturation"):
+        fase = int(name[-1])
+        fluidos = [fluid(T=Ti, x=fase) for Ti in vvar]
+    else:
+        fluidos = calcIsoline(fluid, option, var, name, vvar, value)
+    return i, _getLineData(fluidos)
+
+
+def calcIsoline(f, config, var, fix, vvar, vfix, ini=0, step=0, end=0,
+                total=1, bar=None):
+    """Procedure to calculate isoline, with the continuation method of meos
+    when it's supported for the line variables, the saturated states are
+    added in the points where the line cross the saturation curve
+    bar is the progress bar to update, None to calculate without gui"""
+    option = _getOption(config)
+    Tmin = f.eq[option["eq"]]["Tmin"]
+    Tmax = f.eq[option["eq"]]["Tmax"]
+    Pmin = f.eq[option["eq"]]["Pmin"]*1000
+    Pmax = f.eq[option["eq"]]["Pmax"]*1000
+    if var == "T":
+        vvar = [T for T in vvar if Tmin <= T <= Tmax]
+    elif var == "P":
+        vvar = [P for P in vvar if Pmin-1 <= P <= Pmax+1]
+
+    try:
+        fluidos = f.isoline(var, vvar, fix, vfix, **option)
+    except NotImplementedError:
+        fluidos = None
+
+    if fluidos is not None:
+        fluidos = [fluido for fluido in fluidos if _inRange(fluido, option)]
+        if bar is not None:
+            bar.setValue(ini+end*(step+1)/total)
+            QtGui.QApplication.processEvents()
+        return fluidos
+
     fluidos = []
-    fase = None
     rhoo = 0
     To = 0
     for Ti in vvar:
         kwargs = {var: Ti, fix: vfix, "rho0": rhoo, "T0": To}
-        print kwargs
-        fluido = calcPoint(f, config, **kwargs)
+        fluido = calcPoint(f, option, **kwargs)
         if fluido and fluido.status and (fluido.rho != rhoo or fluido.T != To):
             if var not in ("T", "P") or fix not in ("T", "P"):
                 rhoo = fluido.rho
                 To = fluido.T
-
             fluidos.append(fluido)
-            # FIXME: Fix added point order
-#            if var in ("T", "P") and fix in ("T", "P"):
-#                if fase is None:
-#                    fase = fluido.x
-#                if fase != fluido.x and fase <= 0:
-#                    if fluido.P < f.Pc and fluido.T < f.Tc:
-#                        fluido_x0 = calcPoint(f, config, **{fix: vfix, "x": 0.})
-#                        fluidos.insert(-1, fluido_x0)
-#                elif fase != fluido.x and fase >= 1:
-#                    if fluido.P < f.Pc and fluido.T < f.Tc:
-#                        fluido_x1 = calcPoint(f, config, **{fix: vfix, "x": 1.})
-#                        fluidos.insert(-1, fluido_x1)
-#                if fase != fluido.x and fluido.x >= 1:
-#                    if fluido.P < f.Pc and fluido.T < f.Tc:
-#                        fluido_x1 = calcPoint(f, config, **{fix: vfix, "x": 1.})
-#                        fluidos.insert(-1, fluido_x1)
-##                        rhoo = fluido_x1.rho
-##                        To = fluido_x1.T
-#                elif fase != fluido.x and fluido.x <= 0:
-#                    if fluido.P < f.Pc and fluido.T < f.Tc:
-#                        fluido_x0 = calcPoint(f, config, **{fix: vfix, "x": 0.})
-#                        fluidos.insert(-1, fluido_x0)
-##                        rhoo = fluido_x0.rho
-##                        To = fluido_x0.T
-#                fase = fluido.x
-
-        bar.setValue(ini+end*step/total+end/total*len(fluidos)/len(vvar))
-        QtGui.QApplication.processEvents()
+
+        if bar is not None:
+            bar.setValue(ini+end*step/total+end/total*len(fluidos)/len(vvar))
+            QtGui.QApplication.processEvents()
     return fluidos
 
 
@@ -4193,6 +4136,49 @@ def plotIsoline(data, axis, title, unidad, grafico, transform, **format):
                                      size="small", ha="center", va="center")
 
 
+# Name of preferences line format for each line of plot data
+_lineFormat = {"saturation_0": "saturation", "saturation_1": "saturation",
+               "melting": "saturation", "sublimation": "saturation",
+               "x": "Isoquality", "T": "Isotherm", "P": "Isobar",
+               "v": "Isochor", "rho": "Isochor", "h": "Isoenthalpic",
+               "s": "Isoentropic"}
+
+
+def _lineVisible(name, x, y, z=None):
+    """Check if the lines name of plot data are drawn in a plot with x, y, z
+    axis, the lines of a variable in axis aren't drawn"""
+    if name == "saturation_1":
+        return x != "P" or y != "T"
+    if z or name in ("saturation_0", "melting", "sublimation"):
+        return True
+    if name == "x":
+        return x not in ["P", "T"] or y not in ["P", "T"]
+    if name in ("v", "rho"):
+        return x not in ["rho", "v"] and y not in ["rho", "v"]
+    return x != name and y != name
+
+
+def plotLine(grafico, name, line, Preferences, x, y, z=None):
+    """Plot a line of plot data without label and annotation, used to show
+    the lines as they are calculated
+        grafico: PlotMEoS instance to plot data
+        name: name of line in plot data, saturation_0, melting, T...
+        line: dict with the properties values list of line
+        Preferences: ConfigParser instance with pychemqt preferences
+        x, y, z: Keys for axis, z optional for 3D plot
+    Return the list of matplotlib lines added"""
+    if not _lineVisible(name, x, y, z):
+        return []
+    format = getLineFormat(Preferences, _lineFormat[name])
+    for key in ("annotate", "pos", "unit", "variable"):
+        format.pop(key, None)
+    values = []
+    for axis in (x, y, z):
+        if axis:
+            values.append(map(_getunitTransform(axis), line[axis]))
+    return grafico.plot.ax.plot(*values, **format)
+
+
 def plot2D3D(grafico, data, Preferences, x, y, z=None):
     """Plot procedure
     Parameters:
@@ -4210,7 +4196,7 @@ def plot2D3D(grafico, data, Preferences, x, y, z=None):
 
     # Plot saturation lines
     format = getLineFormat(Preferences, "saturation")
-    if x == "P" and y == "T":
+    if not _lineVisible("saturation_1", x, y, z):
         satLines = QtGui.QApplication.translate("pychemqt", "Saturation Line"),
     else:
         satLines = [
@@ -4246,25 +4232,25 @@ def plot2D3D(grafico, data, Preferences, x, y, z=None):
             grafico.plot.ax.plot(xsub, ysub, label=label, **format)
 
     # Plot quality isolines
-    if x not in ["P", "T"] or y not in ["P", "T"] or z:
+    if _lineVisible("x", x, y, z):
         format = getLineFormat(Preferences, "Isoquality")
         plotIsoline(data["x"], (x, y, z), "x", unidades.Dimensionless, grafico,
                     transform, **format)
 
     # Plot isotherm lines
-    if x != "T" and y != "T" or z:
+    if _lineVisible("T", x, y, z):
         format = getLineFormat(Preferences, "Isotherm")
         plotIsoline(data["T"], (x, y, z), "T", unidades.Temperature, grafico,
                     transform, **format)
 
     # Plot isobar lines
-    if x != "P" and y != "P" or z:
+    if _lineVisible("P", x, y, z):
         format = getLineFormat(Preferences, "Isobar")
         plotIsoline(data["P"], (x, y, z), "P", unidades.Pressure, grafico,
                     transform, **format)
 
     # Plot isochor lines
-    if x not in ["rho", "v"] and y not in ["rho", "v"] or z:
+    if _lineVisible("v", x, y, z):
         format = getLineFormat(Preferences, "Isochor")
         plotIsoline(data["v"], (x, y, z), "v", unidades.SpecificVolume, grafico,
                     transform, **format)
@@ -4274,13 +4260,13 @@ def plot2D3D(grafico, data, Preferences, x, y, z=None):
                         grafico, transform, **format)
 
     # Plot isoenthalpic lines
-    if x != "h" and y != "h" or z:
+    if _lineVisible("h", x, y, z):
         format = getLineFormat(Preferences, "Isoenthalpic")
         plotIsoline(data["h"], (x, y, z), "h", unidades.Enthalpy, grafico,
                     transform, **format)
 
     # Plot isoentropic lines
-    if x != "s" and y != "s" or z:
+    if _lineVisible("s", x, y, z):
         format = getLineFormat(Preferences, "Isoentropic")
         plotIsoline(data["s"], (x, y, z), "s", unidades.SpecificHeat, grafico,
                     transform, **format)
@@ -4303,15 +4289,39 @@ def _getunitTransform(eje):
         return lambda val: val*factor if val is not None else nan
 
 
+def _getOption(config):
+    """Return a dict with the meos options from project config"""
+    if isinstance(config, dict):
+        return config
+    option = {}
+    option["eq"] = config.getint("MEoS", "eq")
+    option["visco"] = config.getint("MEoS", "visco")
+    option["thermal"] = config.getint("MEoS", "thermal")
+    return option
+
+
+def _inRange(fluido, option):
+    """Check the state is calculated and it's in the P-T range of eq"""
+    if fluido.status not in [1, 3]:
+        return False
+    Tmin = fluido.eq[option["eq"]]["Tmin"]
+    Tmax = fluido.eq[option["eq"]]["Tmax"]
+    Pmin = fluido.eq[option["eq"]]["Pmin"]*1000
+    Pmax = fluido.eq[option["eq"]]["Pmax"]*1000
+    if fluido._melting and fluido._melting["Tmin"] <= fluido.T\
+            <= fluido._melting["Tmax"]:
+        Pmel = fluido._Melting_Pressure(fluido.T)
+        Pmax = min(Pmax, Pmel)
+
+    if fluido.P < Pmin-1 or fluido.P > Pmax+1 or fluido.T < Tmin\
+            or fluido.T > Tmax:
+        return False
+    return True
+
+
 def calcPoint(fluid, config, **kwargs):
     """Procedure to calculate point state and check state in P-T range of eq"""
-    if isinstance(config, dict):
-        option = config
-    else:
-        option = {}
-        option["eq"] = config.getint("MEoS", "eq")
-        option["visco"] = config.getint("MEoS", "visco")
-        option["thermal"] = config.getint("MEoS", "thermal")
+    option = _getOption(config)
     kwargs.update(option)
     Tmin = fluid.eq[option["eq"]]["Tmin"]
     Tmax = fluid.eq[option["eq"]]["Tmax"]
@@ -4325,15 +4335,7 @@ def calcPoint(fluid, config, **kwargs):
             return None
     fluido = fluid(**kwargs)
 
-    if fluido.status not in [1, 3]:
-        return None
-    if fluido._melting and fluido._melting["Tmin"] <= fluido.T\
-            <= fluido._melting["Tmax"]:
-        Pmel = fluido._Melting_Pressure(fluido.T)
-        Pmax = min(Pmax, Pmel)
-
-    if fluido.P < Pmin-1 or fluido.P > Pmax+1 or fluido.T < Tmin\
-            or fluido.T > Tmax:
+    if not _inRange(fluido, option):
         return None
     return fluido
 
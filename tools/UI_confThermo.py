@@ -9,7 +9,9 @@ import os
 
 from PyQt4 import QtGui
 
+from lib import tabulated
 from lib.EoS import K, H
+from lib.thread import Evaluate
 
 
 class UI_confThermo_widget(QtGui.QWidget):
@@ -79,6 +81,22 @@ class UI_confThermo_widget(QtGui.QWidget):
         self.GERG = QtGui.QCheckBox(QtGui.QApplication.translate(
             "pychemqt", "Use GERG EoS for mix if it's posible"))
         layout.addWidget(self.GERG, 12, 0, 1, 3)
+        self.tabulated = QtGui.QCheckBox(QtGui.QApplication.translate(
+            "pychemqt", "Use precalculated tables for MEoS and IAPWS97 "
+            "(fastest, interpolated)"))
+        layout.addWidget(self.tabulated, 13, 0, 1, 3)
+        self.buildTables = QtGui.QPushButton(QtGui.QApplication.translate(
+            "pychemqt", "Build tables"))
+        self.buildTables.setToolTip(QtGui.QApplication.translate(
+            "pychemqt", "Calculate in background the missing tables of "
+            "project components, it can take some minutes by component"))
+        self.buildTables.setEnabled(False)
+        self.buildTables.clicked.connect(self.build)
+        layout.addWidget(self.buildTables, 14, 1, 1, 2)
+        self.tabulated.toggled.connect(self.buildTables.setEnabled)
+        # The thread outlives the dialog, the build is not interrupted
+        self.thread = Evaluate(QtGui.QApplication.instance())
+        self.thread.finished.connect(self.built)
 
         if os.environ["freesteam"]:
             self.iapws.toggled.connect(self.freesteam.setEnabled)
@@ -87,10 +105,36 @@ class UI_confThermo_widget(QtGui.QWidget):
         if os.environ["refprop"]:
             self.MEoS.toggled.connect(self.refprop.setEnabled)
 
+        self.config = None
         if config:
             self.setConfig(config)
 
+    def build(self):
+        """Build the tables of components of project in a thread, so the
+        gui can response while calculation is in process"""
+        if self.config is None or \
+                not self.config.has_option("Components", "Components"):
+            return
+        ids = self.config.get("Components", "Components")
+        if not isinstance(ids, list):
+            ids = eval(ids)
+        if self.config.has_option("MEoS", "eq"):
+            eq = self.config.getint("MEoS", "eq")
+        else:
+            eq = 0
+        self.buildTables.setEnabled(False)
+        self.buildTables.setText(QtGui.QApplication.translate(
+            "pychemqt", "Building tables..."))
+        self.thread.start(tabulated.buildTables, {
+            "ids": ids, "iapws97": self.iapws.isChecked(), "eq": eq})
+
+    def built(self):
+        self.buildTables.setText(QtGui.QApplication.translate(
+            "pychemqt", "Build tables"))
+        self.buildTables.setEnabled(self.tabulated.isChecked())
+
     def setConfig(self, config):
+        self.config = config
         if config.has_section("Thermo"):
             self.K.setCurrentIndex(config.getint("Thermo", "K"))
             self.alfa.setCurrentIndex(config.getint("Thermo", "Alfa"))
@@ -103,6 +147,9 @@ class UI_confThermo_widget(QtGui.QWidget):
             self.freesteam.setChecked(config.getboolean("Thermo", "freesteam"))
             self.coolProp.setChecked(config.getboolean("Thermo", "coolProp"))
             self.refprop.setChecked(config.getboolean("Thermo", "refprop"))
+            if config.has_option("Thermo", "tabulated"):
+                self.tabulated.setChecked(
+                    config.getboolean("Thermo", "tabulated"))
 
     def value(self, config):
         """Function result for wizard"""
@@ -119,6 +166,7 @@ class UI_confThermo_widget(QtGui.QWidget):
         config.set("Thermo", "freesteam", str(self.freesteam.isChecked()))
         config.set("Thermo", "coolProp", str(self.coolProp.isChecked()))
         config.set("Thermo", "refprop", str(self.refprop.isChecked()))
+        config.set("Thermo", "tabulated", str(self.tabulated.isChecked()))
         return config
 
     @classmethod
@@ -135,6 +183,7 @@ class UI_confThermo_widget(QtGui.QWidget):
         config.set("Thermo", "freesteam", "False")
         config.set("Thermo", "coolProp", "False")
         config.set("Thermo", "refprop", "False")
+        config.set("Thermo", "tabulated", "False")
         return config
 
 